@@ -41,6 +41,11 @@ setup(
     packages=['vectara_client'],
     install_requires=['requests', 'dacite>=1.8.1', 'Authlib==1.3.1', 'pyaml==23.9.7', 'tqdm==4.66.1',
                       'requests-toolbelt==1.0.0', 'cryptography==40.0.2'],
+    extras_require={
+        'async': ['httpx'],
+        'orjson': ['orjson'],
+        'http2': ['httpx[http2]']
+    },
     python_requires='>=3.4',
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
@@ -0,0 +1,149 @@
+import unittest
+import asyncio
+import logging
+import importlib.util
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.core import Factory, AsyncClient
+from vectara_client.domain import ResponseSet, IndexDocumentResponse
+from vectara_client.query import AsyncQueryService
+from vectara_client.index import AsyncIndexerService
+from vectara_client.document import AsyncDocumentService
+from vectara_client.admin import AsyncAdminService
+from vectara_client.config import TransportConfig
+from vectara_client.status import StatusCode
+from vectara_client.util import AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response, build_list_documents_response, INDEX_RESPONSE, LIST_CORPORA_RESPONSE, \
+    UPLOAD_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+
+def list_documents_route(request):
+    if request.json().get('pageKey'):
+        return build_list_documents_response(50, offset=100)
+    else:
+        return build_list_documents_response(100, next_page_key="page-2")
+
+
+@unittest.skipUnless(HAS_HTTPX, "httpx is required for the asyncio client")
+class AsyncClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(routes={
+            "query": build_query_response(),
+            "index": INDEX_RESPONSE,
+            "list-documents": list_documents_route,
+            "list-corpora": LIST_CORPORA_RESPONSE,
+            "upload": UPLOAD_RESPONSE
+        }).start()
+        self.auth_util = ApiKeyUtil("12344", "BLAH_KEY")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _request_util(self, transport_config: TransportConfig = None):
+        return AsyncRequestUtil(self.auth_util, transport_config=transport_config, base_url=self.server.base_url)
+
+    def testQuery(self):
+        async def run():
+            request_util = self._request_util()
+            qs = AsyncQueryService(request_util, 12344)
+            result = await qs.query("Where does Santa live?", 1)
+            await request_util.aclose()
+            return result
+
+        result = asyncio.run(run())
+        self.assertIsInstance(result, ResponseSet)
+        self.assertEqual(10, len(result.response))
+
+        # The payload is identical to the one the blocking QueryService would send.
+        payload = self.server.requests[0].json()
+        self.assertEqual({"lambda": 0.025}, payload['query'][0]['corpusKey'][0]['lexicalInterpolationConfig'])
+
+    def testIndexDoc(self):
+        async def run():
+            request_util = self._request_util()
+            indexer = AsyncIndexerService(self.auth_util, request_util, 12344)
+            result = await indexer.index_doc(1, {"document_id": "doc-1", "title": "Doc 1",
+                                                 "section": [{"text": "Hello", "section": []}]})
+            await request_util.aclose()
+            return result
+
+        result = asyncio.run(run())
+        self.assertIsInstance(result, IndexDocumentResponse)
+        self.assertEqual(StatusCode.OK, result.status.code)
+
+    def testUpload(self):
+        async def run():
+            request_util = self._request_util()
+            indexer = AsyncIndexerService(self.auth_util, request_util, 12344)
+            result = await indexer.upload(1, "./resources/filter_attributes/document_1.json",
+                                          metadata={"owner": "david"})
+            await request_util.aclose()
+            return result
+
+        result = asyncio.run(run())
+        self.assertIsNone(result.response.status)
+        upload_request = self.server.requests[0]
+        self.assertIn("multipart/form-data", upload_request.headers['Content-Type'])
+        self.assertIn(b'"owner":"david"', upload_request.body)
+
+    def testListDocumentsPaginates(self):
+        async def run():
+            request_util = self._request_util()
+            document_service = AsyncDocumentService(request_util)
+            result = await document_service.list_documents(1)
+            await request_util.aclose()
+            return result
+
+        result = asyncio.run(run())
+        self.assertEqual(150, len(result))
+        self.assertEqual(2, self.server.request_count)
+
+    def testListCorpora(self):
+        async def run():
+            request_util = self._request_util()
+            admin_service = AsyncAdminService(request_util, 12344)
+            result = await admin_service.list_corpora("test")
+            await request_util.aclose()
+            return result
+
+        self.assertEqual([], asyncio.run(run()))
+
+    def testConcurrentQueriesSharePool(self):
+        async def run():
+            request_util = self._request_util(TransportConfig(pool_maxsize=8))
+            qs = AsyncQueryService(request_util, 12344)
+            results = await asyncio.gather(*[qs.query(f"Query {i}", 1, summary=False) for i in range(200)])
+            await request_util.aclose()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(200, len(results))
+        self.assertEqual(200, self.server.request_count)
+        self.assertLessEqual(self.server.connection_count, 8)
+
+    def testFactoryBuildAsync(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" }
+        }"""
+
+        async def run():
+            async with Factory(config_json=config_json).build_async() as client:
+                self.assertIsInstance(client, AsyncClient)
+                self.assertIsInstance(client.query_service, AsyncQueryService)
+                self.assertIs(client.request_util, client.document_service.request_util)
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,256 @@
+import unittest
+import asyncio
+import importlib.util
+import logging
+import os
+import tempfile
+import requests
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.authpool import PooledAuthUtil, PooledCredential
+from vectara_client.config import PooledAuthConfig
+from vectara_client.core import Factory
+from vectara_client.decoder import decode
+from vectara_client.domain import IndexDocumentResponse
+from vectara_client.retry import RetryHandler
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import INDEX_RESPONSE, LIST_CORPORA_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('PooledAuthUtil').setLevel(logging.ERROR)
+
+HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers if headers else {}
+
+
+def pool(*names, policy: str = "round-robin", weights: dict = None, clock=None) -> PooledAuthUtil:
+    weights = weights if weights else {}
+    credentials = [PooledCredential(name, ApiKeyUtil("12344", name), weights.get(name, 1)) for name in names]
+    return PooledAuthUtil(credentials, PooledAuthConfig(credentials=[], policy=policy),
+                          clock=clock if clock else FakeClock())
+
+
+def keys(auth_util: PooledAuthUtil, count: int) -> list:
+    return [auth_util.get_headers()["x-api-key"] for _ in range(count)]
+
+
+def throttling_route(throttled_key: str, response=LIST_CORPORA_RESPONSE, headers=None):
+    """
+    Answers requests with throttled_key with a 429.
+    """
+    def route(request):
+        if request.headers.get("x-api-key") == throttled_key:
+            return 429, {"message": "slow down"}, headers if headers else {}
+        return response
+
+    return route
+
+
+class PooledAuthUtilTest(unittest.TestCase):
+
+    def testRoundRobin(self):
+        self.assertEqual(["a", "b", "c", "a", "b", "c"], keys(pool("a", "b", "c"), 6))
+
+    def testWeighted(self):
+        auth_util = pool("a", "b", "c", policy="weighted", weights={"a": 5})
+        self.assertEqual(["a", "a", "b", "a", "c", "a", "a"], keys(auth_util, 7))
+
+    def testLeastRecentlyThrottled(self):
+        clock = FakeClock()
+        auth_util = pool("a", "b", "c", policy="least-recently-throttled", clock=clock)
+        # Never throttled, so by fewest requests.
+        self.assertEqual(["a", "b", "c"], keys(auth_util, 3))
+
+        auth_util.observe({"x-api-key": "a"}, FakeResponse(429))
+        clock.now += 5
+        auth_util.observe({"x-api-key": "b"}, FakeResponse(429))
+        clock.now += 60
+        self.assertEqual(["c", "c"], keys(auth_util, 2))
+        auth_util.observe({"x-api-key": "c"}, FakeResponse(429))
+        clock.now += 60
+        # All back in rotation, a was throttled longest ago.
+        self.assertEqual("a", keys(auth_util, 1)[0])
+
+    def testSidelinesThrottledCredential(self):
+        clock = FakeClock()
+        auth_util = pool("a", "b", clock=clock)
+        keys(auth_util, 2)
+        auth_util.observe({"x-api-key": "a"}, FakeResponse(429, {"Retry-After": "30"}))
+
+        self.assertEqual(["b", "b", "b"], keys(auth_util, 3))
+        self.assertTrue(auth_util.stats()["a"].sidelined)
+        clock.now += 30
+        self.assertEqual({"a", "b"}, set(keys(auth_util, 2)))
+
+        stats = auth_util.stats()
+        self.assertEqual(1, stats["a"].throttled)
+        self.assertFalse(stats["a"].sidelined)
+        self.assertEqual(7, stats["a"].requests + stats["b"].requests)
+
+    def testSidelinesRejectedCredential(self):
+        clock = FakeClock()
+        auth_util = pool("a", "b", clock=clock)
+        keys(auth_util, 2)
+        expired = {"status": {"code": "EXPIRED_API_KEY", "statusDetail": "Expired", "cause": None},
+                   "quotaConsumed": None}
+        auth_util.observe({"x-api-key": "b"}, FakeResponse(200), decode(IndexDocumentResponse, expired))
+        auth_util.observe({"x-api-key": "a"}, FakeResponse(200), decode(IndexDocumentResponse, INDEX_RESPONSE))
+
+        clock.now += 299
+        self.assertEqual(["a", "a"], keys(auth_util, 2))
+        self.assertEqual(1, auth_util.stats()["b"].rejected)
+        clock.now += 1
+        self.assertIn("b", keys(auth_util, 2))
+
+    def testSidelinesCredentialRejectedByErrorStatus(self):
+        auth_util = pool("a", "b", "c")
+        keys(auth_util, 3)
+        auth_util.observe({"x-api-key": "a"}, FakeResponse(401), {"status": {"code": "DISABLED_API_KEY"}})
+        auth_util.observe({"x-api-key": "b"}, FakeResponse(403), {"code": 1105, "message": "Expired"})
+        auth_util.observe({"x-api-key": "c"}, FakeResponse(401), {"code": 16, "message": "Unauthenticated"})
+
+        self.assertEqual(["c", "c"], keys(auth_util, 2))
+        stats = auth_util.stats()
+        self.assertEqual([1, 1, 0], [stats[name].rejected for name in ["a", "b", "c"]])
+
+    def testAllSidelinedUsesSoonestBack(self):
+        clock = FakeClock()
+        auth_util = pool("a", "b", clock=clock)
+        keys(auth_util, 2)
+        auth_util.observe({"x-api-key": "a"}, FakeResponse(429, {"Retry-After": "20"}))
+        auth_util.observe({"x-api-key": "b"}, FakeResponse(429, {"Retry-After": "10"}))
+        self.assertEqual(["b", "b"], keys(auth_util, 2))
+
+    def testIgnoresUnknownCredential(self):
+        auth_util = pool("a", "b")
+        auth_util.observe({"x-api-key": "other"}, FakeResponse(429))
+        self.assertEqual(["a", "b"], keys(auth_util, 2))
+
+    def testInvalidPool(self):
+        with self.assertRaises(TypeError):
+            pool()
+        with self.assertRaises(TypeError):
+            pool("a", "a")
+        with self.assertRaises(TypeError):
+            pool("a", policy="random")
+        with self.assertRaises(TypeError):
+            PooledCredential("a", ApiKeyUtil("12344", "a"), weight=0)
+
+
+class PooledRequestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+
+    def testRetryRotatesPastThrottledKey(self):
+        with StubServer(routes={"list-corpora": throttling_route("a")}) as server:
+            auth_util = pool("a", "b")
+            request_util = RequestUtil(auth_util, base_url=server.base_url,
+                                       retry_handler=RetryHandler(sleep=self.sleeps.append, rand=lambda: 1.0))
+            for _ in range(3):
+                request_util.request("list-corpora", {})
+            request_util.close()
+
+        self.assertEqual(["a", "b", "b", "b"], [request.headers["x-api-key"] for request in server.requests])
+        self.assertEqual(1, auth_util.stats()["a"].throttled)
+        self.assertEqual(3, auth_util.stats()["b"].requests)
+
+    def testRotatesPastDisabledKey(self):
+        def route(request):
+            if request.headers.get("x-api-key") == "a":
+                return 401, {"status": {"code": "DISABLED_API_KEY", "statusDetail": "Disabled"}}, {}
+            return LIST_CORPORA_RESPONSE
+
+        with StubServer(routes={"list-corpora": route}) as server:
+            auth_util = pool("a", "b")
+            request_util = RequestUtil(auth_util, base_url=server.base_url,
+                                       retry_handler=RetryHandler(sleep=self.sleeps.append, rand=lambda: 1.0))
+            with self.assertRaises(requests.HTTPError):
+                request_util.request("list-corpora", {})
+            for _ in range(3):
+                request_util.request("list-corpora", {})
+            request_util.close()
+
+        self.assertEqual(["a", "b", "b", "b"], [request.headers["x-api-key"] for request in server.requests])
+        self.assertEqual(1, auth_util.stats()["a"].rejected)
+        self.assertTrue(auth_util.stats()["a"].sidelined)
+
+    def testAllThrottled(self):
+        with StubServer(routes={"list-corpora": throttling_route("a")}) as server:
+            request_util = RequestUtil(pool("a"), base_url=server.base_url,
+                                       retry_handler=RetryHandler(sleep=self.sleeps.append, rand=lambda: 1.0))
+            with self.assertRaises(requests.HTTPError):
+                request_util.request("list-corpora", {})
+            request_util.close()
+
+        self.assertEqual(3, server.request_count)
+
+    @unittest.skipUnless(HAS_HTTPX, "httpx is required for the asyncio client")
+    def testAsyncRetryRotatesPastThrottledKey(self):
+        async def no_sleep(delay):
+            self.sleeps.append(delay)
+
+        auth_util = pool("a", "b")
+        with StubServer(routes={"list-corpora": throttling_route("a")}) as server:
+            async def run():
+                request_util = AsyncRequestUtil(auth_util, base_url=server.base_url,
+                                                retry_handler=RetryHandler(async_sleep=no_sleep, rand=lambda: 1.0))
+                for _ in range(3):
+                    await request_util.request("list-corpora", {})
+                await request_util.aclose()
+
+            asyncio.run(run())
+
+        self.assertEqual(["a", "b", "b", "b"], [request.headers["x-api-key"] for request in server.requests])
+        self.assertTrue(auth_util.stats()["a"].sidelined)
+
+    def testFactory(self):
+        config_yaml = """
+default:
+  customer_id: "12344"
+  auth:
+    policy: weighted
+    throttle_cooldown: 5
+    credentials:
+      - api_key: "key-a"
+        name: "ingest"
+        weight: 3
+      - api_key: "key-b"
+      - app_client_id: "client"
+        app_client_secret: "secret"
+        auth_url: "http://localhost/oauth2/token"
+"""
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, ".vec_auth.yaml")
+            with open(config_path, "w") as f:
+                f.write(config_yaml)
+            with Factory(config_path=config_path).build() as client:
+                auth_util = client.request_util.auth_util
+                self.assertIsInstance(auth_util, PooledAuthUtil)
+                self.assertEqual("weighted", auth_util.config.policy)
+                self.assertEqual(["ingest", "credential-1", "credential-2"], list(client.get_credential_stats()))
+                self.assertEqual([3, 1, 1], [credential.weight for credential in auth_util.credentials])
+                self.assertEqual("client", auth_util.credentials[2].auth_util.app_client_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
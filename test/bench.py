@@ -0,0 +1,47 @@
+"""
+Small helpers shared by the *_benchmark_test.py files.
+"""
+from typing import Callable, List
+import os
+import resource
+import sys
+import time
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def time_calls(fn: Callable, iterations: int, warmup: int = 5) -> List[float]:
+    """
+    Times each call to fn, returning the latencies in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def summarize(name: str, samples: List[float]) -> str:
+    return f"{name:<30} p50 {percentile(samples, 50):8.3f}ms  p99 {percentile(samples, 99):8.3f}ms"
+
+
+def current_rss_mb() -> float:
+    """
+    Resident set size of this process in MB, from /proc where available otherwise the peak from getrusage.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS and kilobytes elsewhere.
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
@@ -0,0 +1,115 @@
+import unittest
+import logging
+import os
+import tempfile
+from vectara_client.admin import AdminService
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import CassetteConfig, TransportConfig
+from vectara_client.corpus import CorpusManager
+from vectara_client.document import DocumentService
+from vectara_client.index import IndexerService
+from vectara_client.query import QueryService
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response, build_list_documents_response, INDEX_RESPONSE
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+logging.getLogger('CorpusManager').setLevel(logging.WARNING)
+logging.getLogger('IndexerService').setLevel(logging.WARNING)
+
+ITERATIONS = 200
+DOCUMENTS = 40
+SYNTHETIC_LATENCY_MS = 5.0
+# Not listening, so any request which isn't replayed fails to connect.
+OFFLINE_URL = "http://127.0.0.1:9/v1"
+
+
+def list_documents_route(request):
+    if request.json().get('pageKey'):
+        return build_list_documents_response(500, offset=1000)
+    else:
+        return build_list_documents_response(1000, next_page_key="page-2")
+
+
+DOCUMENTS_TO_INDEX = [{"document_id": f"doc-{i}", "title": f"Doc {i}",
+                       "section": [{"text": f"Some text about document {i}", "section": []}]}
+                      for i in range(DOCUMENTS)]
+
+
+class Workload:
+    """
+    The three calls benchmarked, against whichever transport request_util has.
+    """
+
+    def __init__(self, request_util: RequestUtil):
+        self.request_util = request_util
+        indexer_service = IndexerService(request_util.auth_util, request_util, 12344)
+        self.corpus_manager = CorpusManager(AdminService(request_util, 12344), indexer_service)
+        self.query_service = QueryService(request_util, 12344)
+        self.document_service = DocumentService(request_util)
+
+    def query(self):
+        return self.query_service.query("Where is Santa?", 1)
+
+    def batch_index(self):
+        return self.corpus_manager.batch_index(1, DOCUMENTS_TO_INDEX, threads=4)
+
+    def list_documents(self):
+        return self.document_service.list_documents(1)
+
+
+class CassetteBenchmark(unittest.TestCase):
+    """
+    Records QueryService.query, CorpusManager.batch_index and DocumentService.list_documents once against the stub
+    server, then benchmarks them replayed from the cassette with no network at all, as CI would.
+    """
+
+    def _request_util(self, path: str, mode: str, base_url: str = OFFLINE_URL, **kwargs) -> RequestUtil:
+        cassette = CassetteConfig(mode=mode, path=path, **kwargs)
+        return RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                           transport_config=TransportConfig(cassette=cassette))
+
+    def testReplay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.ndjson.gz")
+            routes = {"query": build_query_response(10), "index": INDEX_RESPONSE,
+                      "list-documents": list_documents_route}
+            with StubServer(routes=routes, record=False) as server:
+                request_util = self._request_util(path, "record", server.base_url)
+                workload = Workload(request_util)
+                recorded = (workload.query(), workload.list_documents())
+                workload.batch_index()
+                request_util.close()
+            size = os.path.getsize(path)
+
+            request_util = self._request_util(path, "replay")
+            workload = Workload(request_util)
+            self.assertEqual(recorded, (workload.query(), workload.list_documents()))
+            timings = {
+                "query": time_calls(workload.query, ITERATIONS),
+                "batch_index, 40 docs": time_calls(workload.batch_index, ITERATIONS // 10),
+                "list_documents, 1500": time_calls(workload.list_documents, ITERATIONS // 10)
+            }
+            request_util.close()
+
+            request_util = self._request_util(path, "replay", latency="synthetic", latency_ms=SYNTHETIC_LATENCY_MS)
+            synthetic = time_calls(Workload(request_util).query, ITERATIONS // 4)
+            request_util.close()
+
+        print()
+        print(f"cassette of {DOCUMENTS + 3} exchanges, {size} bytes")
+        for name, samples in timings.items():
+            print(summarize(name, samples))
+        print(summarize(f"query, {SYNTHETIC_LATENCY_MS:.0f}ms synthetic", synthetic))
+
+        self.assertGreaterEqual(percentile(synthetic, 50), SYNTHETIC_LATENCY_MS)
+        # No network, so nothing close to even the synthetic latency.
+        self.assertLess(percentile(timings["query"], 50), SYNTHETIC_LATENCY_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import unittest
+import asyncio
+import gzip
+import importlib.util
+import json
+import logging
+import os
+import tempfile
+import time
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.cassette import Cassette, CassetteMissError, CassetteReplayAdapter, normalize
+from vectara_client.compression import Compressor
+from vectara_client.config import CassetteConfig, CompressionConfig, TransportConfig
+from vectara_client.core import Factory
+from vectara_client.document import DocumentService, AsyncDocumentService
+from vectara_client.index import IndexerService
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response, build_list_documents_response, UPLOAD_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+# Not listening, so any request which isn't replayed fails to connect.
+OFFLINE_URL = "http://127.0.0.1:9/v1"
+
+
+def list_documents_route(request):
+    if request.json().get('pageKey'):
+        return build_list_documents_response(50, offset=100)
+    else:
+        return build_list_documents_response(100, next_page_key="page-2")
+
+
+ROUTES = {
+    "query": build_query_response(3),
+    "list-documents": list_documents_route,
+    "upload": UPLOAD_RESPONSE
+}
+
+
+class CassetteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cassette.ndjson.gz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _request_util(self, mode: str, base_url: str = OFFLINE_URL, **kwargs) -> RequestUtil:
+        cassette = CassetteConfig(mode=mode, path=self.path, **kwargs)
+        return RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                           transport_config=TransportConfig(cassette=cassette))
+
+    def _record(self, fn, routes: dict = None, delay: float = 0.0):
+        with StubServer(routes=routes if routes else ROUTES, delay=delay) as server:
+            request_util = self._request_util("record", server.base_url)
+            result = fn(request_util)
+            request_util.close()
+        return result
+
+
+class CassetteTest(CassetteTestCase):
+
+    def testRecordReplay(self):
+        def run(request_util):
+            query = QueryService(request_util, 12344).query("Where is Santa?", 1)
+            documents = DocumentService(request_util).list_documents(1)
+            upload = IndexerService(request_util.auth_util, request_util, 12344).upload(
+                1, "./resources/filter_attributes/document_1.json")
+            return query, documents, upload
+
+        recorded = self._record(run)
+        with gzip.open(self.path, "rt") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(["/v1/query", "/v1/list-documents", "/v1/list-documents", "/v1/upload"],
+                         [entry["path"] for entry in entries])
+        self.assertEqual("page-2", entries[2]["request"]["pageKey"])
+        self.assertIsNone(entries[3]["request"])
+        self.assertNotIn("BLAH_KEY", json.dumps(entries))
+
+        request_util = self._request_util("replay")
+        replayed = run(request_util)
+        request_util.close()
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(150, len(replayed[1]))
+
+    def testNormalizedMatching(self):
+        self._record(lambda request_util: request_util.request("query", {"a": 1, "b": {"c": 2, "d": 3}}))
+        cassette = Cassette(CassetteConfig(mode="replay", path=self.path))
+        headers = {"Content-Type": "application/json"}
+        self.assertEqual(200, cassette.play("POST", "http://elsewhere/v1/query", headers,
+                                            b'{"b": {"d": 3, "c": 2}, "a": 1}')["status"])
+        compressed, encoding = Compressor(CompressionConfig(min_size=0)).compress("query", b'{"a":1,"b":{"c":2,"d":3}}')
+        self.assertEqual(200, cassette.play("POST", "http://elsewhere/v1/query",
+                                            dict(headers, **{"Content-Encoding": encoding}), compressed)["status"])
+        with self.assertRaises(CassetteMissError):
+            cassette.play("POST", "http://elsewhere/v1/query", headers, b'{"a": 2}')
+        with self.assertRaises(CassetteMissError):
+            cassette.play("POST", "http://elsewhere/v1/list-documents", headers, b'{"a": 1, "b": {"c": 2, "d": 3}}')
+
+    def testIgnoreFields(self):
+        self._record(lambda request_util: request_util.request("query", {"query": "santa", "requestId": "1"}))
+        request_util = self._request_util("replay", ignore_fields=["requestId"])
+        self.assertEqual(3, len(request_util.request("query", {"query": "santa", "requestId": "2"})
+                                ["responseSet"][0]["response"]))
+        request_util.close()
+        self.assertEqual({"query": [{}]}, normalize(b'{"query": [{"requestId": "1"}]}', "application/json", None,
+                                                    frozenset(["requestId"])))
+
+    def testRepeatsInOrder(self):
+        responses = iter([{"n": 1}, {"n": 2}])
+        self._record(lambda request_util: [request_util.request("query", {}) for _ in range(2)],
+                     routes={"query": lambda request: next(responses)})
+        request_util = self._request_util("replay")
+        self.assertEqual([1, 2, 1, 2, 1], [request_util.request("query", {})["n"] for _ in range(5)])
+        request_util.close()
+
+    def testErrorsReplay(self):
+        self._record(lambda request_util: request_util.session.post(f"{request_util.base_url}/query", data=b"{}"),
+                     routes={"query": (503, {"error": "busy"}, {"Retry-After": "1"})})
+        request_util = self._request_util("replay")
+        response = request_util.session.post(f"{request_util.base_url}/query", data=b"{}")
+        request_util.close()
+        self.assertEqual(503, response.status_code)
+        self.assertEqual("Service Unavailable", response.reason)
+        self.assertEqual("1", response.headers["retry-after"])
+
+    def testLatency(self):
+        self._record(lambda request_util: request_util.request("query", {}), delay=0.05)
+        request_util = self._request_util("replay", latency="recorded")
+        start = time.perf_counter()
+        request_util.request("query", {})
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        request_util.close()
+
+        cassette = Cassette(CassetteConfig(mode="replay", path=self.path, latency="synthetic", latency_ms=20,
+                                           jitter_ms=5, seed=1))
+        entry = cassette.play("POST", "/v1/query", {"Content-Type": "application/json"}, b"{}")
+        delays = [cassette.latency(entry) for _ in range(100)]
+        self.assertTrue(all(0.015 <= delay <= 0.025 for delay in delays))
+        self.assertEqual(0.0, Cassette(CassetteConfig(mode="replay", path=self.path)).latency(entry))
+
+        repeat = Cassette(CassetteConfig(mode="replay", path=self.path, latency="synthetic", latency_ms=20,
+                                         jitter_ms=5, seed=1))
+        self.assertEqual(delays, [repeat.latency(entry) for _ in range(100)])
+
+    def testInvalid(self):
+        with self.assertRaises(TypeError):
+            Cassette(CassetteConfig(mode="rewind", path=self.path))
+        with self.assertRaises(TypeError):
+            Cassette(CassetteConfig(mode="replay", path=""))
+        with self.assertRaises(TypeError):
+            Cassette(CassetteConfig(mode="record", path=self.path, latency="slow"))
+
+    def testFactory(self):
+        self._record(lambda request_util: QueryService(request_util, 12344).query("Where is Santa?", 1))
+        config_json = json.dumps({
+            "customer_id": "12344",
+            "auth": {"api_key": "BLAH_KEY"},
+            "transport": {"cassette": {"mode": "replay", "path": self.path}}
+        })
+        with Factory(config_json=config_json).build() as client:
+            self.assertIsInstance(client.request_util.session.get_adapter("https://api.vectara.io"),
+                                  CassetteReplayAdapter)
+            self.assertEqual(3, len(client.query_service.query("Where is Santa?", 1).response))
+
+
+@unittest.skipUnless(HAS_HTTPX, "httpx is required for the asyncio client")
+class AsyncCassetteTest(CassetteTestCase):
+
+    def _async_request_util(self, mode: str, base_url: str = OFFLINE_URL) -> AsyncRequestUtil:
+        cassette = CassetteConfig(mode=mode, path=self.path)
+        return AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                transport_config=TransportConfig(cassette=cassette))
+
+    def testRecordReplay(self):
+        async def run(request_util):
+            try:
+                query = await AsyncQueryService(request_util, 12344).query("Where is Santa?", 1)
+                documents = await AsyncDocumentService(request_util).list_documents(1)
+                return query, documents
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes=ROUTES) as server:
+            recorded = asyncio.run(run(self._async_request_util("record", server.base_url)))
+        replayed = asyncio.run(run(self._async_request_util("replay")))
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(150, len(replayed[1]))
+
+    def testSharedWithBlockingClient(self):
+        # Recorded by the blocking client, replayed by the asyncio one.
+        self._record(lambda request_util: QueryService(request_util, 12344).query("Where is Santa?", 1))
+
+        async def run():
+            request_util = self._async_request_util("replay")
+            try:
+                return await AsyncQueryService(request_util, 12344).query("Where is Santa?", 1)
+            finally:
+                await request_util.aclose()
+
+        self.assertEqual(3, len(asyncio.run(run()).response))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,369 @@
+import unittest
+import asyncio
+import logging
+import threading
+import requests
+from vectara_client.admin import AdminService
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.circuit import CircuitBreaker, CircuitState
+from vectara_client.config import CircuitBreakerConfig, CircuitBreakerPolicyConfig, RetryConfig, RetryPolicyConfig
+from vectara_client.core import Factory
+from vectara_client.decoder import decode
+from vectara_client.domain import IndexDocumentResponse
+from vectara_client.corpus import CorpusManager
+from vectara_client.error import CircuitOpenError
+from vectara_client.index import IndexerService
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response, INDEX_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def breaker(clock=None, **kwargs) -> CircuitBreaker:
+    policy = CircuitBreakerPolicyConfig(**{"window": 10, "min_calls": 4, "open_duration": 5.0, "half_open_calls": 2,
+                                           **kwargs})
+    if clock:
+        return CircuitBreaker(CircuitBreakerConfig(default=policy), clock=clock)
+    return CircuitBreaker(CircuitBreakerConfig(default=policy))
+
+
+def fail(status: int = 503):
+    def send():
+        raise http_error(status)
+    return send
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def _trip(self, circuit_breaker: CircuitBreaker, operation: str = "query", calls: int = 4):
+        for _ in range(calls):
+            with self.assertRaises(requests.HTTPError):
+                circuit_breaker.call(operation, fail())
+
+    def testOpensOnFailureRate(self):
+        circuit_breaker = breaker()
+        for _ in range(3):
+            circuit_breaker.call("query", lambda: "ok")
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                circuit_breaker.call("query", fail())
+        # Two of five is below the 50% failure rate.
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+        with self.assertRaises(requests.HTTPError):
+            circuit_breaker.call("query", fail())
+        self.assertEqual(CircuitState.OPEN, circuit_breaker.state("query"))
+
+    def testFailsFastWhileOpen(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock)
+        self._trip(circuit_breaker)
+
+        calls = []
+        clock.now = 2.0
+        with self.assertRaises(CircuitOpenError) as context:
+            circuit_breaker.call("query", lambda: calls.append(1))
+        self.assertEqual([], calls)
+        self.assertEqual("query", context.exception.operation)
+        self.assertAlmostEqual(3.0, context.exception.retry_after)
+
+        # Each operation has its own circuit.
+        self.assertEqual("ok", circuit_breaker.call("list-documents", lambda: "ok"))
+
+    def testHalfOpenCloses(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock)
+        self._trip(circuit_breaker)
+
+        clock.now = 5.0
+        self.assertEqual("ok", circuit_breaker.call("query", lambda: "ok"))
+        self.assertEqual(CircuitState.HALF_OPEN, circuit_breaker.state("query"))
+        self.assertEqual("ok", circuit_breaker.call("query", lambda: "ok"))
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+        # The window starts afresh, a single failure doesn't re-open it.
+        with self.assertRaises(requests.HTTPError):
+            circuit_breaker.call("query", fail())
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+    def testHalfOpenFailureReopens(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock)
+        self._trip(circuit_breaker)
+
+        clock.now = 5.0
+        with self.assertRaises(requests.HTTPError):
+            circuit_breaker.call("query", fail())
+        self.assertEqual(CircuitState.OPEN, circuit_breaker.state("query"))
+
+        clock.now = 9.0
+        with self.assertRaises(CircuitOpenError) as context:
+            circuit_breaker.call("query", lambda: "ok")
+        self.assertAlmostEqual(1.0, context.exception.retry_after)
+
+    def testHalfOpenLimitsTrials(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock, half_open_calls=1)
+        self._trip(circuit_breaker)
+        clock.now = 5.0
+
+        in_trial = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            in_trial.set()
+            release.wait(5)
+            return "ok"
+
+        trial = threading.Thread(target=circuit_breaker.call, args=("query", slow))
+        trial.start()
+        in_trial.wait(5)
+        with self.assertRaises(CircuitOpenError) as context:
+            circuit_breaker.call("query", lambda: "ok")
+        self.assertIsNone(context.exception.retry_after)
+
+        release.set()
+        trial.join()
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+    def testWhatCountsAsFailure(self):
+        circuit_breaker = breaker()
+        # Our own mistakes say nothing about the health of the server.
+        for _ in range(10):
+            with self.assertRaises(requests.HTTPError):
+                circuit_breaker.call("query", fail(400))
+            with self.assertRaises(ValueError):
+                circuit_breaker.call("query", lambda: int("x"))
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+        def refused():
+            raise requests.ConnectionError("refused")
+
+        for _ in range(4):
+            with self.assertRaises(requests.ConnectionError):
+                circuit_breaker.call("index", refused)
+        self.assertEqual(CircuitState.OPEN, circuit_breaker.state("index"))
+
+        # A Vectara status within a 200 body.
+        unavailable = decode(IndexDocumentResponse, {"status": {"code": "UNAVAILABLE"}, "quotaConsumed": None})
+        for _ in range(4):
+            circuit_breaker.call("core/index", lambda: unavailable)
+        self.assertEqual(CircuitState.OPEN, circuit_breaker.state("core/index"))
+
+    def testSlowCalls(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock, slow_call_duration=1.0)
+
+        def slow():
+            clock.now += 2.0
+            return "ok"
+
+        for _ in range(4):
+            self.assertEqual("ok", circuit_breaker.call("query", slow))
+        self.assertEqual(CircuitState.OPEN, circuit_breaker.state("query"))
+
+    def testPerOperationPolicy(self):
+        config = CircuitBreakerConfig(operations={"index": CircuitBreakerPolicyConfig(min_calls=2, window=2)})
+        circuit_breaker = CircuitBreaker(config)
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                circuit_breaker.call("index", fail())
+            with self.assertRaises(requests.HTTPError):
+                circuit_breaker.call("query", fail())
+        self.assertEqual(CircuitState.OPEN, circuit_breaker.state("index"))
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+    def testUnknownCode(self):
+        with self.assertRaises(TypeError):
+            CircuitBreaker(CircuitBreakerConfig(default=CircuitBreakerPolicyConfig(failure_codes=["NOT_A_CODE"])))
+
+    def testListeners(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock, half_open_calls=1)
+        changes = []
+
+        def broken(operation, old, new):
+            raise RuntimeError("listener failed")
+
+        circuit_breaker.add_listener(broken)
+        circuit_breaker.add_listener(lambda operation, old, new: changes.append((operation, old, new)))
+        self._trip(circuit_breaker)
+        clock.now = 5.0
+        circuit_breaker.call("query", lambda: "ok")
+
+        self.assertEqual([("query", CircuitState.CLOSED, CircuitState.OPEN),
+                          ("query", CircuitState.OPEN, CircuitState.HALF_OPEN),
+                          ("query", CircuitState.HALF_OPEN, CircuitState.CLOSED)], changes)
+
+    def testWait(self):
+        circuit_breaker = breaker(open_duration=0.2)
+        self.assertTrue(circuit_breaker.wait("query", timeout=0))
+        self._trip(circuit_breaker)
+        self.assertFalse(circuit_breaker.wait("query", timeout=0.01))
+        self.assertTrue(circuit_breaker.wait("query", timeout=5))
+
+    def testInterruptedTrialReleased(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock, half_open_calls=1)
+        self._trip(circuit_breaker)
+        clock.now = 5.0
+
+        def interrupted():
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            circuit_breaker.call("query", interrupted)
+        self.assertEqual("ok", circuit_breaker.call("query", lambda: "ok"))
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+    def testAsyncCancelledTrialReleased(self):
+        clock = FakeClock()
+        circuit_breaker = breaker(clock, half_open_calls=1)
+        self._trip(circuit_breaker)
+        clock.now = 5.0
+
+        async def run():
+            task = asyncio.ensure_future(circuit_breaker.call_async("query", lambda: asyncio.sleep(5)))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            async def ok():
+                return "ok"
+
+            return await circuit_breaker.call_async("query", ok)
+
+        self.assertEqual("ok", asyncio.run(run()))
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("query"))
+
+
+class RequestUtilCircuitTest(unittest.TestCase):
+
+    def _no_retries(self) -> RetryHandler:
+        return RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+
+    def testRequestUtil(self):
+        circuit_breaker = breaker(open_duration=60)
+        with StubServer(routes={"query": (503, {"error": "unavailable"}, {})}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       retry_handler=self._no_retries(), circuit_breaker=circuit_breaker)
+            query_service = QueryService(request_util, 12344)
+            for _ in range(4):
+                with self.assertRaises(requests.HTTPError):
+                    query_service.query("failing", 1)
+            for _ in range(10):
+                with self.assertRaises(CircuitOpenError):
+                    query_service.query("failing", 1)
+            request_util.close()
+
+            self.assertEqual(4, server.request_count)
+
+    def testCircuitOpenNotRetried(self):
+        circuit_breaker = breaker(open_duration=60)
+        for _ in range(4):
+            with self.assertRaises(requests.HTTPError):
+                circuit_breaker.call("query", fail())
+
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       circuit_breaker=circuit_breaker)
+            with self.assertRaises(CircuitOpenError):
+                QueryService(request_util, 12344).query("blocked", 1)
+            request_util.close()
+            self.assertEqual(0, server.request_count)
+
+    def testAsyncRequestUtil(self):
+        circuit_breaker = breaker(open_duration=60)
+
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            retry_handler=self._no_retries(), circuit_breaker=circuit_breaker)
+            query_service = AsyncQueryService(request_util, 12344)
+            try:
+                for _ in range(4):
+                    with self.assertRaises(Exception):
+                        await query_service.query("failing", 1)
+                with self.assertRaises(CircuitOpenError):
+                    await query_service.query("failing", 1)
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": (503, {"error": "unavailable"}, {})}) as server:
+            asyncio.run(run(server.base_url))
+            self.assertEqual(4, server.request_count)
+
+    def testBatchIndexPauses(self):
+        lock = threading.Lock()
+        calls = []
+
+        def route(request):
+            with lock:
+                calls.append(1)
+                failing = len(calls) <= 4
+            if failing:
+                return 503, {"error": "unavailable"}, {}
+            return INDEX_RESPONSE
+
+        circuit_breaker = breaker(open_duration=0.2, half_open_calls=1)
+        opened = []
+        circuit_breaker.add_listener(lambda operation, old, new: opened.append(new == CircuitState.OPEN))
+
+        with StubServer(routes={"index": route}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       retry_handler=self._no_retries(), circuit_breaker=circuit_breaker)
+            admin_service = AdminService(request_util, 12344)
+            indexer_service = IndexerService(request_util.auth_util, request_util, 12344)
+            documents = [{"document_id": f"doc-{i}", "title": f"Doc {i}", "section": [{"text": "Some text", "section": []}]}
+                         for i in range(20)]
+            CorpusManager(admin_service, indexer_service).batch_index(1, documents, threads=2)
+            request_util.close()
+
+            # The four failures opened the circuit, after which every document was sent exactly once.
+            self.assertTrue(any(opened))
+            self.assertEqual(CircuitState.CLOSED, circuit_breaker.state("index"))
+            self.assertEqual(4 + 20 - 4, server.request_count)
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "circuit_breaker" : { "default" : { "open_duration" : 10 },
+                                  "operations" : { "index" : { "min_calls" : 5 } } }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            circuit_breaker = client.request_util.circuit_breaker
+            self.assertEqual(10, circuit_breaker.policy_for("query").open_duration)
+            self.assertEqual(5, circuit_breaker.policy_for("index").min_calls)
+            self.assertEqual(CircuitState.CLOSED, client.get_circuit_state("query"))
+
+        with Factory(config_json='{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}').build() as client:
+            self.assertIsNone(client.request_util.circuit_breaker)
+            self.assertEqual(CircuitState.CLOSED, client.get_circuit_state("query"))
+
+
+if __name__ == '__main__':
+    unittest.main()
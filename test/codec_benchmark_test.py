@@ -0,0 +1,52 @@
+import unittest
+import logging
+import importlib.util
+from vectara_client.codec import StdlibJsonCodec, OrjsonCodec
+from test.fixtures import build_query_response, build_list_documents_response
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+
+ITERATIONS = 50
+
+
+@unittest.skipUnless(HAS_ORJSON, "orjson is not installed")
+class JsonCodecBenchmark(unittest.TestCase):
+    """
+    Compares encode/decode of realistic bodies between the standard library and orjson. The old path also decoded
+    response.text to a str first, which we include in the standard library decode for comparison.
+    """
+
+    def _compare(self, name: str, body: dict):
+        stdlib = StdlibJsonCodec()
+        fast = OrjsonCodec()
+        encoded = stdlib.dumps(body)
+
+        print()
+        print(f"{name}: {len(encoded) / 1024.0:.0f}KB")
+        stdlib_decode = time_calls(lambda: stdlib.loads(encoded.decode("utf-8")), ITERATIONS)
+        fast_decode = time_calls(lambda: fast.loads(encoded), ITERATIONS)
+        stdlib_encode = time_calls(lambda: stdlib.dumps(body), ITERATIONS)
+        fast_encode = time_calls(lambda: fast.dumps(body), ITERATIONS)
+        print(summarize("decode json", stdlib_decode))
+        print(summarize("decode orjson", fast_decode))
+        print(summarize("encode json", stdlib_encode))
+        print(summarize("encode orjson", fast_encode))
+
+        self.assertEqual(stdlib.loads(encoded), fast.loads(encoded))
+        # orjson is typically several times faster, so the medians are safe to compare even on a noisy machine.
+        self.assertLess(percentile(fast_decode, 50), percentile(stdlib_decode, 50))
+        self.assertLess(percentile(fast_encode, 50), percentile(stdlib_encode, 50))
+
+    def testBatchQueryResponse(self):
+        self._compare("query, 100 results", build_query_response(100))
+
+    def testListDocumentsResponse(self):
+        self._compare("list-documents, 1000 documents", build_list_documents_response(1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
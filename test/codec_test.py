@@ -0,0 +1,77 @@
+import unittest
+import logging
+import importlib.util
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.codec import StdlibJsonCodec, OrjsonCodec, create_codec
+from vectara_client.core import Factory
+from vectara_client.domain import BatchQueryResponse
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+
+PAYLOAD = {
+    "query": [{"query": "مرحبا بالعالم", "numResults": 10, "corpusKey": [{"customerId": 1, "corpusId": 2}]}],
+    "scores": [1.5, 0.25],
+    "enabled": True,
+    "missing": None
+}
+
+
+class JsonCodecTest(unittest.TestCase):
+
+    def _check_codec(self, codec):
+        encoded = codec.dumps(PAYLOAD)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(PAYLOAD, codec.loads(encoded))
+        self.assertEqual(PAYLOAD, codec.loads(encoded.decode("utf-8")))
+        # Non ASCII is sent as UTF-8 rather than escaped.
+        self.assertIn("مرحبا".encode("utf-8"), encoded)
+        self.assertEqual({"1": "a"}, codec.loads(codec.dumps({1: "a"})))
+        self.assertIn("\n", codec.dumps_pretty(PAYLOAD))
+
+    def testStdlib(self):
+        self._check_codec(StdlibJsonCodec())
+
+    @unittest.skipUnless(HAS_ORJSON, "orjson is not installed")
+    def testOrjson(self):
+        self._check_codec(OrjsonCodec())
+        self.assertEqual(StdlibJsonCodec().loads(OrjsonCodec().dumps(PAYLOAD)), PAYLOAD)
+
+    def testCreateCodec(self):
+        self.assertEqual("json", create_codec("json").name)
+        self.assertEqual("orjson" if HAS_ORJSON else "json", create_codec().name)
+        self.assertEqual("orjson" if HAS_ORJSON else "json", create_codec("auto").name)
+        with self.assertRaises(TypeError):
+            create_codec("simplejson")
+
+    def testRequestUtilDecodesBytes(self):
+        with StubServer(routes={"query": build_query_response(5)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       codec=StdlibJsonCodec())
+            result = request_util.request("query", PAYLOAD, BatchQueryResponse)
+            request_util.close()
+
+        self.assertEqual(5, len(result.responseSet[0].response))
+        self.assertEqual(PAYLOAD, server.requests[0].json())
+
+    def testCodecFromProfile(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "json_codec" : "json"
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual("json", client.request_util.codec.name)
+
+        if HAS_ORJSON:
+            with Factory(config_json=config_json, json_codec="orjson").build() as client:
+                self.assertEqual("orjson", client.request_util.codec.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
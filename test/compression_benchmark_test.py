@@ -0,0 +1,50 @@
+import unittest
+import importlib.util
+import logging
+from vectara_client.codec import create_codec
+from vectara_client.compression import Compressor
+from vectara_client.config import CompressionConfig
+from test.bench import time_calls, summarize
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+ITERATIONS = 10
+
+
+def _build_policy_document(num_sections: int = 5000) -> dict:
+    sections = [{"title": f"Section {i}",
+                 "text": f"Clause {i}. Subject to the exclusions in schedule {i % 12}, the insurer will indemnify "
+                         f"the insured against loss of or damage to the property described, up to {i * 100} dollars."}
+                for i in range(num_sections)]
+    return {"customer_id": 12344, "corpus_id": 1, "document": {"document_id": "policy", "parts": sections}}
+
+
+class CompressionBenchmark(unittest.TestCase):
+    """
+    Wire size and CPU cost of each request encoding on a multi-megabyte index payload.
+    """
+
+    def testEncodings(self):
+        body = create_codec().dumps(_build_policy_document())
+        encodings = [("gzip", 1), ("gzip", 6)]
+        if importlib.util.find_spec("zstandard"):
+            encodings.append(("zstd", 3))
+        if importlib.util.find_spec("brotli"):
+            encodings.append(("br", 5))
+
+        print()
+        print(f"uncompressed {len(body) / 1024 / 1024:.2f}MB")
+        for encoding, level in encodings:
+            compressor = Compressor(CompressionConfig(request_encoding=encoding, level=level))
+            samples = time_calls(lambda: compressor.compress("core/index", body), ITERATIONS, warmup=1)
+            wire_bytes = len(compressor.compress("core/index", body)[0])
+            ratio = wire_bytes / len(body)
+            print(summarize(f"{encoding} level {level} ratio {ratio:.3f}", samples))
+
+            # Document text is highly repetitive JSON, every encoding should at least halve it.
+            self.assertLess(ratio, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
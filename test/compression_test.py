@@ -0,0 +1,186 @@
+import unittest
+import asyncio
+import gzip
+import importlib.util
+import logging
+import os
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.compression import Compressor
+from vectara_client.config import CompressionConfig
+from vectara_client.core import Factory
+from vectara_client.domain import ListDocumentsResponse
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_list_documents_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+LARGE_PAYLOAD = {
+    "customer_id": 12344,
+    "corpus_id": 1,
+    "document": {"document_id": "policy", "section": [{"text": f"Clause {i}: the insured shall notify the insurer."}
+                                                      for i in range(1000)]}
+}
+SMALL_PAYLOAD = {"customer_id": 12344, "corpus_id": 1, "document_id": "policy"}
+
+
+class CompressorTest(unittest.TestCase):
+
+    def testBelowThresholdNotCompressed(self):
+        compressor = Compressor(CompressionConfig(min_size=1024))
+        body, encoding = compressor.compress("delete-doc", b'{"a":1}')
+
+        self.assertEqual(b'{"a":1}', body)
+        self.assertIsNone(encoding)
+        stats = compressor.stats()["delete-doc"]
+        self.assertEqual(1, stats.requests)
+        self.assertEqual(0, stats.requests_compressed)
+        self.assertEqual(0, stats.request_saved_bytes)
+
+    def testGzip(self):
+        compressor = Compressor(CompressionConfig(min_size=1024, level=9))
+        original = b'{"text":"' + b"repetitive " * 1000 + b'"}'
+        body, encoding = compressor.compress("index", original)
+
+        self.assertEqual("gzip", encoding)
+        self.assertEqual(original, gzip.decompress(body))
+        stats = compressor.stats()["index"]
+        self.assertEqual(1, stats.requests_compressed)
+        self.assertEqual(len(original) - len(body), stats.request_saved_bytes)
+
+    def testIncompressibleSentAsIs(self):
+        compressor = Compressor(CompressionConfig(min_size=16))
+        original = os.urandom(1024)
+        body, encoding = compressor.compress("index", original)
+
+        self.assertIsNone(encoding)
+        self.assertEqual(original, body)
+
+    def testDisabled(self):
+        for compressor in [Compressor(), Compressor(CompressionConfig(request_encoding="identity"))]:
+            body, encoding = compressor.compress("index", b" " * 100000)
+            self.assertIsNone(encoding)
+            self.assertEqual(100000, compressor.stats()["index"].request_wire_bytes)
+
+    @unittest.skipUnless(HAS_ZSTD, "zstandard is not installed")
+    def testZstd(self):
+        import zstandard
+        compressor = Compressor(CompressionConfig(request_encoding="zstd", min_size=0))
+        body, encoding = compressor.compress("index", b"zstd " * 1000)
+
+        self.assertEqual("zstd", encoding)
+        self.assertEqual(b"zstd " * 1000, zstandard.ZstdDecompressor().decompress(body))
+
+    @unittest.skipUnless(HAS_BROTLI, "brotli is not installed")
+    def testBrotli(self):
+        import brotli
+        compressor = Compressor(CompressionConfig(request_encoding="br", min_size=0))
+        body, encoding = compressor.compress("index", b"brotli " * 1000)
+
+        self.assertEqual("br", encoding)
+        self.assertEqual(b"brotli " * 1000, brotli.decompress(body))
+
+    def testUnknownEncoding(self):
+        with self.assertRaises(TypeError):
+            Compressor(CompressionConfig(request_encoding="lzma"))
+
+    def testStatsAreCopies(self):
+        compressor = Compressor()
+        compressor.record_response("query", 100, 1000)
+        compressor.stats()["query"].responses = 99
+
+        stats = compressor.stats()["query"]
+        self.assertEqual(1, stats.responses)
+        self.assertEqual(1, stats.responses_compressed)
+        self.assertEqual(900, stats.response_saved_bytes)
+
+
+class RequestCompressionTest(unittest.TestCase):
+
+    def testRequestUtil(self):
+        routes = {"core/index": {}, "delete-doc": {}}
+        with StubServer(routes=routes) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       compressor=Compressor(CompressionConfig()))
+            request_util.request("core/index", LARGE_PAYLOAD)
+            request_util.request("delete-doc", SMALL_PAYLOAD)
+            request_util.close()
+
+        large, small = server.requests
+        self.assertEqual("gzip", large.headers['Content-Encoding'])
+        self.assertEqual(LARGE_PAYLOAD, large.json())
+        self.assertIsNone(small.headers['Content-Encoding'])
+        self.assertEqual(SMALL_PAYLOAD, small.json())
+
+        stats = request_util.compressor.stats()
+        self.assertEqual(len(large.body), stats["core/index"].request_wire_bytes)
+        self.assertGreater(stats["core/index"].request_saved_bytes, 0)
+        # The journal holds the payload as sent, before encoding.
+        self.assertEqual(LARGE_PAYLOAD, request_util.requests[0]['payload'])
+
+    def testCompressedResponses(self):
+        routes = {"list-documents": build_list_documents_response(200)}
+        with StubServer(routes=routes, compress_responses=True) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            result = request_util.request("list-documents", SMALL_PAYLOAD, ListDocumentsResponse)
+            request_util.close()
+
+        self.assertEqual(200, len(result.document))
+        self.assertIn("gzip", server.requests[0].headers['Accept-Encoding'])
+        stats = request_util.compressor.stats()["list-documents"]
+        self.assertEqual(1, stats.responses_compressed)
+        self.assertGreater(stats.response_saved_bytes, 0)
+
+    def testAcceptIdentity(self):
+        routes = {"list-documents": build_list_documents_response(10)}
+        with StubServer(routes=routes, compress_responses=True) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       compressor=Compressor(CompressionConfig(accept_compressed=False)))
+            request_util.request("list-documents", SMALL_PAYLOAD, ListDocumentsResponse)
+            request_util.close()
+
+        self.assertEqual("identity", server.requests[0].headers['Accept-Encoding'])
+        self.assertEqual(0, request_util.compressor.stats()["list-documents"].responses_compressed)
+
+    def testAsyncRequestUtil(self):
+        routes = {"core/index": {}, "list-documents": build_list_documents_response(200)}
+
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            compressor=Compressor(CompressionConfig()))
+            await request_util.request("core/index", LARGE_PAYLOAD)
+            result = await request_util.request("list-documents", SMALL_PAYLOAD, ListDocumentsResponse)
+            await request_util.aclose()
+            return request_util, result
+
+        with StubServer(routes=routes, compress_responses=True) as server:
+            request_util, result = asyncio.run(run(server.base_url))
+
+        self.assertEqual("gzip", server.requests[0].headers['Content-Encoding'])
+        self.assertEqual(LARGE_PAYLOAD, server.requests[0].json())
+        self.assertEqual(200, len(result.document))
+        stats = request_util.compressor.stats()
+        self.assertEqual(1, stats["core/index"].requests_compressed)
+        self.assertEqual(1, stats["list-documents"].responses_compressed)
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "compression" : { "request_encoding" : "gzip", "level" : 1, "min_size" : 100 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual("gzip", client.request_util.compressor.request_encoding)
+            self.assertEqual({}, client.get_compression_stats())
+
+        override = CompressionConfig(request_encoding="identity")
+        with Factory(config_json=config_json, compression_config=override).build() as client:
+            self.assertIsNone(client.request_util.compressor.request_encoding)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,282 @@
+import unittest
+import asyncio
+import logging
+import threading
+import time
+import httpx
+import requests
+from types import SimpleNamespace
+from vectara_client.admin import AdminService
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import RetryConfig, RetryPolicyConfig, TimeoutConfig
+from vectara_client.core import Factory
+from vectara_client.deadline import Deadline, Timeouts
+from vectara_client.document import DocumentService, AsyncDocumentService
+from vectara_client.error import DeadlineExceededError
+from vectara_client.index import IndexerService
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.util import RequestUtil, AsyncRequestUtil, CountDownLatch
+from test.stub_server import StubServer
+from test.fixtures import build_query_response, build_list_documents_response, UPLOAD_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('RetryHandler').setLevel(logging.ERROR)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def testRemaining(self):
+        clock = FakeClock()
+        deadline = Deadline.after(2.0, clock)
+        self.assertEqual(2.0, deadline.remaining())
+        self.assertFalse(deadline.expired())
+        deadline.check("query")
+
+        clock.now = 2.5
+        self.assertEqual(-0.5, deadline.remaining())
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(DeadlineExceededError) as context:
+            deadline.check("query")
+        self.assertEqual("query", context.exception.operation)
+
+    def testResolve(self):
+        self.assertIsNone(Deadline.resolve(None))
+        deadline = Deadline.after(5)
+        self.assertIs(deadline, Deadline.resolve(deadline))
+        self.assertAlmostEqual(5, Deadline.resolve(5).remaining(), places=1)
+
+
+class TimeoutsTest(unittest.TestCase):
+
+    def testPerOperation(self):
+        timeouts = Timeouts(TimeoutConfig(connect=3, default=60, operations={"query": 30, "upload": None}))
+        self.assertEqual((3, 30), timeouts.for_attempt("query"))
+        self.assertEqual((3, 60), timeouts.for_attempt("index"))
+        self.assertEqual((3, None), timeouts.for_attempt("upload"))
+
+    def testDeadlineCaps(self):
+        clock = FakeClock()
+        timeouts = Timeouts(TimeoutConfig(connect=3, default=60, operations={"upload": None}))
+        deadline = Deadline.after(2, clock)
+        self.assertEqual((2, 2), timeouts.for_attempt("index", deadline))
+        self.assertEqual((2, 2), timeouts.for_attempt("upload", deadline))
+
+        clock.now = 2
+        with self.assertRaises(DeadlineExceededError):
+            timeouts.for_attempt("index", deadline)
+
+    def testAdaptive(self):
+        timeouts = Timeouts(TimeoutConfig(default=10, operations={}, adaptive=True, percentile=90, multiplier=2,
+                                          min_timeout=0.5, min_samples=10))
+        for i in range(9):
+            timeouts.record("query", 1.0)
+        # Not enough samples yet.
+        self.assertEqual(10, timeouts.timeout("query"))
+
+        for i in range(91):
+            timeouts.record("query", 1.0)
+        self.assertEqual(2.0, timeouts.timeout("query"))
+        # Each operation adapts separately.
+        self.assertEqual(10, timeouts.timeout("index"))
+
+        slow = Timeouts(TimeoutConfig(default=10, operations={}, adaptive=True, min_samples=1))
+        slow.record("query", 8.0)
+        self.assertEqual(10, slow.timeout("query"))
+
+        fast = Timeouts(TimeoutConfig(default=10, operations={}, adaptive=True, min_samples=1, min_timeout=0.5))
+        fast.record("query", 0.001)
+        self.assertEqual(0.5, fast.timeout("query"))
+
+    def testStaticIgnoresLatency(self):
+        timeouts = Timeouts(TimeoutConfig(default=10, operations={}, min_samples=1))
+        timeouts.record("query", 0.001)
+        self.assertEqual(10, timeouts.timeout("query"))
+        self.assertEqual({}, timeouts._trackers)
+
+
+class RetryDeadlineTest(unittest.TestCase):
+
+    def testNoBackoffPastDeadline(self):
+        sleeps = []
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(initial_backoff=1.0, jitter=False)),
+                                     sleep=sleeps.append)
+
+        def send():
+            raise requests.ConnectionError("refused")
+
+        with self.assertRaises(requests.ConnectionError):
+            retry_handler.call("query", send, Deadline.after(0.5))
+        self.assertEqual([], sleeps)
+
+        with self.assertRaises(requests.ConnectionError):
+            retry_handler.call("query", send, Deadline.after(60))
+        self.assertEqual([1.0, 2.0], sleeps)
+
+
+class RequestUtilDeadlineTest(unittest.TestCase):
+
+    def _request_util(self, base_url: str, **kwargs) -> RequestUtil:
+        return RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url, **kwargs)
+
+    def testDefaultTimeout(self):
+        timeouts = Timeouts(TimeoutConfig(default=0.2, operations={}))
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+        with StubServer(routes={"query": build_query_response(1)}, delay=2.0) as server:
+            request_util = self._request_util(server.base_url, timeouts=timeouts, retry_handler=retry_handler)
+            start = time.perf_counter()
+            with self.assertRaises(requests.Timeout):
+                QueryService(request_util, 12344).query("stuck", 1)
+            elapsed = time.perf_counter() - start
+            request_util.close()
+        self.assertLess(elapsed, 1.5)
+
+    def testDeadline(self):
+        with StubServer(routes={"query": build_query_response(1)}, delay=2.0) as server:
+            request_util = self._request_util(server.base_url)
+            start = time.perf_counter()
+            with self.assertRaises(requests.Timeout):
+                QueryService(request_util, 12344).query("stuck", 1, deadline=0.2)
+            elapsed = time.perf_counter() - start
+
+            # Nothing is sent once the deadline has passed.
+            with self.assertRaises(DeadlineExceededError):
+                QueryService(request_util, 12344).query("late", 1, deadline=Deadline.after(0))
+            request_util.close()
+
+            self.assertLess(elapsed, 1.5)
+            self.assertEqual(1, server.request_count)
+
+    def testErrorResponsesDoNotAdapt(self):
+        config = TimeoutConfig(default=10, operations={}, adaptive=True, min_samples=1, min_timeout=0.5)
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+        with StubServer(routes={"query": (429, {"error": "slow down"}, {})}) as server:
+            timeouts = Timeouts(config)
+            request_util = self._request_util(server.base_url, timeouts=timeouts, retry_handler=retry_handler)
+            with self.assertRaises(requests.HTTPError):
+                QueryService(request_util, 12344).query("throttled", 1)
+            request_util.close()
+
+            async_timeouts = Timeouts(config)
+
+            async def run():
+                async_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                              timeouts=async_timeouts, retry_handler=retry_handler)
+                try:
+                    with self.assertRaises(httpx.HTTPStatusError):
+                        await AsyncQueryService(async_util, 12344).query("throttled", 1)
+                finally:
+                    await async_util.aclose()
+            asyncio.run(run())
+
+        # The quick 429s left the timeout where it was.
+        self.assertEqual(10, timeouts.timeout("query"))
+        self.assertEqual(10, async_timeouts.timeout("query"))
+
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = self._request_util(server.base_url, timeouts=timeouts, retry_handler=retry_handler)
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+        self.assertEqual(0.5, timeouts.timeout("query"))
+
+    def testPaginationSharesDeadline(self):
+        # Every page has another after it, so only the deadline stops us.
+        routes = {"list-documents": build_list_documents_response(10, next_page_key="more")}
+        with StubServer(routes=routes, delay=0.1) as server:
+            request_util = self._request_util(server.base_url)
+            start = time.perf_counter()
+            with self.assertRaises((DeadlineExceededError, requests.Timeout)):
+                DocumentService(request_util).list_documents(1, deadline=0.35)
+            elapsed = time.perf_counter() - start
+            request_util.close()
+
+            self.assertLess(elapsed, 1.0)
+            self.assertLessEqual(server.request_count, 4)
+
+    def testListApiKeysSharesDeadline(self):
+        deadlines = []
+        pages = {None: "page-2", "page-2": "page-3", "page-3": ""}
+
+        class RecordingRequestUtil:
+
+            def request(self, operation, payload, to_class=None, method="POST", deadline=None):
+                deadlines.append(deadline)
+                return SimpleNamespace(keyData=[], pageKey=pages[payload["pageKey"]])
+
+        AdminService(RecordingRequestUtil(), 12344).list_api_keys(deadline=30)
+        self.assertEqual(3, len(deadlines))
+        self.assertIsInstance(deadlines[0], Deadline)
+        self.assertTrue(all(deadline is deadlines[0] for deadline in deadlines))
+
+    def testUploadTimeout(self):
+        timeouts = Timeouts(TimeoutConfig(operations={"upload": 0.2}))
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+        with StubServer(routes={"upload": UPLOAD_RESPONSE}, delay=2.0) as server:
+            request_util = self._request_util(server.base_url, timeouts=timeouts, retry_handler=retry_handler)
+            start = time.perf_counter()
+            with self.assertRaises(requests.Timeout):
+                IndexerService(request_util.auth_util, request_util, 12344).upload(
+                    1, "./resources/filter_attributes/document_1.json")
+            elapsed = time.perf_counter() - start
+            request_util.close()
+        self.assertLess(elapsed, 1.5)
+
+    def testAsyncDeadline(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url)
+            try:
+                with self.assertRaises(httpx.TimeoutException):
+                    await AsyncQueryService(request_util, 12344).query("stuck", 1, deadline=0.2)
+                with self.assertRaises(DeadlineExceededError):
+                    await AsyncDocumentService(request_util).list_documents(1, deadline=Deadline.after(0))
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": build_query_response(1)}, delay=2.0) as server:
+            start = time.perf_counter()
+            asyncio.run(run(server.base_url))
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 1.5)
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "timeout" : { "connect" : 2, "operations" : { "query" : 5 }, "adaptive" : true }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            timeouts = client.request_util.timeouts
+            self.assertEqual((2, 5), timeouts.for_attempt("query"))
+            self.assertTrue(timeouts.config.adaptive)
+
+        with Factory(config_json='{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}').build() as client:
+            self.assertEqual(TimeoutConfig(), client.request_util.timeouts.config)
+
+
+class CountDownLatchTest(unittest.TestCase):
+
+    def testTimeout(self):
+        latch = CountDownLatch(2)
+        latch.count_down()
+        self.assertFalse(latch.sweat_it_out(0.05))
+
+        threading.Timer(0.05, latch.count_down).start()
+        self.assertTrue(latch.sweat_it_out(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import logging
+from dacite import from_dict
+from vectara_client.decoder import decode
+from vectara_client.domain import BatchQueryResponse, ListDocumentsResponse
+from test.fixtures import build_query_response, build_list_documents_response
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+ITERATIONS = 50
+
+
+class DecoderBenchmark(unittest.TestCase):
+    """
+    Compares dacite.from_dict against our precompiled decoders on realistic response bodies.
+    """
+
+    def _compare(self, name: str, data_class, data: dict):
+        self.assertEqual(from_dict(data_class, data), decode(data_class, data))
+
+        dacite_samples = time_calls(lambda: from_dict(data_class, data), ITERATIONS)
+        compiled_samples = time_calls(lambda: decode(data_class, data), ITERATIONS)
+        print()
+        print(summarize(f"{name} dacite", dacite_samples))
+        print(summarize(f"{name} compiled", compiled_samples))
+
+        # Typically over 10x faster, so comparing medians is safe even on a noisy machine.
+        self.assertLess(percentile(compiled_samples, 50), percentile(dacite_samples, 50))
+
+    def testBatchQueryResponse(self):
+        self._compare("query x50", BatchQueryResponse, build_query_response(50))
+
+    def testListDocumentsResponse(self):
+        self._compare("list-documents x1000", ListDocumentsResponse, build_list_documents_response(1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+from dacite import from_dict, MissingValueError, WrongTypeError, UnionMatchError
+from vectara_client.decoder import decode, register_decoder
+from vectara_client.domain import (BatchQueryResponse, ListDocumentsResponse, IndexDocumentResponse, ListCorpusResponse,
+                                   UploadDocumentResponse, DocumentSection, FilterAttributeType, Semantics)
+from vectara_client.status import StatusCode
+from test.fixtures import (build_query_response, build_list_documents_response, INDEX_RESPONSE, UPLOAD_RESPONSE)
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+@dataclass
+class Defaults:
+    name: str
+    ratio: float = 0.5
+    tags: List[str] = field(default_factory=list)
+    extra: Optional[Dict[str, int]] = None
+
+
+CORPORA = {
+    "corpus": [{
+        "id": 1, "name": "test",
+        "filterAttributes": [{
+            "name": "lang", "indexed": True, "type": "FILTER_ATTRIBUTE_TYPE__TEXT",
+            "level": "FILTER_ATTRIBUTE_LEVEL__DOCUMENT"
+        }]
+    }],
+    "pageKey": "",
+    "status": {"code": "OK"}
+}
+
+
+def paths(value, path=()):
+    yield path
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from paths(child, path + (key,))
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            yield from paths(child, path + (index,))
+
+
+def outcome(decoder, data_class, data):
+    try:
+        return "ok", decoder(data_class, data)
+    except Exception as e:
+        return type(e), getattr(e, "field_path", None)
+
+
+class DecoderTest(unittest.TestCase):
+
+    def testMatchesDacite(self):
+        for data_class, data in [(BatchQueryResponse, build_query_response(3)),
+                                 (ListDocumentsResponse, build_list_documents_response(3)),
+                                 (IndexDocumentResponse, INDEX_RESPONSE), (ListCorpusResponse, CORPORA),
+                                 (UploadDocumentResponse, UPLOAD_RESPONSE)]:
+            self.assertEqual(from_dict(data_class, data), decode(data_class, data))
+
+    def testEnumFixUps(self):
+        result = decode(BatchQueryResponse, build_query_response(1))
+        self.assertEqual(Semantics.DEFAULT, result.responseSet[0].response[0].corpusKey.semantics)
+
+        corpora = decode(ListCorpusResponse, CORPORA)
+        self.assertEqual(StatusCode.OK, corpora.status.code)
+        self.assertEqual(FilterAttributeType.FILTER_ATTRIBUTE_TYPE__TEXT, corpora.corpus[0].filterAttributes[0].type)
+
+    def testValidationMatchesDacite(self):
+        """
+        Replaces every value in the fixtures with values of other types, or removes it, and checks we accept and
+        reject exactly what dacite does with the same exception and field path.
+        """
+        checked = 0
+        for data_class, data in [(BatchQueryResponse, build_query_response(2)), (ListCorpusResponse, CORPORA),
+                                 (IndexDocumentResponse, INDEX_RESPONSE)]:
+            for path in list(paths(data))[1:]:
+                for replacement in [None, 1, 1.5, "s", "OK", [], {}, True, [1], KeyError]:
+                    if replacement is KeyError and isinstance(path[-1], int):
+                        continue
+                    mutated = copy.deepcopy(data)
+                    parent = mutated
+                    for key in path[:-1]:
+                        parent = parent[key]
+                    if replacement is KeyError:
+                        del parent[path[-1]]
+                    else:
+                        parent[path[-1]] = replacement
+
+                    expected = outcome(from_dict, data_class, copy.deepcopy(mutated))
+                    actual = outcome(decode, data_class, copy.deepcopy(mutated))
+                    self.assertEqual(expected, actual, f"{data_class.__name__} {path} = {replacement!r}")
+                    checked += 1
+        self.assertGreater(checked, 500)
+
+    def testErrors(self):
+        with self.assertRaises(MissingValueError) as cm:
+            decode(DocumentSection, {"text": "a", "section": [{"text": "b"}]})
+        self.assertEqual("section.section", cm.exception.field_path)
+
+        with self.assertRaises(WrongTypeError) as cm:
+            decode(Defaults, {"name": 1})
+        self.assertEqual("name", cm.exception.field_path)
+
+        with self.assertRaises(UnionMatchError):
+            decode(IndexDocumentResponse, {"status": {"code": 5}, "quotaConsumed": None})
+
+    def testUnionOnlySkipsMismatches(self):
+        @dataclass
+        class Broken:
+            name: str
+
+        def broken_decoder(data):
+            raise ZeroDivisionError()
+        register_decoder(Broken, broken_decoder)
+
+        @dataclass
+        class Holder:
+            value: Union[Broken, str]
+
+        # A member failing for any reason other than a mismatch isn't silently skipped for the next one.
+        with self.assertRaises(ZeroDivisionError):
+            decode(Holder, {"value": {"name": "a"}})
+        with self.assertRaises(ZeroDivisionError):
+            decode(Holder, {"value": "a"})
+
+        @dataclass
+        class Either:
+            value: Union[Defaults, str]
+
+        self.assertEqual(Either("a"), decode(Either, {"value": "a"}))
+        self.assertEqual(Either(Defaults("a")), decode(Either, {"value": {"name": "a"}}))
+
+    def testDefaultsAndNumericTower(self):
+        self.assertEqual(Defaults("a"), decode(Defaults, {"name": "a"}))
+        result = decode(Defaults, {"name": "a", "ratio": 1, "tags": ["x"], "extra": {"k": 2}, "unknown": True})
+        self.assertEqual(Defaults("a", 1, ["x"], {"k": 2}), result)
+        with self.assertRaises(WrongTypeError):
+            decode(Defaults, {"name": "a", "extra": {"k": "2"}})
+
+    def testRecursiveType(self):
+        data = {"text": "a", "section": [{"text": "b", "section": []}]}
+        self.assertEqual(from_dict(DocumentSection, data), decode(DocumentSection, data))
+
+    def testConcurrentFirstUse(self):
+        for attempt in range(20):
+            # A new recursive class each time, so every attempt races to compile it.
+            node_class = dataclass(type(f"Node{attempt}", (), {
+                "__annotations__": {"name": str, **{f"f{i}": Optional[int] for i in range(200)},
+                                    "children": List[f"Node{attempt}"]},
+                "__module__": __name__
+            }))
+            globals()[node_class.__name__] = node_class
+            data = {"name": "root", "children": [{"name": "leaf", "children": []}]}
+            barrier = threading.Barrier(8)
+
+            def first_decode(_):
+                barrier.wait()
+                return decode(node_class, data)
+
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(first_decode, range(8)))
+            self.assertEqual([from_dict(node_class, data)] * 8, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import logging
+from dataclasses import asdict
+from vectara_client.domain import IndexDocument, IndexDocumentRequest, DocumentSection
+from vectara_client.encoder import encode
+from vectara_client.util import _custom_asdict_factory
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+ITERATIONS = 50
+
+
+def _strip_nulls(value):
+    if isinstance(value, dict):
+        return {key: _strip_nulls(item) for key, item in value.items() if item is not None}
+    elif isinstance(value, list):
+        return [_strip_nulls(item) for item in value]
+    return value
+
+
+class EncoderBenchmark(unittest.TestCase):
+    """
+    Compares dataclasses.asdict (as previously used to build request bodies) against our precompiled encoders.
+    """
+
+    def testLargeIndexDocument(self):
+        sections = [DocumentSection(f"Paragraph {i} of a long document, with some text to index.", None,
+                                    '{"page": %d}' % i, [DocumentSection("Nested", None, None, [])])
+                    for i in range(2000)]
+        request = IndexDocumentRequest(12344, 1, IndexDocument("doc-1", "A long document", None, sections, None))
+
+        def with_asdict():
+            return asdict(request, dict_factory=_custom_asdict_factory)
+
+        # asdict keeps nulls which we no longer send, otherwise the payloads are the same.
+        self.assertEqual(_strip_nulls(with_asdict()), encode(request))
+
+        asdict_samples = time_calls(with_asdict, ITERATIONS)
+        encode_samples = time_calls(lambda: encode(request), ITERATIONS)
+        print()
+        print(summarize("index-doc x2000 asdict", asdict_samples))
+        print(summarize("index-doc x2000 encode", encode_samples))
+
+        # Typically 5x faster or more, as asdict deep copies every value.
+        self.assertLess(percentile(encode_samples, 50), percentile(asdict_samples, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
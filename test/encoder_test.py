@@ -0,0 +1,77 @@
+import unittest
+import logging
+from dataclasses import asdict
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.domain import (BatchQueryRequest, CorpusKey, LinearInterpolation, IndexDocument, DocumentSection,
+                                   FilterAttribute, FilterAttributeType, FilterAttributeLevel, Corpus,
+                                   CreateCorpusRequest)
+from vectara_client.encoder import encode, wire_name
+from vectara_client.index import IndexerService
+from vectara_client.query import QueryService
+from vectara_client.util import RequestUtil, _custom_asdict_factory
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+class EncoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"))
+
+    def tearDown(self):
+        self.request_util.close()
+
+    def testMatchesAsdictFactory(self):
+        attribute = FilterAttribute("lang", None, True, FilterAttributeType.FILTER_ATTRIBUTE_TYPE__TEXT,
+                                    FilterAttributeLevel.FILTER_ATTRIBUTE_LEVEL__DOCUMENT)
+        corpus = Corpus(None, "test", "A test corpus", None, None, None, None, None, None, None, None, None, None,
+                        [attribute])
+        request = CreateCorpusRequest(corpus)
+
+        self.assertEqual(asdict(request, dict_factory=_custom_asdict_factory), encode(request))
+        self.assertEqual("FILTER_ATTRIBUTE_TYPE__TEXT", encode(request)['corpus']['filterAttributes'][0]['type'])
+
+    def testReservedWords(self):
+        self.assertEqual("lambda", wire_name("_lambda"))
+        self.assertEqual("_private", wire_name("_private"))
+
+        key = CorpusKey(1, 12344, "DEFAULT", None, None, LinearInterpolation(0.1))
+        self.assertEqual({"corpusId": 1, "customerId": 12344, "semantics": "DEFAULT",
+                          "lexicalInterpolationConfig": {"lambda": 0.1}}, encode(key))
+
+    def testQueryLambdaOnEveryCorpus(self):
+        query_service = QueryService(self.request_util, 12344)
+        payload = query_service._build_query("Where is Santa?", [1, 2], _lambda=0.3)
+
+        for corpus_key in payload['query'][0]['corpusKey']:
+            self.assertEqual({"lambda": 0.3}, corpus_key['lexicalInterpolationConfig'])
+
+    def testIndexDocumentOmitsNulls(self):
+        section = DocumentSection("A stunning four bedroom house", None, None, [])
+        document = IndexDocument("doc-1", "Rental", None, [section], None)
+        indexer = IndexerService(self.request_util.auth_util, self.request_util, 12344)
+
+        payload = indexer._build_index_doc_payload(1, document)
+        self.assertEqual({
+            "customer_id": 12344,
+            "corpus_id": 1,
+            "document": {"document_id": "doc-1", "title": "Rental",
+                         "section": [{"text": "A stunning four bedroom house", "section": []}]}
+        }, payload)
+
+        # A dict is validated first, with the same result.
+        as_dict = {"document_id": "doc-1", "title": "Rental", "metadata_json": None, "custom_dims": None,
+                   "section": [{"text": "A stunning four bedroom house", "section": [], "context": None,
+                                "metadata_json": None}]}
+        self.assertEqual(payload, indexer._build_index_doc_payload(1, as_dict))
+
+    def testSharesPlainValues(self):
+        sections = [DocumentSection("text", None, None, [])]
+        encoded = encode({"items": ["a", "b"], "sections": sections, "level": FilterAttributeLevel(5)})
+        self.assertEqual({"items": ["a", "b"], "sections": [{"text": "text", "section": []}],
+                          "level": "FILTER_ATTRIBUTE_LEVEL__DOCUMENT"}, encoded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import io
+import json
+import logging
+import os
+import time
+from vectara_client.authn import OAuthUtil
+from vectara_client.config import LoggingConfig
+from vectara_client.query import QueryService
+from vectara_client.util import RequestUtil
+from test.fixtures import FakeOAuthSession, build_query_response
+
+ITERATIONS = 2000
+RUNS = 10
+BODY = json.dumps(build_query_response(1)).encode("utf-8")
+LOGGERS = ["QueryService", "RequestUtil", "OAuthUtil"]
+# Set VECTARA_BENCH_TIMINGS=1 to also check production logging costs a tenth of development's, which wall clock noise
+# on a loaded machine can upset.
+CHECK_TIMINGS = os.environ.get("VECTARA_BENCH_TIMINGS", "") not in ("", "0")
+
+
+class FakeResponse:
+    status_code = 200
+    content = BODY
+    headers = {}
+
+
+class FakeSession:
+    """
+    Answers immediately, so the timings are the client's own overhead including its logging.
+    """
+
+    def request(self, method, url, headers=None, data=None, timeout=None):
+        return FakeResponse()
+
+    def close(self):
+        pass
+
+
+def oauth_request_util(profile: str) -> RequestUtil:
+    """
+    A RequestUtil with an already authenticated OAuthUtil, as most requests of a long running process see.
+    """
+    config = LoggingConfig(profile=profile)
+    auth_util = OAuthUtil("http://localhost/oauth2/token", "client", "secret", "12344", logging_config=config,
+                          session=FakeOAuthSession())
+    auth_util.authenticate()
+    return RequestUtil(auth_util, session=FakeSession(), logging_config=config)
+
+
+class EventLogBenchmark(unittest.TestCase):
+    """
+    The logging cost of each QueryService.query at INFO, from building the query to its lazily decoded response,
+    written to an in memory stream with the usual format, under the "development" profile which logs as we always
+    have, the "production" profile, and with logging silenced entirely as the floor.
+    """
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        for name in LOGGERS:
+            target = logging.getLogger(name)
+            previous = (target.level, target.propagate)
+            target.addHandler(handler)
+            target.propagate = False
+            self.addCleanup(self._restore, target, handler, previous)
+
+    def _restore(self, target, handler, previous):
+        target.removeHandler(handler)
+        target.setLevel(previous[0])
+        target.propagate = previous[1]
+
+    def _set_level(self, level: int):
+        for name in LOGGERS:
+            logging.getLogger(name).setLevel(level)
+
+    def testPerQueryCost(self):
+        utils = {"development": oauth_request_util("development"),
+                 "production": oauth_request_util("production"),
+                 "silent": oauth_request_util("production")}
+        levels = {"development": logging.INFO, "production": logging.INFO, "silent": logging.CRITICAL + 1}
+
+        best = {}
+        for _ in range(RUNS):
+            for name, request_util in utils.items():
+                self._set_level(levels[name])
+                query_service = QueryService(request_util, 12344)
+                start = time.perf_counter()
+                for _ in range(ITERATIONS):
+                    query_service.query("Where is Santa?", 1, lazy=True)
+                elapsed = (time.perf_counter() - start) / ITERATIONS * 1_000_000
+                best[name] = min(best.get(name, elapsed), elapsed)
+        for request_util in utils.values():
+            request_util.close()
+
+        lines = self.stream.getvalue().count("\n")
+        development = best["development"] - best["silent"]
+        production = best["production"] - best["silent"]
+        print()
+        print(f"silent          {best['silent']:8.3f}us per query")
+        print(f"development     {best['development']:8.3f}us per query, logging {development:6.3f}us")
+        print(f"production      {best['production']:8.3f}us per query, logging {production:6.3f}us")
+        print(f"lines written   {lines}")
+
+        # Only development writes, one URL and one token line per query.
+        self.assertEqual(2 * RUNS * ITERATIONS, lines)
+        if CHECK_TIMINGS:
+            self.assertLess(production, development / 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import unittest
+import io
+import json
+import logging
+from vectara_client.authn import ApiKeyUtil, OAuthUtil
+from vectara_client.config import LoggingConfig
+from vectara_client.core import Factory
+from vectara_client.eventlog import EventLogger, StructuredFormatter, lazy
+from vectara_client.query import QueryService
+from vectara_client.util import RequestUtil, ChatPromptFactory
+from test.stub_server import StubServer
+from test.fixtures import FakeOAuthSession, build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+class CapturingHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class EventLogTestCase(unittest.TestCase):
+    """
+    Captures what is written to the named loggers, which don't propagate to the root logger meanwhile.
+    """
+
+    def capture(self, name: str, level: int = logging.INFO) -> CapturingHandler:
+        target = logging.getLogger(name)
+        handler = CapturingHandler()
+        previous = (target.level, target.propagate)
+        target.addHandler(handler)
+        target.setLevel(level)
+        target.propagate = False
+
+        def restore():
+            target.removeHandler(handler)
+            target.setLevel(previous[0])
+            target.propagate = previous[1]
+
+        self.addCleanup(restore)
+        return handler
+
+
+class EventLoggerTest(EventLogTestCase):
+
+    def testDevelopmentProfile(self):
+        handler = self.capture("EventLoggerTest")
+        events = EventLogger(logging.getLogger("EventLoggerTest"))
+        events.log("request.url", "URL for operation %s is: %s", "query", "http://x/query", operation="query")
+        events.log("request.payload", "Payload is: %s", "{}")
+        self.assertEqual(1, len(handler.records))
+        record = handler.records[0]
+        self.assertEqual(logging.INFO, record.levelno)
+        self.assertEqual("URL for operation query is: http://x/query", record.getMessage())
+        self.assertEqual("request.url", record.event)
+        self.assertEqual({"operation": "query"}, record.fields)
+        # The call site, not EventLogger.log.
+        self.assertEqual("testDevelopmentProfile", record.funcName)
+
+    def testProductionProfile(self):
+        handler = self.capture("EventLoggerTest")
+        events = EventLogger(logging.getLogger("EventLoggerTest"), LoggingConfig(profile="production"))
+        events.log("request.url", "URL for operation %s is: %s", "query", "http://x/query")
+        events.log("chat.prompt", "Chat prompt is:\n%s", "prompt")
+        events.log("corpus.created", "Created corpus %s", 1)
+        self.assertEqual(["corpus.created"], [record.event for record in handler.records])
+        self.assertFalse(events.enabled("request.url"))
+
+        handler = self.capture("EventLoggerTest", logging.DEBUG)
+        events.log("request.url", "URL for operation %s is: %s", "query", "http://x/query")
+        self.assertEqual(logging.DEBUG, handler.records[0].levelno)
+
+    def testLevels(self):
+        handler = self.capture("EventLoggerTest")
+        events = EventLogger(logging.getLogger("EventLoggerTest"), LoggingConfig(profile="production",
+                                                                                levels={"request.url": "warning"}))
+        events.log("request.url", "URL for operation %s is: %s", "query", "http://x/query")
+        self.assertEqual(logging.WARNING, handler.records[0].levelno)
+
+    def testLazy(self):
+        calls = []
+
+        def expensive(value):
+            calls.append(value)
+            return value.upper()
+
+        self.capture("EventLoggerTest")
+        events = EventLogger(logging.getLogger("EventLoggerTest"))
+        events.log("request.payload", "Payload is: %s", lazy(expensive, "skipped"))
+        self.assertEqual([], calls)
+
+        handler = self.capture("EventLoggerTest", logging.DEBUG)
+        events.log("request.payload", "Payload is: %s", lazy(expensive, "written"))
+        self.assertEqual("Payload is: WRITTEN", handler.records[0].getMessage())
+        self.assertEqual(["written"], calls)
+
+    def testSampling(self):
+        handler = self.capture("EventLoggerTest")
+        events = EventLogger(logging.getLogger("EventLoggerTest"),
+                             LoggingConfig(sample_rates={"request.url": 0.1, "chat.prompt": 0.0}))
+        for i in range(100):
+            events.log("request.url", "request %s", i)
+            events.log("chat.prompt", "prompt %s", i)
+            events.log("auth.token", "token %s", i)
+        self.assertEqual(10, len([record for record in handler.records if record.event == "request.url"]))
+        self.assertEqual(0, len([record for record in handler.records if record.event == "chat.prompt"]))
+        self.assertEqual(100, len([record for record in handler.records if record.event == "auth.token"]))
+
+    def testInvalid(self):
+        target = logging.getLogger("EventLoggerTest")
+        with self.assertRaises(TypeError):
+            EventLogger(target, LoggingConfig(profile="quiet"))
+        with self.assertRaises(TypeError):
+            EventLogger(target, LoggingConfig(sample_rates={"request.url": 2}))
+
+    def testStructuredFormatter(self):
+        stream = io.StringIO()
+        target = logging.getLogger("EventLoggerTest")
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(StructuredFormatter())
+        target.addHandler(handler)
+        self.addCleanup(target.removeHandler, handler)
+        self.capture("EventLoggerTest")
+
+        events = EventLogger(target)
+        events.log("request.url", "URL for operation %s is: %s", "query", "http://x/query", operation="query",
+                   size=lazy(len, "abc"))
+        entry = json.loads(stream.getvalue())
+        self.assertEqual("request.url", entry["event"])
+        self.assertEqual("query", entry["operation"])
+        self.assertEqual("3", entry["size"])
+        self.assertEqual("INFO", entry["level"])
+        self.assertEqual("URL for operation query is: http://x/query", entry["message"])
+
+
+class HotPathLoggingTest(EventLogTestCase):
+
+    def testRequestUtil(self):
+        handler = self.capture("RequestUtil")
+        with StubServer(routes={"list-corpora": {"corpus": [], "pageKey": "", "status": None}}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            request_util.request("list-corpora", {"numResults": 10})
+            request_util.close()
+
+            self.assertEqual(["request.url"], [record.event for record in handler.records])
+            self.assertEqual(f"URL for operation list-corpora is: {server.base_url}/list-corpora",
+                             handler.records[0].getMessage())
+
+            handler = self.capture("RequestUtil")
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       logging_config=LoggingConfig(profile="production"))
+            request_util.request("list-corpora", {"numResults": 10})
+            request_util.close()
+            self.assertEqual([], handler.records)
+
+    def testQueryService(self):
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            handler = self.capture("QueryService")
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            self.assertEqual([], handler.records)
+
+            handler = self.capture("QueryService", logging.DEBUG)
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+        self.assertTrue(any(record.getMessage().startswith("Query is:") for record in handler.records))
+
+    def testOAuthToken(self):
+        handler = self.capture("OAuthUtil")
+        auth_util = OAuthUtil("http://localhost/oauth2/token", "client", "secret", "12344",
+                              session=FakeOAuthSession())
+        auth_util.authenticate()
+        handler.records.clear()
+
+        self.assertEqual("Bearer token-1", auth_util.get_headers()["Authorization"])
+        self.assertEqual(["auth.token"], [record.event for record in handler.records])
+        self.assertEqual(auth_util.expires_at, handler.records[0].fields["expires_at"])
+
+    def testChatPrompt(self):
+        handler = self.capture("ChatPromptFactory")
+        ChatPromptFactory().build()
+        self.assertEqual(["chat.prompt"], [record.event for record in handler.records])
+        ChatPromptFactory(logging_config=LoggingConfig(profile="production")).build()
+        self.assertEqual(1, len(handler.records))
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "logging" : { "profile" : "production", "sample_rates" : { "request.url" : 0.5 } }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual("production", client.request_util.events.config.profile)
+            self.assertEqual({"request.url": 0.5}, client.request_util.events.config.sample_rates)
+
+        config_json = '{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}'
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual("development", client.request_util.events.config.profile)
+        with Factory(config_json=config_json, logging_config=LoggingConfig(profile="production")).build() as client:
+            self.assertEqual("production", client.request_util.events.config.profile)
+
+
+if __name__ == '__main__':
+    unittest.main()
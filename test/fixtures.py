@@ -0,0 +1,112 @@
+"""
+Canned Vectara responses for the stub server, shaped like the real API responses.
+"""
+
+
+def build_query_response(num_results: int = 10, summary: bool = True, corpus_id: int = 1) -> dict:
+    responses = []
+    documents = []
+    for index in range(num_results):
+        responses.append({
+            "text": f"Result {index} about Santa's workshop in the North Pole.",
+            "score": 1.0 - (index / 100.0),
+            "metadata": [
+                {"name": "lang", "value": "eng"},
+                {"name": "section", "value": str(index)},
+                {"name": "offset", "value": "0"},
+                {"name": "len", "value": "52"}
+            ],
+            "documentIndex": index,
+            "corpusKey": {
+                "customerId": 0,
+                "corpusId": corpus_id,
+                "semantics": "DEFAULT",
+                "dim": [],
+                "metadataFilter": "",
+                "lexicalInterpolationConfig": None
+            },
+            "resultOffset": 0,
+            "resultLength": 52
+        })
+        documents.append({
+            "id": f"doc-{index}",
+            "metadata": [
+                {"name": "title", "value": f"Document {index}"},
+                {"name": "sha1_hash", "value": "da39a3ee5e6b4b0d3255bfef95601890afd80709"}
+            ]
+        })
+
+    summaries = []
+    if summary:
+        summaries.append({
+            "text": "Santa lives at the North Pole [1].",
+            "lang": "eng",
+            "prompt": "",
+            "status": [],
+            "chat": None
+        })
+
+    return {
+        "responseSet": [{
+            "response": responses,
+            "status": [],
+            "document": documents,
+            "summary": summaries
+        }],
+        "status": [],
+        "metrics": {
+            "queryEncodeMs": 12,
+            "retrievalMs": 34,
+            "userdataRetrievalMs": 5,
+            "rerankMs": 7
+        }
+    }
+
+
+def build_list_documents_response(num_documents: int = 100, next_page_key: str = "", offset: int = 0) -> dict:
+    documents = []
+    for index in range(offset, offset + num_documents):
+        documents.append({
+            "id": f"doc-{index}",
+            "metadata": [
+                {"name": "title", "value": f"Document {index}"},
+                {"name": "owner", "value": "david"}
+            ]
+        })
+    return {"document": documents, "nextPageKey": next_page_key}
+
+
+INDEX_RESPONSE = {
+    "status": {"code": "OK", "statusDetail": "", "cause": None},
+    "quotaConsumed": {"numChars": "120", "numMetadataChars": "24"}
+}
+
+LIST_CORPORA_RESPONSE = {"corpus": [], "pageKey": "", "status": None}
+
+UPLOAD_RESPONSE = {
+    "response": {"status": {}, "quotaConsumed": {"numChars": "1024", "numMetadataChars": "64"}},
+    "document": None
+}
+
+
+class FakeOAuthSession:
+    """
+    Stands in for the OAuth2Session of OAuthUtil, issuing tokens "token-1", "token-2"... without a token endpoint.
+    """
+
+    def __init__(self, expires_in: int = 3600, delay: float = 0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.fetches = 0
+        self.closed = False
+
+    def fetch_token(self, url, grant_type=None, **kwargs) -> dict:
+        import time
+        if self.delay:
+            time.sleep(self.delay)
+        self.fetches += 1
+        return {"access_token": f"token-{self.fetches}", "token_type": "Bearer", "expires_in": self.expires_in,
+                "expires_at": int(time.time()) + self.expires_in}
+
+    def close(self):
+        self.closed = True
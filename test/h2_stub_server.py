@@ -0,0 +1,151 @@
+"""
+Cleartext HTTP/2 stand-in for api.vectara.io, sharing the routes and request recording of StubServer.
+
+Clients must use prior knowledge (TransportConfig.http2_prior_knowledge) as there is no TLS to negotiate HTTP/2 with.
+Each stream is served concurrently on an asyncio loop, so delay models server latency without limiting throughput.
+"""
+from requests.structures import CaseInsensitiveDict
+from threading import Thread
+from test.stub_server import StubServer, StubRequest
+import asyncio
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+import h2.settings
+
+
+class _H2Protocol(asyncio.Protocol):
+
+    def __init__(self, stub: "H2StubServer"):
+        self.stub = stub
+        self.conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        self.transport = None
+        self.streams = {}
+        self.window_updated = asyncio.Event()
+        self.in_flight = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.stub._count_connection()
+        self.stub._protocols.append(self)
+        self.conn.initiate_connection()
+        self.conn.update_settings({h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: self.stub.max_concurrent_streams})
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data: bytes):
+        try:
+            events = self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self.stub._count_protocol_error()
+            self.transport.write(self.conn.data_to_send())
+            self.transport.close()
+            return
+
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                self.streams[event.stream_id] = (CaseInsensitiveDict(event.headers), bytearray())
+                self.in_flight += 1
+                self.stub._observe_streams(self.in_flight)
+            elif isinstance(event, h2.events.DataReceived):
+                self.streams[event.stream_id][1].extend(event.data)
+                self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded):
+                asyncio.ensure_future(self._respond(event.stream_id))
+            elif isinstance(event, h2.events.StreamReset):
+                if self.streams.pop(event.stream_id, None) is not None:
+                    self.in_flight -= 1
+            elif isinstance(event, h2.events.WindowUpdated):
+                self.window_updated.set()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.conn.data_to_send())
+
+    def connection_lost(self, exc):
+        self.window_updated.set()
+
+    async def _respond(self, stream_id: int):
+        headers, body = self.streams.pop(stream_id)
+        request = StubRequest(headers[':method'], self.stub.operation_for(headers[':path']), headers, bytes(body))
+        self.stub._record(request)
+
+        if self.stub.delay:
+            await asyncio.sleep(self.stub.delay)
+
+        status, response_bytes, response_headers = self.stub.dispatch(request)
+        response_headers = [(":status", str(status))] + [(key.lower(), value) for key, value in
+                                                          response_headers.items()]
+        response_headers.append(("content-length", str(len(response_bytes))))
+        try:
+            self.conn.send_headers(stream_id, response_headers, end_stream=not response_bytes)
+            await self._send_data(stream_id, response_bytes)
+        except h2.exceptions.StreamClosedError:
+            pass
+        finally:
+            self.in_flight -= 1
+        if not self.transport.is_closing():
+            self.transport.write(self.conn.data_to_send())
+
+    async def _send_data(self, stream_id: int, data: bytes):
+        while data:
+            window = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+            if window <= 0:
+                self.transport.write(self.conn.data_to_send())
+                self.window_updated.clear()
+                await self.window_updated.wait()
+                if self.transport.is_closing():
+                    return
+                continue
+            chunk, data = data[:window], data[window:]
+            self.conn.send_data(stream_id, chunk, end_stream=not data)
+
+
+class H2StubServer(StubServer):
+
+    def __init__(self, routes: dict = None, delay: float = 0.0, record: bool = True, compress_responses: bool = False,
+                 max_concurrent_streams: int = 1000):
+        """
+        :param max_concurrent_streams: the SETTINGS_MAX_CONCURRENT_STREAMS we advertise to clients.
+        """
+        super().__init__(routes=routes, delay=delay, record=record, compress_responses=compress_responses)
+        self.max_concurrent_streams = max_concurrent_streams
+        # The most streams seen in flight on any one connection.
+        self.peak_streams = 0
+        # Connections closed as the client broke the protocol, e.g. opened streams out of order.
+        self.protocol_errors = 0
+        self._loop = None
+        self._port = None
+        self._protocols = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._port}/v1"
+
+    def _count_protocol_error(self):
+        with self._lock:
+            self.protocol_errors += 1
+
+    def _observe_streams(self, in_flight: int):
+        with self._lock:
+            self.peak_streams = max(self.peak_streams, in_flight)
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            self._loop.create_server(lambda: _H2Protocol(self), "127.0.0.1", 0))
+        self._port = self._server.sockets[0].getsockname()[1]
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        async def shutdown():
+            self._server.close()
+            for protocol in self._protocols:
+                protocol.transport.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
@@ -0,0 +1,73 @@
+import unittest
+import logging
+import threading
+import time
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import HedgeConfig
+from vectara_client.hedge import Hedger
+from vectara_client.query import QueryService
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+
+ITERATIONS = 400
+# One in SLOW_EVERY responses stalls for SLOW_DELAY, the occasional slow response which dominates p99.
+SLOW_EVERY = 50
+SLOW_DELAY = 0.25
+
+
+def tail_latency_route():
+    lock = threading.Lock()
+    counter = []
+
+    def route(request):
+        with lock:
+            counter.append(1)
+            slow = len(counter) % SLOW_EVERY == 0
+        time.sleep(SLOW_DELAY if slow else 0.002)
+        return build_query_response(10)
+
+    return route
+
+
+class HedgeBenchmark(unittest.TestCase):
+    """
+    Query latency with 2% slow responses, with and without hedging at p95.
+    """
+
+    def _run(self, hedger: Hedger = None):
+        with StubServer(routes={"query": tail_latency_route()}, record=False) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url, hedger=hedger)
+            query_service = QueryService(request_util, 12344)
+            samples = time_calls(lambda: query_service.query("Where is Santa?", 1), ITERATIONS)
+            request_util.close()
+            return samples, server.request_count
+
+    def testTailLatency(self):
+        plain_samples, plain_requests = self._run()
+        hedger = Hedger(HedgeConfig(percentile=95, budget_ratio=0.05))
+        hedged_samples, hedged_requests = self._run(hedger)
+
+        print()
+        print(summarize("query unhedged", plain_samples))
+        print(summarize("query hedged at p95", hedged_samples))
+        stats = hedger.stats()["query"]
+        print(f"hedges [{stats.hedges}] won [{stats.hedge_wins}] denied by budget [{stats.budget_denied}], "
+              f"extra requests [{hedged_requests - plain_requests}]")
+
+        # A slow response is a full SLOW_DELAY without hedging, but only ~p95 plus a fast response with it.
+        self.assertGreater(percentile(plain_samples, 99), SLOW_DELAY * 1000)
+        self.assertLess(percentile(hedged_samples, 99), SLOW_DELAY * 1000 / 2)
+        # The budget caps hedges at 5% of requests, here including the warm up calls.
+        self.assertLessEqual(stats.hedges, 0.05 * stats.requests)
+        self.assertGreater(stats.hedge_wins, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
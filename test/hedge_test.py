@@ -0,0 +1,275 @@
+import unittest
+import asyncio
+import logging
+import threading
+import time
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import HedgeConfig
+from vectara_client.core import Factory
+from vectara_client.hedge import Hedger, LatencyTracker
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def wait_for(condition, timeout: float = 5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.001)
+    return condition()
+
+
+def primed_hedger(samples: int = 20, latency: float = 0.01, **kwargs) -> Hedger:
+    """
+    A hedger which has already seen enough fast queries to hedge, with budget for a few hedges.
+    """
+    hedger = Hedger(HedgeConfig(min_samples=samples, **kwargs))
+    for _ in range(samples):
+        hedger._record("query", latency)
+    for _ in range(int(3 / hedger.config.budget_ratio)):
+        hedger.budget.deposit()
+    return hedger
+
+
+class LatencyTrackerTest(unittest.TestCase):
+
+    def testPercentile(self):
+        tracker = LatencyTracker(window=100, percentile=95, min_samples=10)
+        for i in range(9):
+            tracker.record(i / 100)
+        self.assertIsNone(tracker.threshold())
+
+        for i in range(9, 100):
+            tracker.record(i / 100)
+        self.assertAlmostEqual(0.95, tracker.threshold())
+
+    def testWindow(self):
+        tracker = LatencyTracker(window=20, percentile=50, min_samples=1)
+        for _ in range(40):
+            tracker.record(1.0)
+        self.assertEqual(20, len(tracker.samples))
+        self.assertEqual(1.0, tracker.threshold())
+
+
+class HedgerTest(unittest.TestCase):
+
+    def testNoHedgeUntilMinSamples(self):
+        hedger = Hedger(HedgeConfig(min_samples=5))
+        for _ in range(5):
+            self.assertEqual("ok", hedger.call("query", lambda: "ok"))
+        self.assertEqual(5, len(hedger._trackers["query"].samples))
+        self.assertIsNone(hedger._executor)
+
+    def testHedgeWins(self):
+        hedger = primed_hedger()
+        calls = []
+        release = threading.Event()
+
+        def send():
+            calls.append(1)
+            if len(calls) == 1:
+                # The original stalls until after the hedge has answered.
+                release.wait(5)
+                return "slow"
+            return "fast"
+
+        try:
+            self.assertEqual("fast", hedger.call("query", send))
+        finally:
+            release.set()
+            hedger.close()
+
+        stats = hedger.stats()["query"]
+        self.assertEqual(1, stats.hedges)
+        self.assertEqual(1, stats.hedge_wins)
+        self.assertEqual(2, len(calls))
+
+    def testFastResponseNotHedged(self):
+        hedger = primed_hedger(latency=1.0)
+        self.assertEqual("ok", hedger.call("query", lambda: "ok"))
+        hedger.close()
+        self.assertEqual(0, hedger.stats()["query"].hedges)
+
+    def testOriginalErrorWhenBothFail(self):
+        hedger = primed_hedger()
+        calls = []
+
+        def send():
+            calls.append(1)
+            attempt = len(calls)
+            time.sleep(0.05)
+            raise ValueError(f"attempt {attempt}")
+
+        with self.assertRaises(ValueError) as context:
+            hedger.call("query", send)
+        hedger.close()
+        self.assertEqual(2, len(calls))
+        self.assertEqual("attempt 1", str(context.exception))
+
+    def testHedgeCoversFailedOriginal(self):
+        hedger = primed_hedger()
+        calls = []
+
+        def send():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                raise ValueError("original failed")
+            time.sleep(0.1)
+            return "hedge"
+
+        self.assertEqual("hedge", hedger.call("query", send))
+        hedger.close()
+
+    def testBudget(self):
+        hedger = Hedger(HedgeConfig(min_samples=1, budget_ratio=0.05))
+        hedger._record("query", 0.0)
+        for _ in range(100):
+            hedger.call("query", lambda: time.sleep(0.002))
+        hedger.close()
+
+        stats = hedger.stats()["query"]
+        self.assertEqual(100, stats.requests)
+        self.assertLessEqual(stats.hedges, 5)
+        self.assertGreater(stats.budget_denied, 0)
+
+    def testAsyncLoserCancelled(self):
+        hedger = primed_hedger()
+        cancelled = []
+
+        async def run():
+            calls = []
+
+            async def send():
+                calls.append(1)
+                if len(calls) == 1:
+                    try:
+                        await asyncio.sleep(5)
+                    except asyncio.CancelledError:
+                        cancelled.append(1)
+                        raise
+                return "fast"
+
+            result = await hedger.call_async("query", send)
+            # Let the cancellation run.
+            await asyncio.sleep(0)
+            return result
+
+        self.assertEqual("fast", asyncio.run(run()))
+        self.assertEqual([1], cancelled)
+        self.assertEqual(1, hedger.stats()["query"].hedge_wins)
+
+    def testBusyWorkersRunOnCaller(self):
+        hedger = primed_hedger(max_workers=1)
+        release = threading.Event()
+        threads = []
+
+        def send():
+            threads.append(threading.current_thread())
+            if len(threads) == 1:
+                release.wait(5)
+            return "ok"
+
+        first = threading.Thread(target=hedger.call, args=("query", send))
+        first.start()
+        try:
+            self.assertTrue(wait_for(lambda: hedger.stats()["query"].workers_busy == 1))
+            # The only worker is busy, so neither queue for it.
+            self.assertEqual("ok", hedger.call("query", send))
+            self.assertIs(threading.current_thread(), threads[1])
+        finally:
+            release.set()
+            first.join()
+            hedger.close()
+
+        stats = hedger.stats()["query"]
+        self.assertEqual(0, stats.hedges)
+        self.assertEqual(2, stats.workers_busy)
+        self.assertEqual(2, len(threads))
+
+    def testOnlyIdempotentOperations(self):
+        with self.assertRaises(TypeError):
+            Hedger(HedgeConfig(operations=["query", "index"]))
+        self.assertTrue(Hedger(HedgeConfig(operations=["list-documents"])).hedges("list-documents"))
+
+
+class RequestUtilHedgeTest(unittest.TestCase):
+
+    def _slow_every(self, n: int, delay: float):
+        lock = threading.Lock()
+        counter = []
+
+        def route(request):
+            with lock:
+                counter.append(1)
+                slow = len(counter) % n == 0
+            if slow:
+                time.sleep(delay)
+            return build_query_response(1)
+
+        return route
+
+    def testRequestUtil(self):
+        hedger = Hedger(HedgeConfig(min_samples=5))
+        for _ in range(40):
+            hedger.budget.deposit()
+        with StubServer(routes={"query": self._slow_every(10, 2.0)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url, hedger=hedger)
+            query_service = QueryService(request_util, 12344)
+            start = time.perf_counter()
+            for i in range(10):
+                query_service.query(f"query {i}", 1)
+            elapsed = time.perf_counter() - start
+            request_util.close()
+
+        # The tenth request stalled, and was answered by its hedge.
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(1, hedger.stats()["query"].hedge_wins)
+        # Only one journal entry, the hedge is the same request.
+        self.assertEqual(10, len(request_util.requests))
+
+    def testAsyncRequestUtil(self):
+        hedger = Hedger(HedgeConfig(min_samples=5))
+        for _ in range(40):
+            hedger.budget.deposit()
+
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url, hedger=hedger)
+            query_service = AsyncQueryService(request_util, 12344)
+            for i in range(10):
+                await query_service.query(f"query {i}", 1)
+            await request_util.aclose()
+
+        with StubServer(routes={"query": self._slow_every(10, 2.0)}) as server:
+            start = time.perf_counter()
+            asyncio.run(run(server.base_url))
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(1, hedger.stats()["query"].hedge_wins)
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "hedge" : { "operations" : ["query", "list-corpora"], "percentile" : 99 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertTrue(client.request_util.hedger.hedges("list-corpora"))
+            self.assertEqual(0, client.get_hedge_stats()["query"].requests)
+
+        with Factory(config_json='{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}').build() as client:
+            self.assertIsNone(client.request_util.hedger)
+            self.assertEqual({}, client.get_hedge_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import asyncio
+import importlib.util
+import logging
+import time
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import TransportConfig
+from vectara_client.query import AsyncQueryService
+from vectara_client.util import AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+from test.bench import summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+HAS_H2 = importlib.util.find_spec("httpx") is not None and importlib.util.find_spec("h2") is not None
+
+if HAS_H2:
+    from test.h2_stub_server import H2StubServer
+
+# Modelled latency of each query. Nearer a real query than a loopback round trip, and large enough that the client's
+# own CPU (shared with the stand-in on small CI machines) doesn't hide the queuing we want to measure.
+SERVER_DELAY = 0.1
+
+
+async def _fan_out(base_url: str, transport_config: TransportConfig, concurrency: int):
+    """
+    Runs concurrency queries at once, as when one user request fans out to many, returning each call's latency.
+    """
+    request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), transport_config=transport_config,
+                                    base_url=base_url)
+    query_service = AsyncQueryService(request_util, 12344)
+
+    async def timed_query(i: int) -> float:
+        start = time.perf_counter()
+        await query_service.query(f"query {i}", 1)
+        return (time.perf_counter() - start) * 1000.0
+
+    # Warm up the connections so we measure steady state rather than the handshakes.
+    await asyncio.gather(*[query_service.query("warm up", 1) for _ in range(8)])
+    samples = await asyncio.gather(*[timed_query(i) for i in range(concurrency)])
+    await request_util.aclose()
+    return samples
+
+
+@unittest.skipUnless(HAS_H2, "httpx and h2 are required for HTTP/2")
+class Http2Benchmark(unittest.TestCase):
+    """
+    Per query latency of a burst of concurrent queries, over a pool of HTTP/1.1 connections against a few
+    multiplexed HTTP/2 connections, with the stand-ins adding SERVER_DELAY to each query.
+    """
+
+    def _compare(self, concurrency: int):
+        routes = {"query": build_query_response(10)}
+        http1_config = TransportConfig(pool_maxsize=10)
+        http2_config = TransportConfig(http2=True, http2_prior_knowledge=True, http2_connections=2,
+                                       http2_max_concurrent_streams=100)
+
+        with StubServer(routes=routes, delay=SERVER_DELAY, record=False) as server:
+            http1_samples = asyncio.run(_fan_out(server.base_url, http1_config, concurrency))
+            http1_connections = server.connection_count
+        with H2StubServer(routes=routes, delay=SERVER_DELAY, record=False) as server:
+            http2_samples = asyncio.run(_fan_out(server.base_url, http2_config, concurrency))
+            http2_connections = server.connection_count
+            peak_streams = server.peak_streams
+
+        print()
+        print(summarize(f"x{concurrency} HTTP/1.1 pool of 10", http1_samples))
+        print(summarize(f"x{concurrency} HTTP/2 2x100 streams", http2_samples))
+        print(f"connections: HTTP/1.1 [{http1_connections}], HTTP/2 [{http2_connections}] with up to "
+              f"[{peak_streams}] streams each")
+
+        self.assertEqual(2, http2_connections)
+        self.assertLessEqual(peak_streams, 100)
+        # HTTP/1.1 queues in waves of 10, so the margin is several times over and safe to assert on.
+        self.assertLess(percentile(http2_samples, 50), percentile(http1_samples, 50))
+
+    def testConcurrent64(self):
+        self._compare(64)
+
+    def testConcurrent256(self):
+        self._compare(256)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import asyncio
+import importlib.util
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import TransportConfig, RetryConfig, RetryPolicyConfig
+from vectara_client.core import Factory
+from vectara_client.index import IndexerService
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.transport import Http2Adapter
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.fixtures import build_query_response, UPLOAD_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+HAS_H2 = importlib.util.find_spec("httpx") is not None and importlib.util.find_spec("h2") is not None
+
+if HAS_H2:
+    from test.h2_stub_server import H2StubServer
+
+
+def h2_config(connections: int = 2, max_streams: int = 100) -> TransportConfig:
+    return TransportConfig(http2=True, http2_prior_knowledge=True, http2_connections=connections,
+                           http2_max_concurrent_streams=max_streams)
+
+
+@unittest.skipUnless(HAS_H2, "httpx and h2 are required for HTTP/2")
+class Http2Test(unittest.TestCase):
+
+    def setUp(self):
+        self.auth_util = ApiKeyUtil("12344", "BLAH_KEY")
+
+    def testQuery(self):
+        with H2StubServer(routes={"query": build_query_response(5)}, compress_responses=True) as server:
+            request_util = RequestUtil(self.auth_util, transport_config=h2_config(), base_url=server.base_url)
+            self.assertIsInstance(request_util.session.get_adapter(server.base_url), Http2Adapter)
+            result = QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+
+        self.assertEqual(5, len(result.response))
+        self.assertEqual("Where is Santa?", server.requests[0].json()['query'][0]['query'])
+        # Hop-by-hop headers from the session are not sent over HTTP/2.
+        self.assertNotIn("connection", server.requests[0].headers)
+        self.assertEqual(1, request_util.compressor.stats()["query"].responses_compressed)
+
+    def testConcurrencyLimitPerConnection(self):
+        with H2StubServer(routes={"query": build_query_response(1)}, delay=0.02) as server:
+            request_util = RequestUtil(self.auth_util, transport_config=h2_config(connections=2, max_streams=4),
+                                       base_url=server.base_url)
+            query_service = QueryService(request_util, 12344)
+            with ThreadPoolExecutor(32) as executor:
+                results = list(executor.map(lambda i: query_service.query(f"query {i}", 1), range(64)))
+            request_util.close()
+
+        self.assertEqual(64, len(results))
+        # Neither connection was dropped and re-opened, e.g. for streams opened out of order by concurrent threads.
+        self.assertEqual(0, server.protocol_errors)
+        self.assertEqual(2, server.connection_count)
+        self.assertEqual(4, server.peak_streams)
+        self.assertEqual([0, 0], request_util.session.get_adapter(server.base_url).slots.in_flight)
+
+    def testEveryPhaseHasTimeout(self):
+        # Threads sharing a connection set its socket's timeout, which mustn't flip between blocking and not.
+        adapter = Http2Adapter(h2_config())
+        for timeout in [(10.0, 30.0), (10.0, None), None, 5.0]:
+            converted = adapter._to_timeout(timeout)
+            self.assertIsNotNone(converted.connect)
+            self.assertIsNotNone(converted.read)
+            self.assertIsNotNone(converted.write)
+        self.assertEqual(30.0, adapter._to_timeout((10.0, 30.0)).write)
+        adapter.close()
+
+    def testErrorsAreRequestsExceptions(self):
+        calls = []
+
+        def flaky(request):
+            calls.append(request)
+            return (503, {"error": "unavailable"}, {}) if len(calls) == 1 else build_query_response(1)
+
+        retry_config = RetryConfig(default=RetryPolicyConfig(max_attempts=2, initial_backoff=0))
+        with H2StubServer(routes={"query": flaky}) as server:
+            request_util = RequestUtil(self.auth_util, transport_config=h2_config(), base_url=server.base_url,
+                                       retry_handler=RetryHandler(retry_config))
+            result = QueryService(request_util, 12344).query("Where is Santa?", 1)
+            with self.assertRaises(requests.HTTPError):
+                request_util.request("missing", {})
+            request_util.close()
+
+        self.assertEqual(2, len(calls))
+        self.assertEqual(1, len(result.response))
+
+    def testUpload(self):
+        with H2StubServer(routes={"upload": UPLOAD_RESPONSE}) as server:
+            request_util = RequestUtil(self.auth_util, transport_config=h2_config(), base_url=server.base_url)
+            indexer = IndexerService(self.auth_util, request_util, 12344)
+            result = indexer.upload(1, "./resources/filter_attributes/document_1.json", metadata={"owner": "david"})
+            request_util.close()
+
+        self.assertIsNone(result.response.status)
+        self.assertIn("multipart/form-data", server.requests[0].headers['Content-Type'])
+        self.assertIn(b'"owner":"david"', server.requests[0].body)
+
+    def testAsync(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(self.auth_util, transport_config=h2_config(connections=2, max_streams=8),
+                                            base_url=base_url)
+            query_service = AsyncQueryService(request_util, 12344)
+            results = await asyncio.gather(*[query_service.query(f"query {i}", 1) for i in range(64)])
+            await request_util.aclose()
+            return results
+
+        with H2StubServer(routes={"query": build_query_response(2)}, delay=0.02) as server:
+            results = asyncio.run(run(server.base_url))
+
+        self.assertEqual(64, len(results))
+        self.assertEqual(2, server.connection_count)
+        self.assertEqual(8, server.peak_streams)
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "transport" : { "http2" : true, "http2_connections" : 3, "http2_max_concurrent_streams" : 50 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            adapter = client.request_util.session.get_adapter("https://api.vectara.io/v1")
+            self.assertIsInstance(adapter, Http2Adapter)
+            self.assertEqual(3, len(adapter.clients))
+            self.assertEqual(50, adapter.slots.max_streams)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+# Loaded on first use rather than by importing vectara_client.core: uploads, OAuth2, configuration files and the
+# OAuth2 token cache.
+LAZY_MODULES = ("tqdm", "requests_toolbelt", "authlib", "yaml", "cryptography")
+RUNS = 5
+# Cold import of vectara_client.core, best of RUNS, in milliseconds. About 240ms on a single core CI runner, where
+# importing authlib, yaml, tqdm and requests_toolbelt up front took over 370ms.
+BUDGET_MS = 330
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY_CONFIG = json.dumps({"customer_id": "12344", "auth": {"api_key": "BLAH_KEY"}})
+OAUTH_CONFIG = json.dumps({"customer_id": "12344", "auth": {"auth_url": "http://localhost/oauth2/token",
+                                                            "app_client_id": "client",
+                                                            "app_client_secret": "secret"}})
+
+
+def import_times(statement: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Runs statement in a fresh interpreter with -X importtime. Bytecode is written, so after the first run modules
+    load from __pycache__ as they do once installed, rather than being compiled each time.
+
+    :return: the self and cumulative import time in microseconds of each module it imported, by name.
+    """
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def lazy_modules_loaded(times: Dict[str, Tuple[int, int]]) -> set:
+    return {name.split(".")[0] for name in times if name.split(".")[0] in LAZY_MODULES}
+
+
+class ImportTimeBenchmark(unittest.TestCase):
+    """
+    Start up cost of the client, as paid by each cold start of a serverless handler or CLI invocation.
+    """
+
+    def testColdImport(self):
+        # The first run writes the bytecode.
+        runs = [import_times("import vectara_client.core") for _ in range(RUNS + 1)][1:]
+        best = min(runs, key=lambda times: times["vectara_client.core"][1])
+        total_ms = best["vectara_client.core"][1] / 1000.0
+
+        print()
+        print(f"import vectara_client.core  {total_ms:8.1f}ms, budget {BUDGET_MS}ms")
+        slowest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:10]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"  {name:<40} self {self_us / 1000.0:7.1f}ms  cumulative {cumulative_us / 1000.0:7.1f}ms")
+
+        self.assertEqual(set(), lazy_modules_loaded(best))
+        self.assertLess(total_ms, BUDGET_MS)
+
+    def testBuildWithApiKey(self):
+        times = import_times("from vectara_client.core import Factory\n"
+                             f"Factory(config_json={API_KEY_CONFIG!r}).build().close()")
+        self.assertEqual(set(), lazy_modules_loaded(times))
+
+    def testBuildWithOAuth(self):
+        times = import_times("from vectara_client.core import Factory\n"
+                             f"Factory(config_json={OAUTH_CONFIG!r}).build().close()")
+        self.assertEqual({"authlib", "cryptography"}, lazy_modules_loaded(times))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+import unittest
+import asyncio
+import logging
+import requests
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import RetryConfig, RetryPolicyConfig
+from vectara_client.core import Factory
+from vectara_client.index import IndexerService, AsyncIndexerService
+from vectara_client.interceptor import BaseInterceptor, InterceptorChain, RequestContext
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response, UPLOAD_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class RecordingInterceptor(BaseInterceptor):
+
+    def __init__(self, name: str, calls: list):
+        self.name = name
+        self.calls = calls
+
+    def before(self, context: RequestContext):
+        self.calls.append(f"{self.name}.before")
+
+    def after(self, context: RequestContext, result):
+        self.calls.append(f"{self.name}.after")
+        return result
+
+    def on_error(self, context: RequestContext, error: Exception):
+        self.calls.append(f"{self.name}.on_error")
+
+
+class CachingInterceptor(BaseInterceptor):
+    """
+    Caches successful results by operation and payload, to show an interceptor can short-circuit.
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def before(self, context: RequestContext):
+        return self.cache.get((context.operation, repr(context.payload)))
+
+    def after(self, context: RequestContext, result):
+        self.cache[(context.operation, repr(context.payload))] = result
+        return result
+
+
+class RetryOnceInterceptor(BaseInterceptor):
+    """
+    Retries any failure once, to show an interceptor can resend.
+    """
+
+    def __init__(self):
+        self.retries = 0
+
+    def on_error(self, context: RequestContext, error: Exception):
+        if context.attributes.get("retried"):
+            return None
+        context.attributes["retried"] = True
+        self.retries += 1
+        return context.resend()
+
+    async def on_error_async(self, context: RequestContext, error: Exception):
+        if context.attributes.get("retried"):
+            return None
+        context.attributes["retried"] = True
+        self.retries += 1
+        return await context.resend()
+
+
+class InterceptorChainTest(unittest.TestCase):
+
+    def testOrder(self):
+        calls = []
+        chain = InterceptorChain([RecordingInterceptor("a", calls), RecordingInterceptor("b", calls)])
+        result = chain.call(RequestContext("query", {}), lambda: calls.append("send") or "result")
+        self.assertEqual("result", result)
+        self.assertEqual(["a.before", "b.before", "send", "b.after", "a.after"], calls)
+
+    def testError(self):
+        calls = []
+        chain = InterceptorChain([RecordingInterceptor("a", calls), RecordingInterceptor("b", calls)])
+
+        def send():
+            raise ValueError("bad")
+
+        with self.assertRaises(ValueError):
+            chain.call(RequestContext("query", {}), send)
+        self.assertEqual(["a.before", "b.before", "b.on_error", "a.on_error"], calls)
+
+    def testShortCircuit(self):
+        calls = []
+
+        class Hit(BaseInterceptor):
+            def before(self, context):
+                calls.append("hit.before")
+                return "cached"
+
+        chain = InterceptorChain([RecordingInterceptor("a", calls), Hit(), RecordingInterceptor("b", calls)])
+        self.assertEqual("cached", chain.call(RequestContext("query", {}), lambda: calls.append("send")))
+        self.assertEqual(["a.before", "hit.before", "a.after"], calls)
+
+    def testReplaceResult(self):
+        class Upper(BaseInterceptor):
+            def after(self, context, result):
+                return result.upper()
+
+        self.assertEqual("RESULT", InterceptorChain([Upper()]).call(RequestContext("query", {}), lambda: "result"))
+
+    def testAddRemove(self):
+        chain = InterceptorChain()
+        self.assertFalse(chain)
+        interceptor = BaseInterceptor()
+        chain.add(interceptor)
+        self.assertEqual(1, len(chain))
+        chain.remove(interceptor)
+        self.assertFalse(chain)
+
+    def testAsyncDefaultsToBlockingHooks(self):
+        calls = []
+        chain = InterceptorChain([RecordingInterceptor("a", calls)])
+
+        async def send():
+            calls.append("send")
+            return "result"
+
+        self.assertEqual("result", asyncio.run(chain.call_async(RequestContext("query", {}), send)))
+        self.assertEqual(["a.before", "send", "a.after"], calls)
+
+
+class RequestUtilInterceptorTest(unittest.TestCase):
+
+    def testCaching(self):
+        cache = CachingInterceptor()
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       interceptors=[cache])
+            query_service = QueryService(request_util, 12344)
+            first = query_service.query("Where is Santa?", 1)
+            second = query_service.query("Where is Santa?", 1)
+            query_service.query("Where is Rudolph?", 1)
+            request_util.close()
+            self.assertIs(first, second)
+            self.assertEqual(2, server.request_count)
+
+    def testRetry(self):
+        attempts = []
+
+        def flaky(request):
+            attempts.append(1)
+            return (503, {"error": "busy"}, {}) if len(attempts) == 1 else build_query_response(1)
+
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+        retry = RetryOnceInterceptor()
+        with StubServer(routes={"query": flaky}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       retry_handler=retry_handler, interceptors=[retry])
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+        self.assertEqual(1, retry.retries)
+        self.assertEqual(2, len(attempts))
+
+    def testModifyPayload(self):
+        class Rename(BaseInterceptor):
+            def before(self, context):
+                context.payload = dict(context.payload, renamed=True)
+
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            request_util.interceptors.add(Rename())
+            request_util.request("query", {"query": []})
+            request_util.close()
+            self.assertTrue(server.requests[0].json()["renamed"])
+
+    def testMultipart(self):
+        calls = []
+        with StubServer(routes={"upload": UPLOAD_RESPONSE}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       interceptors=[RecordingInterceptor("a", calls)])
+            contexts = []
+
+            class Capture(BaseInterceptor):
+                def before(self, context):
+                    contexts.append(context)
+
+            request_util.interceptors.add(Capture())
+            IndexerService(request_util.auth_util, request_util, 12344).upload(
+                1, "./resources/filter_attributes/document_1.json")
+            request_util.close()
+        self.assertEqual(["a.before", "a.after"], calls)
+        self.assertEqual("upload", contexts[0].operation)
+        self.assertEqual("./resources/filter_attributes/document_1.json", contexts[0].path)
+
+    def testAsync(self):
+        class AsyncCounter(BaseInterceptor):
+            def __init__(self):
+                self.before_calls = 0
+                self.after_calls = 0
+
+            async def before_async(self, context):
+                await asyncio.sleep(0)
+                self.before_calls += 1
+
+            async def after_async(self, context, result):
+                self.after_calls += 1
+                return result
+
+        counter = AsyncCounter()
+        retry = RetryOnceInterceptor()
+        attempts = []
+
+        def flaky(request):
+            attempts.append(1)
+            return (503, {"error": "busy"}, {}) if len(attempts) == 1 else build_query_response(1)
+
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            retry_handler=RetryHandler(RetryConfig(
+                                                default=RetryPolicyConfig(max_attempts=1))),
+                                            interceptors=[counter, retry])
+            try:
+                await AsyncQueryService(request_util, 12344).query("Where is Santa?", 1)
+                await AsyncIndexerService(request_util.auth_util, request_util, 12344).upload(
+                    1, "./resources/filter_attributes/document_1.json")
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": flaky, "upload": UPLOAD_RESPONSE}) as server:
+            asyncio.run(run(server.base_url))
+        self.assertEqual(2, counter.before_calls)
+        self.assertEqual(1, counter.after_calls)
+        self.assertEqual(1, retry.retries)
+
+    def testFactory(self):
+        interceptor = BaseInterceptor()
+        config_json = '{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}'
+        with Factory(config_json=config_json, interceptors=[interceptor]).build() as client:
+            self.assertEqual((interceptor,), client.request_util.interceptors.interceptors)
+        with Factory(config_json=config_json).build() as client:
+            self.assertFalse(client.request_util.interceptors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import logging
+import os
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.domain import IndexDocument, DocumentSection
+from vectara_client.index import IndexerService
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import INDEX_RESPONSE
+from test.bench import current_rss_mb
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+
+# Set VECTARA_BENCH_DOCUMENTS=100000 for the full run, the default keeps the suite quick.
+DOCUMENTS = int(os.environ.get("VECTARA_BENCH_DOCUMENTS", "5000"))
+WARMUP = 1000
+SECTION_TEXT = "Santa's workshop is in the North Pole. " * 50
+
+
+class JournalMemoryBenchmark(unittest.TestCase):
+    """
+    Indexes many documents through the stand-in server and checks resident memory stays flat. Before the journal
+    every payload was kept in RequestUtil.requests, which for these ~2KB documents grew by ~20MB per 10k documents.
+    """
+
+    def testFlatMemoryWhileIndexing(self):
+        with StubServer(routes={"index": INDEX_RESPONSE}, record=False) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            indexer = IndexerService(request_util.auth_util, request_util, 12344)
+
+            def index_document(index: int):
+                section = DocumentSection(f"{index} {SECTION_TEXT}", None, None, [])
+                indexer.index_doc(1, IndexDocument(f"doc-{index}", f"Document {index}", None, [section], None))
+
+            for index in range(WARMUP):
+                index_document(index)
+            baseline = current_rss_mb()
+
+            samples = []
+            for index in range(WARMUP, DOCUMENTS):
+                index_document(index)
+                if index % (DOCUMENTS // 10) == 0:
+                    samples.append(current_rss_mb())
+            final = current_rss_mb()
+            request_util.close()
+
+        unbounded = DOCUMENTS * len(SECTION_TEXT) / (1024.0 * 1024.0)
+        print()
+        print(f"indexed [{DOCUMENTS}] documents, rss baseline [{baseline:.1f}MB] final [{final:.1f}MB] "
+              f"samples {[round(s, 1) for s in samples]}")
+        print(f"payload bytes an unbounded journal would have retained: [{unbounded:.1f}MB]")
+
+        self.assertEqual(DOCUMENTS, server.request_count)
+        self.assertEqual(request_util.requests.config.max_entries, len(request_util.requests))
+        self.assertLess(final - baseline, max(2.0, unbounded / 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
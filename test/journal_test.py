@@ -0,0 +1,96 @@
+import unittest
+import logging
+import os
+import tempfile
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import JournalConfig
+from vectara_client.core import Factory
+from vectara_client.journal import RequestJournal, read_spilled
+from vectara_client.util import RequestUtil, render_markdown_req
+from test.stub_server import StubServer
+from test.fixtures import LIST_CORPORA_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+def entry(index: int) -> dict:
+    return {'operation': 'index', 'payload': {'document': {'documentId': f"doc-{index}"}}}
+
+
+class RequestJournalTest(unittest.TestCase):
+
+    def testRingBufferKeepsMostRecent(self):
+        journal = RequestJournal(JournalConfig(max_entries=3))
+        for index in range(10):
+            journal.append(entry(index))
+
+        self.assertEqual(3, len(journal))
+        self.assertEqual(10, journal.recorded)
+        self.assertEqual("doc-9", journal[-1]['payload']['document']['documentId'])
+        self.assertEqual(["doc-7", "doc-8", "doc-9"], [e['payload']['document']['documentId'] for e in journal])
+        self.assertEqual(2, len(journal[-2:]))
+
+    def testDisabled(self):
+        journal = RequestJournal(JournalConfig(enabled=False))
+        journal.append(entry(1))
+        self.assertEqual(0, len(journal))
+
+    def testSampling(self):
+        samples = iter([0.05, 0.5, 0.09, 0.95])
+        journal = RequestJournal(JournalConfig(sample_rate=0.1), rand=lambda: next(samples))
+        for index in range(4):
+            journal.append(entry(index))
+
+        self.assertEqual(["doc-0", "doc-2"], [e['payload']['document']['documentId'] for e in journal])
+
+    def testInvalidConfig(self):
+        with self.assertRaises(TypeError):
+            RequestJournal(JournalConfig(sample_rate=2.0))
+        with self.assertRaises(TypeError):
+            RequestJournal(JournalConfig(max_entries=-1))
+
+    def testSpillsEvictedEntries(self):
+        handle, path = tempfile.mkstemp(suffix=".ndjson.gz")
+        os.close(handle)
+        os.remove(path)
+        try:
+            journal = RequestJournal(JournalConfig(max_entries=2, spill_path=path))
+            for index in range(5):
+                journal.append(entry(index))
+            journal.close()
+
+            spilled = [e['payload']['document']['documentId'] for e in read_spilled(path)]
+            self.assertEqual(["doc-0", "doc-1", "doc-2"], spilled)
+            self.assertEqual(3, journal.spilled)
+            self.assertEqual(2, len(journal))
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def testClientGetRequests(self):
+        with StubServer(routes={"list-corpora": LIST_CORPORA_RESPONSE}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       journal=RequestJournal(JournalConfig(max_entries=5)))
+            for index in range(8):
+                request_util.request("list-corpora", {"numResults": index})
+            request_util.close()
+
+        self.assertEqual(5, len(request_util.requests))
+        last_request = request_util.requests[-1]
+        self.assertEqual({"numResults": 7}, last_request['payload'])
+        self.assertIn("list-corpora", render_markdown_req(last_request))
+
+    def testJournalFromProfile(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "journal" : { "max_entries" : 10, "sample_rate" : 0.5 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual(10, client.get_requests().config.max_entries)
+            self.assertEqual(0.5, client.get_requests().config.sample_rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import logging
+import tracemalloc
+from vectara_client.decoder import decode
+from vectara_client.domain import BatchQueryResponse
+from vectara_client.lazy import lazy_view
+from test.fixtures import build_query_response
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+ITERATIONS = 200
+TOP_N = 3
+
+
+def read_top(response_set) -> list:
+    """
+    What a retrieval-only caller typically reads: the top few texts, scores and document ids.
+    """
+    results = []
+    for response in response_set.response[:TOP_N]:
+        results.append((response.text, response.score, response_set.document[response.documentIndex].id))
+    return results
+
+
+def allocated_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class LazyViewBenchmark(unittest.TestCase):
+    """
+    Compares decoding the full BatchQueryResponse tree against a lazy view when only the top results are read.
+    """
+
+    def testRetrievalOnly(self):
+        data = build_query_response(50)
+
+        def eager():
+            return read_top(decode(BatchQueryResponse, data).responseSet[0])
+
+        def lazy():
+            return read_top(lazy_view(BatchQueryResponse, data).responseSet[0])
+
+        self.assertEqual(eager(), lazy())
+
+        eager_bytes = allocated_bytes(eager)
+        lazy_bytes = allocated_bytes(lazy)
+        eager_samples = time_calls(eager, ITERATIONS)
+        lazy_samples = time_calls(lazy, ITERATIONS)
+
+        print()
+        print(f"peak allocation reading top {TOP_N} of 50: eager [{eager_bytes}B], lazy [{lazy_bytes}B]")
+        print(summarize("eager decode", eager_samples))
+        print(summarize("lazy view", lazy_samples))
+
+        # Allocations are deterministic, unlike timings.
+        self.assertLess(lazy_bytes * 5, eager_bytes)
+        self.assertLess(percentile(lazy_samples, 50), percentile(eager_samples, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
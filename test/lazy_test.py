@@ -0,0 +1,78 @@
+import unittest
+import logging
+from dacite import MissingValueError, WrongTypeError
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.decoder import decode
+from vectara_client.domain import BatchQueryResponse, ResponseSet, Response, Semantics
+from vectara_client.lazy import lazy_view, LazyList
+from vectara_client.query import QueryService
+from vectara_client.status import StatusCode
+from vectara_client.util import RequestUtil, render_markdown
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+class LazyViewTest(unittest.TestCase):
+
+    def testMatchesEagerDecode(self):
+        data = build_query_response(5)
+        view = lazy_view(BatchQueryResponse, data)
+
+        self.assertIsInstance(view, BatchQueryResponse)
+        self.assertIsInstance(view.responseSet[0], ResponseSet)
+        self.assertEqual(decode(BatchQueryResponse, data), view)
+        self.assertEqual(Semantics.DEFAULT, view.responseSet[0].response[0].corpusKey.semantics)
+
+    def testOnlyReadFieldsAreDecoded(self):
+        view = lazy_view(BatchQueryResponse, build_query_response(5))
+        response_set = view.responseSet[0]
+        first = response_set.response[0]
+
+        self.assertEqual(1.0, first.score)
+        self.assertIsInstance(response_set.response, LazyList)
+        # Nothing else has been built, and reads are cached.
+        self.assertNotIn("metadata", first.__dict__)
+        self.assertNotIn("corpusKey", first.__dict__)
+        self.assertNotIn("document", response_set.__dict__)
+        self.assertIs(first, response_set.response[0])
+
+    def testValidationOnAccess(self):
+        data = build_query_response(2)
+        del data["responseSet"][0]["response"][1]["text"]
+        data["responseSet"][0]["response"][0]["score"] = "high"
+        response = lazy_view(BatchQueryResponse, data).responseSet[0].response
+
+        with self.assertRaises(WrongTypeError):
+            response[0].score
+        with self.assertRaises(MissingValueError):
+            response[1].text
+        # Other fields of the same response are unaffected.
+        self.assertEqual(0, response[0].documentIndex)
+
+    def testRenderMarkdown(self):
+        data = build_query_response(3)
+        eager = decode(BatchQueryResponse, data).responseSet[0]
+        view = lazy_view(BatchQueryResponse, data).responseSet[0]
+        self.assertEqual(render_markdown("Where is Santa?", eager), render_markdown("Where is Santa?", view))
+
+    def testQueryServiceLazy(self):
+        no_citation = build_query_response(2)
+        no_citation["responseSet"][0]["summary"][0]["text"] = "No idea."
+        with StubServer(routes={"query": no_citation}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            query_service = QueryService(request_util, 12344)
+            result = query_service.query("Where is Santa?", 1, lazy=True)
+            request_util.close()
+
+        self.assertIsInstance(result, ResponseSet)
+        self.assertIsInstance(result.response[0], Response)
+        self.assertEqual("doc-1", result.document[1].id)
+        # The existing summary check assigns onto the view.
+        self.assertEqual(StatusCode.INVALID_ARGUMENT, result.summary[0].status.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,292 @@
+import unittest
+import asyncio
+import logging
+import threading
+import time
+import requests
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import MetricsConfig, RetryConfig, RetryPolicyConfig
+from vectara_client.core import Factory
+from vectara_client.metrics import Histogram, Metrics, OperationMetrics, PrometheusExporter, render_prometheus
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer, free_port
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class HistogramTest(unittest.TestCase):
+
+    def testPercentiles(self):
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.record(i / 1000)
+        self.assertEqual(1000, histogram.count)
+        self.assertAlmostEqual(500.5, histogram.sum, places=3)
+        self.assertAlmostEqual(0.5005, histogram.mean(), places=6)
+        self.assertEqual(1.0, histogram.max)
+        # Two significant figures, so within 1%.
+        for percentile, expected in [(50, 0.5), (90, 0.9), (99, 0.99), (100, 1.0)]:
+            self.assertAlmostEqual(expected, histogram.percentile(percentile), delta=expected * 0.01)
+
+    def testExactForSmallValues(self):
+        histogram = Histogram()
+        histogram.record(0.000150)
+        self.assertEqual(0.000150, histogram.percentile(50))
+        self.assertIsNone(Histogram().percentile(50))
+
+    def testPrecision(self):
+        for significant_figures in [1, 2, 3]:
+            histogram = Histogram(significant_figures)
+            for value in [0.0123456, 1.23456, 123.456]:
+                single = Histogram(significant_figures)
+                single.record(value)
+                # The bucket's highest value, capped at the max, so check below it.
+                bucket = single._highest(single._index(int(value * 1_000_000))) / 1_000_000
+                self.assertLessEqual(bucket - value, value * 10 ** -significant_figures)
+                histogram.record(value)
+            self.assertEqual(3, histogram.count)
+
+    def testMerge(self):
+        first, second, both = Histogram(), Histogram(), Histogram()
+        for i in range(500):
+            first.record(i / 1000)
+            both.record(i / 1000)
+        for i in range(500, 1000):
+            second.record(i / 1000)
+            both.record(i / 1000)
+        merged = first.copy()
+        merged.merge(second)
+        self.assertEqual(both.counts, merged.counts)
+        self.assertEqual(both.percentile(99), merged.percentile(99))
+        self.assertEqual(500, first.count)
+
+        with self.assertRaises(TypeError):
+            first.merge(Histogram(3))
+
+    def testCumulativeCounts(self):
+        histogram = Histogram()
+        for value in [0.001, 0.02, 0.02, 0.3, 5.0]:
+            histogram.record(value)
+        self.assertEqual([1, 3, 4, 4, 5], histogram.cumulative_counts([0.005, 0.05, 0.5, 1.0, 10.0]))
+
+    def testInvalid(self):
+        with self.assertRaises(TypeError):
+            Histogram(0)
+        with self.assertRaises(TypeError):
+            Metrics(MetricsConfig(significant_figures=9))
+
+
+class MetricsTest(unittest.TestCase):
+
+    def testTrack(self):
+        metrics = Metrics()
+        with metrics.track("query", 100) as tracking:
+            tracking.received(200, 1000)
+        with self.assertRaises(requests.ConnectionError):
+            with metrics.track("query", 100):
+                raise requests.ConnectionError("refused")
+
+        query = metrics.snapshot()["query"]
+        self.assertEqual(2, query.requests)
+        self.assertEqual(0, query.in_flight)
+        self.assertEqual(200, query.request_bytes)
+        self.assertEqual(1000, query.response_bytes)
+        self.assertEqual({"200": 1, "ConnectionError": 1}, query.statuses)
+        self.assertEqual(2, query.latency.count)
+        self.assertIsNotNone(tracking.latency)
+
+    def testThreadsMerge(self):
+        metrics = Metrics()
+
+        def record():
+            for _ in range(1000):
+                with metrics.track("query", 1) as tracking:
+                    tracking.received(200, 2)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        query = metrics.snapshot()["query"]
+        self.assertEqual(8000, query.requests)
+        self.assertEqual(8000, query.latency.count)
+        self.assertEqual(16000, query.response_bytes)
+
+        # Finished threads are folded together, rather than kept one per thread.
+        self.assertEqual([], [thread for thread, _ in metrics._shards if thread in threads])
+        record()
+        self.assertEqual(9000, metrics.snapshot()["query"].requests)
+
+    def testInFlight(self):
+        metrics = Metrics()
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            with metrics.track("query") as tracking:
+                started.set()
+                release.wait()
+                tracking.received(200, 0)
+
+        thread = threading.Thread(target=slow)
+        thread.start()
+        started.wait()
+        self.assertEqual(1, metrics.snapshot()["query"].in_flight)
+        release.set()
+        thread.join()
+        self.assertEqual(0, metrics.snapshot()["query"].in_flight)
+
+    def testOperationMetricsMerge(self):
+        first = OperationMetrics(requests=1, request_bytes=10, statuses={"200": 1})
+        first.latency.record(0.1)
+        second = OperationMetrics(requests=2, request_bytes=5, statuses={"200": 1, "500": 1})
+        second.latency.record(0.2)
+        first.merge(second)
+        self.assertEqual(OperationMetrics(requests=3, request_bytes=15, statuses={"200": 2, "500": 1},
+                                          latency=first.latency), first)
+        self.assertEqual(2, first.latency.count)
+
+
+class PrometheusTest(unittest.TestCase):
+
+    def testRender(self):
+        query = OperationMetrics(requests=3, request_bytes=30, response_bytes=300, statuses={"200": 2, "429": 1})
+        for latency in [0.02, 0.3, 0.7]:
+            query.latency.record(latency)
+        text = render_prometheus({"query": query}, buckets=[0.1, 0.5])
+        self.assertIn('vectara_client_request_duration_seconds_bucket{operation="query",le="0.1"} 1', text)
+        self.assertIn('vectara_client_request_duration_seconds_bucket{operation="query",le="0.5"} 2', text)
+        self.assertIn('vectara_client_request_duration_seconds_bucket{operation="query",le="+Inf"} 3', text)
+        self.assertIn('vectara_client_request_duration_seconds_count{operation="query"} 3', text)
+        self.assertIn('vectara_client_requests_total{operation="query",status="200"} 2', text)
+        self.assertIn('vectara_client_requests_total{operation="query",status="429"} 1', text)
+        self.assertIn('vectara_client_request_bytes_total{operation="query"} 30', text)
+        self.assertIn('vectara_client_response_bytes_total{operation="query"} 300', text)
+        self.assertIn('vectara_client_requests_in_flight{operation="query"} 0', text)
+        self.assertIn("# TYPE vectara_client_request_duration_seconds histogram", text)
+        self.assertTrue(text.endswith("\n"))
+
+    def testExporter(self):
+        metrics = Metrics()
+        with metrics.track("query", 10) as tracking:
+            tracking.received(200, 100)
+        with PrometheusExporter(metrics) as exporter:
+            response = requests.get(exporter.url)
+            self.assertEqual(200, response.status_code)
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+            self.assertIn('vectara_client_requests_total{operation="query",status="200"} 1', response.text)
+            self.assertEqual(404, requests.get(exporter.url.replace("/metrics", "/other")).status_code)
+
+
+class RequestUtilMetricsTest(unittest.TestCase):
+
+    def testRequests(self):
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+        routes = {"query": build_query_response(3), "list-corpora": (400, {"error": "bad"}, {})}
+        with StubServer(routes=routes) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       retry_handler=retry_handler)
+            query_service = QueryService(request_util, 12344)
+            for _ in range(3):
+                query_service.query("Where is Santa?", 1)
+            with self.assertRaises(requests.HTTPError):
+                request_util.request("list-corpora", {})
+            request_util.close()
+
+        snapshot = request_util.metrics.snapshot()
+        query = snapshot["query"]
+        self.assertEqual(3, query.requests)
+        self.assertEqual({"200": 3}, query.statuses)
+        self.assertEqual(3, query.latency.count)
+        self.assertEqual(3 * len(server.requests[0].body), query.request_bytes)
+        self.assertGreater(query.response_bytes, 0)
+        self.assertEqual({"400": 1}, snapshot["list-corpora"].statuses)
+
+    def testRetriesCounted(self):
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=3, initial_backoff=0.01)))
+        with StubServer(routes={"query": (503, {"error": "busy"}, {})}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       retry_handler=retry_handler)
+            with self.assertRaises(requests.HTTPError):
+                QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+        self.assertEqual({"503": 3}, request_util.metrics.snapshot()["query"].statuses)
+
+    def testAsync(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url)
+            try:
+                query_service = AsyncQueryService(request_util, 12344)
+                await asyncio.gather(*[query_service.query("Where is Santa?", 1) for _ in range(5)])
+                return request_util.metrics.snapshot()
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            snapshot = asyncio.run(run(server.base_url))
+        self.assertEqual(5, snapshot["query"].requests)
+        self.assertEqual({"200": 5}, snapshot["query"].statuses)
+        self.assertEqual(0, snapshot["query"].in_flight)
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "metrics" : { "significant_figures" : 3, "port" : 0 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual(3, client.request_util.metrics.config.significant_figures)
+            self.assertEqual({}, client.metrics())
+            response = requests.get(client.metrics_exporter.url)
+            self.assertEqual(200, response.status_code)
+        self.assertIsNone(client.metrics_exporter._server)
+
+        with Factory(config_json='{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}').build() as client:
+            self.assertEqual(MetricsConfig(), client.request_util.metrics.config)
+            self.assertIsNone(client.metrics_exporter)
+
+    def testClientsShareFixedPort(self):
+        port = free_port()
+        config_json = '{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }, "metrics" : { "port" : %d }}'
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            first = Factory(config_json=config_json % port).build()
+            second = Factory(config_json=config_json % port).build()
+            for client in [first, second]:
+                client.request_util.base_url = server.base_url
+                client.query_service.query("Where is Santa?", 1)
+            self.assertEqual(first.metrics_exporter.url, second.metrics_exporter.url)
+            text = requests.get(first.metrics_exporter.url).text
+            self.assertIn('vectara_client_requests_total{operation="query",status="200"} 2', text)
+
+            # A closed client's counts are still served, so the counters don't go down.
+            first.close()
+            second.query_service.query("Where is Santa?", 1)
+            text = requests.get(second.metrics_exporter.url).text
+            self.assertIn('vectara_client_requests_total{operation="query",status="200"} 3', text)
+            second.close()
+
+        with self.assertRaises(requests.ConnectionError):
+            requests.get(f"http://127.0.0.1:{port}/metrics")
+        # Closed with the last client, so the port may be used again.
+        with Factory(config_json=config_json % port).build() as client:
+            self.assertEqual(200, requests.get(client.metrics_exporter.url).status_code)
+
+    def testFixedPortInUse(self):
+        with StubServer() as server:
+            port = server._server.server_address[1]
+            config_json = '{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }, "metrics" : { "port" : %d }}'
+            with self.assertRaises(OSError) as cm:
+                Factory(config_json=config_json % port).build()
+            self.assertIn("metrics.port", str(cm.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,343 @@
+import unittest
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import requests
+from vectara_client.authn import OAuthUtil
+from vectara_client.config import TokenConfig
+from vectara_client.core import Factory
+from vectara_client.oauth import TokenCache, TokenManager
+from test.fixtures import FakeOAuthSession
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('OAuthUtil').setLevel(logging.WARNING)
+logging.getLogger('TokenManager').setLevel(logging.ERROR)
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeTokenEndpoint:
+    """
+    Issues tokens lasting expires_in seconds of clock, optionally blocking until released or failing.
+    """
+
+    def __init__(self, clock: FakeClock, expires_in: int = 100):
+        self.clock = clock
+        self.expires_in = expires_in
+        self.fetches = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> dict:
+        self.release.wait(5)
+        with self._lock:
+            self.fetches += 1
+            fetches = self.fetches
+        if self.error:
+            raise self.error
+        return {"access_token": f"token-{fetches}", "expires_in": self.expires_in,
+                "expires_at": self.clock.now + self.expires_in}
+
+
+def wait_for(condition, timeout: float = 5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.001)
+    return condition()
+
+
+class TokenManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.endpoint = FakeTokenEndpoint(self.clock)
+
+    def testCachesToken(self):
+        tokens = TokenManager(self.endpoint, clock=self.clock)
+        first = tokens.get()
+        self.clock.now += 50
+        self.assertIs(first, tokens.get())
+        self.assertEqual("token-1", first.access_token)
+        self.assertEqual(1100, first.expires_at)
+        self.assertEqual(1080, first.refresh_at)
+        self.assertEqual(1, self.endpoint.fetches)
+
+    def testConcurrentCallersShareOneFetch(self):
+        tokens = TokenManager(self.endpoint, clock=self.clock)
+        self.endpoint.release.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(tokens.get())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        # Wait until every thread is in refresh, then let the single fetch finish.
+        wait_for(lambda: tokens._in_flight is not None)
+        time.sleep(0.05)
+        self.endpoint.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, self.endpoint.fetches)
+        self.assertEqual(10, len(results))
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def testBackgroundRefresh(self):
+        tokens = TokenManager(self.endpoint, clock=self.clock)
+        first = tokens.get()
+        self.endpoint.release.clear()
+        self.clock.now += 85
+        # Past refresh_at, the current token is returned straight away while one refresh runs in the background.
+        for _ in range(10):
+            self.assertIs(first, tokens.get())
+        self.endpoint.release.set()
+        self.assertTrue(wait_for(lambda: tokens.token is not first))
+        self.assertEqual("token-2", tokens.get().access_token)
+        self.assertEqual(2, self.endpoint.fetches)
+
+    def testNoBackgroundRefresh(self):
+        tokens = TokenManager(self.endpoint, TokenConfig(background_refresh=False), clock=self.clock)
+        tokens.get()
+        self.clock.now += 90
+        self.assertEqual("token-1", tokens.get().access_token)
+        time.sleep(0.01)
+        self.assertEqual(1, self.endpoint.fetches)
+        # Within expiry_margin callers wait for a new token.
+        self.clock.now += 6
+        self.assertEqual("token-2", tokens.get().access_token)
+
+    def testSharedFailure(self):
+        tokens = TokenManager(self.endpoint, clock=self.clock)
+        self.endpoint.error = ValueError("unavailable")
+        self.endpoint.release.clear()
+        errors = []
+
+        def get():
+            try:
+                tokens.get()
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=get) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: tokens._in_flight is not None)
+        time.sleep(0.05)
+        self.endpoint.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(5, len(errors))
+        self.assertEqual(1, self.endpoint.fetches)
+
+        # The next caller tries again.
+        self.endpoint.error = None
+        self.assertEqual("token-2", tokens.get().access_token)
+
+    def testBackgroundFailureKeepsToken(self):
+        tokens = TokenManager(self.endpoint, clock=self.clock)
+        first = tokens.get()
+        self.endpoint.error = ValueError("unavailable")
+        self.clock.now += 84
+        self.assertEqual("token-1", tokens.get().access_token)
+        self.assertTrue(wait_for(lambda: tokens.token is not first and not tokens._background))
+        # Still token-1, with the next refresh halfway to its expiry.
+        self.assertEqual("token-1", tokens.token.access_token)
+        self.assertEqual(1092, tokens.token.refresh_at)
+        self.assertEqual("token-1", tokens.get().access_token)
+        self.assertEqual(2, self.endpoint.fetches)
+
+    def testExpiresInOnly(self):
+        tokens = TokenManager(lambda: {"access_token": "a", "expires_in": 60}, clock=self.clock)
+        self.assertEqual(1060, tokens.get().expires_at)
+
+    def testInvalid(self):
+        with self.assertRaises(TypeError):
+            TokenManager(self.endpoint, TokenConfig(refresh_fraction=0))
+        with self.assertRaises(TypeError):
+            TokenManager(self.endpoint, TokenConfig(refresh_fraction=1.5))
+
+
+class OAuthUtilTest(unittest.TestCase):
+
+    def testCachedHeaders(self):
+        session = FakeOAuthSession()
+        auth_util = OAuthUtil("http://localhost/oauth2/token", "client", "secret", "12344", session=session)
+        headers = auth_util.get_headers()
+        self.assertEqual({"Customer-Id": "12344", "Authorization": "Bearer token-1"}, headers)
+        self.assertIs(headers, auth_util.get_headers())
+        self.assertEqual("token-1", auth_util.access_token)
+
+        auth_util.authenticate()
+        self.assertEqual("Bearer token-2", auth_util.get_headers()["Authorization"])
+        self.assertEqual(2, session.fetches)
+        auth_util.close()
+        # Not ours to close.
+        self.assertFalse(session.closed)
+
+    def testConcurrentRequestsAtExpiry(self):
+        # As the worker threads of CorpusManager.batch_index would.
+        session = FakeOAuthSession(delay=0.05)
+        auth_util = OAuthUtil("http://localhost/oauth2/token", "client", "secret", "12344", session=session)
+        barrier = threading.Barrier(10)
+        headers = []
+
+        def request():
+            barrier.wait()
+            headers.append(auth_util.get_headers())
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, session.fetches)
+        self.assertEqual({"Bearer token-1"}, {header["Authorization"] for header in headers})
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "auth_url" : "http://localhost/oauth2/token", "app_client_id" : "client",
+                       "app_client_secret" : "secret" },
+            "token" : { "refresh_fraction" : 0.5 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual(0.5, client.request_util.auth_util.tokens.config.refresh_fraction)
+        with Factory(config_json=config_json, token_config=TokenConfig(expiry_margin=30)).build() as client:
+            self.assertEqual(30, client.request_util.auth_util.tokens.config.expiry_margin)
+
+
+
+def oauth_util(cache_dir: str, secret: str = "secret", delay: float = 0.0) -> OAuthUtil:
+    return OAuthUtil("http://localhost/oauth2/token", "client", secret, "12344",
+                     token_config=TokenConfig(cache=True, cache_dir=cache_dir), session=FakeOAuthSession(delay=delay))
+
+
+def process_headers(cache_dir: str, start: float, results):
+    """
+    Runs in a separate process, starting at the same moment as the others.
+    """
+    auth_util = oauth_util(cache_dir, delay=0.2)
+    time.sleep(max(0.0, start - time.time()))
+    headers = auth_util.get_headers()
+    results.put((auth_util.session.fetches, headers["Authorization"]))
+
+
+class TokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, "tokens")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testSharedBetweenClients(self):
+        first = oauth_util(self.cache_dir)
+        self.assertEqual("Bearer token-1", first.get_headers()["Authorization"])
+        second = oauth_util(self.cache_dir)
+        self.assertEqual("Bearer token-1", second.get_headers()["Authorization"])
+        self.assertEqual(0, second.session.fetches)
+        self.assertEqual(first.tokens.token.expires_at, second.tokens.token.expires_at)
+        # The cached token is as far through its lifetime as the first one.
+        self.assertEqual(first.tokens.token.refresh_at, second.tokens.token.refresh_at)
+
+    def testEncrypted(self):
+        oauth_util(self.cache_dir).get_headers()
+        cache = oauth_util(self.cache_dir).token_cache
+        with open(cache.path, "rb") as f:
+            contents = f.read()
+        self.assertNotIn(b"token-1", contents)
+        if os.name == "posix":
+            self.assertEqual(0, os.stat(cache.path).st_mode & 0o077)
+            self.assertEqual(0, os.stat(self.cache_dir).st_mode & 0o077)
+
+        # A different secret can't read it, so fetches its own.
+        other = oauth_util(self.cache_dir, secret="other")
+        other.get_headers()
+        self.assertEqual(1, other.session.fetches)
+
+    def testKeyedByCredentials(self):
+        cache = TokenCache("12344", "client", "http://localhost/oauth2/token", "secret",
+                           TokenConfig(cache=True, cache_dir=self.cache_dir))
+        for other in [TokenCache("12345", "client", "http://localhost/oauth2/token", "secret",
+                                 TokenConfig(cache=True, cache_dir=self.cache_dir)),
+                      TokenCache("12344", "other", "http://localhost/oauth2/token", "secret",
+                                 TokenConfig(cache=True, cache_dir=self.cache_dir)),
+                      TokenCache("12344", "client", "http://elsewhere/oauth2/token", "secret",
+                                 TokenConfig(cache=True, cache_dir=self.cache_dir))]:
+            self.assertNotEqual(cache.path, other.path)
+
+    def testRefreshesDueTokens(self):
+        clock = FakeClock(1000.0)
+        config = TokenConfig(cache=True, cache_dir=self.cache_dir)
+        cache = TokenCache("12344", "client", "http://localhost/oauth2/token", "secret", config, clock)
+        endpoint = FakeTokenEndpoint(clock)
+        self.assertEqual("token-1", cache.get_or_fetch(endpoint)["access_token"])
+        clock.now += 70
+        self.assertEqual("token-1", cache.get_or_fetch(endpoint)["access_token"])
+        # Past refresh_fraction of its lifetime, as the TokenManager would refresh it.
+        clock.now += 15
+        self.assertEqual("token-2", cache.get_or_fetch(endpoint)["access_token"])
+        self.assertEqual("token-3", cache.get_or_fetch(endpoint, stale="token-2")["access_token"])
+        self.assertEqual(1085, cache.get_or_fetch(endpoint)["issued_at"])
+
+    def testAuthenticateReplacesCachedToken(self):
+        auth_util = oauth_util(self.cache_dir)
+        auth_util.get_headers()
+        auth_util.authenticate()
+        self.assertEqual("Bearer token-2", auth_util.get_headers()["Authorization"])
+        self.assertEqual("Bearer token-2", oauth_util(self.cache_dir).get_headers()["Authorization"])
+
+    def testUnavailable(self):
+        # A file where the directory should be.
+        blocked = os.path.join(self.directory.name, "blocked")
+        open(blocked, "w").close()
+        auth_util = oauth_util(blocked)
+        logging.getLogger('vectara_client.oauth').setLevel(logging.ERROR)
+        try:
+            self.assertEqual("Bearer token-1", auth_util.get_headers()["Authorization"])
+        finally:
+            logging.getLogger('vectara_client.oauth').setLevel(logging.NOTSET)
+
+    def testFetchFailure(self):
+        clock = FakeClock(1000.0)
+        cache = TokenCache("12344", "client", "http://localhost/oauth2/token", "secret",
+                           TokenConfig(cache=True, cache_dir=self.cache_dir), clock)
+        endpoint = FakeTokenEndpoint(clock)
+        endpoint.error = requests.ConnectionError("unreachable")
+        # A RequestException is an OSError, but not one of the cache's.
+        with self.assertNoLogs('vectara_client.oauth', level=logging.WARNING):
+            with self.assertRaises(requests.ConnectionError):
+                cache.get_or_fetch(endpoint)
+        self.assertEqual(1, endpoint.fetches)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "Needs fork to start the processes quickly")
+    def testSharedBetweenProcesses(self):
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        start = time.time() + 0.5
+        processes = [context.Process(target=process_headers, args=(self.cache_dir, start, results))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        outcomes = [results.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join()
+        # One process fetched, the others waited for its token.
+        self.assertEqual(1, sum(fetches for fetches, _ in outcomes))
+        self.assertEqual({"Bearer token-1"}, {header for _, header in outcomes})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import unittest
+import asyncio
+import logging
+import threading
+import os
+import tempfile
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import RateLimitConfig, RateLimitRule
+from vectara_client.core import Factory
+from vectara_client.deadline import Deadline
+from vectara_client.error import DeadlineExceededError, RateLimitExceededError
+from vectara_client.ratelimit import RateLimiter, SqliteBucketStore
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import LIST_CORPORA_RESPONSE, INDEX_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _limiter(self, config: RateLimitConfig, store=None) -> RateLimiter:
+        return RateLimiter(config, store=store, sleep=self.clock.sleep, clock=self.clock)
+
+    def testBurstThenRate(self):
+        config = RateLimitConfig(operations={"query": RateLimitRule(rate=2.0, burst=3)})
+        limiter = self._limiter(config)
+
+        for _ in range(5):
+            limiter.acquire("query")
+
+        # Three from the burst, then one every half second.
+        self.assertEqual([0.5, 0.5], self.clock.sleeps)
+
+    def testUnconfiguredOperationNotLimited(self):
+        limiter = self._limiter(RateLimitConfig(operations={"query": RateLimitRule(rate=1.0)}))
+        for _ in range(10):
+            self.assertEqual(0.0, limiter.reserve("index"))
+
+    def testConcurrentReservationsQueue(self):
+        limiter = self._limiter(RateLimitConfig(operations={"query": RateLimitRule(rate=1.0)}))
+
+        # Without sleeping (as asyncio tasks would) each caller is told to wait behind the previous one.
+        waits = [limiter.reserve("query") for _ in range(4)]
+        self.assertEqual([0.0, 1.0, 2.0, 3.0], waits)
+
+    def testPerCorpusBuckets(self):
+        limiter = self._limiter(RateLimitConfig(operations={"index": RateLimitRule(rate=1.0, per_corpus=True)}))
+
+        self.assertEqual(0.0, limiter.reserve("index", {"customerId": 1, "corpusId": 10}))
+        self.assertEqual(0.0, limiter.reserve("index", {"customerId": 1, "corpusId": 11}))
+        self.assertEqual(0.0, limiter.reserve("upload", {"c": 1, "o": 10}))
+        self.assertEqual(1.0, limiter.reserve("index", {"customerId": 1, "corpusId": 10}))
+
+        query = {"query": [{"query": "hello", "corpusKey": [{"corpusId": 12}]}]}
+        limiter = self._limiter(RateLimitConfig(operations={"query": RateLimitRule(rate=1.0, per_corpus=True)}))
+        self.assertEqual(0.0, limiter.reserve("query", query))
+        self.assertEqual(1.0, limiter.reserve("query", query))
+
+    def testMaxWaitRaises(self):
+        config = RateLimitConfig(operations={"query": RateLimitRule(rate=1.0)}, max_wait=1.5)
+        limiter = self._limiter(config)
+
+        limiter.reserve("query")
+        limiter.reserve("query")
+        with self.assertRaises(RateLimitExceededError) as cm:
+            limiter.reserve("query")
+        self.assertEqual("query", cm.exception.key)
+
+        # A rejected caller takes nothing, so once time passes we can proceed.
+        self.clock.now += 2.0
+        self.assertEqual(0.0, limiter.reserve("query"))
+
+    def testWaitCappedByDeadline(self):
+        limiter = self._limiter(RateLimitConfig(operations={"query": RateLimitRule(rate=1.0)}, max_wait=30.0))
+        deadline = Deadline.after(1.5, clock=self.clock)
+
+        limiter.acquire("query", deadline=deadline)
+        limiter.acquire("query", deadline=deadline)
+        self.assertEqual([1.0], self.clock.sleeps)
+
+        # The next token is a second away but the deadline only half a second.
+        with self.assertRaises(DeadlineExceededError) as cm:
+            limiter.acquire("query", deadline=deadline)
+        self.assertEqual("query", cm.exception.operation)
+        self.assertEqual([1.0], self.clock.sleeps)
+
+        # Nothing was taken, so a caller without a deadline waits just the one second.
+        self.assertEqual(1.0, limiter.reserve("query"))
+
+    def testInvalidConfig(self):
+        with self.assertRaises(TypeError):
+            RateLimiter(RateLimitConfig(operations={"query": RateLimitRule(rate=0)}))
+        with self.assertRaises(TypeError):
+            RateLimiter(RateLimitConfig(backend="redis"))
+
+    def testSqliteSharedBetweenStores(self):
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        try:
+            config = RateLimitConfig(operations={"query": RateLimitRule(rate=1.0, burst=2)}, backend="sqlite",
+                                     path=path)
+            # Two limiters with their own connections stand in for two worker processes.
+            first = self._limiter(config, SqliteBucketStore(path))
+            second = self._limiter(config, SqliteBucketStore(path))
+
+            self.assertEqual(0.0, first.reserve("query"))
+            self.assertEqual(0.0, second.reserve("query"))
+            self.assertEqual(1.0, first.reserve("query"))
+            self.assertEqual(2.0, second.reserve("query"))
+        finally:
+            os.remove(path)
+
+    def testAsyncSqliteReservedOffEventLoop(self):
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        try:
+            config = RateLimitConfig(operations={"query": RateLimitRule(rate=1.0)}, backend="sqlite", path=path)
+            store = SqliteBucketStore(path)
+            threads = []
+            reserve = store.reserve
+
+            def recording_reserve(*args):
+                threads.append(threading.current_thread())
+                return reserve(*args)
+            store.reserve = recording_reserve
+
+            async_sleeps = []
+
+            async def async_sleep(delay: float):
+                async_sleeps.append(delay)
+            limiter = RateLimiter(config, store=store, clock=self.clock, async_sleep=async_sleep)
+
+            async def acquire_twice():
+                await limiter.acquire_async("query")
+                await limiter.acquire_async("query")
+                return threading.current_thread()
+            loop_thread = asyncio.run(acquire_twice())
+
+            self.assertEqual(2, len(threads))
+            self.assertNotIn(loop_thread, threads)
+            self.assertEqual([1.0], async_sleeps)
+        finally:
+            os.remove(path)
+
+    def testRequestUtilIsLimited(self):
+        config = RateLimitConfig(operations={"list-corpora": RateLimitRule(rate=4.0, burst=1)})
+        limiter = self._limiter(config)
+
+        with StubServer(routes={"list-corpora": LIST_CORPORA_RESPONSE, "index": INDEX_RESPONSE}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       rate_limiter=limiter)
+            for _ in range(3):
+                request_util.request("list-corpora", {})
+            request_util.request("index", {})
+            request_util.close()
+
+        self.assertEqual(4, server.request_count)
+        self.assertEqual([0.25, 0.25], self.clock.sleeps)
+
+    def testRateLimitFromProfile(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "rate_limit" : {
+                "operations" : { "query" : { "rate" : 5, "burst" : 10, "per_corpus" : true } },
+                "max_wait" : 30
+            }
+        }"""
+        client = Factory(config_json=config_json).build()
+        rate_limiter = client.request_util.rate_limiter
+        self.assertEqual(10, rate_limiter.config.operations["query"].burst)
+        self.assertTrue(rate_limiter.config.operations["query"].per_corpus)
+        client.close()
+
+        client = Factory(config_json='{ "customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" } }').build()
+        self.assertIsNone(client.request_util.rate_limiter)
+        client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import logging
+import os
+import tempfile
+from vectara_client.config import PathConfigLoader
+from vectara_client.core import Factory
+from vectara_client.registry import CLIENT_REGISTRY
+from test.bench import time_calls, summarize, percentile
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('Factory').setLevel(logging.WARNING)
+logging.getLogger('PathConfigLoader').setLevel(logging.WARNING)
+
+ITERATIONS = 200
+CONFIG = """
+default:
+  customer_id: "12344"
+  auth:
+    api_key: "BLAH_KEY"
+  retry:
+    default:
+      max_attempts: 3
+  compression:
+    request_encoding: gzip
+  hedge:
+    percentile: 95
+  token:
+    refresh_fraction: 0.8
+"""
+
+
+class ClientRegistryBenchmark(unittest.TestCase):
+    """
+    What a web tier pays for a client on every request: building one from a configuration file as before, with
+    the parsed configuration cached, and the shared client from the registry.
+    """
+
+    def testBuildPerRequest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, ".vec_auth.yaml")
+            with open(config_path, "w") as f:
+                f.write(CONFIG)
+            factory = Factory(config_path=config_path)
+
+            def build_uncached():
+                # As build() did before the ConfigCache, reading and parsing the file every time.
+                factory._build(PathConfigLoader(config_path).load()).close()
+
+            uncached = time_calls(build_uncached, ITERATIONS)
+            cached = time_calls(lambda: factory.build().close(), ITERATIONS)
+            shared = time_calls(lambda: factory.build_shared().close(), ITERATIONS)
+            CLIENT_REGISTRY.invalidate_all()
+
+        print()
+        print(summarize("build, parsing the file", uncached))
+        print(summarize("build, cached config", cached))
+        print(summarize("build_shared", shared))
+
+        self.assertLess(percentile(cached, 50), percentile(uncached, 50))
+        self.assertLess(percentile(shared, 50), 0.05 * percentile(uncached, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,286 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+import threading
+import requests
+import vectara_client.config as config_module
+from vectara_client.config import ClientConfig, ConfigCache, JsonConfigLoader, PathConfigLoader, RetryConfig
+from vectara_client.core import Factory
+from vectara_client.interceptor import BaseInterceptor
+from vectara_client.registry import CLIENT_REGISTRY, ClientRegistry
+from test.stub_server import free_port
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('Factory').setLevel(logging.WARNING)
+logging.getLogger('PathConfigLoader').setLevel(logging.WARNING)
+logging.getLogger('JsonConfigLoader').setLevel(logging.WARNING)
+
+
+def write_config(config_path: str, customer_id: str, mtime_ns: int = None, extra: str = ""):
+    with open(config_path, "w") as f:
+        f.write(f'default:\n  customer_id: "{customer_id}"\n  auth:\n    api_key: "BLAH_KEY"\n{extra}')
+    if mtime_ns:
+        # Filesystem timestamps can be coarser than the time between writes in a test.
+        os.utime(config_path, ns=(mtime_ns, mtime_ns))
+
+
+class ParseCounter:
+    """
+    Counts the dacite parses of a whole ClientConfig, including those of the config loaders.
+    """
+
+    def __init__(self):
+        self.original = config_module.from_dict
+        self.count = 0
+
+    def __enter__(self):
+        def counting(data_class, *args, **kwargs):
+            if data_class is ClientConfig:
+                self.count += 1
+            return self.original(data_class, *args, **kwargs)
+
+        config_module.from_dict = counting
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        config_module.from_dict = self.original
+
+
+class FakeClient:
+
+    def __init__(self, client_config: ClientConfig):
+        self.client_config = client_config
+        self.shared = False
+        self.registry = None
+        self.closed = False
+
+    def close(self):
+        self.registry.release(self)
+
+    def _close(self):
+        self.closed = True
+
+
+class ConfigCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.directory.name, ".vec_auth.yaml")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testParsesOnce(self):
+        with ParseCounter() as parses:
+            JsonConfigLoader(config_json=json.dumps({"customer_id": "12344", "auth": {"api_key": "KEY"}})).load()
+        self.assertEqual(1, parses.count)
+
+    def testReloadsChangedFile(self):
+        cache = ConfigCache()
+        write_config(self.config_path, "1", mtime_ns=1_000_000_000)
+        with ParseCounter() as parses:
+            first = PathConfigLoader(self.config_path, cache=cache, share=True).load()
+            self.assertIs(first, PathConfigLoader(self.directory.name, cache=cache, share=True).load())
+            self.assertEqual(1, parses.count)
+
+            write_config(self.config_path, "2", mtime_ns=2_000_000_000)
+            second = PathConfigLoader(self.config_path, cache=cache, share=True).load()
+            self.assertEqual(2, parses.count)
+        self.assertEqual("2", second.customer_id)
+
+    def testReturnsCopies(self):
+        cache = ConfigCache()
+        config_json = json.dumps({"customer_id": "12344", "auth": {"api_key": "KEY"}, "retry": {}})
+        first = JsonConfigLoader(config_json, cache=cache).load()
+        first.retry.default.max_attempts = 10
+        second = JsonConfigLoader(config_json, cache=cache).load()
+        self.assertIsNot(first, second)
+        self.assertEqual(3, second.retry.default.max_attempts)
+        self.assertEqual(3, JsonConfigLoader(config_json, cache=cache, share=True).load().retry.default.max_attempts)
+
+    def testKeyedByProfile(self):
+        cache = ConfigCache()
+        with open(self.config_path, "w") as f:
+            f.write('default:\n  customer_id: "1"\n  auth:\n    api_key: "KEY"\n'
+                    'admin:\n  customer_id: "2"\n  auth:\n    api_key: "KEY"\n')
+        self.assertEqual("1", PathConfigLoader(self.config_path, cache=cache).load().customer_id)
+        self.assertEqual("2", PathConfigLoader(self.config_path, profile="admin", cache=cache).load().customer_id)
+
+    def testEvictsLeastRecentlyUsed(self):
+        cache = ConfigCache(max_entries=1)
+        configs = [json.dumps({"customer_id": str(i), "auth": {"api_key": "KEY"}}) for i in range(2)]
+        first = JsonConfigLoader(configs[0], cache=cache, share=True).load()
+        JsonConfigLoader(configs[1], cache=cache, share=True).load()
+        self.assertIsNot(first, JsonConfigLoader(configs[0], cache=cache, share=True).load())
+
+
+class ClientRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.directory.name, ".vec_auth.yaml")
+
+    def tearDown(self):
+        CLIENT_REGISTRY.invalidate_all()
+        self.directory.cleanup()
+
+    def testSharesClient(self):
+        write_config(self.config_path, "12344")
+        client = Factory(config_path=self.config_path).build_shared()
+        self.assertIs(client, Factory(config_path=self.directory.name).build_shared())
+        with Factory(config_path=self.config_path).build() as built:
+            self.assertIsNot(client, built)
+
+    def testConcurrentCallersShareOneClient(self):
+        config_json = json.dumps({"customer_id": "12344", "auth": {"api_key": "KEY"}})
+        clients = []
+        start = threading.Barrier(8)
+
+        def build():
+            start.wait()
+            clients.append(Factory(config_json=config_json).build_shared())
+
+        threads = [threading.Thread(target=build) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len({id(client) for client in clients}))
+
+    def testCloseLeavesSharedClientOpen(self):
+        write_config(self.config_path, "12344")
+        with Factory(config_path=self.config_path).build_shared() as client:
+            pass
+        self.assertTrue(client.shared)
+        self.assertIs(client, Factory(config_path=self.config_path).build_shared())
+
+    def testReplacesClientWhenConfigChanges(self):
+        write_config(self.config_path, "1", mtime_ns=1_000_000_000)
+        first = Factory(config_path=self.config_path).build_shared()
+        write_config(self.config_path, "2", mtime_ns=2_000_000_000)
+        second = Factory(config_path=self.config_path).build_shared()
+
+        self.assertIsNot(first, second)
+        self.assertEqual("2", second.customer_id)
+        self.assertFalse(first.shared)
+
+    def testReplacesClientServingMetricsPort(self):
+        metrics = f"  metrics:\n    port: {free_port()}\n"
+        write_config(self.config_path, "1", mtime_ns=1_000_000_000, extra=metrics)
+        first = Factory(config_path=self.config_path).build_shared()
+        write_config(self.config_path, "2", mtime_ns=2_000_000_000, extra=metrics)
+
+        # Built while the client it replaces, leased, still serves the port.
+        second = Factory(config_path=self.config_path).build_shared()
+        self.assertEqual("2", second.customer_id)
+        self.assertIs(second, Factory(config_path=self.config_path).build_shared())
+        first.close()
+        self.assertEqual(200, requests.get(second.metrics_exporter.url).status_code)
+
+    def testReplacedJsonConfigurationNotLogged(self):
+        registry = ClientRegistry(ConfigCache())
+        current = [ClientConfig("1", None)]
+        get = lambda: registry.get(("json", '{"auth": {"api_key": "SECRET_KEY"}}', None), (), lambda: current[0],
+                                   FakeClient)
+        get()
+        current[0] = ClientConfig("2", None)
+        with self.assertLogs("ClientRegistry", logging.INFO) as logs:
+            get()
+        self.assertIn("sha256:", logs.output[0])
+        self.assertNotIn("SECRET_KEY", logs.output[0])
+
+    def testInvalidate(self):
+        write_config(self.config_path, "12344")
+        client = Factory(config_path=self.config_path).build_shared()
+
+        self.assertTrue(CLIENT_REGISTRY.invalidate(config_path=self.directory.name))
+        self.assertFalse(client.shared)
+        self.assertFalse(CLIENT_REGISTRY.invalidate(config_path=self.config_path))
+        with ParseCounter() as parses:
+            self.assertIsNot(client, Factory(config_path=self.config_path).build_shared())
+        self.assertEqual(1, parses.count)
+
+    def testInvalidateAll(self):
+        registry = ClientRegistry(ConfigCache())
+        configs = [json.dumps({"customer_id": str(i), "auth": {"api_key": "KEY"}}) for i in range(3)]
+        for config_json in configs:
+            factory = Factory(config_json=config_json)
+            registry.get(("json", config_json, None), (), lambda: factory._load_config(share=True), factory._build)
+        self.assertEqual(3, len(registry))
+        self.assertEqual(3, registry.invalidate_all())
+        self.assertEqual(0, len(registry))
+
+    def testKeyedByOverrides(self):
+        write_config(self.config_path, "12344")
+        client = Factory(config_path=self.config_path).build_shared()
+        retrying = Factory(config_path=self.config_path, retry_config=RetryConfig(budget_ratio=0.5)).build_shared()
+        self.assertIsNot(client, retrying)
+        self.assertEqual(0.5, retrying.request_util.retry_handler.config.budget_ratio)
+        self.assertIs(retrying, Factory(config_path=self.config_path,
+                                        retry_config=RetryConfig(budget_ratio=0.5)).build_shared())
+        interceptors = [BaseInterceptor()]
+        intercepted = Factory(config_path=self.config_path, interceptors=interceptors).build_shared()
+        self.assertIsNot(client, intercepted)
+        self.assertIs(intercepted, Factory(config_path=self.config_path, interceptors=interceptors).build_shared())
+
+        # Invalidating the source retires both.
+        self.assertTrue(CLIENT_REGISTRY.invalidate(config_path=self.config_path))
+        self.assertFalse(client.shared)
+        self.assertFalse(retrying.shared)
+        self.assertFalse(intercepted.shared)
+
+    def testRetiredClientClosedOnLastRelease(self):
+        registry = ClientRegistry(ConfigCache())
+        configs = [ClientConfig("1", None), ClientConfig("2", None)]
+        current = [configs[0]]
+        get = lambda: registry.get(("json", "config", None), (), lambda: current[0], FakeClient)
+
+        first = get()
+        self.assertIs(first, get())
+        first.close()
+        current[0] = configs[1]
+        second = get()
+
+        # Replaced while one lease is outstanding.
+        self.assertIsNot(first, second)
+        self.assertEqual("2", second.client_config.customer_id)
+        self.assertFalse(first.closed)
+        first.close()
+        self.assertTrue(first.closed)
+
+        # Not leased, so closed as soon as it is invalidated.
+        second.close()
+        registry.invalidate(config_json="config")
+        self.assertTrue(second.closed)
+
+    def testBuildsDoNotBlockOtherConfigurations(self):
+        registry = ClientRegistry(ConfigCache())
+        building = threading.Event()
+        release = threading.Event()
+        client_config = ClientConfig("1", None)
+
+        def slow_build(config):
+            building.set()
+            release.wait(5)
+            return FakeClient(config)
+
+        slow = threading.Thread(target=registry.get,
+                                args=(("json", "slow", None), (), lambda: client_config, slow_build))
+        slow.start()
+        try:
+            self.assertTrue(building.wait(5))
+            # Built while the other configuration's build is still in progress.
+            registry.get(("json", "fast", None), (), lambda: client_config, FakeClient)
+            self.assertEqual(1, len(registry))
+        finally:
+            release.set()
+            slow.join()
+        self.assertEqual(2, len(registry))
+
+
+if __name__ == '__main__':
+    unittest.main()
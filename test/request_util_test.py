@@ -0,0 +1,68 @@
+import unittest
+import logging
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import TransportConfig
+from vectara_client.core import Factory
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import LIST_CORPORA_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+
+class RequestUtilPoolingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(routes={"list-corpora": LIST_CORPORA_RESPONSE}).start()
+        self.auth_util = ApiKeyUtil("12344", "BLAH_KEY")
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testKeepAliveReusesConnection(self):
+        request_util = RequestUtil(self.auth_util, base_url=self.server.base_url)
+        for _ in range(20):
+            request_util.request("list-corpora", {})
+        request_util.close()
+
+        self.assertEqual(20, self.server.request_count)
+        self.assertEqual(1, self.server.connection_count)
+
+    def testNoKeepAliveOpensConnectionPerCall(self):
+        request_util = RequestUtil(self.auth_util, transport_config=TransportConfig(keep_alive=False),
+                                   base_url=self.server.base_url)
+        for _ in range(5):
+            request_util.request("list-corpora", {})
+        request_util.close()
+
+        self.assertEqual(5, self.server.connection_count)
+
+    def testSharedSessionNotClosed(self):
+        from vectara_client.transport import create_session
+        session = create_session()
+        request_util = RequestUtil(self.auth_util, session=session, base_url=self.server.base_url)
+        request_util.close()
+
+        # Session is still usable as the owner is responsible for it.
+        request_util.request("list-corpora", {})
+        session.close()
+
+    def testFactoryWiresTransportAndClientCloses(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "transport" : { "pool_maxsize" : 32 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            adapter = client.request_util.session.get_adapter("https://api.vectara.io")
+            self.assertEqual(32, adapter._pool_maxsize)
+            # All services share the one RequestUtil, and hence one pool.
+            self.assertIs(client.request_util, client.query_service.request_util)
+            self.assertIs(client.request_util, client.indexer_service.request_util)
+            self.assertIs(client.request_util, client.document_service.request_util)
+            self.assertIs(client.request_util, client.admin_service.request_util)
+
+
+if __name__ == '__main__':
+    unittest.main()
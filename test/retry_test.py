@@ -0,0 +1,228 @@
+import unittest
+import asyncio
+import logging
+import importlib.util
+import requests
+import socket
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import RetryConfig, RetryPolicyConfig, TimeoutConfig
+from vectara_client.core import Factory
+from vectara_client.deadline import Timeouts
+from vectara_client.domain import IndexDocumentResponse
+from vectara_client.retry import RetryHandler, RetryBudget, parse_retry_after
+from vectara_client.status import StatusCode
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import INDEX_RESPONSE, LIST_CORPORA_RESPONSE
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.CRITICAL)
+
+HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+
+def failing_route(failures: int, status: int = 503, body=None, headers=None, response=LIST_CORPORA_RESPONSE):
+    """
+    Fails the first number of calls with the given status then succeeds.
+    """
+    calls = {"count": 0}
+
+    def route(request):
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            return status, body if body else {"message": "try again"}, headers if headers else {}
+        return response
+
+    return route
+
+
+class RetryHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.auth_util = ApiKeyUtil("12344", "BLAH_KEY")
+        self.sleeps = []
+
+    def _request_util(self, server: StubServer, config: RetryConfig = None, timeouts: Timeouts = None) -> RequestUtil:
+        # No jitter randomness and no real sleeping, we just record the delays.
+        retry_handler = RetryHandler(config, sleep=self.sleeps.append, rand=lambda: 1.0)
+        return RequestUtil(self.auth_util, base_url=server.base_url, retry_handler=retry_handler, timeouts=timeouts)
+
+    def testRetriesServiceUnavailableWithBackoff(self):
+        with StubServer(routes={"list-corpora": failing_route(2)}) as server:
+            request_util = self._request_util(server)
+            request_util.request("list-corpora", {})
+
+        self.assertEqual(3, server.request_count)
+        self.assertEqual([0.5, 1.0], self.sleeps)
+
+    def testHonorsRetryAfter(self):
+        route = failing_route(1, status=429, headers={"Retry-After": "3"})
+        with StubServer(routes={"list-corpora": route}) as server:
+            self._request_util(server).request("list-corpora", {})
+
+        self.assertEqual([3.0], self.sleeps)
+
+    def testGivesUpOnLongRetryAfter(self):
+        route = failing_route(1, status=429, headers={"Retry-After": "3600"})
+        with StubServer(routes={"list-corpora": route}) as server:
+            with self.assertRaises(requests.HTTPError):
+                self._request_util(server).request("list-corpora", {})
+
+        self.assertEqual(1, server.request_count)
+
+    def testFatalNotRetried(self):
+        with StubServer(routes={"list-corpora": failing_route(1, status=400)}) as server:
+            with self.assertRaises(requests.HTTPError) as cm:
+                self._request_util(server).request("list-corpora", {})
+
+        self.assertEqual(400, cm.exception.response.status_code)
+        self.assertEqual(1, server.request_count)
+
+    def testExhaustsAttempts(self):
+        with StubServer(routes={"list-corpora": failing_route(10)}) as server:
+            with self.assertRaises(requests.HTTPError):
+                self._request_util(server).request("list-corpora", {})
+
+        self.assertEqual(3, server.request_count)
+
+    def testRetriesVectaraStatusInBody(self):
+        unavailable = {"status": {"code": "UNAVAILABLE", "statusDetail": "Busy", "cause": None},
+                       "quotaConsumed": None}
+        route = failing_route(1, status=200, body=unavailable, response=INDEX_RESPONSE)
+        with StubServer(routes={"index": route}) as server:
+            result = self._request_util(server).request("index", {}, IndexDocumentResponse)
+
+        self.assertEqual(2, server.request_count)
+        self.assertEqual(StatusCode.OK, result.status.code)
+
+    def testPerOperationOverride(self):
+        config = RetryConfig(operations={"query": RetryPolicyConfig(max_attempts=1)})
+        with StubServer(routes={"query": failing_route(1), "list-corpora": failing_route(1)}) as server:
+            request_util = self._request_util(server, config)
+            with self.assertRaises(requests.HTTPError):
+                request_util.request("query", {})
+            request_util.request("list-corpora", {})
+
+        self.assertEqual(3, server.request_count)
+
+    def testMutatingNotRetriedAfterReadTimeout(self):
+        timeouts = Timeouts(TimeoutConfig(default=0.1, operations={}))
+        routes = {"create-corpus": LIST_CORPORA_RESPONSE, "list-corpora": LIST_CORPORA_RESPONSE}
+        with StubServer(routes=routes, delay=0.5) as server:
+            request_util = self._request_util(server, timeouts=timeouts)
+            with self.assertRaises(requests.Timeout):
+                request_util.request("create-corpus", {})
+            self.assertEqual(1, server.request_count)
+
+            # Reads are retried as before.
+            with self.assertRaises(requests.Timeout):
+                request_util.request("list-corpora", {})
+            self.assertEqual(4, server.request_count)
+            request_util.close()
+
+    def testMutatingRetriedOnlyWhenNotActedUpon(self):
+        routes = {"create-corpus": failing_route(1, status=502), "create-api-key": failing_route(1, status=429),
+                  "index": failing_route(1, status=503, response=INDEX_RESPONSE)}
+        with StubServer(routes=routes) as server:
+            request_util = self._request_util(server)
+            with self.assertRaises(requests.HTTPError):
+                request_util.request("create-corpus", {})
+            request_util.request("create-api-key", {})
+            request_util.request("index", {}, IndexDocumentResponse)
+
+        self.assertEqual(["create-corpus", "create-api-key", "create-api-key", "index", "index"],
+                         [request.operation for request in server.requests])
+
+    def testMutatingRetriedAfterConnectError(self):
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+        request_util = RequestUtil(self.auth_util, base_url=f"http://127.0.0.1:{port}/v1",
+                                   retry_handler=RetryHandler(sleep=self.sleeps.append, rand=lambda: 1.0))
+        with self.assertRaises(requests.ConnectionError):
+            request_util.request("create-corpus", {})
+        request_util.close()
+        # Nothing was sent, so it was safe to try again.
+        self.assertEqual([0.5, 1.0], self.sleeps)
+
+    def testMutatingOptIn(self):
+        timeouts = Timeouts(TimeoutConfig(default=0.1, operations={}))
+        config = RetryConfig(operations={"create-corpus": RetryPolicyConfig(max_attempts=2)})
+        with StubServer(routes={"create-corpus": failing_route(1, status=502)}) as server:
+            self._request_util(server, config).request("create-corpus", {})
+        self.assertEqual(2, server.request_count)
+
+        with StubServer(routes={"create-corpus": LIST_CORPORA_RESPONSE}, delay=0.5) as server:
+            request_util = self._request_util(server, config, timeouts)
+            with self.assertRaises(requests.Timeout):
+                request_util.request("create-corpus", {})
+            self.assertEqual(2, server.request_count)
+            request_util.close()
+
+    def testRetryBudgetLimitsRetries(self):
+        config = RetryConfig(budget_initial=2, budget_ratio=0.0)
+        with StubServer(routes={"list-corpora": failing_route(100)}) as server:
+            request_util = self._request_util(server, config)
+            for _ in range(3):
+                with self.assertRaises(requests.HTTPError):
+                    request_util.request("list-corpora", {})
+
+        # 3 first attempts plus only the 2 retries the budget allowed.
+        self.assertEqual(5, server.request_count)
+
+    def testBudget(self):
+        budget = RetryBudget(ratio=0.5, initial=1, maximum=2)
+        self.assertTrue(budget.try_withdraw())
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.try_withdraw())
+
+    def testParseRetryAfter(self):
+        self.assertEqual(5.0, parse_retry_after("5"))
+        self.assertEqual(0.0, parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def testUnknownStatusCodeRejected(self):
+        with self.assertRaises(TypeError):
+            RetryHandler(RetryConfig(default=RetryPolicyConfig(retryable_codes=["NOT_A_CODE"])))
+
+    def testRetryConfigFromProfile(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "retry" : {
+                "default" : { "max_attempts" : 5 },
+                "operations" : { "query" : { "max_attempts" : 2, "initial_backoff" : 0.1 } }
+            }
+        }"""
+        client = Factory(config_json=config_json).build()
+        retry_handler = client.request_util.retry_handler
+        self.assertEqual(5, retry_handler.policy_for("index").max_attempts)
+        self.assertEqual(2, retry_handler.policy_for("query").max_attempts)
+        client.close()
+
+    @unittest.skipUnless(HAS_HTTPX, "httpx is required for the asyncio client")
+    def testAsyncRetries(self):
+        async def no_sleep(delay):
+            self.sleeps.append(delay)
+
+        with StubServer(routes={"list-corpora": failing_route(2)}) as server:
+            async def run():
+                retry_handler = RetryHandler(async_sleep=no_sleep, rand=lambda: 1.0)
+                request_util = AsyncRequestUtil(self.auth_util, base_url=server.base_url,
+                                                retry_handler=retry_handler)
+                await request_util.request("list-corpora", {})
+                await request_util.aclose()
+
+            asyncio.run(run())
+
+        self.assertEqual(3, server.request_count)
+        self.assertEqual([0.5, 1.0], self.sleeps)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import logging
+import threading
+import time
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.query import QueryService
+from vectara_client.singleflight import SingleFlight
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+
+CALLERS = 16
+ROUNDS = 10
+SERVER_DELAY = 0.05
+
+
+class SingleFlightBenchmark(unittest.TestCase):
+    """
+    Rounds of 16 threads making the same query at once, with and without single-flight.
+    """
+
+    def _run(self, single_flight: SingleFlight = None):
+        with StubServer(routes={"query": build_query_response(10)}, delay=SERVER_DELAY, record=False) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       single_flight=single_flight)
+            query_service = QueryService(request_util, 12344)
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                barrier = threading.Barrier(CALLERS)
+
+                def call():
+                    barrier.wait()
+                    query_service.query("Where is Santa?", 10)
+
+                threads = [threading.Thread(target=call) for _ in range(CALLERS)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - start
+            request_util.close()
+            return elapsed, server.request_count
+
+    def testIdenticalQueries(self):
+        plain_elapsed, plain_requests = self._run()
+        single_flight = SingleFlight()
+        coalesced_elapsed, coalesced_requests = self._run(single_flight)
+
+        print()
+        print(f"without single-flight {plain_requests:5d} requests in {plain_elapsed * 1000:8.1f}ms")
+        print(f"with single-flight    {coalesced_requests:5d} requests in {coalesced_elapsed * 1000:8.1f}ms, "
+              f"{single_flight.stats()['query'].coalesced} calls coalesced")
+
+        self.assertEqual(CALLERS * ROUNDS, plain_requests)
+        # Threads released together nearly always all join the first; allow a straggler per round.
+        self.assertLessEqual(coalesced_requests, ROUNDS * 2)
+        self.assertLess(coalesced_elapsed, plain_elapsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
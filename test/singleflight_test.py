@@ -0,0 +1,245 @@
+import unittest
+import asyncio
+import logging
+import threading
+import time
+import requests
+from vectara_client.admin import AdminService
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import SingleFlightConfig, RetryConfig, RetryPolicyConfig
+from vectara_client.core import Factory
+from vectara_client.error import DeadlineExceededError
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.singleflight import SingleFlight, SingleFlightStats
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+# Long enough that every concurrent caller arrives while the first request is still in flight.
+DELAY = 0.3
+
+
+def run_concurrently(count: int, call) -> list:
+    """
+    Runs call from count threads released together, returning each thread's result or exception.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def testKeyIsCanonical(self):
+        self.assertEqual(SingleFlight.key("query", {"a": 1, "b": [1, 2]}),
+                         SingleFlight.key("query", {"b": [1, 2], "a": 1}))
+        self.assertNotEqual(SingleFlight.key("query", {"a": 1}), SingleFlight.key("query", {"a": 2}))
+        self.assertNotEqual(SingleFlight.key("query", {"a": 1}), SingleFlight.key("read-corpus", {"a": 1}))
+        self.assertNotEqual(SingleFlight.key("query", {"a": 1}, "POST"), SingleFlight.key("query", {"a": 1}, "GET"))
+
+    def testNotIdempotent(self):
+        with self.assertRaises(TypeError):
+            SingleFlight(SingleFlightConfig(operations=["query", "index"]))
+
+    def testNothingCached(self):
+        single_flight = SingleFlight()
+        key = SingleFlight.key("query", {"q": 1})
+        calls = []
+        for i in range(3):
+            self.assertEqual(i, single_flight.call("query", key, lambda: calls.append(1) or len(calls) - 1))
+        self.assertEqual(3, len(calls))
+        self.assertEqual(SingleFlightStats(calls=3, coalesced=0), single_flight.stats()["query"])
+        self.assertEqual({}, single_flight._in_flight)
+
+    def testFollowerTimeout(self):
+        single_flight = SingleFlight()
+        key = SingleFlight.key("query", {"q": 1})
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(DELAY)
+            return "done"
+
+        leader = threading.Thread(target=lambda: single_flight.call("query", key, slow))
+        leader.start()
+        started.wait()
+        with self.assertRaises(DeadlineExceededError):
+            single_flight.call("query", key, slow, timeout=0.05)
+        leader.join()
+        # The leader carried on regardless.
+        self.assertEqual("done", single_flight.call("query", key, lambda: "done"))
+
+
+class RequestUtilSingleFlightTest(unittest.TestCase):
+
+    def _request_util(self, base_url: str, **kwargs) -> RequestUtil:
+        return RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url, single_flight=SingleFlight(),
+                           **kwargs)
+
+    def testIdenticalQueriesCoalesce(self):
+        with StubServer(routes={"query": build_query_response(3)}, delay=DELAY) as server:
+            request_util = self._request_util(server.base_url)
+            query_service = QueryService(request_util, 12344)
+            results = run_concurrently(8, lambda: query_service.query("Where is Santa?", 1))
+            request_util.close()
+
+            self.assertEqual(1, server.request_count)
+            self.assertEqual(3, len(results[0].response))
+            self.assertTrue(all(result is results[0] for result in results))
+            self.assertEqual(SingleFlightStats(calls=8, coalesced=7), request_util.single_flight.stats()["query"])
+            # The journal only has the request actually sent.
+            self.assertEqual(1, len(request_util.requests))
+
+    def testDifferentPayloadsDoNotCoalesce(self):
+        with StubServer(routes={"query": build_query_response(1)}, delay=DELAY) as server:
+            request_util = self._request_util(server.base_url)
+            query_service = QueryService(request_util, 12344)
+            counter = iter(range(4))
+            lock = threading.Lock()
+
+            def query():
+                with lock:
+                    i = next(counter)
+                return query_service.query(f"Query {i}", 1)
+
+            run_concurrently(4, query)
+            request_util.close()
+            self.assertEqual(4, server.request_count)
+            self.assertEqual(0, request_util.single_flight.stats()["query"].coalesced)
+
+    def testOnlyConfiguredOperations(self):
+        with StubServer(routes={"query": build_query_response(1)}, delay=DELAY) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url,
+                                       single_flight=SingleFlight(SingleFlightConfig(operations=["read-corpus"])))
+            query_service = QueryService(request_util, 12344)
+            run_concurrently(3, lambda: query_service.query("Where is Santa?", 1))
+            request_util.close()
+            self.assertEqual(3, server.request_count)
+
+    def testErrorIsShared(self):
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=1)))
+        with StubServer(routes={"query": (400, {"error": "bad"}, {})}, delay=DELAY) as server:
+            request_util = self._request_util(server.base_url, retry_handler=retry_handler)
+            query_service = QueryService(request_util, 12344)
+            results = run_concurrently(4, lambda: query_service.query("Where is Santa?", 1))
+            request_util.close()
+
+            self.assertEqual(1, server.request_count)
+            self.assertTrue(all(isinstance(result, requests.HTTPError) for result in results))
+
+    def testListCorporaNotSortedInPlace(self):
+        corpora = {"corpus": [{"id": 2, "name": "b"}, {"id": 1, "name": "a"}], "pageKey": "", "status": None}
+        with StubServer(routes={"list-corpora": corpora}, delay=DELAY) as server:
+            request_util = self._request_util(server.base_url)
+            admin_service = AdminService(request_util, 12344)
+            results = run_concurrently(4, admin_service.list_corpora)
+            request_util.close()
+
+            self.assertEqual(1, server.request_count)
+            for result in results:
+                self.assertEqual(["a", "b"], [corpus.name for corpus in result])
+
+    def testFactory(self):
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "single_flight" : { "operations" : [ "query" ] }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual(["query"], client.request_util.single_flight.config.operations)
+            self.assertEqual({"query": SingleFlightStats()}, client.get_single_flight_stats())
+
+        with Factory(config_json='{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}').build() as client:
+            self.assertIsNone(client.request_util.single_flight)
+            self.assertEqual({}, client.get_single_flight_stats())
+
+        with self.assertRaises(TypeError):
+            Factory(config_json='{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}',
+                    single_flight_config=SingleFlightConfig(operations=["upload"])).build()
+
+
+class AsyncRequestUtilSingleFlightTest(unittest.TestCase):
+
+    def testIdenticalQueriesCoalesce(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            single_flight=SingleFlight())
+            try:
+                query_service = AsyncQueryService(request_util, 12344)
+                results = await asyncio.gather(*[query_service.query("Where is Santa?", 1) for _ in range(8)])
+                self.assertTrue(all(result is results[0] for result in results))
+                return request_util.single_flight.stats()["query"]
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": build_query_response(1)}, delay=DELAY) as server:
+            stats = asyncio.run(run(server.base_url))
+            self.assertEqual(1, server.request_count)
+        self.assertEqual(SingleFlightStats(calls=8, coalesced=7), stats)
+
+    def testCancellingLeaderKeepsRequest(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            single_flight=SingleFlight())
+            try:
+                query_service = AsyncQueryService(request_util, 12344)
+                leader = asyncio.ensure_future(query_service.query("Where is Santa?", 1))
+                await asyncio.sleep(0.05)
+                follower = asyncio.ensure_future(query_service.query("Where is Santa?", 1))
+                await asyncio.sleep(0.05)
+                leader.cancel()
+                result = await follower
+                with self.assertRaises(asyncio.CancelledError):
+                    await leader
+                return result
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": build_query_response(2)}, delay=DELAY) as server:
+            result = asyncio.run(run(server.base_url))
+            self.assertEqual(1, server.request_count)
+        self.assertEqual(2, len(result.response))
+
+    def testFollowerDeadline(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            single_flight=SingleFlight())
+            try:
+                query_service = AsyncQueryService(request_util, 12344)
+                leader = asyncio.ensure_future(query_service.query("Where is Santa?", 1))
+                await asyncio.sleep(0.05)
+                with self.assertRaises(DeadlineExceededError):
+                    await query_service.query("Where is Santa?", 1, deadline=0.05)
+                return await leader
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": build_query_response(1)}, delay=DELAY) as server:
+            self.assertIsNotNone(asyncio.run(run(server.base_url)))
+            self.assertEqual(1, server.request_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
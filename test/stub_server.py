@@ -0,0 +1,187 @@
+"""
+Local stand-in for api.vectara.io so we can exercise RequestUtil without a live account.
+
+Routes are keyed by operation (e.g. "query", "list-documents"). A route is either a dict which is returned as a 200
+JSON body, or a callable taking the StubRequest and returning a dict, or a tuple of (status, body, headers).
+
+Compressed request bodies are decoded by StubRequest.json(), and with compress_responses=True responses are gzipped
+for clients which accept it.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+import gzip
+import json
+import socket
+import sys
+import time
+
+
+class StubRequest:
+
+    def __init__(self, method: str, operation: str, headers, body: bytes):
+        self.method = method
+        self.operation = operation
+        self.headers = headers
+        self.body = body
+
+    def decoded_body(self) -> bytes:
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == "gzip":
+            return gzip.decompress(self.body)
+        elif encoding == "zstd":
+            import zstandard
+            return zstandard.ZstdDecompressor().decompress(self.body)
+        elif encoding == "br":
+            import brotli
+            return brotli.decompress(self.body)
+        return self.body
+
+    def json(self):
+        return json.loads(self.decoded_body())
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so keep-alive connections are honoured.
+    protocol_version = "HTTP/1.1"
+    # Otherwise the split header/body writes stall on delayed ACKs over a kept-alive connection.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server.stub
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b""
+
+        request = StubRequest(self.command, server.operation_for(self.path), self.headers, body)
+        server._record(request)
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        status, response_bytes, headers = server.dispatch(request)
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if self.close_connection:
+            # Echo the close back like a real server, so the client does not re-use this connection.
+            self.send_header("Connection", "close")
+        self.send_header("Content-Length", str(len(response_bytes)))
+        self.end_headers()
+        self.wfile.write(response_bytes)
+
+    do_POST = _handle
+    do_GET = _handle
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        self.stub._count_connection()
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        # Clients abandon requests, e.g. the loser of a hedge, which is expected rather than worth a stack trace.
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+
+    def __init__(self, routes: dict = None, delay: float = 0.0, record: bool = True, compress_responses: bool = False):
+        """
+        :param record: keep every request in self.requests, disable for long benchmarks so the server doesn't grow.
+        :param compress_responses: gzip response bodies if the request's Accept-Encoding allows it.
+        """
+        self.routes = routes if routes else {}
+        self.delay = delay
+        self.record = record
+        self.compress_responses = compress_responses
+        self.requests = []
+        self.request_total = 0
+        self.connection_count = 0
+        self._lock = Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def request_count(self):
+        return self.request_total
+
+    @staticmethod
+    def operation_for(path: str) -> str:
+        return path.split("?")[0][len("/v1/"):]
+
+    def dispatch(self, request: StubRequest):
+        """
+        Runs the route for a request.
+
+        :return: a tuple of status, the encoded body and the response headers
+        """
+        route = self.routes.get(request.operation)
+        if route is None:
+            status, response_body, headers = 404, {"error": f"No route for {request.operation}"}, {}
+        else:
+            result = route(request) if callable(route) else route
+            if isinstance(result, tuple):
+                status, response_body, headers = result
+            else:
+                status, response_body, headers = 200, result, {}
+
+        if isinstance(response_body, (dict, list)):
+            response_bytes = json.dumps(response_body).encode("utf-8")
+        elif response_body is None:
+            response_bytes = b""
+        else:
+            response_bytes = response_body
+
+        headers = dict(headers)
+        headers.setdefault("Content-Type", "application/json")
+        if self.compress_responses and response_bytes and "gzip" in request.headers.get('Accept-Encoding', ""):
+            response_bytes = gzip.compress(response_bytes)
+            headers["Content-Encoding"] = "gzip"
+        return status, response_bytes, headers
+
+    def _record(self, request: StubRequest):
+        with self._lock:
+            self.request_total += 1
+            if self.record:
+                self.requests.append(request)
+
+    def _count_connection(self):
+        with self._lock:
+            self.connection_count += 1
+
+    def start(self):
+        self._server = _CountingServer(("127.0.0.1", 0), _StubHandler)
+        self._server.stub = self
+        self._thread = Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def free_port() -> int:
+    """
+    :return: a port nothing is listening on, for tests which need a fixed one.
+    """
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        return unused.getsockname()[1]
@@ -0,0 +1,234 @@
+import unittest
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import requests
+from vectara_client.admin import AdminService
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import HedgeConfig, RetryConfig, RetryPolicyConfig, TracingConfig
+from vectara_client.core import Factory
+from vectara_client.hedge import Hedger
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.retry import RetryHandler
+from vectara_client.tracing import (Tracer, InMemorySpanExporter, OtlpJsonFileExporter, SpanKind, SpanStatus,
+                                    current_span, to_otlp_json)
+from vectara_client.util import RequestUtil, AsyncRequestUtil
+from test.stub_server import StubServer
+from test.fixtures import build_query_response
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('AsyncRequestUtil').setLevel(logging.CRITICAL)
+logging.getLogger('RetryHandler').setLevel(logging.ERROR)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class TracerTest(unittest.TestCase):
+
+    def testNesting(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter=exporter)
+        with tracer.start_span("outer") as outer:
+            self.assertIs(outer, current_span())
+            with tracer.start_span("inner", SpanKind.CLIENT, {"a": 1}) as inner:
+                self.assertIs(inner, current_span())
+            self.assertIs(outer, current_span())
+        self.assertIsNone(current_span())
+
+        finished = exporter.get_finished_spans()
+        self.assertEqual(["inner", "outer"], [span.name for span in finished])
+        self.assertEqual(outer.trace_id, inner.trace_id)
+        self.assertEqual(outer.span_id, inner.parent_span_id)
+        self.assertIsNone(outer.parent_span_id)
+        self.assertEqual({"a": 1}, inner.attributes)
+        self.assertEqual(32, len(outer.trace_id))
+        self.assertEqual(16, len(outer.span_id))
+        self.assertGreaterEqual(outer.duration, inner.duration)
+
+    def testException(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter=exporter)
+        with self.assertRaises(ValueError):
+            with tracer.start_span("failing"):
+                raise ValueError("bad")
+        span = exporter.get_finished_spans()[0]
+        self.assertEqual(SpanStatus.ERROR, span.status)
+        self.assertEqual("exception", span.events[0][0])
+        self.assertEqual("ValueError", span.events[0][2]["exception.type"])
+
+    def testSampling(self):
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(TracingConfig(sample_rate=0.0), exporter)
+        with tracer.start_span("outer"):
+            with tracer.start_span("inner") as inner:
+                self.assertFalse(inner.recording)
+        self.assertEqual([], exporter.get_finished_spans())
+
+    def testOtlpJson(self):
+        tracer = Tracer(exporter=InMemorySpanExporter())
+        with tracer.start_span("outer"):
+            with tracer.start_span("POST query", SpanKind.CLIENT, {"n": 3, "x": 1.5, "ok": True, "s": "v"}):
+                pass
+        spans = tracer.exporter.get_finished_spans()
+        otlp = to_otlp_json(spans, "my-service")
+        resource_spans = otlp["resourceSpans"][0]
+        self.assertEqual([{"key": "service.name", "value": {"stringValue": "my-service"}}],
+                         resource_spans["resource"]["attributes"])
+        inner = resource_spans["scopeSpans"][0]["spans"][0]
+        self.assertEqual(3, inner["kind"])
+        self.assertEqual(spans[1].span_id, inner["parentSpanId"])
+        self.assertEqual(str(spans[0].start_time_ns), inner["startTimeUnixNano"])
+        self.assertEqual([{"key": "n", "value": {"intValue": "3"}}, {"key": "x", "value": {"doubleValue": 1.5}},
+                          {"key": "ok", "value": {"boolValue": True}}, {"key": "s", "value": {"stringValue": "v"}}],
+                         inner["attributes"])
+        self.assertNotIn("parentSpanId", resource_spans["scopeSpans"][0]["spans"][1])
+
+    def testFileExporter(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "spans.jsonl")
+            tracer = Tracer(TracingConfig(exporter="otlp-file", path=path))
+            self.assertIsInstance(tracer.exporter, OtlpJsonFileExporter)
+            for i in range(3):
+                with tracer.start_span(f"span {i}"):
+                    pass
+            tracer.close()
+
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(3, len(lines))
+        self.assertEqual("span 2", lines[2]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"])
+
+    def testInvalidExporter(self):
+        with self.assertRaises(TypeError):
+            Tracer(TracingConfig(exporter="zipkin"))
+        with self.assertRaises(TypeError):
+            Tracer(TracingConfig(exporter="otlp-file"))
+
+
+class RequestUtilTracingTest(unittest.TestCase):
+
+    def _request_util(self, base_url: str, **kwargs) -> RequestUtil:
+        return RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                           tracer=Tracer(exporter=InMemorySpanExporter()), **kwargs)
+
+    def testQuery(self):
+        with StubServer(routes={"query": build_query_response(2)}) as server:
+            request_util = self._request_util(server.base_url)
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+
+        http, service = request_util.tracer.exporter.get_finished_spans()
+        self.assertEqual("QueryService.query", service.name)
+        self.assertEqual(SpanKind.INTERNAL, service.kind)
+        self.assertEqual("POST query", http.name)
+        self.assertEqual(SpanKind.CLIENT, http.kind)
+        self.assertEqual(service.span_id, http.parent_span_id)
+        self.assertEqual(200, http.attributes["http.response.status_code"])
+        self.assertEqual(f"{server.base_url}/query", http.attributes["url.full"])
+        self.assertGreater(http.attributes["http.request.body.size"], 0)
+        self.assertGreater(http.attributes["http.response.body.size"], 0)
+        self.assertIn("vectara.client.decode_ms", http.attributes)
+        self.assertEqual(12, http.attributes["vectara.server.query_encode_ms"])
+        self.assertEqual(34, http.attributes["vectara.server.retrieval_ms"])
+        self.assertEqual(5, http.attributes["vectara.server.userdata_retrieval_ms"])
+        self.assertEqual(7, http.attributes["vectara.server.rerank_ms"])
+        self.assertEqual(58, http.attributes["vectara.server.total_ms"])
+
+    def testLazyQuery(self):
+        with StubServer(routes={"query": build_query_response(2)}) as server:
+            request_util = self._request_util(server.base_url)
+            QueryService(request_util, 12344).query("Where is Santa?", 1, lazy=True)
+            request_util.close()
+        http = request_util.tracer.exporter.get_finished_spans()[0]
+        self.assertEqual(34, http.attributes["vectara.server.retrieval_ms"])
+
+    def testRetries(self):
+        retry_handler = RetryHandler(RetryConfig(default=RetryPolicyConfig(max_attempts=2, initial_backoff=0.01)))
+        with StubServer(routes={"query": (503, {"error": "busy"}, {})}) as server:
+            request_util = self._request_util(server.base_url, retry_handler=retry_handler)
+            with self.assertRaises(requests.HTTPError):
+                QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+
+        spans = request_util.tracer.exporter.get_finished_spans()
+        self.assertEqual(["POST query", "POST query", "QueryService.query"], [span.name for span in spans])
+        self.assertTrue(all(span.status == SpanStatus.ERROR for span in spans))
+        self.assertEqual([503, 503], [span.attributes["http.response.status_code"] for span in spans[:2]])
+
+    def testNestedServiceCalls(self):
+        corpora = {"corpus": [{"id": 1, "name": "a"}], "pageKey": "", "status": None}
+        with StubServer(routes={"list-corpora": corpora}) as server:
+            request_util = self._request_util(server.base_url)
+            AdminService(request_util, 12344).list_corpora()
+            request_util.close()
+        http, service = request_util.tracer.exporter.get_finished_spans()
+        self.assertEqual("AdminService.list_corpora", service.name)
+        self.assertEqual(service.span_id, http.parent_span_id)
+
+    def testHedgedRequestsKeepParent(self):
+        hedger = Hedger(HedgeConfig(min_samples=1))
+        hedger._record("query", 0.001)
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = self._request_util(server.base_url, hedger=hedger)
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+        spans = request_util.tracer.exporter.get_finished_spans()
+        service = spans[-1]
+        self.assertEqual("QueryService.query", service.name)
+        for span in spans[:-1]:
+            self.assertEqual(service.span_id, span.parent_span_id)
+
+    def testNoTracer(self):
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            request_util = RequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=server.base_url)
+            QueryService(request_util, 12344).query("Where is Santa?", 1)
+            request_util.close()
+        self.assertIsNone(request_util.tracer)
+
+    def testAsync(self):
+        async def run(base_url):
+            request_util = AsyncRequestUtil(ApiKeyUtil("12344", "BLAH_KEY"), base_url=base_url,
+                                            tracer=Tracer(exporter=InMemorySpanExporter()))
+            try:
+                query_service = AsyncQueryService(request_util, 12344)
+                await asyncio.gather(*[query_service.query("Where is Santa?", 1) for _ in range(3)])
+                return request_util.tracer.exporter.get_finished_spans()
+            finally:
+                await request_util.aclose()
+
+        with StubServer(routes={"query": build_query_response(1)}) as server:
+            spans = asyncio.run(run(server.base_url))
+
+        services = [span for span in spans if span.name == "AsyncQueryService.query"]
+        https = [span for span in spans if span.name == "POST query"]
+        self.assertEqual(3, len(services))
+        self.assertEqual(3, len(https))
+        # Each concurrent task's HTTP span belongs to its own service span.
+        self.assertEqual(sorted(span.span_id for span in services), sorted(span.parent_span_id for span in https))
+        self.assertEqual(3, len({span.trace_id for span in services}))
+
+    def testFactory(self):
+        exporter = InMemorySpanExporter()
+        config_json = '{"customer_id" : "12344", "auth" : { "api_key" : "BLAH_KEY" }}'
+        with Factory(config_json=config_json, span_exporter=exporter).build() as client:
+            self.assertIs(exporter, client.request_util.tracer.exporter)
+
+        with Factory(config_json=config_json).build() as client:
+            self.assertIsNone(client.request_util.tracer)
+
+        config_json = """{
+            "customer_id" : "12344",
+            "auth" : { "api_key" : "BLAH_KEY" },
+            "tracing" : { "sample_rate" : 0.5 }
+        }"""
+        with Factory(config_json=config_json).build() as client:
+            self.assertEqual(0.5, client.request_util.tracer.config.sample_rate)
+            self.assertIsInstance(client.request_util.tracer.exporter, InMemorySpanExporter)
+
+
+if __name__ == '__main__':
+    unittest.main()
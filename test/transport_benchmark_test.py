@@ -0,0 +1,50 @@
+import unittest
+import logging
+from vectara_client.authn import ApiKeyUtil
+from vectara_client.config import TransportConfig
+from vectara_client.util import RequestUtil
+from test.stub_server import StubServer
+from test.bench import time_calls, summarize
+
+logging.basicConfig(
+        format=logging.BASIC_FORMAT, level=logging.INFO)
+
+logging.getLogger('RequestUtil').setLevel(logging.WARNING)
+
+ITERATIONS = 200
+
+
+class PooledTransportBenchmark(unittest.TestCase):
+    """
+    Compares per-call latency of a fresh connection per request (the old module level requests.request behaviour)
+    against our pooled keep-alive session. The stand-in server is plain HTTP on loopback, so the real saving
+    against api.vectara.io is larger still as each fresh connection there also pays a TLS handshake.
+    """
+
+    def testPooledVersusFreshConnection(self):
+        auth_util = ApiKeyUtil("12344", "BLAH_KEY")
+        with StubServer(routes={"list-corpora": {"corpus": [], "pageKey": "", "status": None}}) as server:
+            fresh = RequestUtil(auth_util, transport_config=TransportConfig(keep_alive=False),
+                                base_url=server.base_url)
+            pooled = RequestUtil(auth_util, base_url=server.base_url)
+
+            fresh_samples = time_calls(lambda: fresh.request("list-corpora", {}), ITERATIONS)
+            fresh_connections = server.connection_count
+            pooled_samples = time_calls(lambda: pooled.request("list-corpora", {}), ITERATIONS)
+            pooled_connections = server.connection_count - fresh_connections
+            fresh.close()
+            pooled.close()
+
+        print()
+        print(summarize("connection per call", fresh_samples))
+        print(summarize("pooled keep-alive", pooled_samples))
+
+        print(f"connections opened: per call [{fresh_connections}], pooled [{pooled_connections}]")
+
+        # Timings on loopback are too noisy to assert on, the handshakes avoided are not.
+        self.assertEqual(1, pooled_connections)
+        self.assertGreater(fresh_connections, ITERATIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,12 @@
-from dataclasses import asdict
+from vectara_client.deadline import Deadline
+from vectara_client.tracing import traced
 from vectara_client.domain import *
+from vectara_client.encoder import encode
 from vectara_client.enums import ApiKeyStatus, ApiKeyType, ApiKeySort, SortDirection
 from dacite import from_dict
 from typing import List, TypeVar, Union
 from vectara_client.status import StatusCode
-from vectara_client.util import _custom_asdict_factory, RequestUtil
+from vectara_client.util import RequestUtil, AsyncRequestUtil
 from datetime import datetime, timezone
 import logging
 
@@ -17,7 +19,16 @@ class AdminService():
         self.request_util = request_util
         self.customer_id = customer_id
 
-    def list_corpora(self, filter: str = None, numResults: int = None, pageKey: int = None) -> List[Corpus]:
+    @traced
+    def list_corpora(self, filter: str = None, numResults: int = None, pageKey: int = None,
+                     deadline: Union[Deadline, float] = None) -> List[Corpus]:
+        payload = self._build_list_corpora_payload(filter, numResults, pageKey)
+
+        response = self.request_util.request("list-corpora", payload, ListCorpusResponse, deadline=deadline)
+        # A copy, as a coalesced response is shared with other callers.
+        return sorted(response.corpus, key=lambda x: x.name)
+
+    def _build_list_corpora_payload(self, filter: str = None, numResults: int = None, pageKey: int = None) -> dict:
         payload = {}
         if filter:
             payload['filter'] = filter
@@ -25,16 +36,16 @@ class AdminService():
             payload['numResults'] = numResults
         if pageKey:
             payload['pageKey'] = pageKey
+        return payload
 
-        response = self.request_util.request("list-corpora", payload, ListCorpusResponse)
-        response.corpus.sort(key=lambda x: x.name)
-        return response.corpus
-
-    def calculate_corpus_size(self, corpus_id: int):
+    @traced
+    def calculate_corpus_size(self, corpus_id: int, deadline: Union[Deadline, float] = None):
         payload = {'customer_id': self.customer_id, 'corpus_id': corpus_id}
-        resp = self.request_util.request("compute-corpus-size", payload, CalculateCorpusSizeResponse)
+        resp = self.request_util.request("compute-corpus-size", payload, CalculateCorpusSizeResponse,
+                                         deadline=deadline)
         return resp
 
+    @traced
     def get_usage_metrics_range(self, corpus_id: int, from_ts: int = None,to_ts: int = None,
                                 bucket: int = None):
         """
@@ -65,29 +76,43 @@ class AdminService():
 
 
 
-    def read_corpus(self, corpus_id: int) -> CorpusInfo:
+    @traced
+    def read_corpus(self, corpus_id: int, deadline: Union[Deadline, float] = None) -> CorpusInfo:
         request = ReadCorpusRequest([corpus_id], True, True, True, True, True, True)
-        payload = asdict(request)
-        response = self.request_util.request("read-corpus", payload, ReadCorpusResponse)
+        payload = encode(request)
+        response = self.request_util.request("read-corpus", payload, ReadCorpusResponse, deadline=deadline)
         # TODO Validate that there is 1 corpus and what happens if it doesn't exist.
         return response.corpora[0]
 
-    def _create_corpus_inner(self, request: CreateCorpusRequest) -> CreateCorpusResponse:
-        payload = asdict(request, dict_factory=_custom_asdict_factory)
-        response = self.request_util.request("create-corpus", payload, CreateCorpusResponse)
+    def _create_corpus_inner(self, request: CreateCorpusRequest,
+                             deadline: Union[Deadline, float] = None) -> CreateCorpusResponse:
+        payload = encode(request)
+        response = self.request_util.request("create-corpus", payload, CreateCorpusResponse, deadline=deadline)
+        return self._check_create_corpus(response)
+
+    def _check_create_corpus(self, response: CreateCorpusResponse) -> CreateCorpusResponse:
         if response.status.code == StatusCode.OK:
             self.logger.info(f"Created new corpus with {response.corpusId}")
             return response
         else:
             raise Exception(f"Unable to create corpus due to: {response.status}")
 
-    def create_corpus_d(self, corpus: Corpus) -> CreateCorpusResponse:
+    @traced
+    def create_corpus_d(self, corpus: Corpus, deadline: Union[Deadline, float] = None) -> CreateCorpusResponse:
         request = CreateCorpusRequest(corpus)
-        return self._create_corpus_inner(request)
+        return self._create_corpus_inner(request, deadline)
 
+    @traced
     def create_corpus(self, name=None, description: str = None, custom_dimensions: List[Dimension] = None,
-                      filter_attributes: List[FilterAttribute] = None) -> CreateCorpusResponse:
+                      filter_attributes: List[FilterAttribute] = None,
+                      deadline: Union[Deadline, float] = None) -> CreateCorpusResponse:
+
+        request = self._build_create_corpus_request(name, description, custom_dimensions, filter_attributes)
+        return self._create_corpus_inner(request, deadline)
 
+    def _build_create_corpus_request(self, name=None, description: str = None,
+                                     custom_dimensions: List[Dimension] = None,
+                                     filter_attributes: List[FilterAttribute] = None) -> CreateCorpusRequest:
         # First create our domain request
         corpus = from_dict(Corpus, {
             'name': name,
@@ -95,17 +120,26 @@ class AdminService():
             'customDimensions': custom_dimensions,
             'filterAttributes': filter_attributes
         })
-        request = CreateCorpusRequest(corpus)
-        return self._create_corpus_inner(request)
+        return CreateCorpusRequest(corpus)
 
-    def delete_corpus(self, corpus_id: int) -> Status:
+    @traced
+    def delete_corpus(self, corpus_id: int, deadline: Union[Deadline, float] = None) -> Status:
         request = DeleteCorpusRequest(self.customer_id, corpus_id)
-        payload = asdict(request)
+        payload = encode(request)
 
-        response = self.request_util.request("delete-corpus", asdict(request), DeleteCorpusResponse)
+        response = self.request_util.request("delete-corpus", encode(request), DeleteCorpusResponse,
+                                             deadline=deadline)
         return response.status
 
-    def create_api_key(self, corpus_id: Union[int, List], key_type: ApiKeyType, description: str = None):
+    @traced
+    def create_api_key(self, corpus_id: Union[int, List], key_type: ApiKeyType, description: str = None,
+                       deadline: Union[Deadline, float] = None):
+        payload = self._build_create_api_key_payload(corpus_id, key_type, description)
+        response = self.request_util.request("create-api-key", payload, CreateApiKeyResponse, deadline=deadline)
+        return self._check_create_api_key(response)
+
+    def _build_create_api_key_payload(self, corpus_id: Union[int, List], key_type: ApiKeyType,
+                                      description: str = None) -> dict:
         # Convert singular int to List of corpus ids.
         if type(corpus_id) is list:
             corpus_ids = corpus_id
@@ -116,8 +150,9 @@ class AdminService():
         if description:
             inner_payload['description'] = description
 
-        payload = {"apiKeyData": [inner_payload]}
-        response = self.request_util.request("create-api-key", payload, CreateApiKeyResponse)
+        return {"apiKeyData": [inner_payload]}
+
+    def _check_create_api_key(self, response: CreateApiKeyResponse) -> str:
         status = response.response[0].status
         if status.code == StatusCode.OK:
             return response.response[0].keyId
@@ -129,33 +164,41 @@ class AdminService():
         if status.code != StatusCode.OK:
             raise Exception(f"Unexpected response [{status}]")
 
-    def delete_api_key(self, key_id: Union[str, List[str]]):
+    @traced
+    def delete_api_key(self, key_id: Union[str, List[str]], deadline: Union[Deadline, float] = None):
+        payload = self._build_delete_api_key_payload(key_id)
+        response = self.request_util.request("delete-api-key", payload, ModifyApiKeyResponse, deadline=deadline)
+        self._check_ok(response)
+
+    def _build_delete_api_key_payload(self, key_id: Union[str, List[str]]) -> dict:
         if type(key_id) is list:
             key_ids = key_id
         else:
             key_ids = [key_id]
-        payload = {"keyId": key_ids}
-        response = self.request_util.request("delete-api-key", payload, ModifyApiKeyResponse)
-        self._check_ok(response)
+        return {"keyId": key_ids}
 
-    def update_api_key(self, key_id: str, enabled: bool):
+    @traced
+    def update_api_key(self, key_id: str, enabled: bool, deadline: Union[Deadline, float] = None):
         payload = {"keyEnablement": [{"keyId": key_id, "enable": enabled}]}
-        response = self.request_util.request("enable-api-key", payload, ModifyApiKeyResponse)
+        response = self.request_util.request("enable-api-key", payload, ModifyApiKeyResponse, deadline=deadline)
         self._check_ok(response)
 
-    def _list_api_keys(self, num_results: int = 10, page: str = None, read_corpora_info=True) -> ListApiKeysResponse:
+    def _list_api_keys(self, num_results: int = 10, page: str = None, read_corpora_info=True,
+                       deadline: Deadline = None) -> ListApiKeysResponse:
         payload = {"numResults": num_results, "pageKey": page, "readCorporaInfo": read_corpora_info}
         #payload = {"numResults": num_results, "readCorporaInfo": read_corpora_info}
-        response = self.request_util.request("list-api-keys", payload, ListApiKeysResponse)
+        response = self.request_util.request("list-api-keys", payload, ListApiKeysResponse, deadline=deadline)
         return response
 
+    @traced
     def list_api_keys(self,
                       # Filters
                       corpus_id:int=None, enabled:bool=None, key_type:ApiKeyType=None, key_status:ApiKeyStatus=None,
                       # Pagination
                       pagination:bool = False, page:int=1, page_size=10,
                       # Sort Params
-                      sort_field:ApiKeySort=ApiKeySort.START_TS, sort_dir:SortDirection=SortDirection.ASC):
+                      sort_field:ApiKeySort=ApiKeySort.START_TS, sort_dir:SortDirection=SortDirection.ASC,
+                      deadline: Union[Deadline, float] = None):
         """
         FIXME: MOVE Pagination/Sorting into vectara_client-client-manager.
 
@@ -168,23 +211,30 @@ class AdminService():
         :param page_size:
         :param sort_field:
         :param sort_dir:
+        :param deadline: a Deadline or seconds from now, shared by every page.
         :return:
         """
+        # One deadline for all the pages, rather than each page getting the full budget.
+        deadline = Deadline.resolve(deadline)
 
         # Retrieve all the API keys.
 
         self.logger.info(f"Getting first page")
         # FIXME Increase this to 1000 after testing to reduce pages.
-        api_key_response = self._list_api_keys()
+        api_key_response = self._list_api_keys(deadline=deadline)
         self.logger.info(f"Found [{len(api_key_response.keyData)}] results")
         api_keys = api_key_response.keyData
         while api_key_response.pageKey:
             self.logger.info(f"Getting page [{api_key_response.pageKey}]")
             # FIXME Increase this to 1000 after testing to reduce pages.
-            api_key_response = self._list_api_keys(page=api_key_response.pageKey)
+            api_key_response = self._list_api_keys(page=api_key_response.pageKey, deadline=deadline)
             self.logger.info(f"Found [{len(api_key_response.keyData)}] results")
             api_keys.extend(api_key_response.keyData)
 
+        return self._filter_api_keys(api_keys, corpus_id, enabled, key_type, key_status)
+
+    def _filter_api_keys(self, api_keys: List[KeyData], corpus_id: int = None, enabled: bool = None,
+                         key_type: ApiKeyType = None, key_status: ApiKeyStatus = None) -> List[KeyData]:
         # Filter
         if corpus_id or enabled or key_type or key_status:
             filtered_api_keys = []
@@ -214,6 +264,103 @@ class AdminService():
         return filtered_api_keys
 
 
+class AsyncAdminService(AdminService):
+    """
+    asyncio counterpart of AdminService, sharing its request building and response checks.
+    """
+
+    def __init__(self, request_util: AsyncRequestUtil, customer_id: int):
+        super().__init__(request_util, customer_id)
+
+    @traced
+    async def list_corpora(self, filter: str = None, numResults: int = None, pageKey: int = None,
+                           deadline: Union[Deadline, float] = None) -> List[Corpus]:
+        payload = self._build_list_corpora_payload(filter, numResults, pageKey)
+
+        response = await self.request_util.request("list-corpora", payload, ListCorpusResponse, deadline=deadline)
+        # A copy, as a coalesced response is shared with other callers.
+        return sorted(response.corpus, key=lambda x: x.name)
+
+    @traced
+    async def calculate_corpus_size(self, corpus_id: int, deadline: Union[Deadline, float] = None):
+        payload = {'customer_id': self.customer_id, 'corpus_id': corpus_id}
+        return await self.request_util.request("compute-corpus-size", payload, CalculateCorpusSizeResponse,
+                                               deadline=deadline)
+
+    @traced
+    async def read_corpus(self, corpus_id: int, deadline: Union[Deadline, float] = None) -> CorpusInfo:
+        request = ReadCorpusRequest([corpus_id], True, True, True, True, True, True)
+        response = await self.request_util.request("read-corpus", encode(request), ReadCorpusResponse,
+                                                   deadline=deadline)
+        return response.corpora[0]
+
+    async def _create_corpus_inner(self, request: CreateCorpusRequest,
+                                   deadline: Union[Deadline, float] = None) -> CreateCorpusResponse:
+        payload = encode(request)
+        response = await self.request_util.request("create-corpus", payload, CreateCorpusResponse, deadline=deadline)
+        return self._check_create_corpus(response)
+
+    @traced
+    async def create_corpus_d(self, corpus: Corpus, deadline: Union[Deadline, float] = None) -> CreateCorpusResponse:
+        return await self._create_corpus_inner(CreateCorpusRequest(corpus), deadline)
+
+    @traced
+    async def create_corpus(self, name=None, description: str = None, custom_dimensions: List[Dimension] = None,
+                            filter_attributes: List[FilterAttribute] = None,
+                            deadline: Union[Deadline, float] = None) -> CreateCorpusResponse:
+        request = self._build_create_corpus_request(name, description, custom_dimensions, filter_attributes)
+        return await self._create_corpus_inner(request, deadline)
+
+    @traced
+    async def delete_corpus(self, corpus_id: int, deadline: Union[Deadline, float] = None) -> Status:
+        request = DeleteCorpusRequest(self.customer_id, corpus_id)
+        response = await self.request_util.request("delete-corpus", encode(request), DeleteCorpusResponse,
+                                                   deadline=deadline)
+        return response.status
+
+    @traced
+    async def create_api_key(self, corpus_id: Union[int, List], key_type: ApiKeyType, description: str = None,
+                             deadline: Union[Deadline, float] = None):
+        payload = self._build_create_api_key_payload(corpus_id, key_type, description)
+        response = await self.request_util.request("create-api-key", payload, CreateApiKeyResponse, deadline=deadline)
+        return self._check_create_api_key(response)
+
+    @traced
+    async def delete_api_key(self, key_id: Union[str, List[str]], deadline: Union[Deadline, float] = None):
+        payload = self._build_delete_api_key_payload(key_id)
+        response = await self.request_util.request("delete-api-key", payload, ModifyApiKeyResponse, deadline=deadline)
+        self._check_ok(response)
+
+    @traced
+    async def update_api_key(self, key_id: str, enabled: bool, deadline: Union[Deadline, float] = None):
+        payload = {"keyEnablement": [{"keyId": key_id, "enable": enabled}]}
+        response = await self.request_util.request("enable-api-key", payload, ModifyApiKeyResponse, deadline=deadline)
+        self._check_ok(response)
+
+    async def _list_api_keys(self, num_results: int = 10, page: str = None,
+                             read_corpora_info=True, deadline: Deadline = None) -> ListApiKeysResponse:
+        payload = {"numResults": num_results, "pageKey": page, "readCorporaInfo": read_corpora_info}
+        return await self.request_util.request("list-api-keys", payload, ListApiKeysResponse, deadline=deadline)
+
+    @traced
+    async def list_api_keys(self,
+                            # Filters
+                            corpus_id: int = None, enabled: bool = None, key_type: ApiKeyType = None,
+                            key_status: ApiKeyStatus = None, deadline: Union[Deadline, float] = None):
+        """
+        Retrieves all API keys then applies the filters, see AdminService.list_api_keys.
+        """
+        deadline = Deadline.resolve(deadline)
+        api_key_response = await self._list_api_keys(deadline=deadline)
+        api_keys = api_key_response.keyData
+        while api_key_response.pageKey:
+            self.logger.info(f"Getting page [{api_key_response.pageKey}]")
+            api_key_response = await self._list_api_keys(page=api_key_response.pageKey, deadline=deadline)
+            api_keys.extend(api_key_response.keyData)
+
+        return self._filter_api_keys(api_keys, corpus_id, enabled, key_type, key_status)
+
+
 class CorpusBuilder:
 
     corpus: Corpus
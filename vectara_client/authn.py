@@ -1,12 +1,9 @@
-import re
-from urllib.parse import urlparse
-import unittest
-import requests
 import logging
-from authlib.integrations.requests_client import OAuth2Session
 import datetime
-import traceback
 from abc import ABC
+from vectara_client.config import LoggingConfig, TokenConfig
+from vectara_client.eventlog import EventLogger
+from vectara_client.oauth import TokenCache, TokenManager
 
 # TODO This should be discovered from the console
 # TODO Change this file to authc.py!!
@@ -17,16 +14,42 @@ logger = logging.getLogger(__name__)
 
 class BaseAuthUtil(ABC):
 
+    # Whether the request utilities should pass each response to observe().
+    observes_responses = False
+
     def get_headers(self) -> dict:
+        """
+        :return: the authentication headers, which may be shared between calls so must be copied before changing.
+        """
         raise NotImplementedError("You must implement this on a subclass")
 
     def authenticate(self):
         pass
 
+    def observe(self, headers: dict, response, result=None):
+        """
+        Called with the response to each request sent with our headers, if observes_responses.
+
+        :param headers: the request's headers
+        :param response: the requests or httpx response
+        :param result: the decoded body of a 200 response, or the JSON of an error response's body undecoded
+        """
+        pass
+
+    def close(self):
+        pass
+
 class OAuthUtil(BaseAuthUtil):
 
-    def __init__(self, auth_url: str, app_client_id: str, app_client_secret: str, customer_id: str):
+    def __init__(self, auth_url: str, app_client_id: str, app_client_secret: str, customer_id: str,
+                 logging_config: LoggingConfig = None, token_config: TokenConfig = None, session=None):
+        """
+        :param token_config: when tokens are refreshed, defaults to the default TokenConfig
+        :param session: the OAuth2Session to fetch tokens with, by default one is created and re-used for every token
+        """
         self.logger = logging.getLogger(str(__class__.__name__))
+        # getToken runs for every request, so logs through the hot path events.
+        self.events = EventLogger(self.logger, logging_config)
 
         if not customer_id:
             # Putting this in as I'm surprised we also need a customer Id on the header.
@@ -65,13 +88,34 @@ class OAuthUtil(BaseAuthUtil):
         self.expires_at = None
         self.access_token = None
 
-    def authenticate(self):
-        """Connect to the server and get a JWT token."""
+        # One pooled session, so refreshes re-use the connection to the token endpoint.
+        if session:
+            self.session = session
+            self._owns_session = False
+        else:
+            # Imported here, authlib and the cryptography it loads are only needed for OAuth2.
+            from authlib.integrations.requests_client import OAuth2Session
+            self.session = OAuth2Session(self.app_client_id, self.app_client_secret, scope="")
+            self._owns_session = True
+        self.tokens = TokenManager(self._fetch_token, token_config)
+        if token_config and token_config.cache:
+            self.token_cache = TokenCache(customer_id, app_client_id, self.auth_url, app_client_secret, token_config)
+        else:
+            self.token_cache = None
+        # The headers built for the current token, replaced together so get_headers needs no lock.
+        self._headers = (None, None)
 
-#        try:
-        session = OAuth2Session(
-            self.app_client_id, self.app_client_secret, scope="")
-        token = session.fetch_token(self.auth_url, grant_type="client_credentials")
+    def authenticate(self):
+        """Connect to the server and get a JWT token, replacing the current one."""
+        self.tokens.refresh(self.tokens.token)
+
+    def _fetch_token(self) -> dict:
+        if self.token_cache:
+            current = self.tokens.token
+            token = self.token_cache.get_or_fetch(self._request_token,
+                                                  stale=current.access_token if current else None)
+        else:
+            token = self._request_token()
         self.expires_at = token["expires_at"]
         self.expires_in = token["expires_in"]
         self.access_token = token["access_token"]
@@ -79,42 +123,43 @@ class OAuthUtil(BaseAuthUtil):
         self.expiry_ts = datetime.datetime.fromtimestamp(self.expires_at)
         self.expiry_txt = self.expiry_ts.strftime("%m/%d/%Y, %H:%M:%S")
         self.logger.info(f"Received OAuth token, will expire [{self.expiry_txt}]")
+        return token
 
-    def getToken(self):
-        """Get the current token or get a new one if expired"""
-        now = datetime.datetime.now()
-        self.logger.info(f"Current timestamp {now}")
-
-        if self.expiry_ts:
-            self.logger.info(f"Expiry            {self.expiry_ts}")
-
-        if not self.access_token:
-            self.logger.info("First time requesting token, authenticating")
-            self.authenticate()
-        if (now > (self.expiry_ts - datetime.timedelta(seconds=5))):
-            self.logger.info("Token expiry within 5 seconds, refreshing")
-            self.authenticate()
-        else:
-            self.logger.info(f"Already authenticated with non-expired token, expiry is [{self.expires_at}]")
+    def _request_token(self) -> dict:
+        return self.session.fetch_token(self.auth_url, grant_type="client_credentials")
 
-        return self.access_token
+    def getToken(self):
+        """Get the current token or get a new one if expired, see TokenManager.get"""
+        token = self.tokens.get()
+        self.events.log("auth.token", "Using OAuth token which expires at [%s]", token.expires_at,
+                        expires_at=token.expires_at)
+        return token.access_token
 
     def get_headers(self) -> dict:
         token = self.getToken()
 
-        return {
-            "Customer-Id": self.customer_id,
-            "Authorization": f"Bearer {token}"
-        }
+        cached_token, headers = self._headers
+        if cached_token is not token:
+            headers = {
+                "Customer-Id": self.customer_id,
+                "Authorization": f"Bearer {token}"
+            }
+            self._headers = (token, headers)
+        return headers
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
 
 class ApiKeyUtil(BaseAuthUtil):
 
     def __init__(self, customer_id, api_key):
         self.customer_id = customer_id
         self.api_key = api_key
-
-    def get_headers(self):
-        return {
+        self._headers = {
             "customer-id": self.customer_id,
             "x-api-key": self.api_key
-        }
\ No newline at end of file
+        }
+
+    def get_headers(self):
+        return self._headers
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Spreads requests over several credentials of one account, so throughput isn't bound by the limits of one API key.
+
+PooledAuthUtil wraps an ApiKeyUtil or OAuthUtil for each credential and hands out the headers of one of them for
+every request attempt, chosen by policy:
+
+- "round-robin" takes the credentials in turn.
+- "least-recently-throttled" takes the credential which was throttled longest ago, or never, and of those the one
+  which has sent the fewest requests.
+- "weighted" sends each credential a share of requests in proportion to its weight, interleaved rather than in runs.
+
+RequestUtil and AsyncRequestUtil pass every response back to observe(). A 429 takes the credential which sent the
+request out of rotation for the response's Retry-After, or PooledAuthConfig.throttle_cooldown without one, and an
+EXPIRED_API_KEY or DISABLED_API_KEY status for rejected_cooldown, whether in a 200 response or, as a revoked key is
+usually rejected, the body of a 401 or 403. Should every credential be out of rotation, the
+one due back soonest is used rather than failing the request.
+"""
+from vectara_client.authn import BaseAuthUtil
+from vectara_client.config import PooledAuthConfig
+from vectara_client.retry import _find_statuses, _to_status_code, parse_retry_after
+from vectara_client.status import StatusCode
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+import logging
+import time
+
+POLICIES = ("round-robin", "least-recently-throttled", "weighted")
+
+# Statuses which mean the credential itself can't be used, rather than anything about the request.
+REJECTED_CODES = frozenset([StatusCode.EXPIRED_API_KEY, StatusCode.DISABLED_API_KEY])
+
+
+def _body_codes(body) -> List[Optional[StatusCode]]:
+    """
+    :return: the status codes of an undecoded JSON body, either its own {"code": ...} or those of its "status",
+        a single status or a list of them, by number or name.
+    """
+    if not isinstance(body, dict):
+        return []
+    status = body.get("status")
+    statuses = [body] + (status if isinstance(status, list) else [status])
+    codes = []
+    for status in statuses:
+        code = status.get("code") if isinstance(status, dict) else None
+        if isinstance(code, str) and code in StatusCode.__members__:
+            codes.append(StatusCode[code])
+        elif code is not None:
+            codes.append(_to_status_code(code))
+    return codes
+
+
+def _secret(headers) -> Optional[str]:
+    """
+    :return: the header value which identifies the credential a request was sent with.
+    """
+    return headers.get("x-api-key") or headers.get("Authorization")
+
+
+@dataclass
+class CredentialStats:
+    """
+    Counters for one credential.
+    """
+    # Request attempts sent with the credential.
+    requests: int = 0
+    # Responses which took it out of rotation, with a 429 and with an EXPIRED_API_KEY or DISABLED_API_KEY status.
+    throttled: int = 0
+    rejected: int = 0
+    # Whether it is out of rotation now.
+    sidelined: bool = False
+
+
+class PooledCredential:
+    """
+    One credential of a PooledAuthUtil, which serializes access to it.
+    """
+
+    def __init__(self, name: str, auth_util: BaseAuthUtil, weight: int = 1):
+        """
+        :param name: names the credential in PooledAuthUtil.stats()
+        :param auth_util: provides the credential's headers
+        :param weight: its share of requests under the "weighted" policy
+        """
+        if weight < 1:
+            raise TypeError(f"The weight of credential [{name}] must be at least 1, not {weight}")
+        self.name = name
+        self.auth_util = auth_util
+        self.weight = weight
+        self.stats = CredentialStats()
+        # Both from the pool's clock.
+        self.sidelined_until = float("-inf")
+        self.last_throttled = float("-inf")
+        # The running total of the smooth weighted round-robin.
+        self.current_weight = 0
+        # The identifying header value last handed out, see _secret.
+        self.secret = None
+
+
+class PooledAuthUtil(BaseAuthUtil):
+    """
+    Thread-safe pool of credentials, shared by every thread or task using the client.
+    """
+
+    observes_responses = True
+
+    def __init__(self, credentials: List[PooledCredential], config: PooledAuthConfig = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param credentials: the pooled credentials, each with its own auth util
+        :param config: the policy and cooldowns, its credentials are ignored in favour of credentials. If None
+            round-robin with the default cooldowns of PooledAuthConfig is used.
+        :param clock: injectable for tests, returns seconds.
+        :raises TypeError: for an empty pool, duplicate names or an unknown policy
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not credentials:
+            raise TypeError("A credential pool needs at least one credential")
+        names = [credential.name for credential in credentials]
+        if len(set(names)) != len(names):
+            raise TypeError(f"The names of pooled credentials must be unique, not {names}")
+        self.config = config if config else PooledAuthConfig(credentials=[])
+        if self.config.policy not in POLICIES:
+            raise TypeError(f"Unknown credential pool policy [{self.config.policy}], expected one of {list(POLICIES)}")
+        self.credentials = credentials
+        self.clock = clock
+        self._select = {
+            "round-robin": self._round_robin,
+            "least-recently-throttled": self._least_recently_throttled,
+            "weighted": self._weighted
+        }[self.config.policy]
+        self._turn = 0
+        self._by_secret: Dict[str, PooledCredential] = {}
+        self._lock = Lock()
+
+    def get_headers(self) -> dict:
+        """
+        :return: the headers of the next credential, called for every attempt so retries and hedges rotate too.
+        """
+        with self._lock:
+            credential = self._choose(self.clock())
+            credential.stats.requests += 1
+        # Outside the lock, as an OAuthUtil may have to wait for a token.
+        headers = credential.auth_util.get_headers()
+        secret = _secret(headers)
+        if credential.secret != secret:
+            with self._lock:
+                # Forget a replaced OAuth token, so the map doesn't grow with every refresh.
+                self._by_secret.pop(credential.secret, None)
+                credential.secret = secret
+                self._by_secret[secret] = credential
+        return headers
+
+    def _choose(self, now: float) -> PooledCredential:
+        available = [credential for credential in self.credentials if credential.sidelined_until <= now]
+        if not available:
+            return min(self.credentials, key=lambda credential: credential.sidelined_until)
+        return self._select(available)
+
+    def _round_robin(self, available: List[PooledCredential]) -> PooledCredential:
+        credential = available[self._turn % len(available)]
+        self._turn += 1
+        return credential
+
+    @staticmethod
+    def _least_recently_throttled(available: List[PooledCredential]) -> PooledCredential:
+        return min(available, key=lambda credential: (credential.last_throttled, credential.stats.requests))
+
+    @staticmethod
+    def _weighted(available: List[PooledCredential]) -> PooledCredential:
+        # Smooth weighted round-robin, weights 5, 1, 1 give a, a, b, a, c, a, a rather than a run of five.
+        total = 0
+        chosen = None
+        for credential in available:
+            credential.current_weight += credential.weight
+            total += credential.weight
+            if chosen is None or credential.current_weight > chosen.current_weight:
+                chosen = credential
+        chosen.current_weight -= total
+        return chosen
+
+    def observe(self, headers: dict, response, result=None):
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            cooldown = retry_after if retry_after is not None else self.config.throttle_cooldown
+            self._sideline(headers, cooldown, "429 TOO_MANY_REQUESTS", throttled=True)
+        elif result is not None:
+            if isinstance(result, dict):
+                codes = _body_codes(result)
+            else:
+                codes = [_to_status_code(status.code) for status in _find_statuses(result)]
+            for code in codes:
+                if code in REJECTED_CODES:
+                    self._sideline(headers, self.config.rejected_cooldown, code.name, throttled=False)
+                    return
+
+    def _sideline(self, headers: dict, cooldown: float, reason: str, throttled: bool):
+        with self._lock:
+            credential = self._by_secret.get(_secret(headers))
+            if credential is None:
+                return
+            now = self.clock()
+            credential.sidelined_until = max(credential.sidelined_until, now + cooldown)
+            if throttled:
+                credential.stats.throttled += 1
+                credential.last_throttled = now
+            else:
+                credential.stats.rejected += 1
+        self.logger.warning(f"Taking credential [{credential.name}] out of rotation for [{cooldown}s] after "
+                            f"{reason}")
+
+    def stats(self) -> Dict[str, CredentialStats]:
+        """
+        :return: a copy of the counters keyed by credential name.
+        """
+        now = self.clock()
+        with self._lock:
+            return {credential.name: replace(credential.stats, sidelined=credential.sidelined_until > now)
+                    for credential in self.credentials}
+
+    def authenticate(self):
+        for credential in self.credentials:
+            credential.auth_util.authenticate()
+
+    def close(self):
+        for credential in self.credentials:
+            credential.auth_util.close()
@@ -0,0 +1,317 @@
+"""
+Record and replay of HTTP exchanges, so the client can be tested and benchmarked without a Vectara account.
+
+A cassette is a gzip compressed file of JSON lines, one per request/response pair. With TransportConfig.cassette in
+"record" mode every exchange made through the real transport is appended to it, and in "replay" mode responses are
+served from it without any network, optionally after the recorded or a synthetic latency.
+
+Requests are matched on their method, the URL path and query (not the host, so a cassette recorded against
+api.vectara.io replays against any base_url) and the normalized JSON body: decompressed, with sorted keys and
+without CassetteConfig.ignore_fields. Headers are never matched on or recorded, so cassettes hold no credentials.
+Multipart uploads are matched on method and path alone. Identical requests are answered with their recorded
+responses in order, starting over once they run out so a benchmark can loop over a short recording.
+
+The blocking client mounts a CassetteRecordAdapter or CassetteReplayAdapter on its session, the asyncio client uses
+an AsyncCassetteClient in place of its httpx client.
+"""
+from vectara_client.config import CassetteConfig
+from http import HTTPStatus
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import random
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Response headers which describe the original transfer rather than the replayed body.
+_TRANSFER_HEADERS = frozenset(["content-encoding", "content-length", "transfer-encoding", "connection",
+                               "keep-alive", "set-cookie", "date"])
+
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _reason(status: int) -> str:
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ""
+
+
+class CassetteMissError(LookupError):
+    """
+    Raised in replay mode for a request the cassette has no recording of.
+    """
+    pass
+
+
+def _decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding or encoding == "identity":
+        return body
+    elif encoding == "gzip":
+        return gzip.decompress(body)
+    elif encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(body)
+    elif encoding == "br":
+        import brotli
+        return brotli.decompress(body)
+    raise TypeError(f"Unknown Content-Encoding [{encoding}]")
+
+
+def _strip(value, ignore_fields: frozenset):
+    if isinstance(value, dict):
+        return {key: _strip(item, ignore_fields) for key, item in value.items() if key not in ignore_fields}
+    elif isinstance(value, list):
+        return [_strip(item, ignore_fields) for item in value]
+    return value
+
+
+def normalize(body, content_type: Optional[str], content_encoding: Optional[str] = None,
+              ignore_fields: frozenset = frozenset()):
+    """
+    :return: the JSON body as decoded objects without ignore_fields, None for an empty or non-JSON body.
+    """
+    if not body or not isinstance(body, (bytes, str)):
+        return None
+    if content_type and "json" not in content_type:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        decoded = json.loads(_decompress(body, content_encoding))
+    except ValueError:
+        return None
+    return _strip(decoded, ignore_fields)
+
+
+def match_key(method: str, url: str, normalized) -> Tuple[str, str, str]:
+    split = urlsplit(url)
+    path = f"{split.path}?{split.query}" if split.query else split.path
+    body = json.dumps(normalized, sort_keys=True, separators=(",", ":")) if normalized is not None else ""
+    return method.upper(), path, body
+
+
+class Cassette:
+    """
+    The recorded exchanges of one file, thread-safe for concurrent recording or replay.
+    """
+
+    def __init__(self, config: CassetteConfig):
+        if config.mode not in ("record", "replay"):
+            raise TypeError(f"Unknown cassette mode [{config.mode}], expected \"record\" or \"replay\"")
+        if not config.path:
+            raise TypeError("A cassette requires a path")
+        if config.latency not in ("none", "recorded", "synthetic"):
+            raise TypeError(f"Unknown cassette latency [{config.latency}], expected \"none\", \"recorded\" or "
+                            f"\"synthetic\"")
+        self.config = config
+        self.ignore_fields = frozenset(config.ignore_fields)
+        self._lock = Lock()
+        self._entries: Dict[Tuple[str, str, str], List[dict]] = {}
+        self._played: Dict[Tuple[str, str, str], int] = {}
+        self._file = None
+        self._random = random.Random(config.seed)
+        if config.mode == "record":
+            self._file = gzip.open(config.path, "wt", encoding="utf-8")
+        else:
+            self._load()
+
+    def _load(self):
+        count = 0
+        with gzip.open(self.config.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    # ignore_fields may differ from when the cassette was recorded.
+                    key = match_key(entry["method"], entry["path"], _strip(entry["request"], self.ignore_fields))
+                    self._entries.setdefault(key, []).append(entry)
+                    count += 1
+        logger.debug(f"Loaded [{count}] exchanges from cassette [{self.config.path}]")
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def normalize(self, body, headers) -> Optional[object]:
+        headers = headers or {}
+        return normalize(body, headers.get("Content-Type"), headers.get("Content-Encoding"), self.ignore_fields)
+
+    def record(self, method: str, url: str, request_headers, request_body, status: int, response_headers,
+               content: bytes, latency: float):
+        split = urlsplit(url)
+        entry = {
+            "method": method.upper(),
+            "path": f"{split.path}?{split.query}" if split.query else split.path,
+            "request": self.normalize(request_body, request_headers),
+            "status": status,
+            "headers": {key: value for key, value in response_headers.items()
+                        if key.lower() not in _TRANSFER_HEADERS},
+            "latency": round(latency, 6)
+        }
+        try:
+            entry["body"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body_base64"] = base64.b64encode(content).decode("ascii")
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def play(self, method: str, url: str, headers, body) -> dict:
+        """
+        :return: the next recorded exchange for this request.
+        :raises CassetteMissError: if there is none.
+        """
+        key = match_key(method, url, self.normalize(body, headers))
+        entries = self._entries.get(key)
+        if not entries:
+            raise CassetteMissError(f"No recording of {key[0]} {key[1]} with body {key[2][:200]} in cassette "
+                                    f"[{self.config.path}]")
+        with self._lock:
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+        return entries[played % len(entries)]
+
+    def latency(self, entry: dict) -> float:
+        """
+        :return: seconds to wait before answering with entry.
+        """
+        if self.config.latency == "recorded":
+            return entry["latency"]
+        elif self.config.latency == "synthetic":
+            with self._lock:
+                jitter = self._random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+            return max(0.0, self.config.latency_ms + jitter) / 1000.0
+        return 0.0
+
+    @staticmethod
+    def content(entry: dict) -> bytes:
+        if "body_base64" in entry:
+            return base64.b64decode(entry["body_base64"])
+        return entry["body"].encode("utf-8")
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class CassetteRecordAdapter(BaseAdapter):
+    """
+    requests transport adapter which sends through another adapter, recording each exchange.
+    """
+
+    def __init__(self, cassette: Cassette, adapter: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        start = time.perf_counter()
+        response = self.adapter.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                     proxies=proxies)
+        # Reads the body, so the latency includes receiving it.
+        content = response.content
+        self.cassette.record(request.method, request.url, request.headers, request.body, response.status_code,
+                             response.headers, content, time.perf_counter() - start)
+        return response
+
+    def close(self):
+        self.adapter.close()
+        self.cassette.close()
+
+
+class _ReplayRaw:
+    """
+    Stands in for the urllib3 response on requests.Response.raw, replayed bodies are never compressed.
+    """
+
+    def __init__(self, num_bytes: int):
+        self.num_bytes = num_bytes
+
+    def tell(self) -> int:
+        return self.num_bytes
+
+    def close(self):
+        pass
+
+
+class CassetteReplayAdapter(BaseAdapter):
+    """
+    requests transport adapter which answers from a cassette without any network.
+    """
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body
+        if hasattr(body, "read"):
+            # Drain streamed uploads as the network would, e.g. so the upload progress bar completes.
+            while body.read(_UPLOAD_CHUNK_SIZE):
+                pass
+        entry = self.cassette.play(request.method, request.url, request.headers, body)
+        delay = self.cassette.latency(entry)
+        if delay:
+            time.sleep(delay)
+
+        content = Cassette.content(entry)
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.reason = _reason(entry["status"])
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = content
+        response._content_consumed = True
+        response.raw = _ReplayRaw(len(content))
+        return response
+
+    def close(self):
+        pass
+
+
+class AsyncCassetteClient:
+    """
+    Drop in for the httpx.AsyncClient used by AsyncRequestUtil, recording the exchanges of client or, without one,
+    replaying them.
+    """
+
+    def __init__(self, cassette: Cassette, client=None):
+        from vectara_client.transport import _import_httpx
+        self.httpx = _import_httpx()
+        self.cassette = cassette
+        self.client = client
+
+    async def request(self, method: str, url: str, headers=None, content=None, **kwargs):
+        if self.client is not None:
+            start = time.perf_counter()
+            response = await self.client.request(method, url, headers=headers, content=content, **kwargs)
+            self.cassette.record(method, url, headers, content, response.status_code, response.headers,
+                                 response.content, time.perf_counter() - start)
+            return response
+
+        entry = self.cassette.play(method, url, headers, content)
+        delay = self.cassette.latency(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        return self.httpx.Response(entry["status"], headers=entry["headers"], content=Cassette.content(entry),
+                                   request=self.httpx.Request(method, url))
+
+    async def post(self, url: str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.cassette.close()
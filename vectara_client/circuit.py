@@ -0,0 +1,281 @@
+"""
+Per operation circuit breakers for RequestUtil and AsyncRequestUtil.
+
+Each operation's circuit starts closed and tracks the outcome of its most recent calls. Once the failure rate
+(connection errors, failure status codes and optionally slow calls) reaches the policy's threshold the circuit opens,
+and calls fail fast with CircuitOpenError rather than each waiting for its own failure. After open_duration a few
+trial calls are let through (half-open), closing the circuit if they all succeed or re-opening it if any fail.
+
+State changes are reported to listeners, e.g. so CorpusManager.batch_index can pause its workers, and wait() blocks
+until an operation's circuit would let a call through.
+"""
+from vectara_client.config import CircuitBreakerConfig, CircuitBreakerPolicyConfig
+from vectara_client.error import CircuitOpenError
+from vectara_client.retry import _find_statuses, _is_transport_error, _to_status_code
+from vectara_client.status import StatusCode
+from collections import deque
+from enum import Enum
+from threading import Condition
+from typing import Callable, List, Optional, TypeVar
+import logging
+import time
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+# Called with the operation, the previous state and the new state.
+CircuitListener = Callable[[str, CircuitState, CircuitState], None]
+
+
+class _Circuit:
+    """
+    The state of one operation's circuit, guarded by the CircuitBreaker's condition.
+    """
+
+    def __init__(self, policy: CircuitBreakerPolicyConfig):
+        self.policy = policy
+        self.state = CircuitState.CLOSED
+        self.outcomes = deque(maxlen=policy.window)
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials_in_flight = 0
+        self.trial_successes = 0
+
+    def record(self, failed: bool):
+        if len(self.outcomes) == self.outcomes.maxlen and self.outcomes[0]:
+            self.failures -= 1
+        self.outcomes.append(failed)
+        if failed:
+            self.failures += 1
+
+    def should_open(self) -> bool:
+        return (len(self.outcomes) >= self.policy.min_calls
+                and self.failures >= self.policy.failure_rate * len(self.outcomes))
+
+    def reset(self):
+        self.outcomes.clear()
+        self.failures = 0
+        self.trials_in_flight = 0
+        self.trial_successes = 0
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breakers keyed by operation, shared by every thread or task using the request utility.
+    """
+
+    def __init__(self, config: CircuitBreakerConfig = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param config: the breaker policies, if None the defaults from CircuitBreakerConfig are used.
+        :param clock: injectable for tests, returns seconds.
+        :raises TypeError: if a policy names an unknown StatusCode
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = CircuitBreakerConfig()
+        self.config = config
+        self.clock = clock
+
+        self._failure_codes = {}
+        for operation, policy in [(None, config.default)] + list(config.operations.items()):
+            try:
+                self._failure_codes[operation] = frozenset(StatusCode[name] for name in policy.failure_codes)
+            except KeyError as e:
+                raise TypeError(f"Unknown StatusCode {e} in circuit breaker policy for operation [{operation}]") \
+                    from None
+
+        self._circuits = {}
+        self._listeners: List[CircuitListener] = []
+        self._condition = Condition()
+
+    def add_listener(self, listener: CircuitListener):
+        """
+        Registers a callback for every state change, called with the operation, old state and new state. It is
+        called on the thread making the request, so should be quick and must not make requests itself.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: CircuitListener):
+        self._listeners.remove(listener)
+
+    def policy_for(self, operation: str) -> CircuitBreakerPolicyConfig:
+        return self.config.operations.get(operation, self.config.default)
+
+    def state(self, operation: str) -> CircuitState:
+        with self._condition:
+            circuit = self._circuits.get(operation)
+            return circuit.state if circuit else CircuitState.CLOSED
+
+    def wait(self, operation: str, timeout: float = None) -> bool:
+        """
+        Blocks until the circuit for operation would let a call through, e.g. to pause a batch job while it is open.
+
+        :param timeout: the most seconds to wait, None waits indefinitely
+        :return: True if a call may now be made, False if we timed out
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            while True:
+                circuit = self._circuit(operation)
+                if circuit.state == CircuitState.CLOSED:
+                    return True
+                elif circuit.state == CircuitState.OPEN:
+                    wait = circuit.opened_at + circuit.policy.open_duration - self.clock()
+                    if wait <= 0:
+                        return True
+                elif circuit.trials_in_flight + circuit.trial_successes < circuit.policy.half_open_calls:
+                    return True
+                else:
+                    # Half-open with every trial taken, wait to hear how they went.
+                    wait = None
+
+                if deadline is not None:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+
+    def call(self, operation: str, send: Callable[[], T]) -> T:
+        """
+        Performs one attempt of a request through the circuit for its operation.
+
+        :raises CircuitOpenError: without calling send if the circuit is open.
+        """
+        trial = self._before(operation)
+        start = self.clock()
+        try:
+            result = send()
+        except BaseException as e:
+            # e.g. KeyboardInterrupt, which tells us nothing about the server but must free the trial.
+            failed = self._is_failure_error(operation, e) if isinstance(e, Exception) else None
+            self._after(operation, trial, failed)
+            raise
+        self._after(operation, trial, self._is_failure_result(operation, result, self.clock() - start))
+        return result
+
+    async def call_async(self, operation: str, send) -> T:
+        """
+        asyncio version of call, where send is a coroutine function.
+        """
+        trial = self._before(operation)
+        start = self.clock()
+        try:
+            result = await send()
+        except BaseException as e:
+            # A cancelled call tells us nothing about the server.
+            failed = self._is_failure_error(operation, e) if isinstance(e, Exception) else None
+            self._after(operation, trial, failed)
+            raise
+        self._after(operation, trial, self._is_failure_result(operation, result, self.clock() - start))
+        return result
+
+    def _circuit(self, operation: str) -> _Circuit:
+        circuit = self._circuits.get(operation)
+        if circuit is None:
+            circuit = _Circuit(self.policy_for(operation))
+            self._circuits[operation] = circuit
+        return circuit
+
+    def _before(self, operation: str) -> bool:
+        """
+        :return: whether the call is a half-open trial.
+        :raises CircuitOpenError: if the call may not be made.
+        """
+        change = None
+        with self._condition:
+            circuit = self._circuit(operation)
+            if circuit.state == CircuitState.OPEN:
+                remaining = circuit.opened_at + circuit.policy.open_duration - self.clock()
+                if remaining > 0:
+                    raise CircuitOpenError(f"Circuit for operation [{operation}] is open, retry after "
+                                           f"[{remaining:.1f}s]", operation=operation, retry_after=remaining)
+                change = self._transition(operation, circuit, CircuitState.HALF_OPEN)
+
+            if circuit.state == CircuitState.HALF_OPEN:
+                if circuit.trials_in_flight + circuit.trial_successes >= circuit.policy.half_open_calls:
+                    raise CircuitOpenError(f"Circuit for operation [{operation}] is half-open and its trial calls "
+                                           f"are in progress", operation=operation)
+                circuit.trials_in_flight += 1
+                trial = True
+            else:
+                trial = False
+
+        self._notify(change)
+        return trial
+
+    def _after(self, operation: str, trial: bool, failed: Optional[bool]):
+        """
+        :param failed: None if the call was abandoned, in which case only a trial's slot is released.
+        """
+        change = None
+        with self._condition:
+            circuit = self._circuit(operation)
+            if trial and circuit.state == CircuitState.HALF_OPEN:
+                circuit.trials_in_flight -= 1
+                if failed:
+                    change = self._open(operation, circuit)
+                elif failed is not None:
+                    circuit.trial_successes += 1
+                    if circuit.trial_successes >= circuit.policy.half_open_calls:
+                        circuit.reset()
+                        change = self._transition(operation, circuit, CircuitState.CLOSED)
+                self._condition.notify_all()
+            elif not trial and circuit.state == CircuitState.CLOSED and failed is not None:
+                circuit.record(failed)
+                if failed and circuit.should_open():
+                    change = self._open(operation, circuit)
+            # Otherwise the call started before the last state change, and its outcome is stale.
+
+        self._notify(change)
+
+    def _open(self, operation: str, circuit: _Circuit):
+        circuit.reset()
+        circuit.opened_at = self.clock()
+        return self._transition(operation, circuit, CircuitState.OPEN)
+
+    def _transition(self, operation: str, circuit: _Circuit, state: CircuitState):
+        previous = circuit.state
+        circuit.state = state
+        self._condition.notify_all()
+        return operation, previous, state
+
+    def _notify(self, change):
+        if not change:
+            return
+        operation, previous, state = change
+        log = self.logger.warning if state == CircuitState.OPEN else self.logger.info
+        log(f"Circuit for operation [{operation}] changed from [{previous.value}] to [{state.value}]")
+        for listener in list(self._listeners):
+            try:
+                listener(operation, previous, state)
+            except Exception as e:
+                self.logger.error(f"Circuit listener failed: {e}")
+
+    def _failure_codes_for(self, operation: str):
+        if operation in self.config.operations:
+            return self._failure_codes[operation]
+        else:
+            return self._failure_codes[None]
+
+    def _is_failure_error(self, operation: str, e: Exception) -> bool:
+        response = getattr(e, "response", None)
+        if response is not None and getattr(response, "status_code", None) is not None:
+            return _to_status_code(response.status_code) in self._failure_codes_for(operation)
+        # Other errors (e.g. a bad payload) are our own, not a sign the server is struggling.
+        return _is_transport_error(e)
+
+    def _is_failure_result(self, operation: str, result, duration: float) -> bool:
+        slow_call_duration = self.policy_for(operation).slow_call_duration
+        if slow_call_duration is not None and duration > slow_call_duration:
+            return True
+        failure_codes = self._failure_codes_for(operation)
+        return any(_to_status_code(status.code) in failure_codes for status in _find_statuses(result))
@@ -0,0 +1,104 @@
+"""
+JSON codecs used for request and response bodies.
+
+Codecs work on bytes so responses are decoded straight from the body without first building a str, which with
+requests also skips charset detection. orjson is used when installed, otherwise we fall back to the standard library.
+"""
+from abc import ABC
+from typing import Any, Union
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BaseJsonCodec(ABC):
+    name = None
+
+    def dumps(self, obj: Any) -> bytes:
+        """
+        :return: the compact UTF-8 encoded JSON for the given object
+        """
+        raise NotImplementedError("You must implement this on a subclass")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        :param data: UTF-8 encoded JSON, a str is also accepted
+        """
+        raise NotImplementedError("You must implement this on a subclass")
+
+    def dumps_pretty(self, obj: Any) -> str:
+        """
+        Indented JSON for our debug logs, not on the hot path.
+        """
+        return json.dumps(obj, indent=4)
+
+
+class StdlibJsonCodec(BaseJsonCodec):
+    name = "json"
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        self._decoder = json.JSONDecoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode("utf-8")
+        return self._decoder.decode(data)
+
+
+class OrjsonCodec(BaseJsonCodec):
+    name = "orjson"
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError("The orjson codec requires orjson, install it with: pip install orjson") from None
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        # Allow int keys like json.dumps does.
+        return self._orjson.dumps(obj, option=self._orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+    def dumps_pretty(self, obj: Any) -> str:
+        return self._orjson.dumps(obj, option=self._orjson.OPT_INDENT_2).decode("utf-8")
+
+
+def create_codec(name: str = None) -> BaseJsonCodec:
+    """
+    :param name: "orjson", "json" for the standard library, or None/"auto" for orjson if installed
+    :return: the codec
+    :raises TypeError: if the name is not known
+    """
+    if not name or name == "auto":
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            logger.debug("orjson is not installed, using the standard library JSON codec")
+            return StdlibJsonCodec()
+    elif name == "orjson":
+        return OrjsonCodec()
+    elif name == "json":
+        return StdlibJsonCodec()
+    else:
+        raise TypeError(f"Unknown JSON codec [{name}], expected auto, orjson or json")
+
+
+_default_codec = None
+
+
+def default_codec() -> BaseJsonCodec:
+    """
+    The automatically selected codec, shared by code without an injected one (e.g. our config loaders).
+    """
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = create_codec()
+    return _default_codec
@@ -0,0 +1,155 @@
+"""
+Compression of request bodies and accounting of the bytes saved, used by RequestUtil and AsyncRequestUtil.
+
+Request bodies at or above CompressionConfig.min_size are compressed with gzip (or zstd/brotli if installed) and sent
+with a Content-Encoding header. Response decompression is left to requests/httpx, which already advertise every
+encoding they can decode; we only count the bytes on the wire against the decoded size.
+"""
+from vectara_client.config import CompressionConfig
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+import gzip
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEVELS = {
+    "gzip": 6,
+    "zstd": 3,
+    "br": 5
+}
+
+
+@dataclass
+class CompressionStats:
+    """
+    Byte counts for one operation, where *_bytes are the uncompressed sizes and *_wire_bytes what was transferred.
+    """
+    requests: int = 0
+    requests_compressed: int = 0
+    request_bytes: int = 0
+    request_wire_bytes: int = 0
+    responses: int = 0
+    responses_compressed: int = 0
+    response_bytes: int = 0
+    response_wire_bytes: int = 0
+
+    @property
+    def request_saved_bytes(self) -> int:
+        return self.request_bytes - self.request_wire_bytes
+
+    @property
+    def response_saved_bytes(self) -> int:
+        return self.response_bytes - self.response_wire_bytes
+
+
+def _create_compress_fn(encoding: str, level: int) -> Callable[[bytes], bytes]:
+    if encoding == "gzip":
+        # A fixed mtime so the same payload always compresses to the same bytes.
+        return lambda body: gzip.compress(body, compresslevel=level, mtime=0)
+    elif encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression requires zstandard, install it with: pip install zstandard") from None
+        compressor = zstandard.ZstdCompressor(level=level)
+        lock = Lock()
+
+        def compress_zstd(body: bytes) -> bytes:
+            # A ZstdCompressor is not thread-safe.
+            with lock:
+                return compressor.compress(body)
+
+        return compress_zstd
+    elif encoding == "br":
+        try:
+            import brotli
+        except ImportError:
+            raise ImportError("br compression requires brotli, install it with: pip install brotli") from None
+        return lambda body: brotli.compress(body, quality=level)
+    else:
+        raise TypeError(f"Unknown request encoding [{encoding}], expected gzip, zstd, br or identity")
+
+
+class Compressor:
+    """
+    Thread-safe request compressor which keeps per operation byte counters for both requests and responses.
+    """
+
+    def __init__(self, config: CompressionConfig = None):
+        """
+        :param config: the compression settings, if None requests are sent uncompressed but still counted
+        :raises TypeError: if the request encoding is not known
+        :raises ImportError: if the library for the request encoding is not installed
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config
+        self.accept_compressed = config.accept_compressed if config else True
+
+        if config and config.request_encoding != "identity":
+            self.request_encoding = config.request_encoding
+            level = config.level if config.level is not None else DEFAULT_LEVELS.get(config.request_encoding)
+            self._compress = _create_compress_fn(config.request_encoding, level)
+            self._min_size = config.min_size
+        else:
+            self.request_encoding = None
+            self._compress = None
+            self._min_size = None
+
+        self._stats: Dict[str, CompressionStats] = {}
+        self._lock = Lock()
+
+    def compress(self, operation: str, body: bytes) -> Tuple[bytes, Optional[str]]:
+        """
+        :return: the body to send, compressed if worthwhile, and its Content-Encoding (None if sent as is)
+        """
+        encoding = None
+        wire_body = body
+        if self._compress and len(body) >= self._min_size:
+            compressed = self._compress(body)
+            # Already compact bodies (e.g. mostly base64) can grow, in which case send the original.
+            if len(compressed) < len(body):
+                wire_body = compressed
+                encoding = self.request_encoding
+
+        with self._lock:
+            stats = self._stats_for(operation)
+            stats.requests += 1
+            stats.request_bytes += len(body)
+            stats.request_wire_bytes += len(wire_body)
+            if encoding:
+                stats.requests_compressed += 1
+
+        if encoding:
+            self.logger.debug(f"Compressed {operation} request from {len(body)} to {len(wire_body)} bytes")
+        return wire_body, encoding
+
+    def record_response(self, operation: str, wire_bytes: Optional[int], body_bytes: int):
+        """
+        :param wire_bytes: the bytes received before decompression, None if the transport doesn't report it
+        :param body_bytes: the decoded body size
+        """
+        if wire_bytes is None:
+            wire_bytes = body_bytes
+        with self._lock:
+            stats = self._stats_for(operation)
+            stats.responses += 1
+            stats.response_bytes += body_bytes
+            stats.response_wire_bytes += wire_bytes
+            if wire_bytes < body_bytes:
+                stats.responses_compressed += 1
+
+    def stats(self) -> Dict[str, CompressionStats]:
+        """
+        :return: a copy of the counters keyed by operation, e.g. stats()["index"].request_saved_bytes
+        """
+        with self._lock:
+            return {operation: replace(stats) for operation, stats in self._stats.items()}
+
+    def _stats_for(self, operation: str) -> CompressionStats:
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = CompressionStats()
+            self._stats[operation] = stats
+        return stats
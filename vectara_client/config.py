@@ -1,10 +1,14 @@
 import logging
 from abc import ABC
-from dataclasses import dataclass
-from dacite import from_dict, Config, UnexpectedDataError, UnionMatchError
-from typing import Optional, Union, Any
+from dataclasses import dataclass, field
+from dacite import from_dict, Config, DaciteError, UnexpectedDataError, UnionMatchError
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Hashable, Optional, Union, Any, List, Dict
+import copy
 import json
-import yaml
+import os
+from vectara_client.codec import default_codec
 from os import path, sep
 from pathlib import Path
 
@@ -43,6 +47,323 @@ class OAuth2AuthConfig(BaseAuthConfig):
         pass
 
 
+@dataclass
+class PooledCredentialConfig:
+    """
+    One credential of a PooledAuthConfig, either an api_key or an OAuth2 app_client_id and app_client_secret.
+    """
+    api_key: Optional[str] = None
+    app_client_id: Optional[str] = None
+    app_client_secret: Optional[str] = None
+    auth_url: Optional[str] = None
+    # Names the credential in the usage counters, by default its position, e.g. "credential-0".
+    name: Optional[str] = None
+    # The credential's share of requests under the "weighted" policy.
+    weight: int = 1
+
+
+@dataclass
+class PooledAuthConfig(BaseAuthConfig):
+    """
+    Spreads requests over several API keys and/or OAuth2 apps of one account, see vectara_client.authpool.
+    """
+    credentials: List[PooledCredentialConfig]
+    # "round-robin", "least-recently-throttled" or "weighted".
+    policy: str = "round-robin"
+    # Seconds a credential is taken out of rotation after a 429, unless the response's Retry-After says otherwise.
+    throttle_cooldown: float = 10.0
+    # Seconds a credential is taken out of rotation after an EXPIRED_API_KEY or DISABLED_API_KEY status.
+    rejected_cooldown: float = 300.0
+
+    def getAuthType(self) -> str:
+        return "Pooled"
+
+
+@dataclass
+class CassetteConfig:
+    """
+    Records every request/response pair to a cassette, or replays them from it without any network, see
+    vectara_client.cassette.
+    """
+    # "record" sends requests as usual and writes them to path, "replay" answers from path.
+    mode: str
+    path: str
+    # How long a replayed response takes, "none", "recorded" or "synthetic" (latency_ms plus or minus jitter_ms).
+    latency: str = "none"
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Seeds the synthetic jitter, so replays are repeatable.
+    seed: int = 0
+    # Payload fields, at any depth, which are not compared when matching a request.
+    ignore_fields: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TransportConfig:
+    """
+    Tuning for the pooled HTTP transport owned by RequestUtil.
+
+    The defaults keep connections alive so repeated calls skip the TCP/TLS handshake to api.vectara.io.
+    """
+    keep_alive: bool = True
+    # Number of per-host connection pools to cache.
+    pool_connections: int = 10
+    # Maximum number of connections kept open to a single host.
+    pool_maxsize: int = 10
+    # Whether to wait for a free connection when pool_maxsize is reached rather than opening a throwaway one.
+    pool_block: bool = False
+    # Multiplex requests over a few HTTP/2 connections (requires httpx[http2]), the pool_* settings are then unused.
+    http2: bool = False
+    http2_connections: int = 2
+    # In-flight requests allowed on each HTTP/2 connection, also capped by the server's SETTINGS_MAX_CONCURRENT_STREAMS
+    # and at 100 by httpx. Further requests wait for a free stream.
+    http2_max_concurrent_streams: int = 100
+    # Speak HTTP/2 without negotiating it, only for cleartext (http://) stand-ins or local proxies.
+    http2_prior_knowledge: bool = False
+    # Record or replay every exchange instead of only sending it.
+    cassette: Optional[CassetteConfig] = None
+
+
+@dataclass
+class TimeoutConfig:
+    """
+    Per attempt timeouts for RequestUtil, in seconds. A deadline passed to a service method caps these further, and
+    carries across every retry and page of the call.
+    """
+    # Seconds to establish a connection.
+    connect: float = 10.0
+    # Seconds to wait for the response of operations without an override, None waits indefinitely.
+    default: Optional[float] = 60.0
+    operations: Dict[str, Optional[float]] = field(default_factory=lambda: {
+        "query": 30.0, "upload": 120.0, "delete-corpus": 120.0
+    })
+    # Derive the timeout from recently observed latency, as multiplier times the percentile, never exceeding the
+    # static timeout above nor dropping below min_timeout.
+    adaptive: bool = False
+    percentile: float = 99.0
+    multiplier: float = 3.0
+    min_timeout: float = 1.0
+    # Number of recent latencies kept per operation, and how many we need before adapting.
+    window: int = 1000
+    min_samples: int = 50
+
+
+@dataclass
+class RetryPolicyConfig:
+    """
+    How a single operation is retried. Codes are names from vectara_client.status.StatusCode, covering both the
+    HTTP response code and the Vectara status within a 200 response body.
+    """
+    # Total attempts including the first, so 1 disables retries.
+    max_attempts: int = 3
+    initial_backoff: float = 0.5
+    max_backoff: float = 20.0
+    multiplier: float = 2.0
+    # Full jitter, i.e. sleep a random amount up to the exponential backoff, to avoid synchronized retry storms.
+    jitter: bool = True
+    honor_retry_after: bool = True
+    # We give up rather than block for longer than this if the server asks us to wait.
+    max_retry_after: float = 60.0
+    retryable_codes: List[str] = field(default_factory=lambda: [
+        "TOO_MANY_REQUESTS", "BAD_GATEWAY", "SERVICE_UNAVAILABLE", "GATEWAY_TIMEOUT",
+        "UNAVAILABLE", "RESOURCE_EXHAUSTED"
+    ])
+    # Also retry connection errors and timeouts.
+    retry_connection_errors: bool = True
+
+
+@dataclass
+class RetryConfig:
+    """
+    Retry policies for RequestUtil, with per operation overrides keyed by operation name (e.g. "query", "index").
+    Operations which change state, such as create-corpus or index, are only retried under the default policy if the
+    request wasn't sent or wasn't acted upon (e.g. a 429), see vectara_client.retry. An override opts one in to every
+    retry of its policy.
+    """
+    default: RetryPolicyConfig = field(default_factory=RetryPolicyConfig)
+    operations: Dict[str, RetryPolicyConfig] = field(default_factory=dict)
+    # Each successful request earns budget_ratio of a retry, so sustained failures can add at most ~10% load.
+    budget_ratio: float = 0.1
+    # Retries available up front, and the most the budget can accumulate.
+    budget_initial: float = 10.0
+    budget_max: float = 100.0
+
+
+@dataclass
+class CircuitBreakerPolicyConfig:
+    """
+    When the circuit for one operation opens. Calls fail if they raise a connection error, get one of the
+    failure_codes (from vectara_client.status.StatusCode, either the HTTP code or a Vectara status within a 200 body)
+    or take longer than slow_call_duration.
+    """
+    # The rolling number of calls the failure rate is measured over, and how many we need before opening.
+    window: int = 20
+    min_calls: int = 10
+    # Opens when at least this fraction of the window failed.
+    failure_rate: float = 0.5
+    # Seconds after which a successful call still counts as a failure, None to ignore latency.
+    slow_call_duration: Optional[float] = None
+    # Seconds we fail fast for before letting trial calls through (half-open).
+    open_duration: float = 30.0
+    # Trial calls let through when half-open, which must all succeed to close the circuit. Any failure re-opens it.
+    half_open_calls: int = 3
+    failure_codes: List[str] = field(default_factory=lambda: [
+        "TOO_MANY_REQUESTS", "INTERNAL_SERVER_ERROR", "BAD_GATEWAY", "SERVICE_UNAVAILABLE", "GATEWAY_TIMEOUT",
+        "INTERNAL", "UNAVAILABLE", "RESOURCE_EXHAUSTED", "DEADLINE_EXCEEDED"
+    ])
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """
+    Circuit breakers for RequestUtil, one per operation, with per operation overrides keyed by operation name.
+    """
+    default: CircuitBreakerPolicyConfig = field(default_factory=CircuitBreakerPolicyConfig)
+    operations: Dict[str, CircuitBreakerPolicyConfig] = field(default_factory=dict)
+
+
+@dataclass
+class RateLimitRule:
+    """
+    Token bucket for one operation, refilling at rate tokens per second up to burst tokens.
+    """
+    rate: float
+    # Bucket capacity, defaults to one second's worth of tokens.
+    burst: Optional[float] = None
+    # Keep a separate bucket per corpus id rather than one for the operation.
+    per_corpus: bool = False
+
+
+@dataclass
+class RateLimitConfig:
+    """
+    Client side rate limits keyed by operation name, e.g. "query", "index", "core/index", "upload", "delete-doc" and
+    "list-documents". Operations without a rule are not limited.
+    """
+    operations: Dict[str, RateLimitRule] = field(default_factory=dict)
+    # "memory" shares buckets between threads, "sqlite" also shares them between processes on this host.
+    backend: str = "memory"
+    # Location of the sqlite database, defaults to ~/.vectara_rate_limit.db
+    path: Optional[str] = None
+    # Fail with RateLimitExceededError rather than wait longer than this many seconds, None waits indefinitely.
+    max_wait: Optional[float] = None
+
+
+@dataclass
+class JournalConfig:
+    """
+    The journal of recent requests kept by RequestUtil for debugging, see Client.get_requests().
+    """
+    enabled: bool = True
+    # Only the most recent max_entries requests are held in memory.
+    max_entries: int = 100
+    # Fraction of requests recorded, e.g. 0.01 keeps roughly one in a hundred.
+    sample_rate: float = 1.0
+    # If set, entries evicted from memory are appended to this gzipped NDJSON file rather than discarded.
+    spill_path: Optional[str] = None
+
+
+@dataclass
+class CompressionConfig:
+    """
+    Compression of request bodies, e.g. the full document text sent by index_doc and index_core_doc. Responses are
+    compressed by the server whenever the HTTP library can decode them, as advertised by its Accept-Encoding.
+    """
+    # "gzip", "zstd" (requires zstandard), "br" (requires brotli) or "identity" to send requests uncompressed.
+    request_encoding: str = "gzip"
+    # Algorithm specific level, None for the algorithm's default (gzip 6, zstd 3, br 5).
+    level: Optional[int] = None
+    # Smaller bodies are sent as is, as compressing them costs more than it saves.
+    min_size: int = 8192
+    # Send "Accept-Encoding: identity" if false, e.g. to debug responses on the wire.
+    accept_compressed: bool = True
+
+
+@dataclass
+class HedgeConfig:
+    """
+    Hedged requests: if an idempotent operation hasn't responded within the given percentile of its recently observed
+    latency, an identical request is sent and whichever succeeds first is used.
+    """
+    # Only read only operations may be hedged, i.e. query, list-corpora, read-corpus, compute-corpus-size,
+    # list-documents and list-api-keys.
+    operations: List[str] = field(default_factory=lambda: ["query"])
+    percentile: float = 95.0
+    # Each request earns budget_ratio of a hedge, so 0.05 sends at most ~5% extra requests.
+    budget_ratio: float = 0.05
+    # The most hedges the budget can accumulate while latency is steady.
+    budget_max: float = 10.0
+    # Number of recent latencies kept per operation, and how many we need before hedging at all.
+    window: int = 1000
+    min_samples: int = 20
+    # Threads running blocking requests (and their hedges). Requests beyond this run unhedged on the caller's thread
+    # rather than queueing for one.
+    max_workers: int = 64
+
+
+@dataclass
+class SingleFlightConfig:
+    """
+    Single-flight: concurrent identical calls (same operation and payload) share one request and its decoded result.
+    """
+    # Only read only operations may be coalesced, as for HedgeConfig.operations.
+    operations: List[str] = field(default_factory=lambda: ["query", "read-corpus", "list-corpora"])
+
+
+@dataclass
+class MetricsConfig:
+    """
+    Per operation latency histograms, byte, status and in-flight counts, always recorded. This block tunes them and
+    optionally serves them in the Prometheus text format.
+    """
+    # Latency buckets are accurate to this many significant figures, as with HdrHistogram.
+    significant_figures: int = 2
+    # Serve the metrics at http://host:port/metrics, None to not serve them. 0 picks a free port.
+    port: Optional[int] = None
+    host: str = "127.0.0.1"
+
+
+@dataclass
+class TracingConfig:
+    """
+    Tracing spans for each service method and each HTTP request, see vectara_client.tracing.
+    """
+    # "memory" keeps finished spans in an InMemorySpanExporter, "otlp-file" appends them to path as OTLP JSON lines.
+    exporter: str = "memory"
+    path: Optional[str] = None
+    # The fraction of traces recorded, decided once for each outermost span.
+    sample_rate: float = 1.0
+    service_name: str = "vectara-client"
+
+
+@dataclass
+class TokenConfig:
+    """
+    Refreshing of OAuth2 tokens, see vectara_client.oauth.
+    """
+    # Refresh in the background once this fraction of a token's lifetime has passed, using the current one meanwhile.
+    refresh_fraction: float = 0.8
+    background_refresh: bool = True
+    # Stop using a token this many seconds before it expires, requests then wait for a new one.
+    expiry_margin: float = 5.0
+    # Share tokens between processes in an encrypted file under cache_dir, by default ~/.vectara/tokens.
+    cache: bool = False
+    cache_dir: Optional[str] = None
+
+
+@dataclass
+class LoggingConfig:
+    """
+    Levels and sampling of the events logged on every request, see vectara_client.eventlog.
+    """
+    # "development" logs each request's URL, token lookup and chat prompt at INFO, "production" at DEBUG.
+    profile: str = "development"
+    # Overrides the profile's level of an event, e.g. {"request.url": "WARNING"}.
+    levels: Dict[str, str] = field(default_factory=dict)
+    # Logs only this fraction of an event, e.g. {"request.url": 0.01} logs every hundredth.
+    sample_rates: Dict[str, float] = field(default_factory=dict)
+
+
 @dataclass
 class ClientConfig:
     """
@@ -50,7 +371,22 @@ class ClientConfig:
     """
 
     customer_id: str
-    auth: Union[ApiKeyAuthConfig, OAuth2AuthConfig]
+    auth: Union[ApiKeyAuthConfig, OAuth2AuthConfig, PooledAuthConfig]
+    transport: Optional[TransportConfig] = None
+    timeout: Optional[TimeoutConfig] = None
+    retry: Optional[RetryConfig] = None
+    rate_limit: Optional[RateLimitConfig] = None
+    journal: Optional[JournalConfig] = None
+    compression: Optional[CompressionConfig] = None
+    hedge: Optional[HedgeConfig] = None
+    circuit_breaker: Optional[CircuitBreakerConfig] = None
+    single_flight: Optional[SingleFlightConfig] = None
+    metrics: Optional[MetricsConfig] = None
+    tracing: Optional[TracingConfig] = None
+    logging: Optional[LoggingConfig] = None
+    token: Optional[TokenConfig] = None
+    # The JSON codec for request/response bodies, "orjson", "json" or "auto" (orjson if installed).
+    json_codec: Optional[str] = None
 
     def validate(self) -> [str]:
         errors = []
@@ -69,6 +405,14 @@ def _tryCreateAuth(data_class, input):
         return False, str(e)
 
 
+def _decode_json_config(config: str) -> dict:
+    try:
+        return default_codec().loads(config)
+    except ValueError:
+        # Config is hand written, so re-parse with the standard library for its more descriptive error.
+        return json.loads(config)
+
+
 def loadConfig(config: str) -> ClientConfig:
     """
     Loads our configuration from JSON onto our data classes.
@@ -80,24 +424,96 @@ def loadConfig(config: str) -> ClientConfig:
     logger.info(f"Loading config from {config}")
 
     try:
-        config_dict = json.loads(config)
-
-
-
+        config_dict = _decode_json_config(config)
         return from_dict(ClientConfig, config_dict, config=Config(strict=True))
     except UnionMatchError as e:
         raise TypeError(e)
     except UnexpectedDataError as e:
         raise TypeError(e)
 
+def config_key(config_path: str = None, config_json: str = None, profile: str = None) -> tuple:
+    """
+    :return: identifies a configuration source and profile as the Factory loads them, i.e. a path, JSON or the home
+        directory, in the ConfigCache and the ClientRegistry.
+    """
+    if config_path:
+        if path.isdir(config_path):
+            config_path = config_path + sep + BaseConfigLoader.CONFIG_FILE_NAME
+        return "file", path.abspath(config_path), profile
+    elif config_json:
+        return "json", config_json, profile
+    else:
+        return "file", str(Path.home()) + sep + BaseConfigLoader.CONFIG_FILE_NAME, profile
+
+
+class ConfigCache:
+    """
+    Thread-safe cache of parsed configurations, so building another client doesn't re-read and re-parse
+    configuration which hasn't changed. Callers get a copy of the cached ClientConfig unless they ask to share it.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        """
+        :param max_entries: the least recently used configurations are dropped beyond this many
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_load(self, key: Hashable, stamp: Hashable, load: Callable[[], ClientConfig],
+                    share: bool = False) -> ClientConfig:
+        """
+        :param key: identifies the configuration's source and profile
+        :param stamp: changes whenever the source does, e.g. a file's modification time and size
+        :param load: parses the configuration if the cache has none for key with this stamp
+        :param share: return the cached instance itself, the same object for as long as the configuration is
+            unchanged, which must then be treated as read only. Otherwise a copy is returned.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                config = entry[1]
+            else:
+                config = None
+        if config is None:
+            # Parsed outside the lock, two threads racing to load the same configuration both parse it.
+            config = load()
+            with self._lock:
+                self._entries[key] = (stamp, config)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return config if share else copy.deepcopy(config)
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Used by the Factory, so every client in the process shares it.
+CONFIG_CACHE = ConfigCache()
+
+
 class BaseConfigLoader(ABC):
     CONFIG_FILE_NAME = ".vec_auth.yaml"
 
     DEFAULT_CONFIG_NAME = "default"
 
-    def __init__(self, profile: str = None):
+    def __init__(self, profile: str = None, cache: ConfigCache = None, share: bool = False):
+        """
+        :param cache: re-uses the configuration parsed by an earlier load while its source is unchanged, by default
+            every load parses it afresh
+        :param share: return the cache's own instance rather than a copy, see ConfigCache.get_or_load
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.profile = profile
+        self.cache = cache
+        self.share = share
 
     def load(self):
         """
@@ -115,31 +531,55 @@ class BaseConfigLoader(ABC):
         :raises TypeError: if the configuration cannot be parsed correctly
         """
 
-        # First we're going to manually try each Authentication Type for better logging.
-        # This is because the dicate library just gives the user a generic error
-        # without any logging.
-        auth = config_dict["auth"]
+        self.logger.info("Parsing config")
+        try:
+            client_config = from_dict(data_class=ClientConfig, data=config_dict, config=Config(strict=True))
+        except DaciteError as e:
+            # Only on failure, as this parses the auth block once per authentication type.
+            self._check_auth(config_dict.get("auth"))
+            if isinstance(e, UnexpectedDataError):
+                raise TypeError(f"Unable to build configuration: {e}") from None
+            raise
+        client_config.validate()
+        return client_config
+
+    def _check_auth(self, auth: Optional[dict]):
+        """
+        Tries each authentication type in turn, as dacite gives a generic error for a Union without saying why
+        each type didn't match.
+
+        :raises TypeError: if the auth block is none of them
+        """
         if (auth):
             oauth2_success, oauth2_error_msg = _tryCreateAuth(OAuth2AuthConfig, auth)
             api_key_success, api_key_error_msg = _tryCreateAuth(ApiKeyAuthConfig, auth)
+            pooled_success, pooled_error_msg = _tryCreateAuth(PooledAuthConfig, auth)
 
-            if not oauth2_success and not api_key_success:
+            if not oauth2_success and not api_key_success and not pooled_success:
                 logger.error(f"Invalid Authentication Configuration:\n{json.dumps(auth, indent=4)}")
                 logger.error(f"Unable to cast auth to OAuth2 configuration block: {oauth2_error_msg}")
                 logger.error(f"Unable to cast auth to API Key configuration block: {api_key_error_msg}")
+                logger.error(f"Unable to cast auth to Pooled configuration block: {pooled_error_msg}")
 
                 raise TypeError(
                     f"Could not use polymorphism to cast auth to either OAuth2 or API Key config, see errors above in log.")
 
-        self.logger.info("Parsing config")
-        try:
-            client_config = from_dict(data_class=ClientConfig, data=config_dict, config=Config(strict=True))
-            client_config.validate()
-            return client_config
-        except UnexpectedDataError as e:
-            raise TypeError(f"Unable to build configuration: {e}") from None
+    def _load_file_config(self, file_path: str) -> ClientConfig:
+        """
+        Parses the profile from a YAML file, or while the file's modification time and size are unchanged returns
+        the configuration parsed from it before.
+        """
+        if self.cache is None:
+            return self._convert_dict_config(self._load_yaml_config(file_path))
+        stat = os.stat(file_path)
+        return self.cache.get_or_load(config_key(config_path=file_path, profile=self.profile),
+                                      (stat.st_mtime_ns, stat.st_size),
+                                      lambda: self._convert_dict_config(self._load_yaml_config(file_path)),
+                                      self.share)
 
     def _load_yaml_config(self, final_config_path):
+        # Only needed for configuration files, not JSON passed in by serverless handlers.
+        import yaml
         with open(final_config_path, 'r') as yaml_stream:
             creds = yaml.safe_load(yaml_stream)
 
@@ -161,14 +601,17 @@ class JsonConfigLoader(BaseConfigLoader):
     Loads our configuration from JSON
     """
 
-    def __init__(self, config_json: str, profile: str = None):
-        super().__init__(profile=profile)
+    def __init__(self, config_json: str, profile: str = None, cache: ConfigCache = None, share: bool = False):
+        super().__init__(profile=profile, cache=cache, share=share)
         self.config_json = config_json
 
     def load(self):
         self.logger.info("Loading configuration from JSON string")
-        config_dict = json.loads(self.config_json)
-        return self._convert_dict_config(config_dict)
+        if self.cache is None:
+            return self._convert_dict_config(_decode_json_config(self.config_json))
+        return self.cache.get_or_load(config_key(config_json=self.config_json, profile=self.profile), None,
+                                      lambda: self._convert_dict_config(_decode_json_config(self.config_json)),
+                                      self.share)
 
 
 class PathConfigLoader(BaseConfigLoader):
@@ -176,8 +619,8 @@ class PathConfigLoader(BaseConfigLoader):
     Loads our configuration from the specified folder/file
     """
 
-    def __init__(self, config_path, profile: str = None):
-        super().__init__(profile=profile)
+    def __init__(self, config_path, profile: str = None, cache: ConfigCache = None, share: bool = False):
+        super().__init__(profile=profile, cache=cache, share=share)
         self.config_path = config_path
 
     def load(self):
@@ -195,8 +638,7 @@ class PathConfigLoader(BaseConfigLoader):
         else:
             raise TypeError(f"Path [{self.config_path}] does not exist.")
 
-        config_dict = self._load_yaml_config(looking_for)
-        return self._convert_dict_config(config_dict)
+        return self._load_file_config(looking_for)
 
 # TODO Finish implementing this before commit
 class HomeConfigLoader(BaseConfigLoader):
@@ -204,8 +646,8 @@ class HomeConfigLoader(BaseConfigLoader):
     Loads our configuration from the users home directory
     """
 
-    def __init__(self, profile: str = None):
-        super().__init__(profile=profile)
+    def __init__(self, profile: str = None, cache: ConfigCache = None, share: bool = False):
+        super().__init__(profile=profile, cache=cache, share=share)
 
     def load(self):
         home = str(Path.home())
@@ -215,7 +657,6 @@ class HomeConfigLoader(BaseConfigLoader):
         if not path.exists(looking_for) or not path.isfile(looking_for):
             raise TypeError(f"Unable to find configuration file [{BaseConfigLoader.CONFIG_FILE_NAME}]"
                             f" within home directory [{home}]")
-        config_dict = self._load_yaml_config(looking_for)
-        return self._convert_dict_config(config_dict)
+        return self._load_file_config(looking_for)
 
 
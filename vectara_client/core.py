@@ -1,11 +1,30 @@
 import logging
-from vectara_client.config import JsonConfigLoader, PathConfigLoader, HomeConfigLoader
-from vectara_client.authn import OAuthUtil, ApiKeyUtil
-from vectara_client.admin import AdminService
-from vectara_client.document import DocumentService
-from vectara_client.index import IndexerService
-from vectara_client.query import QueryService
-from vectara_client.util import RequestUtil
+from typing import Dict, List, Optional, Union
+from vectara_client.config import (JsonConfigLoader, PathConfigLoader, HomeConfigLoader, TransportConfig,
+                                   ClientConfig, RetryConfig, RateLimitConfig, JournalConfig,
+                                   CompressionConfig, HedgeConfig, CircuitBreakerConfig, TimeoutConfig,
+                                   SingleFlightConfig, MetricsConfig, TracingConfig, LoggingConfig,
+                                   TokenConfig, PooledCredentialConfig, CONFIG_CACHE, config_key)
+from vectara_client.authn import BaseAuthUtil, OAuthUtil, ApiKeyUtil
+from vectara_client.authpool import CredentialStats, PooledAuthUtil, PooledCredential
+from vectara_client.admin import AdminService, AsyncAdminService
+from vectara_client.document import DocumentService, AsyncDocumentService
+from vectara_client.index import IndexerService, AsyncIndexerService
+from vectara_client.query import QueryService, AsyncQueryService
+from vectara_client.circuit import CircuitBreaker, CircuitState
+from vectara_client.codec import BaseJsonCodec, create_codec
+from vectara_client.deadline import Timeouts
+from vectara_client.compression import Compressor, CompressionStats
+from vectara_client.hedge import Hedger, HedgeStats
+from vectara_client.interceptor import BaseInterceptor
+from vectara_client.journal import RequestJournal
+from vectara_client.metrics import Metrics, OperationMetrics, PrometheusExporter, SharedExporter, share_exporter
+from vectara_client.ratelimit import RateLimiter
+from vectara_client.registry import CLIENT_REGISTRY
+from vectara_client.retry import RetryHandler
+from vectara_client.singleflight import SingleFlight, SingleFlightStats
+from vectara_client.tracing import BaseSpanExporter, Tracer
+from vectara_client.util import RequestUtil, AsyncRequestUtil
 from vectara_client.corpus import CorpusManager
 
 
@@ -14,7 +33,8 @@ class Client:
     def __init__(self, customer_id: str, admin_service: AdminService,
                  indexer_service: IndexerService, query_service: QueryService,
                  document_service: DocumentService,
-                 request_util: RequestUtil, corpus_manager: CorpusManager):
+                 request_util: RequestUtil, corpus_manager: CorpusManager,
+                 metrics_exporter: Union[PrometheusExporter, SharedExporter] = None):
         self.logging = logging.getLogger(self.__class__.__name__)
         logging.info("initializing Client")
         self.customer_id = customer_id
@@ -24,18 +44,195 @@ class Client:
         self.document_service = document_service
         self.request_util = request_util
         self.corpus_manager = corpus_manager
+        # Only if the "metrics" block has a port, see MetricsConfig.
+        self.metrics_exporter = metrics_exporter
+        # Set while registered by Factory.build_shared, see vectara_client.registry.
+        self.shared = False
+        # The ClientRegistry which leased it, if from Factory.build_shared, when close() returns the lease instead.
+        self.registry = None
 
-    def get_requests(self):
+    def get_requests(self) -> RequestJournal:
+        """
+        :return: the most recent requests sent by this client, e.g. get_requests()[-1] is the last.
+        """
         return self.request_util.requests
 
+    def get_compression_stats(self) -> Dict[str, CompressionStats]:
+        """
+        :return: bytes sent and received per operation, before and after compression.
+        """
+        return self.request_util.compressor.stats()
+
+    def get_hedge_stats(self) -> Dict[str, HedgeStats]:
+        """
+        :return: hedges sent and won per operation, empty if hedging is not configured.
+        """
+        return self.request_util.hedger.stats() if self.request_util.hedger else {}
+
+    def get_circuit_state(self, operation: str) -> CircuitState:
+        """
+        :return: the circuit breaker state of the operation, always CLOSED if circuit breaking is not configured.
+        """
+        breaker = self.request_util.circuit_breaker
+        return breaker.state(operation) if breaker else CircuitState.CLOSED
+
+    def get_single_flight_stats(self) -> Dict[str, SingleFlightStats]:
+        """
+        :return: calls and how many of them were coalesced per operation, empty if single-flight is not configured.
+        """
+        single_flight = self.request_util.single_flight
+        return single_flight.stats() if single_flight else {}
+
+    def get_credential_stats(self) -> Dict[str, CredentialStats]:
+        """
+        :return: requests sent with, and how often throttled or rejected, each credential of a pooled "auth" block,
+            empty for a single credential.
+        """
+        auth_util = self.request_util.auth_util
+        return auth_util.stats() if isinstance(auth_util, PooledAuthUtil) else {}
+
+    def metrics(self) -> Dict[str, OperationMetrics]:
+        """
+        :return: a snapshot of the latency histogram, byte, status and in-flight counts of each operation.
+        """
+        return self.request_util.metrics.snapshot()
+
+    def close(self):
+        """
+        Releases the pooled HTTP connections held by this client, and stops serving metrics. For a client from
+        Factory.build_shared this returns the caller's lease instead, the ClientRegistry closes it once it has been
+        replaced or invalidated and every lease is returned.
+        """
+        if self.registry:
+            self.registry.release(self)
+            return
+        self._close()
+
+    def _close(self):
+        self.request_util.close()
+        self.request_util.auth_util.close()
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class AsyncClient:
+    """
+    asyncio counterpart of Client, see Factory.build_async. All services share one pooled connection client.
+    """
+
+    def __init__(self, customer_id: str, admin_service: AsyncAdminService,
+                 indexer_service: AsyncIndexerService, query_service: AsyncQueryService,
+                 document_service: AsyncDocumentService, request_util: AsyncRequestUtil,
+                 metrics_exporter: Union[PrometheusExporter, SharedExporter] = None):
+        self.logging = logging.getLogger(self.__class__.__name__)
+        self.customer_id = customer_id
+        self.admin_service = admin_service
+        self.indexer_service = indexer_service
+        self.query_service = query_service
+        self.document_service = document_service
+        self.request_util = request_util
+        self.metrics_exporter = metrics_exporter
+
+    def get_requests(self) -> RequestJournal:
+        """
+        :return: the most recent requests sent by this client, e.g. get_requests()[-1] is the last.
+        """
+        return self.request_util.requests
+
+    def get_compression_stats(self) -> Dict[str, CompressionStats]:
+        """
+        :return: bytes sent and received per operation, before and after compression.
+        """
+        return self.request_util.compressor.stats()
+
+    def get_hedge_stats(self) -> Dict[str, HedgeStats]:
+        """
+        :return: hedges sent and won per operation, empty if hedging is not configured.
+        """
+        return self.request_util.hedger.stats() if self.request_util.hedger else {}
+
+    def get_circuit_state(self, operation: str) -> CircuitState:
+        """
+        :return: the circuit breaker state of the operation, always CLOSED if circuit breaking is not configured.
+        """
+        breaker = self.request_util.circuit_breaker
+        return breaker.state(operation) if breaker else CircuitState.CLOSED
+
+    def get_single_flight_stats(self) -> Dict[str, SingleFlightStats]:
+        """
+        :return: calls and how many of them were coalesced per operation, empty if single-flight is not configured.
+        """
+        single_flight = self.request_util.single_flight
+        return single_flight.stats() if single_flight else {}
+
+    def get_credential_stats(self) -> Dict[str, CredentialStats]:
+        """
+        :return: requests sent with, and how often throttled or rejected, each credential of a pooled "auth" block,
+            empty for a single credential.
+        """
+        auth_util = self.request_util.auth_util
+        return auth_util.stats() if isinstance(auth_util, PooledAuthUtil) else {}
+
+    def metrics(self) -> Dict[str, OperationMetrics]:
+        """
+        :return: a snapshot of the latency histogram, byte, status and in-flight counts of each operation.
+        """
+        return self.request_util.metrics.snapshot()
+
+    async def aclose(self):
+        """
+        Releases the pooled HTTP connections held by this client, and stops serving metrics.
+        """
+        await self.request_util.aclose()
+        self.request_util.auth_util.close()
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
 class Factory():
 
-    def __init__(self, config_path: str = None, config_json: str = None, profile: str = None):
+    def __init__(self, config_path: str = None, config_json: str = None, profile: str = None,
+                 transport_config: TransportConfig = None, retry_config: RetryConfig = None,
+                 rate_limit_config: RateLimitConfig = None, journal_config: JournalConfig = None,
+                 json_codec: str = None, compression_config: CompressionConfig = None,
+                 hedge_config: HedgeConfig = None, circuit_breaker_config: CircuitBreakerConfig = None,
+                 timeout_config: TimeoutConfig = None, single_flight_config: SingleFlightConfig = None,
+                 metrics_config: MetricsConfig = None, tracing_config: TracingConfig = None,
+                 span_exporter: BaseSpanExporter = None, interceptors: List[BaseInterceptor] = None,
+                 logging_config: LoggingConfig = None, token_config: TokenConfig = None):
         """
         Initialize our factory using configuration which may either be in a file or serialized in a JSON string
 
         :param config_path: the file containing our configuration
         :param config_json: the JSON containing our configuration
+        :param transport_config: overrides the "transport" block (if any) within our configuration
+        :param retry_config: overrides the "retry" block (if any) within our configuration
+        :param rate_limit_config: overrides the "rate_limit" block (if any) within our configuration
+        :param journal_config: overrides the "journal" block (if any) within our configuration
+        :param json_codec: overrides the "json_codec" (if any) within our configuration, "orjson", "json" or "auto"
+        :param compression_config: overrides the "compression" block (if any) within our configuration
+        :param hedge_config: overrides the "hedge" block (if any) within our configuration
+        :param circuit_breaker_config: overrides the "circuit_breaker" block (if any) within our configuration
+        :param timeout_config: overrides the "timeout" block (if any) within our configuration
+        :param single_flight_config: overrides the "single_flight" block (if any) within our configuration
+        :param metrics_config: overrides the "metrics" block (if any) within our configuration
+        :param tracing_config: overrides the "tracing" block (if any) within our configuration
+        :param span_exporter: receives finished spans instead of the exporter in the tracing configuration, enables
+            tracing with the default TracingConfig if there is none
+        :param interceptors: run around every request, see vectara_client.interceptor
+        :param logging_config: overrides the "logging" block (if any) within our configuration
+        :param token_config: overrides the "token" block (if any) within our configuration, used with OAuth2
         """
 
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -43,23 +240,132 @@ class Factory():
         self.config_path = config_path
         self.config_json = config_json
         self.profile = profile
+        self.transport_config = transport_config
+        self.retry_config = retry_config
+        self.rate_limit_config = rate_limit_config
+        self.journal_config = journal_config
+        self.json_codec = json_codec
+        self.compression_config = compression_config
+        self.hedge_config = hedge_config
+        self.circuit_breaker_config = circuit_breaker_config
+        self.timeout_config = timeout_config
+        self.single_flight_config = single_flight_config
+        self.metrics_config = metrics_config
+        self.tracing_config = tracing_config
+        self.span_exporter = span_exporter
+        self.interceptors = interceptors
+        self.logging_config = logging_config
+        self.token_config = token_config
 
     def build(self) -> Client:
         """
         Builds our client using the configuration which .
         :return:
         """
+        return self._build(self._load_config())
 
+    def build_shared(self) -> Client:
+        """
+        Returns the client shared by every caller in this process with the same configuration source, profile and
+        overrides, building it if there is none yet or its configuration has changed, see vectara_client.registry.
+
+        :return: the shared client, which is thread-safe. Its close() returns this caller's lease rather than
+            closing it.
+        """
+        return CLIENT_REGISTRY.get(config_key(self.config_path, self.config_json, self.profile),
+                                   self._overrides_key(), lambda: self._load_config(share=True), self._build)
+
+    def _overrides_key(self) -> tuple:
+        """
+        :return: this factory's overrides, configuration blocks by value and the span exporter and interceptors by
+            identity, which the shared client built with them keeps alive.
+        """
+        configs = (self.transport_config, self.retry_config, self.rate_limit_config, self.journal_config,
+                   self.json_codec, self.compression_config, self.hedge_config, self.circuit_breaker_config,
+                   self.timeout_config, self.single_flight_config, self.metrics_config, self.tracing_config,
+                   self.logging_config, self.token_config)
+        interceptors = tuple(id(interceptor) for interceptor in self.interceptors) if self.interceptors else ()
+        return tuple(repr(config) for config in configs) + (id(self.span_exporter), interceptors)
+
+    def _build(self, client_config: ClientConfig) -> Client:
+        auth_util = self._create_auth_util(client_config)
+
+        # TODO Use the type of authentication to validate whether we can enabled the admin service.
+        request_util = RequestUtil(auth_util, transport_config=self._resolve_transport_config(client_config),
+                                   retry_handler=RetryHandler(self._resolve_retry_config(client_config)),
+                                   rate_limiter=self._create_rate_limiter(client_config),
+                                   journal=RequestJournal(self._resolve_journal_config(client_config)),
+                                   codec=self._create_codec(client_config),
+                                   compressor=Compressor(self._resolve_compression_config(client_config)),
+                                   hedger=self._create_hedger(client_config),
+                                   circuit_breaker=self._create_circuit_breaker(client_config),
+                                   timeouts=Timeouts(self._resolve_timeout_config(client_config)),
+                                   single_flight=self._create_single_flight(client_config),
+                                   metrics=Metrics(self._resolve_metrics_config(client_config)),
+                                   tracer=self._create_tracer(client_config),
+                                   interceptors=self.interceptors,
+                                   logging_config=self._resolve_logging_config(client_config))
+
+        admin_service = AdminService(request_util, int(client_config.customer_id))
+        indexer_service = IndexerService(auth_util, request_util, int(client_config.customer_id))
+        query_service = QueryService(request_util, int(client_config.customer_id))
+        document_service = DocumentService(request_util)
+        corpus_manager = CorpusManager(admin_service, indexer_service)
+
+        return Client(client_config.customer_id, admin_service, indexer_service, query_service, document_service,
+                      request_util, corpus_manager, metrics_exporter=self._start_metrics_exporter(request_util))
+
+    def build_async(self) -> AsyncClient:
+        """
+        Builds our asyncio client using the same configuration flow as build(). Building does no I/O so this
+        may be called outside of an event loop, though the returned client must be used within one.
+
+        :return: the asyncio client, which requires the optional httpx dependency.
+        """
+        client_config = self._load_config()
+        auth_util = self._create_auth_util(client_config)
+
+        request_util = AsyncRequestUtil(auth_util, transport_config=self._resolve_transport_config(client_config),
+                                        retry_handler=RetryHandler(self._resolve_retry_config(client_config)),
+                                        rate_limiter=self._create_rate_limiter(client_config),
+                                        journal=RequestJournal(self._resolve_journal_config(client_config)),
+                                        codec=self._create_codec(client_config),
+                                        compressor=Compressor(self._resolve_compression_config(client_config)),
+                                        hedger=self._create_hedger(client_config),
+                                        circuit_breaker=self._create_circuit_breaker(client_config),
+                                        timeouts=Timeouts(self._resolve_timeout_config(client_config)),
+                                        single_flight=self._create_single_flight(client_config),
+                                        metrics=Metrics(self._resolve_metrics_config(client_config)),
+                                        tracer=self._create_tracer(client_config),
+                                        interceptors=self.interceptors,
+                                        logging_config=self._resolve_logging_config(client_config))
+
+        admin_service = AsyncAdminService(request_util, int(client_config.customer_id))
+        indexer_service = AsyncIndexerService(auth_util, request_util, int(client_config.customer_id))
+        query_service = AsyncQueryService(request_util, int(client_config.customer_id))
+        document_service = AsyncDocumentService(request_util)
+
+        return AsyncClient(client_config.customer_id, admin_service, indexer_service, query_service,
+                           document_service, request_util,
+                           metrics_exporter=self._start_metrics_exporter(request_util))
+
+    def _load_config(self, share: bool = False) -> ClientConfig:
+        """
+        :param share: return the ConfigCache's own instance rather than a copy, which must then be treated as read
+            only
+        """
         # 1. Load the config whether we're doing file or we've had it passed in as a String.
         if self.config_path:
             self.logger.info("Factory will load configuration from path")
-            config_loader = PathConfigLoader(config_path=self.config_path, profile=self.profile)
+            config_loader = PathConfigLoader(config_path=self.config_path, profile=self.profile, cache=CONFIG_CACHE,
+                                             share=share)
         elif self.config_json:
             self.logger.info("Factory will load configuration from JSON")
-            config_loader = JsonConfigLoader(config_json=self.config_json, profile=self.profile)
+            config_loader = JsonConfigLoader(config_json=self.config_json, profile=self.profile, cache=CONFIG_CACHE,
+                                             share=share)
         else:
             self.logger.info("Factory will load configuration from home directory")
-            config_loader = HomeConfigLoader(profile=self.profile)
+            config_loader = HomeConfigLoader(profile=self.profile, cache=CONFIG_CACHE, share=share)
 
         # 2. Parse and validate the client configuration
         try:
@@ -72,27 +378,156 @@ class Factory():
         if errors:
             raise TypeError(f"Client configuration is not valid {errors}")
 
+        return client_config
+
+    def _create_auth_util(self, client_config: ClientConfig) -> BaseAuthUtil:
         # 3. Load the validated configuration into our client.
         auth_config = client_config.auth
         auth_type = auth_config.getAuthType()
         logging.info(f"We are processing authentication type [{auth_type}]")
 
         if auth_type == "ApiKey":
-            auth_util = ApiKeyUtil(client_config.customer_id, client_config.auth.api_key)
+            return ApiKeyUtil(client_config.customer_id, client_config.auth.api_key)
         elif auth_type == "OAuth2":
-            auth_util = OAuthUtil(auth_config.auth_url, auth_config.app_client_id, auth_config.app_client_secret,
-                                  client_config.customer_id)
+            return OAuthUtil(auth_config.auth_url, auth_config.app_client_id, auth_config.app_client_secret,
+                             client_config.customer_id,
+                             logging_config=self._resolve_logging_config(client_config),
+                             token_config=self._resolve_token_config(client_config))
+        elif auth_type == "Pooled":
+            credentials = [self._create_pooled_credential(client_config, index, credential)
+                           for index, credential in enumerate(auth_config.credentials)]
+            return PooledAuthUtil(credentials, auth_config)
         else:
             raise TypeError(f"Unknown authentication type: {auth_type}")
 
-        # TODO Use the type of authentication to validate whether we can enabled the admin service.
-        request_util = RequestUtil(auth_util)
+    def _create_pooled_credential(self, client_config: ClientConfig, index: int,
+                                  credential: PooledCredentialConfig) -> PooledCredential:
+        name = credential.name if credential.name else f"credential-{index}"
+        if credential.api_key:
+            auth_util = ApiKeyUtil(client_config.customer_id, credential.api_key)
+        elif credential.app_client_id and credential.app_client_secret:
+            auth_util = OAuthUtil(credential.auth_url, credential.app_client_id, credential.app_client_secret,
+                                  client_config.customer_id,
+                                  logging_config=self._resolve_logging_config(client_config),
+                                  token_config=self._resolve_token_config(client_config))
+        else:
+            raise TypeError(f"Pooled credential [{name}] needs either an api_key or an app_client_id and "
+                            f"app_client_secret")
+        return PooledCredential(name, auth_util, credential.weight)
 
-        admin_service = AdminService(request_util, int(client_config.customer_id))
-        indexer_service = IndexerService(auth_util, request_util, int(client_config.customer_id))
-        query_service = QueryService(request_util, int(client_config.customer_id))
-        document_service = DocumentService(request_util)
-        corpus_manager = CorpusManager(admin_service, indexer_service)
+    def _resolve_transport_config(self, client_config: ClientConfig) -> TransportConfig:
+        if self.transport_config:
+            return self.transport_config
+        elif client_config.transport:
+            return client_config.transport
+        else:
+            return TransportConfig()
 
-        return Client(client_config.customer_id, admin_service, indexer_service, query_service, document_service,
-                      request_util, corpus_manager)
+    def _resolve_timeout_config(self, client_config: ClientConfig) -> TimeoutConfig:
+        if self.timeout_config:
+            return self.timeout_config
+        elif client_config.timeout:
+            return client_config.timeout
+        else:
+            return TimeoutConfig()
+
+    def _resolve_retry_config(self, client_config: ClientConfig) -> RetryConfig:
+        if self.retry_config:
+            return self.retry_config
+        elif client_config.retry:
+            return client_config.retry
+        else:
+            return RetryConfig()
+
+    def _create_rate_limiter(self, client_config: ClientConfig) -> Optional[RateLimiter]:
+        if self.rate_limit_config:
+            return RateLimiter(self.rate_limit_config)
+        elif client_config.rate_limit:
+            return RateLimiter(client_config.rate_limit)
+        else:
+            return None
+
+    def _resolve_journal_config(self, client_config: ClientConfig) -> JournalConfig:
+        if self.journal_config:
+            return self.journal_config
+        elif client_config.journal:
+            return client_config.journal
+        else:
+            return JournalConfig()
+
+    def _create_codec(self, client_config: ClientConfig) -> BaseJsonCodec:
+        if self.json_codec:
+            return create_codec(self.json_codec)
+        else:
+            return create_codec(client_config.json_codec)
+
+    def _resolve_compression_config(self, client_config: ClientConfig) -> Optional[CompressionConfig]:
+        if self.compression_config:
+            return self.compression_config
+        else:
+            # None sends requests uncompressed.
+            return client_config.compression
+
+    def _create_hedger(self, client_config: ClientConfig) -> Optional[Hedger]:
+        if self.hedge_config:
+            return Hedger(self.hedge_config)
+        elif client_config.hedge:
+            return Hedger(client_config.hedge)
+        else:
+            return None
+
+    def _create_circuit_breaker(self, client_config: ClientConfig) -> Optional[CircuitBreaker]:
+        if self.circuit_breaker_config:
+            return CircuitBreaker(self.circuit_breaker_config)
+        elif client_config.circuit_breaker:
+            return CircuitBreaker(client_config.circuit_breaker)
+        else:
+            return None
+
+    def _create_single_flight(self, client_config: ClientConfig) -> Optional[SingleFlight]:
+        if self.single_flight_config:
+            return SingleFlight(self.single_flight_config)
+        elif client_config.single_flight:
+            return SingleFlight(client_config.single_flight)
+        else:
+            return None
+
+    def _resolve_metrics_config(self, client_config: ClientConfig) -> MetricsConfig:
+        if self.metrics_config:
+            return self.metrics_config
+        elif client_config.metrics:
+            return client_config.metrics
+        else:
+            return MetricsConfig()
+
+    def _create_tracer(self, client_config: ClientConfig) -> Optional[Tracer]:
+        config = self.tracing_config if self.tracing_config else client_config.tracing
+        if config or self.span_exporter:
+            return Tracer(config, self.span_exporter)
+        else:
+            return None
+
+    def _resolve_logging_config(self, client_config: ClientConfig) -> LoggingConfig:
+        if self.logging_config:
+            return self.logging_config
+        elif client_config.logging:
+            return client_config.logging
+        else:
+            return LoggingConfig()
+
+    def _resolve_token_config(self, client_config: ClientConfig) -> TokenConfig:
+        if self.token_config:
+            return self.token_config
+        elif client_config.token:
+            return client_config.token
+        else:
+            return TokenConfig()
+
+    def _start_metrics_exporter(self, request_util) -> Union[PrometheusExporter, SharedExporter, None]:
+        config = request_util.metrics.config
+        if config.port is None:
+            return None
+        elif config.port == 0:
+            return PrometheusExporter(request_util.metrics, config.host, config.port).start()
+        # Every client of the process configured with this port is served by one exporter.
+        return share_exporter(request_util.metrics, config.host, config.port)
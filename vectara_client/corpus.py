@@ -1,23 +1,47 @@
 from vectara_client.admin import AdminService
+from vectara_client.deadline import Deadline
 from vectara_client.index import IndexerService
 from vectara_client.domain import Corpus, IndexDocument
+from vectara_client.error import CircuitOpenError
 from vectara_client.util import CountDownLatch
-from typing import List, Union
+from typing import List, Optional, Union
 from threading import Thread
 import logging
+import time
+
+# Extra seconds batch_index waits past its deadline for workers to notice it, e.g. a request mid-read.
+_DEADLINE_GRACE = 5.0
+
+
+def _pause_while_open(indexer_service: IndexerService, error: CircuitOpenError, logger: logging.Logger,
+                      deadline: Optional[Deadline]):
+    """
+    Blocks a batch worker until the circuit breaker which rejected its request lets calls through again, rather than
+    failing every remaining document while the API is degraded.
+    """
+    logger.warning(f"Pausing as the circuit for [{error.operation}] is open: {error}")
+    breaker = getattr(indexer_service.request_util, "circuit_breaker", None)
+    timeout = max(0.0, deadline.remaining()) if deadline else None
+    if breaker:
+        breaker.wait(error.operation, timeout)
+    else:
+        wait = error.retry_after or 1.0
+        time.sleep(wait if timeout is None else min(wait, timeout))
 
 class SubIndexer:
     """
         Class designed to be used inside a thread to run multiple indexing requests and track completions.
     """
 
-    def __init__(self, indexer_service: IndexerService, corpus_id: int, latch: CountDownLatch, thread_index: int):
+    def __init__(self, indexer_service: IndexerService, corpus_id: int, latch: CountDownLatch, thread_index: int,
+                 deadline: Deadline = None):
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.indexer_service = indexer_service
         self.corpus_id = corpus_id
         self.latch = latch
         self.thread_index = thread_index
+        self.deadline = deadline
 
         self.docs = []
         self.results = []
@@ -30,12 +54,20 @@ class SubIndexer:
         self.logger.info(f"Worker [{self.thread_index}] Starting our [{len(self.docs)}] indexer requests")
 
         for doc in self.docs:
-            try:
-                result = self.indexer_service.index_doc(self.corpus_id, doc)
-
-            except Exception as e:
-                # Ignore for lab
-                self.logger.error("Error: {e}")
+            while True:
+                try:
+                    # Transient failures (429, UNAVAILABLE etc.) have already been retried by the RequestUtil.
+                    result = self.indexer_service.index_doc(self.corpus_id, doc, deadline=self.deadline)
+                    self.results.append({"result": result})
+                except CircuitOpenError as e:
+                    # Nothing was sent, so try the same document again once the circuit allows it.
+                    _pause_while_open(self.indexer_service, e, self.logger, self.deadline)
+                    continue
+                except Exception as e:
+                    # Ignore for lab
+                    self.logger.error(f"Error: {e}")
+                    self.results.append({"error": e})
+                break
         self.logger.info(f"Worker [{self.thread_index}] Finished our indexer requests")
         self.latch.count_down()
 
@@ -44,13 +76,15 @@ class SubCoreIndexer:
         Class designed to be used inside a thread to run multiple indexing requests and track completions.
     """
 
-    def __init__(self, indexer_service: IndexerService, corpus_id: int, latch: CountDownLatch, thread_index: int):
+    def __init__(self, indexer_service: IndexerService, corpus_id: int, latch: CountDownLatch, thread_index: int,
+                 deadline: Deadline = None):
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.indexer_service = indexer_service
         self.corpus_id = corpus_id
         self.latch = latch
         self.thread_index = thread_index
+        self.deadline = deadline
 
         self.docs = []
         self.results = []
@@ -63,13 +97,19 @@ class SubCoreIndexer:
         self.logger.info(f"Worker [{self.thread_index}] Starting our [{len(self.docs)}] indexer requests")
 
         for doc in self.docs:
-            try:
-                result = self.indexer_service.index_core_doc(self.corpus_id, doc)
-                self.results.append({"result": result})
-            except Exception as e:
-                # Ignore for lab
-                self.logger.error(f"Error: {e}")
-                self.results.append({"error": e})
+            while True:
+                try:
+                    result = self.indexer_service.index_core_doc(self.corpus_id, doc, deadline=self.deadline)
+                    self.results.append({"result": result})
+                except CircuitOpenError as e:
+                    # Nothing was sent, so try the same document again once the circuit allows it.
+                    _pause_while_open(self.indexer_service, e, self.logger, self.deadline)
+                    continue
+                except Exception as e:
+                    # Ignore for lab
+                    self.logger.error(f"Error: {e}")
+                    self.results.append({"error": e})
+                break
         self.logger.info(f"Worker [{self.thread_index}] Finished our indexer requests")
         self.latch.count_down()
 
@@ -170,14 +210,23 @@ class CorpusManager:
 
 
 
-    def batch_index(self, corpus_id:int, documents: List[Union[dict, IndexDocument]], threads:int=10) -> List[any]:
+    def batch_index(self, corpus_id:int, documents: List[Union[dict, IndexDocument]], threads:int=10,
+                    deadline: Union[Deadline, float] = None) -> List[any]:
+        """
+        Indexes the documents across a number of worker threads.
+
+        :param deadline: a Deadline or seconds from now for the whole batch, documents not sent by then fail with
+            DeadlineExceededError.
+        """
+        deadline = Deadline.resolve(deadline)
         self.logger.info(f"Performing parallel [{threads}] document indexing requests")
 
         # Create our countdown latch
         latch = CountDownLatch(threads)
 
         # Create sub-indexers for each thread
-        sub_indexers = [ SubIndexer(self.indexer_service, corpus_id, latch, thread_index) for thread_index in range(threads)]
+        sub_indexers = [SubIndexer(self.indexer_service, corpus_id, latch, thread_index, deadline)
+                        for thread_index in range(threads)]
 
         for index, doc in enumerate(documents):
             thread_index = index % threads
@@ -188,19 +237,23 @@ class CorpusManager:
             thread.start()
 
         # Wait for completion.
-        latch.sweat_it_out()
+        self._wait_for_workers(latch, deadline)
 
         # TODO Extract results from each sub-indexer into a final result array and return it.
 
     def batch_core_index(self, corpus_id:int, documents: List[Union[dict, IndexDocument]],
-                         threads: int = 10) -> List[any]:
+                         threads: int = 10, deadline: Union[Deadline, float] = None) -> List[any]:
+        """
+        See batch_index, using the core indexing API.
+        """
+        deadline = Deadline.resolve(deadline)
         self.logger.info(f"Performing parallel [{threads}] document indexing requests")
 
         # Create our countdown latch
         latch = CountDownLatch(threads)
 
         # Create sub-indexers for each thread
-        sub_indexers = [SubCoreIndexer(self.indexer_service, corpus_id, latch, thread_index)
+        sub_indexers = [SubCoreIndexer(self.indexer_service, corpus_id, latch, thread_index, deadline)
                         for thread_index in range(threads)]
 
         for index, doc in enumerate(documents):
@@ -212,8 +265,13 @@ class CorpusManager:
             thread.start()
 
         # Wait for completion.
-        latch.sweat_it_out()
+        self._wait_for_workers(latch, deadline)
 
         # TODO Extract results from each sub-indexer into a final result array and return it.
 
-
+    def _wait_for_workers(self, latch: CountDownLatch, deadline: Optional[Deadline]):
+        # Each request is bounded by the deadline, so the workers should all finish shortly after it.
+        timeout = max(0.0, deadline.remaining()) + _DEADLINE_GRACE if deadline else None
+        if not latch.sweat_it_out(timeout):
+            self.logger.warning(f"Batch workers still running [{_DEADLINE_GRACE}s] after the deadline, not waiting "
+                                f"for them")
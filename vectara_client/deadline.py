@@ -0,0 +1,127 @@
+"""
+Deadlines and per attempt timeouts for RequestUtil and AsyncRequestUtil.
+
+A Deadline is an absolute point in time, so one created at the start of a paginated call such as
+AdminService.list_api_keys bounds every page, retry and backoff within it. Each attempt's socket timeouts come from
+TimeoutConfig (optionally adapted to observed latency) and are cut short by whatever remains of the deadline.
+"""
+from vectara_client.config import TimeoutConfig
+from vectara_client.error import DeadlineExceededError
+from vectara_client.hedge import LatencyTracker
+from threading import Lock
+from typing import Callable, Optional, Tuple, Union
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    The time by which a call must finish, including all of its retries and sub-requests.
+    """
+
+    def __init__(self, expires_at: float, clock: Callable[[], float] = time.monotonic):
+        """
+        :param expires_at: in the clock's seconds, see Deadline.after.
+        :param clock: injectable for tests, returns seconds.
+        """
+        self.expires_at = expires_at
+        self.clock = clock
+
+    @classmethod
+    def after(cls, seconds: float, clock: Callable[[], float] = time.monotonic) -> "Deadline":
+        return cls(clock() + seconds, clock)
+
+    @classmethod
+    def resolve(cls, deadline: Union["Deadline", float, None]) -> Optional["Deadline"]:
+        """
+        Service methods accept either a Deadline or a number of seconds from now.
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls.after(deadline)
+
+    def remaining(self) -> float:
+        """
+        :return: seconds left, zero or negative once expired.
+        """
+        return self.expires_at - self.clock()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, operation: str):
+        """
+        :raises DeadlineExceededError: if the deadline has passed.
+        """
+        if self.expired():
+            raise DeadlineExceededError(f"Deadline exceeded before sending operation [{operation}]",
+                                        operation=operation)
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+class Timeouts:
+    """
+    Works out the connect and read timeouts for each attempt. Thread-safe, shared by every thread or task using the
+    request utility.
+    """
+
+    def __init__(self, config: TimeoutConfig = None):
+        """
+        :param config: the timeouts, if None the defaults from TimeoutConfig are used.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = TimeoutConfig()
+        self.config = config
+        self._trackers = {}
+        self._lock = Lock()
+
+    def static_timeout(self, operation: str) -> Optional[float]:
+        return self.config.operations.get(operation, self.config.default)
+
+    def timeout(self, operation: str) -> Optional[float]:
+        """
+        :return: the read timeout for an attempt of operation ignoring any deadline, None for no timeout.
+        """
+        timeout = self.static_timeout(operation)
+        if not self.config.adaptive:
+            return timeout
+
+        with self._lock:
+            tracker = self._trackers.get(operation)
+            threshold = tracker.threshold() if tracker else None
+        if threshold is None:
+            return timeout
+
+        adapted = max(self.config.min_timeout, threshold * self.config.multiplier)
+        return adapted if timeout is None else min(adapted, timeout)
+
+    def for_attempt(self, operation: str, deadline: Deadline = None) -> Tuple[float, Optional[float]]:
+        """
+        :return: a tuple of the connect and read timeouts, as accepted by requests.
+        :raises DeadlineExceededError: if the deadline has already passed.
+        """
+        connect, read = self.config.connect, self.timeout(operation)
+        if deadline:
+            deadline.check(operation)
+            remaining = deadline.remaining()
+            connect = min(connect, remaining)
+            read = remaining if read is None else min(read, remaining)
+        return connect, read
+
+    def record(self, operation: str, latency: float):
+        """
+        Records the latency of a successful attempt, only kept in adaptive mode.
+        """
+        if not self.config.adaptive:
+            return
+        with self._lock:
+            tracker = self._trackers.get(operation)
+            if tracker is None:
+                tracker = LatencyTracker(self.config.window, self.config.percentile, self.config.min_samples)
+                self._trackers[operation] = tracker
+            tracker.record(latency)
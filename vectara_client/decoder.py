@@ -0,0 +1,329 @@
+"""
+Precompiled decoders from decoded JSON onto our dataclasses, used by RequestUtil in place of dacite.from_dict.
+
+dacite walks the type hints of every field on every call and then re-walks the built value to type check it. Here we
+do that work once per dataclass, generating a specialised function which builds and validates each field in a single
+pass. Validation follows dacite's default Config: the same values are accepted (e.g. an int for a float field,
+None or a missing key for an Optional field, unknown keys are ignored) and the same dacite exceptions are raised with
+the same field paths. Instances are created through the dataclass __init__ so __post_init__ enum fix-ups still run.
+"""
+from collections.abc import Mapping
+from dataclasses import MISSING, fields, is_dataclass
+from threading import RLock
+from typing import Any, Callable, Dict, List, Type, TypeVar, Union, get_args, get_origin, get_type_hints
+from dacite import Config, from_dict
+from dacite.core import _build_value
+from dacite.dataclasses import get_fields
+from dacite.exceptions import (DaciteError, DaciteFieldError, ForwardReferenceError, MissingValueError,
+                               UnionMatchError, WrongTypeError)
+from dacite.types import is_instance
+import logging
+import types
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_NONE_TYPE = type(None)
+_UNION_TYPES = (Union, types.UnionType)
+_MISSING = object()
+
+
+class _Mismatch(Exception):
+    """
+    Raised by nested decoders when a value is the wrong type, converted to WrongTypeError with the field path by the
+    enclosing dataclass decoder.
+    """
+    pass
+
+
+_decoders: Dict[Any, Callable[[Any], Any]] = {}
+_lock = RLock()
+
+
+def decode(data_class: Type[T], data: Any) -> T:
+    """
+    Drop in replacement for dacite.from_dict(data_class, data) with the default Config. The decoder for data_class
+    is compiled on first use and cached.
+
+    :raises dacite.DaciteError: on the same inputs as dacite.from_dict.
+    """
+    decoder = _decoders.get(data_class)
+    if decoder is None:
+        with _lock:
+            decoder = _compile(data_class)
+    try:
+        return decoder(data)
+    except _Mismatch:
+        raise WrongTypeError(field_type=data_class, value=data) from None
+
+
+def decode_value(type_, data: Any, field_path: str = None) -> Any:
+    """
+    Decodes and validates a single value, e.g. one field of a dataclass, against any supported type hint.
+
+    :param field_path: the name reported in any exception.
+    :raises dacite.DaciteError: on the same inputs as dacite.from_dict would for a field of this type.
+    """
+    decoder = _decoders.get(type_)
+    if decoder is None:
+        with _lock:
+            decoder = _compile(type_)
+    try:
+        return decoder(data)
+    except _Mismatch:
+        raise WrongTypeError(field_type=type_, value=data, field_path=field_path) from None
+    except DaciteFieldError as e:
+        if field_path:
+            e.update_path(field_path)
+        raise
+
+
+def register_decoder(type_, decoder: Callable[[Any], Any]):
+    """
+    Installs a custom decode function for a type, used both by decode(type_, ...) and for fields of that type.
+    """
+    with _lock:
+        _decoders[type_] = decoder
+
+
+def _compile(type_) -> Callable[[Any], Any]:
+    decoder = _decoders.get(type_)
+    if decoder is not None:
+        return decoder
+
+    origin = get_origin(type_)
+    if type_ is Any:
+        decoder = _identity
+    elif origin in _UNION_TYPES:
+        decoder = _compile_union(type_)
+    elif origin is list:
+        decoder = _compile_list(type_)
+    elif origin is dict:
+        decoder = _compile_dict(type_)
+    elif isinstance(type_, type) and is_dataclass(type_):
+        decoder = _compile_dataclass(type_)
+    elif isinstance(type_, type) and origin is None:
+        decoder = _compile_simple(type_)
+    else:
+        decoder = _compile_fallback(type_)
+
+    _decoders[type_] = decoder
+    return decoder
+
+
+def _identity(data):
+    return data
+
+
+def _accepted_types(type_: type):
+    # The numeric tower from PEP 484, as applied by dacite.
+    if type_ is float:
+        return (int, float)
+    elif type_ is complex:
+        return (int, float, complex)
+    return type_
+
+
+def _compile_simple(type_: type):
+    accepted = _accepted_types(type_)
+
+    def decode_simple(data):
+        if isinstance(data, accepted):
+            return data
+        raise _Mismatch()
+
+    return decode_simple
+
+
+def _compile_union(type_):
+    args = get_args(type_)
+    members = [arg for arg in args if arg is not _NONE_TYPE]
+    optional = len(members) < len(args)
+
+    if optional and len(members) == 1:
+        inner = _compile(members[0])
+
+        def decode_optional(data):
+            if data is None:
+                return None
+            return inner(data)
+
+        return decode_optional
+
+    inner_decoders = [_compile(member) for member in members]
+
+    def decode_union(data):
+        if optional and data is None:
+            return None
+        for inner in inner_decoders:
+            try:
+                return inner(data)
+            except (_Mismatch, DaciteError):
+                # Only a value which doesn't match the member falls through, anything else is a bug to surface.
+                continue
+        raise UnionMatchError(field_type=type_, value=data)
+
+    return decode_union
+
+
+def _compile_list(type_):
+    item_args = get_args(type_)
+    item_decoder = _compile(item_args[0]) if item_args else _identity
+
+    if item_decoder is _identity:
+        def decode_list(data):
+            if isinstance(data, list):
+                return data.__class__(data)
+            raise _Mismatch()
+    else:
+        def decode_list(data):
+            if type(data) is list:
+                return [item_decoder(item) for item in data]
+            elif isinstance(data, list):
+                return data.__class__(item_decoder(item) for item in data)
+            raise _Mismatch()
+
+    return decode_list
+
+
+def _compile_dict(type_):
+    args = get_args(type_)
+    key_decoder = _compile(args[0]) if args else _identity
+    value_decoder = _compile(args[1]) if args else _identity
+
+    def decode_dict(data):
+        if isinstance(data, dict):
+            return data.__class__((key_decoder(key), value_decoder(value)) for key, value in data.items())
+        raise _Mismatch()
+
+    return decode_dict
+
+
+def _compile_fallback(type_):
+    """
+    Types our domain doesn't use (Literal, NewType, Tuple etc.) are handed to dacite.
+    """
+    config = Config()
+
+    def decode_fallback(data):
+        value = _build_value(type_=type_, data=data, config=config)
+        if not is_instance(value, type_):
+            raise _Mismatch()
+        return value
+
+    return decode_fallback
+
+
+def _compile_dataclass(data_class: type):
+    if len(get_fields(data_class)) != len(fields(data_class)) or not all(f.init for f in fields(data_class)):
+        # InitVar and non-init fields are rare enough that we leave them to dacite.
+        return lambda data: from_dict(data_class, data)
+
+    try:
+        hints = get_type_hints(data_class)
+    except NameError as e:
+        raise ForwardReferenceError(str(e))
+
+    # Register a trampoline first so recursive types (e.g. DocumentSection.section) find us while we compile.
+    compiled = []
+
+    def trampoline(data):
+        if not compiled:
+            # Another thread found us before we finished compiling, which we do while holding the lock.
+            with _lock:
+                pass
+        return compiled[0](data)
+
+    _decoders[data_class] = trampoline
+    try:
+        decoder = _generate_dataclass_decoder(data_class, hints)
+    except Exception:
+        del _decoders[data_class]
+        raise
+    compiled.append(decoder)
+    return decoder
+
+
+def _generate_dataclass_decoder(data_class: type, hints: dict):
+
+    namespace = {
+        "_cls": data_class,
+        "_Mapping": Mapping,
+        "_MISSING": _MISSING,
+        "_Mismatch": _Mismatch,
+        "_DaciteFieldError": DaciteFieldError,
+        "_MissingValueError": MissingValueError,
+        "_WrongTypeError": WrongTypeError,
+    }
+    lines = [
+        "def decode(data):",
+        "    if data.__class__ is not dict and not isinstance(data, _Mapping):",
+        "        if isinstance(data, _cls):",
+        "            return data",
+        "        raise _Mismatch()",
+    ]
+    args = []
+    for index, f in enumerate(fields(data_class)):
+        field_type = hints[f.name]
+        var = f"v{index}"
+        namespace[f"t{index}"] = field_type
+        lines.append(f"    {var} = data.get({f.name!r}, _MISSING)")
+        lines.append(f"    if {var} is _MISSING:")
+        lines.extend(_missing_lines(f, field_type, index, var, namespace))
+        lines.append("    else:")
+        lines.append("        try:")
+        lines.extend(_build_lines(field_type, index, var, namespace))
+        lines.append("        except _Mismatch:")
+        lines.append(f"            raise _WrongTypeError(field_path={f.name!r}, field_type=t{index}, "
+                     f"value={var}) from None")
+        lines.append("        except _DaciteFieldError as e:")
+        lines.append(f"            e.update_path({f.name!r})")
+        lines.append("            raise")
+        args.append(f"{f.name}={var}")
+    lines.append(f"    return _cls({', '.join(args)})")
+
+    source = "\n".join(lines)
+    exec(compile(source, f"<decoder {data_class.__module__}.{data_class.__qualname__}>", "exec"), namespace)
+    return namespace["decode"]
+
+
+def _is_optional(type_) -> bool:
+    return get_origin(type_) in _UNION_TYPES and _NONE_TYPE in get_args(type_)
+
+
+def _missing_lines(f, field_type, index: int, var: str, namespace: dict) -> List[str]:
+    if f.default is not MISSING:
+        namespace[f"d{index}"] = f.default
+        return [f"        {var} = d{index}"]
+    elif f.default_factory is not MISSING:
+        namespace[f"f{index}"] = f.default_factory
+        return [f"        {var} = f{index}()"]
+    elif _is_optional(field_type):
+        return [f"        {var} = None"]
+    else:
+        return [f"        raise _MissingValueError({f.name!r})"]
+
+
+def _build_lines(field_type, index: int, var: str, namespace: dict) -> List[str]:
+    """
+    Inlines the check for plain types, e.g. str and Optional[int], otherwise calls the compiled decoder.
+    """
+    optional = False
+    inner = field_type
+    if _is_optional(field_type):
+        members = [arg for arg in get_args(field_type) if arg is not _NONE_TYPE]
+        if len(members) == 1:
+            optional = True
+            inner = members[0]
+
+    if isinstance(inner, type) and get_origin(inner) is None and not is_dataclass(inner):
+        namespace[f"a{index}"] = _accepted_types(inner)
+        condition = f"not isinstance({var}, a{index})"
+        if optional:
+            condition = f"{var} is not None and {condition}"
+        return [f"            if {condition}:",
+                "                raise _Mismatch()"]
+
+    namespace[f"c{index}"] = _compile(field_type)
+    return [f"            {var} = c{index}({var})"]
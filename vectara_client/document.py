@@ -1,6 +1,8 @@
+from vectara_client.deadline import Deadline
+from vectara_client.tracing import traced
 from vectara_client.domain import *
-from typing import List, TypeVar
-from vectara_client.util import RequestUtil, convertAttrListToDict
+from typing import List, TypeVar, Union
+from vectara_client.util import RequestUtil, AsyncRequestUtil, convertAttrListToDict
 import logging
 
 T = TypeVar("T")
@@ -11,12 +13,17 @@ class DocumentService():
         self.logger = logging.getLogger(__class__.__name__)
         self.request_util = request_util
 
+    @traced
     def list_documents(self, corpus_id: int, page: int = 0, page_size: int = 100,
-                       metadata_filter: str = None) -> List[DocumentDTO]:
+                       metadata_filter: str = None, deadline: Union[Deadline, float] = None) -> List[DocumentDTO]:
+        """
+        Retrieves every page of documents in the corpus.
 
-        payload = {"corpus_id": corpus_id, "page": page, "num_results": page_size}
-        if metadata_filter:
-            payload['metadata_filter'] = metadata_filter
+        :param deadline: a Deadline or seconds from now, shared by every page.
+        """
+        # One deadline for all the pages, rather than each page getting the full budget.
+        deadline = Deadline.resolve(deadline)
+        payload = self._build_list_payload(corpus_id, page, page_size, metadata_filter)
 
         documents = []
         end_found = False
@@ -27,15 +34,10 @@ class DocumentService():
             if page_key:
                 payload['pageKey'] = page_key
 
-            response = self.request_util.request("list-documents", payload, ListDocumentsResponse, method="POST")
+            response = self.request_util.request("list-documents", payload, ListDocumentsResponse, method="POST",
+                                                 deadline=deadline)
 
-            for doc in response.document:
-                doc_id = doc.id
-                if doc.metadata:
-                    metadata = convertAttrListToDict(doc.metadata)
-                else:
-                    metadata = {}
-                documents.append(DocumentDTO(doc_id, metadata))
+            documents.extend(self._to_dtos(response))
 
             if response.nextPageKey:
                 page_key = response.nextPageKey
@@ -44,4 +46,51 @@ class DocumentService():
 
         return documents
 
+    def _build_list_payload(self, corpus_id: int, page: int, page_size: int, metadata_filter: str) -> dict:
+        payload = {"corpus_id": corpus_id, "page": page, "num_results": page_size}
+        if metadata_filter:
+            payload['metadata_filter'] = metadata_filter
+        return payload
+
+    def _to_dtos(self, response: ListDocumentsResponse) -> List[DocumentDTO]:
+        documents = []
+        for doc in response.document:
+            doc_id = doc.id
+            if doc.metadata:
+                metadata = convertAttrListToDict(doc.metadata)
+            else:
+                metadata = {}
+            documents.append(DocumentDTO(doc_id, metadata))
+        return documents
+
+
+class AsyncDocumentService(DocumentService):
+    """
+    asyncio counterpart of DocumentService, sharing its request building and response conversion.
+    """
+
+    def __init__(self, request_util: AsyncRequestUtil):
+        super().__init__(request_util)
 
+    @traced
+    async def list_documents(self, corpus_id: int, page: int = 0, page_size: int = 100,
+                             metadata_filter: str = None,
+                             deadline: Union[Deadline, float] = None) -> List[DocumentDTO]:
+        deadline = Deadline.resolve(deadline)
+        payload = self._build_list_payload(corpus_id, page, page_size, metadata_filter)
+
+        documents = []
+        end_found = False
+
+        while not end_found:
+            response = await self.request_util.request("list-documents", payload, ListDocumentsResponse,
+                                                       method="POST", deadline=deadline)
+
+            documents.extend(self._to_dtos(response))
+
+            if response.nextPageKey:
+                payload['pageKey'] = response.nextPageKey
+            else:
+                end_found = True
+
+        return documents
@@ -0,0 +1,79 @@
+"""
+Precompiled encoders from our request dataclasses to JSON-ready structures, replacing dataclasses.asdict.
+
+asdict deep-copies every value and then needs a dict_factory pass to drop None fields and map enums to their names.
+Here a specialised function is generated once per dataclass which does all of that in a single pass, sharing (not
+copying) plain values. Field names which would be Python reserved words are declared with a leading underscore on
+our dataclasses (e.g. LinearInterpolation._lambda) and are sent without it (e.g. "lambda").
+"""
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from threading import RLock
+from typing import Any, Callable, Dict
+import keyword
+import logging
+
+logger = logging.getLogger(__name__)
+
+_PLAIN_TYPES = (str, int, float, bool)
+
+_encoders: Dict[type, Callable[[Any], dict]] = {}
+_lock = RLock()
+
+
+def encode(value: Any) -> Any:
+    """
+    Converts a dataclass (or list/dict of them) into JSON-ready dicts and lists, omitting None fields and mapping
+    enums to their names.
+    """
+    cls = value.__class__
+    if cls in _PLAIN_TYPES or value is None:
+        return value
+
+    encoder = _encoders.get(cls)
+    if encoder is not None:
+        return encoder(value)
+    elif isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    elif isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    elif isinstance(value, Enum):
+        return value.name
+    elif is_dataclass(value):
+        return _encoder_for(cls)(value)
+    else:
+        return value
+
+
+def wire_name(field_name: str) -> str:
+    """
+    :return: the JSON key for a dataclass field, e.g. "_lambda" is sent as "lambda".
+    """
+    if field_name.startswith("_") and keyword.iskeyword(field_name[1:]):
+        return field_name[1:]
+    return field_name
+
+
+def _encoder_for(cls: type) -> Callable[[Any], dict]:
+    with _lock:
+        encoder = _encoders.get(cls)
+        if encoder is None:
+            encoder = _compile(cls)
+            _encoders[cls] = encoder
+        return encoder
+
+
+def _compile(cls: type) -> Callable[[Any], dict]:
+    namespace = {"_encode": encode, "_PLAIN_TYPES": _PLAIN_TYPES}
+    lines = ["def encode_dataclass(obj):", "    result = {}"]
+    for f in fields(cls):
+        lines.append(f"    value = obj.{f.name}")
+        lines.append("    if value is not None:")
+        # Plain values are by far the most common, so avoid the call for those.
+        lines.append(f"        result[{wire_name(f.name)!r}] = (value if value.__class__ in _PLAIN_TYPES "
+                     f"else _encode(value))")
+    lines.append("    return result")
+
+    source = "\n".join(lines)
+    exec(compile(source, f"<encoder {cls.__module__}.{cls.__qualname__}>", "exec"), namespace)
+    return namespace["encode_dataclass"]
@@ -0,0 +1,38 @@
+"""
+Exceptions raised by the transport layer in RequestUtil.
+"""
+
+
+class RateLimitExceededError(Exception):
+    """
+    Raised when the client side rate limiter would have to wait longer than its configured max_wait.
+    """
+
+    def __init__(self, message, key: str = None, wait: float = None):
+        super().__init__(message)
+        self.key = key
+        self.wait = wait
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised without sending the request while the circuit breaker for its operation is open.
+    """
+
+    def __init__(self, message, operation: str = None, retry_after: float = None):
+        """
+        :param retry_after: seconds until trial calls are let through, None if trial calls are already in progress.
+        """
+        super().__init__(message)
+        self.operation = operation
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised instead of sending a request (or another attempt or page of one) once the caller's deadline has passed.
+    """
+
+    def __init__(self, message, operation: str = None):
+        super().__init__(message)
+        self.operation = operation
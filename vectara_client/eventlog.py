@@ -0,0 +1,130 @@
+"""
+Structured, low overhead logging for the events on our hot paths, which happen once or more for every request.
+
+Each event has a name such as "request.url", a level chosen by the LoggingConfig profile and optionally a sample
+rate. Logging an event costs a dictionary lookup and Logger.isEnabledFor when its level is disabled, so call sites
+pass the message and its arguments unformatted, wrapping anything expensive to compute (e.g. pretty printed JSON)
+in lazy() so it is only computed if the event is written.
+
+The "development" profile logs these events at the levels we always have, e.g. the URL of each request at INFO.
+The "production" profile moves every hot path event down to DEBUG, so at INFO they cost close to nothing.
+
+Written records carry the event name and its fields as record.event and record.fields, which StructuredFormatter
+writes as one JSON object per line.
+"""
+from vectara_client.config import LoggingConfig
+from typing import Callable, Dict
+import itertools
+import json
+import logging
+
+# The level of each hot path event, by profile. Events not listed are logged at INFO.
+PROFILES: Dict[str, Dict[str, int]] = {
+    "development": {
+        "request.url": logging.INFO,
+        "request.headers": logging.DEBUG,
+        "request.payload": logging.DEBUG,
+        "response.body": logging.DEBUG,
+        "auth.token": logging.INFO,
+        "chat.prompt": logging.INFO
+    },
+    "production": {
+        "request.url": logging.DEBUG,
+        "request.headers": logging.DEBUG,
+        "request.payload": logging.DEBUG,
+        "response.body": logging.DEBUG,
+        "auth.token": logging.DEBUG,
+        "chat.prompt": logging.DEBUG
+    }
+}
+
+
+class lazy:
+    """
+    A log argument computed only if the message is formatted, e.g. lazy(json.dumps, headers).
+    """
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn: Callable, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+    def __repr__(self):
+        return repr(self.fn(*self.args))
+
+
+class EventLogger:
+    """
+    Logs named events to a standard library logger, at the levels and sample rates of a LoggingConfig.
+    """
+
+    def __init__(self, target: logging.Logger, config: LoggingConfig = None):
+        """
+        :param target: the logger events are written to, usually the owning class's.
+        :param config: the profile and sample rates, defaults to the "development" profile with no sampling.
+        """
+        self.config = config if config else LoggingConfig()
+        if self.config.profile not in PROFILES:
+            raise TypeError(f"Unknown logging profile [{self.config.profile}], expected one of {list(PROFILES)}")
+        self.logger = target
+        self.levels = dict(PROFILES[self.config.profile])
+        for event, level in self.config.levels.items():
+            self.levels[event] = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        # Sampling keeps every nth occurrence of an event, counted with itertools.count as next() on it is atomic.
+        self._every = {}
+        self._counters = {}
+        for event, rate in self.config.sample_rates.items():
+            if not 0.0 <= rate <= 1.0:
+                raise TypeError(f"The sample rate of [{event}] must be between 0 and 1, not {rate}")
+            self._every[event] = round(1.0 / rate) if rate > 0.0 else 0
+            self._counters[event] = itertools.count()
+
+    def enabled(self, event: str) -> bool:
+        """
+        :return: whether event would be written if it weren't sampled out, for call sites which must do work
+            before logging it.
+        """
+        return self.logger.isEnabledFor(self.levels.get(event, logging.INFO))
+
+    def log(self, event: str, msg: str, *args, **fields):
+        """
+        Logs msg % args, which is only formatted by a handler that writes it.
+
+        :param event: the event's name, which selects its level and sample rate
+        :param fields: structured values attached to the record as record.fields, these should be cheap as they're
+            evaluated by the caller, use lazy() otherwise
+        """
+        level = self.levels.get(event, logging.INFO)
+        if not self.logger.isEnabledFor(level):
+            return
+        every = self._every.get(event)
+        if every is not None and (every == 0 or next(self._counters[event]) % every):
+            return
+        self.logger.log(level, msg, *args, extra={"event": event, "fields": fields}, stacklevel=2)
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats each record as a JSON object on one line, with the event name and fields of those logged through an
+    EventLogger.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+            for key, value in record.fields.items():
+                entry[key] = str(value) if isinstance(value, lazy) else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
@@ -0,0 +1,263 @@
+"""
+Hedged requests for idempotent operations, used by RequestUtil and AsyncRequestUtil to cut tail latency.
+
+If a request hasn't responded within a percentile (e.g. p95) of its operation's recently observed latency, an
+identical request is sent and the first to succeed is returned. Hedges draw from a budget earned by every request,
+so they can add at most HedgeConfig.budget_ratio extra load. The asyncio client cancels the losing request; the
+blocking client can't interrupt a request in progress, so the loser completes in the background and is discarded.
+
+The blocking client runs both requests on a pool of HedgeConfig.max_workers threads, so the caller can return
+whichever answers first. Neither ever queues for a thread: when every worker is busy the request runs unhedged on
+the caller's own thread, and a hedge isn't sent. Otherwise time spent queueing would count towards the threshold,
+firing hedges which queue in turn, and the pool would cap how many requests of the operation run at once.
+"""
+from vectara_client.config import HedgeConfig
+from vectara_client.retry import IDEMPOTENT_OPERATIONS, RetryBudget
+from collections import deque
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError, wait
+from dataclasses import dataclass, replace
+from threading import BoundedSemaphore, Lock
+from typing import Callable, Dict, Optional, TypeVar
+import asyncio
+import logging
+import time
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# The threshold is recomputed after this many new latencies, rather than sorting the window on every request.
+_RECOMPUTE_EVERY = 16
+
+
+@dataclass
+class HedgeStats:
+    """
+    Counters for one operation.
+    """
+    requests: int = 0
+    # Hedges sent, and how many of those responded before the original request.
+    hedges: int = 0
+    hedge_wins: int = 0
+    # Requests which were slow enough to hedge but the budget was spent.
+    budget_denied: int = 0
+    # Blocking requests run unhedged, or not hedged when slow, as every worker thread was busy.
+    workers_busy: int = 0
+
+
+class LatencyTracker:
+    """
+    The most recent latencies of one operation and the percentile after which we hedge. Not thread-safe, Hedger
+    serializes access.
+    """
+
+    def __init__(self, window: int, percentile: float, min_samples: int):
+        self.samples = deque(maxlen=window)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._threshold = None
+        self._stale = 0
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+        self._stale += 1
+
+    def threshold(self) -> Optional[float]:
+        """
+        :return: the latency in seconds after which to hedge, None until we have min_samples.
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._threshold is None or self._stale >= _RECOMPUTE_EVERY:
+            ordered = sorted(self.samples)
+            self._threshold = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))]
+            self._stale = 0
+        return self._threshold
+
+
+class Hedger:
+    """
+    Runs one attempt of a request with hedging. Shared by every thread or task using the request utility.
+    """
+
+    def __init__(self, config: HedgeConfig = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param config: the hedging policy, if None the defaults from HedgeConfig are used.
+        :param clock: injectable for tests, returns seconds.
+        :raises TypeError: if a configured operation is not idempotent
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = HedgeConfig()
+        for operation in config.operations:
+            if operation not in IDEMPOTENT_OPERATIONS:
+                raise TypeError(f"Operation [{operation}] is not idempotent so cannot be hedged, expected one of "
+                                f"{sorted(IDEMPOTENT_OPERATIONS)}")
+        self.config = config
+        self.clock = clock
+        # Unlike retries, there is no initial allowance so hedges never exceed budget_ratio of requests.
+        self.budget = RetryBudget(config.budget_ratio, 0.0, config.budget_max)
+        self._trackers = {operation: LatencyTracker(config.window, config.percentile, config.min_samples)
+                          for operation in config.operations}
+        self._stats = {operation: HedgeStats() for operation in config.operations}
+        self._lock = Lock()
+        self._executor = None
+        # Idle worker threads, each request takes one before it is submitted so it never queues.
+        self._workers = BoundedSemaphore(config.max_workers)
+
+    def hedges(self, operation: str) -> bool:
+        return operation in self._trackers
+
+    def stats(self) -> Dict[str, HedgeStats]:
+        """
+        :return: a copy of the counters keyed by operation.
+        """
+        with self._lock:
+            return {operation: replace(stats) for operation, stats in self._stats.items()}
+
+    def close(self):
+        """
+        Stops the worker threads of the blocking client, abandoning any losing requests still in progress.
+        """
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, operation: str) -> Optional[float]:
+        self.budget.deposit()
+        with self._lock:
+            self._stats[operation].requests += 1
+            return self._trackers[operation].threshold()
+
+    def _record(self, operation: str, latency: float):
+        with self._lock:
+            self._trackers[operation].record(latency)
+
+    def _try_hedge(self, operation: str, threshold: float) -> bool:
+        allowed = self.budget.try_withdraw()
+        with self._lock:
+            if allowed:
+                self._stats[operation].hedges += 1
+            else:
+                self._stats[operation].budget_denied += 1
+        if allowed:
+            self.logger.debug(f"No response to [{operation}] within [{threshold:.3f}s], sending a hedge")
+        return allowed
+
+    def _won(self, operation: str):
+        with self._lock:
+            self._stats[operation].hedge_wins += 1
+
+    def _timed(self, operation: str, send: Callable[[], T]) -> T:
+        start = self.clock()
+        result = send()
+        self._record(operation, self.clock() - start)
+        return result
+
+    def _try_reserve_worker(self, operation: str) -> bool:
+        if self._workers.acquire(blocking=False):
+            return True
+        with self._lock:
+            self._stats[operation].workers_busy += 1
+        return False
+
+    def _submit(self, executor: ThreadPoolExecutor, operation: str, send: Callable[[], T]) -> Future:
+        """
+        Runs send on a worker reserved by _try_reserve_worker, which is freed once it completes or is cancelled.
+        """
+        try:
+            # Each request runs in a copy of our context, so it sees the caller's current span.
+            future = executor.submit(copy_context().run, self._timed, operation, send)
+        except BaseException:
+            self._workers.release()
+            raise
+        future.add_done_callback(lambda _: self._workers.release())
+        return future
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.config.max_workers,
+                                                        thread_name_prefix="vectara-hedge")
+        return self._executor
+
+    def call(self, operation: str, send: Callable[[], T]) -> T:
+        """
+        Performs one attempt of a request, hedging it if it is slow.
+
+        :param operation: the REST operation, which must be one of HedgeConfig.operations.
+        :param send: performs the request, returning the decoded response or raising.
+        :return: the response of whichever request succeeded first.
+        """
+        threshold = self._start(operation)
+        if threshold is None or not self._try_reserve_worker(operation):
+            return self._timed(operation, send)
+
+        executor = self._get_executor()
+        # A worker was idle, so the request starts now and the threshold is timed from when it was sent.
+        primary = self._submit(executor, operation, send)
+        try:
+            return primary.result(timeout=threshold)
+        except TimeoutError:
+            pass
+
+        if not self._try_reserve_worker(operation):
+            return primary.result()
+        if not self._try_hedge(operation, threshold):
+            self._workers.release()
+            return primary.result()
+
+        hedge = self._submit(executor, operation, send)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # If both finished together, prefer the original.
+            for future in sorted(done, key=lambda f: f is hedge):
+                if future.exception() is None:
+                    if future is hedge:
+                        self._won(operation)
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+
+        # Both failed, so report the original's error as if we hadn't hedged.
+        return primary.result()
+
+    async def call_async(self, operation: str, send) -> T:
+        """
+        asyncio version of call, where send is a coroutine function. The losing request is cancelled.
+        """
+        threshold = self._start(operation)
+        if threshold is None:
+            return await self._timed_async(operation, send)
+
+        primary = asyncio.ensure_future(self._timed_async(operation, send))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if done or not self._try_hedge(operation, threshold):
+                return await primary
+
+            hedge = asyncio.ensure_future(self._timed_async(operation, send))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t is hedge):
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._won(operation)
+                        return task.result()
+
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _timed_async(self, operation: str, send):
+        start = self.clock()
+        result = await send()
+        self._record(operation, self.clock() - start)
+        return result
@@ -13,14 +13,16 @@ Tasks
 * TODO Investigate whether I need the lower level API too
 """
 from vectara_client.authn import BaseAuthUtil
+from vectara_client.deadline import Deadline
+from vectara_client.tracing import traced
+from vectara_client.decoder import decode
 from vectara_client.domain import (UploadDocumentResponse, IndexDocumentRequest, IndexDocumentResponse,
                                    IndexDocument, CoreIndexDocumentRequest, CoreIndexDocument,
                                    CoreIndexDocumentResponse)
-from vectara_client.util import RequestUtil
+from vectara_client.encoder import encode
+from vectara_client.util import RequestUtil, AsyncRequestUtil
 from typing import Union, List
 from pathlib import Path
-from dacite import from_dict
-from dataclasses import asdict
 import logging
 import json
 
@@ -45,7 +47,9 @@ class IndexerService:
         self.customer_id = customer_id
         self.auth_util = auth_util
 
-    def index_doc(self, corpus_id: int, document: Union[dict, IndexDocument]) -> IndexDocumentResponse:
+    @traced
+    def index_doc(self, corpus_id: int, document: Union[dict, IndexDocument],
+                  deadline: Union[Deadline, float] = None) -> IndexDocumentResponse:
         """
         Indexes the give document which is already in a format that is ready to be added to the embedding.
 
@@ -54,23 +58,28 @@ class IndexerService:
 
         :param corpus_id: the corpus to put the document in
         :param document: either a dict which will be validated against CoreDocument, or a CoreDocument.
+        :param deadline: a Deadline or seconds from now, bounding the request and any retries.
         :return:
         """
-        # Convert singular int to List of corpus ids.
+        payload = self._build_index_doc_payload(corpus_id, document)
+
+        result = self.request_util.request('index', payload, to_class=IndexDocumentResponse, deadline=deadline)
+        return result
+
+    def _build_index_doc_payload(self, corpus_id: int, document: Union[dict, IndexDocument]) -> dict:
+        # Only a dict needs validating, a dataclass is encoded as is.
         if type(document) is dict:
-            domain = from_dict(IndexDocument, document)
+            domain = decode(IndexDocument, document)
         else:
             domain = document
 
-        # Now Convert back to dict, knowing that our parameter is type safe.
         # FIXME Ask Tallat why the customer ID for this API is an integer (unexpected)
         request = IndexDocumentRequest(int(self.customer_id), corpus_id, domain)
-        payload = asdict(request)
-
-        result = self.request_util.request('index', payload, to_class=IndexDocumentResponse)
-        return result
+        return encode(request)
 
-    def index_core_doc(self, corpus_id: int, document: Union[dict, CoreIndexDocument]) -> CoreIndexDocumentResponse:
+    @traced
+    def index_core_doc(self, corpus_id: int, document: Union[dict, CoreIndexDocument],
+                       deadline: Union[Deadline, float] = None) -> CoreIndexDocumentResponse:
         """
         Indexes the give document which is already in a format that is ready to be added to the embedding.
 
@@ -79,26 +88,39 @@ class IndexerService:
 
         :param corpus_id: the corpus to put the document in
         :param document: either a dict which will be validated against CoreDocument, or a CoreDocument.
+        :param deadline: a Deadline or seconds from now, bounding the request and any retries.
         :return:
         """
-        # Convert singular int to List of corpus ids.
+        payload = self._build_index_core_doc_payload(corpus_id, document)
+
+        result = self.request_util.request('core/index', payload, to_class=CoreIndexDocumentResponse,
+                                           deadline=deadline)
+        return result
+
+    def _build_index_core_doc_payload(self, corpus_id: int, document: Union[dict, CoreIndexDocument]) -> dict:
+        # Only a dict needs validating, a dataclass is encoded as is.
         if type(document) is dict:
-            domain = from_dict(CoreIndexDocument, document)
+            domain = decode(CoreIndexDocument, document)
         else:
             domain = document
 
-        # Now Convert back to dict, knowing that our parameter is type safe.
         # FIXME Ask Tallat why the customer ID for this API is an integer (unexpected)
         request = CoreIndexDocumentRequest(int(self.customer_id), corpus_id, domain)
-        payload = asdict(request)
-
-        result = self.request_util.request('core/index', payload, to_class=CoreIndexDocumentResponse)
-        return result
+        return encode(request)
 
 
 
+    @traced
     def upload(self, corpus_id: int, path: Union[str, Path] = None, input_contents: bytes = None, filename_override: str = None,
-               return_extracted: bool = None, metadata: dict = None, ocr = False) -> UploadDocumentResponse:
+               return_extracted: bool = None, metadata: dict = None, ocr = False,
+               deadline: Union[Deadline, float] = None) -> UploadDocumentResponse:
+        headers, params = self._build_upload_params(corpus_id, return_extracted, metadata, ocr)
+
+        return self.request_util.multipart_post("upload", path_str=path, input_contents=input_contents,
+                                                filename_override=filename_override, params=params, headers=headers,
+                                                deadline=deadline)
+
+    def _build_upload_params(self, corpus_id: int, return_extracted: bool = None, metadata: dict = None, ocr=False):
         headers = {'c': str(self.customer_id), 'o': str(corpus_id)}
         self.logger.info(f"Headers: {json.dumps(headers)}")
 
@@ -110,13 +132,51 @@ class IndexerService:
             params['ocr'] = "true"
 
         if metadata:
-            params['doc_metadata'] = json.dumps(metadata)
+            params['doc_metadata'] = self.request_util.codec.dumps(metadata).decode('utf-8')
 
-        return self.request_util.multipart_post("upload", path_str=path, input_contents=input_contents, filename_override=filename_override, params=params, headers=headers)
+        return headers, params
+
+    @traced
+    def delete(self, corpus_id: int, document_id: str, deadline: Union[Deadline, float] = None):
+        delete_request = {'customer_id': self.customer_id, 'corpus_id': corpus_id, 'document_id': document_id}
 
+        response = self.request_util.request('delete-doc', delete_request, deadline=deadline)
+        return response
+
+
+class AsyncIndexerService(IndexerService):
+    """
+    asyncio counterpart of IndexerService, sharing its request building.
+    """
 
-    def delete(self, corpus_id: int, document_id: str):
+    def __init__(self, auth_util: BaseAuthUtil, request_util: AsyncRequestUtil, customer_id: int):
+        super().__init__(auth_util, request_util, customer_id)
+
+    @traced
+    async def index_doc(self, corpus_id: int, document: Union[dict, IndexDocument],
+                        deadline: Union[Deadline, float] = None) -> IndexDocumentResponse:
+        payload = self._build_index_doc_payload(corpus_id, document)
+        return await self.request_util.request('index', payload, to_class=IndexDocumentResponse, deadline=deadline)
+
+    @traced
+    async def index_core_doc(self, corpus_id: int, document: Union[dict, CoreIndexDocument],
+                             deadline: Union[Deadline, float] = None) -> CoreIndexDocumentResponse:
+        payload = self._build_index_core_doc_payload(corpus_id, document)
+        return await self.request_util.request('core/index', payload, to_class=CoreIndexDocumentResponse,
+                                               deadline=deadline)
+
+    @traced
+    async def upload(self, corpus_id: int, path: Union[str, Path] = None, input_contents: bytes = None,
+                     filename_override: str = None, return_extracted: bool = None, metadata: dict = None,
+                     ocr=False, deadline: Union[Deadline, float] = None) -> UploadDocumentResponse:
+        headers, params = self._build_upload_params(corpus_id, return_extracted, metadata, ocr)
+
+        return await self.request_util.multipart_post("upload", path_str=path, input_contents=input_contents,
+                                                      filename_override=filename_override, params=params,
+                                                      headers=headers, deadline=deadline)
+
+    @traced
+    async def delete(self, corpus_id: int, document_id: str, deadline: Union[Deadline, float] = None):
         delete_request = {'customer_id': self.customer_id, 'corpus_id': corpus_id, 'document_id': document_id}
 
-        response = self.request_util.request('delete-doc', delete_request)
-        return response
\ No newline at end of file
+        return await self.request_util.request('delete-doc', delete_request, deadline=deadline)
\ No newline at end of file
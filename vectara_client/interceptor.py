@@ -0,0 +1,168 @@
+"""
+Interceptors around every RequestUtil.request and multipart_post call, and their asyncio counterparts.
+
+They let cross cutting behaviour such as caching, metrics, retries, rate limiting or journaling be plugged in without
+changing RequestUtil, as an Aspect would (see DESIGN_GOALS.md). Each call runs through the chain as:
+
+1. before hooks in registration order. One returning a result short-circuits the call, e.g. a cache hit, and later
+   interceptors' before hooks don't run.
+2. the request itself, including single-flight, retries, hedging and the circuit breaker.
+3. after hooks in reverse order, each may replace the result.
+
+If the request or a before hook raises, on_error hooks run in reverse order instead of the after hooks, until one
+returns a result to use in place of the error, otherwise the error propagates. context.resend() repeats the request
+(without the before hooks), so an on_error hook can retry.
+
+With no interceptors RequestUtil skips the chain entirely.
+"""
+from vectara_client.deadline import Deadline
+from threading import Lock
+from typing import Any, Callable, Iterable, Optional, Type
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContext:
+    """
+    One call as seen by interceptors. Hooks may change operation, payload or deadline in before, and may keep their
+    own state between hooks in attributes.
+    """
+
+    def __init__(self, operation: str, payload, to_class: Type = None, method: str = "POST",
+                 deadline: Deadline = None, path: str = None):
+        """
+        :param payload: the JSON payload, or the form parameters of a multipart upload
+        :param path: the file being uploaded by multipart_post, None for JSON requests
+        """
+        self.operation = operation
+        self.payload = payload
+        self.to_class = to_class
+        self.method = method
+        self.deadline = deadline
+        self.path = path
+        self.attributes = {}
+        self.started = time.monotonic()
+        self.resend: Optional[Callable] = None
+
+    @property
+    def elapsed(self) -> float:
+        """
+        :return: seconds since the call started.
+        """
+        return time.monotonic() - self.started
+
+    def __repr__(self):
+        return f"RequestContext(operation={self.operation}, method={self.method}, path={self.path})"
+
+
+class BaseInterceptor:
+    """
+    Override any of the hooks, the defaults do nothing. The *_async hooks are used by AsyncRequestUtil and default to
+    the blocking hooks, so override them only if a hook needs to await.
+    """
+
+    def before(self, context: RequestContext) -> Optional[Any]:
+        """
+        :return: None to carry on, or a result to return without sending the request.
+        """
+        return None
+
+    def after(self, context: RequestContext, result):
+        """
+        :return: the result, or a replacement for it.
+        """
+        return result
+
+    def on_error(self, context: RequestContext, error: Exception) -> Optional[Any]:
+        """
+        :return: None to let the error propagate, or a result to return instead. May also raise a different error.
+        """
+        return None
+
+    async def before_async(self, context: RequestContext) -> Optional[Any]:
+        return self.before(context)
+
+    async def after_async(self, context: RequestContext, result):
+        return self.after(context, result)
+
+    async def on_error_async(self, context: RequestContext, error: Exception) -> Optional[Any]:
+        return self.on_error(context, error)
+
+
+class InterceptorChain:
+    """
+    An ordered, thread-safe list of interceptors. Adding or removing one replaces the tuple, so calls in progress
+    carry on with the interceptors they started with and reading needs no lock.
+    """
+
+    def __init__(self, interceptors: Iterable[BaseInterceptor] = None):
+        self.interceptors = tuple(interceptors) if interceptors else ()
+        self._lock = Lock()
+
+    def add(self, interceptor: BaseInterceptor):
+        with self._lock:
+            self.interceptors = self.interceptors + (interceptor,)
+
+    def remove(self, interceptor: BaseInterceptor):
+        with self._lock:
+            self.interceptors = tuple(i for i in self.interceptors if i is not interceptor)
+
+    def __bool__(self):
+        return bool(self.interceptors)
+
+    def __len__(self):
+        return len(self.interceptors)
+
+    def call(self, context: RequestContext, send: Callable):
+        """
+        Runs send, which performs the request using context, within the chain.
+        """
+        context.resend = send
+        ran = []
+        try:
+            result = None
+            for interceptor in self.interceptors:
+                ran.append(interceptor)
+                result = interceptor.before(context)
+                if result is not None:
+                    break
+            else:
+                result = send()
+        except Exception as error:
+            for interceptor in reversed(ran):
+                recovered = interceptor.on_error(context, error)
+                if recovered is not None:
+                    return recovered
+            raise
+
+        for interceptor in reversed(ran):
+            result = interceptor.after(context, result)
+        return result
+
+    async def call_async(self, context: RequestContext, send):
+        """
+        asyncio version of call, where send is a coroutine function.
+        """
+        context.resend = send
+        ran = []
+        try:
+            result = None
+            for interceptor in self.interceptors:
+                ran.append(interceptor)
+                result = await interceptor.before_async(context)
+                if result is not None:
+                    break
+            else:
+                result = await send()
+        except Exception as error:
+            for interceptor in reversed(ran):
+                recovered = await interceptor.on_error_async(context, error)
+                if recovered is not None:
+                    return recovered
+            raise
+
+        for interceptor in reversed(ran):
+            result = await interceptor.after_async(context, result)
+        return result
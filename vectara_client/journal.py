@@ -0,0 +1,103 @@
+"""
+Bounded journal of the requests sent by RequestUtil.
+
+Only the most recent requests are held in memory so that long running ingestion doesn't keep every document body
+alive. Older entries may be spilled to a gzipped NDJSON file instead of being discarded.
+"""
+from vectara_client.config import JournalConfig
+from collections import deque
+from threading import Lock
+from typing import Callable, Iterator
+import gzip
+import json
+import logging
+import random
+
+
+class RequestJournal:
+    """
+    Thread-safe ring buffer of {'operation': ..., 'payload': ...} entries. It supports len(), iteration and indexing
+    like the list it replaces, so journal[-1] is still the last request.
+    """
+
+    def __init__(self, config: JournalConfig = None, rand: Callable[[], float] = random.random):
+        """
+        :param config: the journal configuration, if None the defaults from JournalConfig are used.
+        :param rand: injectable for tests, returns a float in [0, 1) used for sampling
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = JournalConfig()
+        if config.max_entries < 0:
+            raise TypeError("Journal max_entries must not be negative")
+        if not 0.0 <= config.sample_rate <= 1.0:
+            raise TypeError("Journal sample_rate must be between 0 and 1")
+
+        self.config = config
+        self.rand = rand
+        self._entries = deque()
+        self._lock = Lock()
+        self._spill = None
+        self.recorded = 0
+        self.spilled = 0
+
+    def append(self, entry: dict):
+        """
+        Records an entry, subject to sampling, evicting (and possibly spilling) the oldest if we are full.
+        """
+        if not self.config.enabled or self.config.max_entries == 0:
+            return
+        if self.config.sample_rate < 1.0 and self.rand() >= self.config.sample_rate:
+            return
+
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+            while len(self._entries) > self.config.max_entries:
+                evicted = self._entries.popleft()
+                if self.config.spill_path:
+                    self._write_spill(evicted)
+
+    def _write_spill(self, entry: dict):
+        if not self._spill:
+            self.logger.info(f"Spilling journal entries to [{self.config.spill_path}]")
+            self._spill = gzip.open(self.config.spill_path, "at", encoding="utf-8")
+        self._spill.write(json.dumps(entry, default=str))
+        self._spill.write("\n")
+        self.spilled += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        """
+        Closes the spill file (if any), which must be done for its final entries to be readable.
+        """
+        with self._lock:
+            if self._spill:
+                self._spill.close()
+                self._spill = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[dict]:
+        with self._lock:
+            entries = list(self._entries)
+        return iter(entries)
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                return list(self._entries)[index]
+            return self._entries[index]
+
+
+def read_spilled(path: str) -> Iterator[dict]:
+    """
+    Reads back the entries spilled by a RequestJournal, oldest first.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
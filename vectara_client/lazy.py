@@ -0,0 +1,180 @@
+"""
+Lazy views over decoded JSON for retrieval-only callers, see QueryService.query(lazy=True).
+
+A view is a subclass of the domain dataclass (so isinstance, render_markdown and ResponseSetRenderer work unchanged)
+which keeps a reference to the raw dict rather than copying it. Each field is decoded the first time it is read and
+then cached on the instance, so reading the top few Response.text/score values never builds the Attribute,
+CorpusKey and Status objects of the rest.
+
+Dataclasses with a __post_init__ (e.g. Status, CorpusKey) are decoded in full when their field is first read, as
+their fix-ups need every field. Validation is the same as vectara_client.decoder but happens on access, so an invalid
+field is only reported when (and if) it is read, with the field path relative to the view it was read from.
+"""
+from collections.abc import Mapping, Sequence
+from dataclasses import MISSING, fields, is_dataclass
+from threading import RLock
+from typing import Any, Type, TypeVar, Union, get_args, get_origin, get_type_hints
+from dacite.exceptions import MissingValueError, WrongTypeError
+from vectara_client.decoder import decode_value, register_decoder
+import types
+
+T = TypeVar("T")
+
+_NONE_TYPE = type(None)
+_UNION_TYPES = (Union, types.UnionType)
+
+_views = {}
+_lock = RLock()
+
+
+class LazyList(Sequence):
+    """
+    Read-only list of views, each created on first access and then cached.
+    """
+
+    def __init__(self, raw: list, item_type):
+        self._raw = raw
+        self._item_type = item_type
+        self._items = [MISSING] * len(raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._raw)))]
+
+        item = self._items[index]
+        if item is MISSING:
+            raw = self._raw[index]
+            if isinstance(raw, Mapping):
+                item = view_class(self._item_type)(raw)
+            else:
+                item = decode_value(self._item_type, raw)
+            self._items[index] = item
+        return item
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _is_viewable(type_) -> bool:
+    return (isinstance(type_, type) and is_dataclass(type_) and not hasattr(type_, "__post_init__")
+            and all(f.init for f in fields(type_)))
+
+
+def _split_optional(type_):
+    if get_origin(type_) in _UNION_TYPES:
+        members = [arg for arg in get_args(type_) if arg is not _NONE_TYPE]
+        if len(members) == 1 and len(get_args(type_)) == 2:
+            return True, members[0]
+    return False, type_
+
+
+class _LazyField:
+    """
+    Non-data descriptor which decodes a field on first read. The value is then stored in the instance __dict__,
+    which takes precedence over us on later reads (and lets callers assign to the field as usual).
+    """
+
+    def __init__(self, f, field_type):
+        self.name = f.name
+        self.field_type = field_type
+        self.optional, inner = _split_optional(field_type)
+        self.default = f.default
+        self.default_factory = f.default_factory
+
+        self.view_type = None
+        self.list_item_type = None
+        if _is_viewable(inner):
+            self.view_type = inner
+        elif get_origin(inner) is list and get_args(inner) and _is_viewable(get_args(inner)[0]):
+            self.list_item_type = get_args(inner)[0]
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self._load(instance._raw)
+        instance.__dict__[self.name] = value
+        return value
+
+    def _load(self, raw_dict: Mapping):
+        raw = raw_dict.get(self.name, MISSING)
+        if raw is MISSING:
+            if self.default is not MISSING:
+                return self.default
+            elif self.default_factory is not MISSING:
+                return self.default_factory()
+            elif self.optional:
+                return None
+            raise MissingValueError(self.name)
+
+        if raw is None and self.optional:
+            return None
+        elif self.view_type and isinstance(raw, Mapping):
+            return view_class(self.view_type)(raw)
+        elif self.list_item_type and type(raw) is list:
+            return LazyList(raw, self.list_item_type)
+        else:
+            return decode_value(self.field_type, raw, self.name)
+
+
+def view_class(data_class: Type[T]) -> Type[T]:
+    """
+    :return: the cached view subclass of data_class, constructed from the raw dict, e.g. view_class(Response)(raw).
+    """
+    view = _views.get(data_class)
+    if view is None:
+        with _lock:
+            view = _views.get(data_class)
+            if view is None:
+                view = _create_view_class(data_class)
+    return view
+
+
+def _create_view_class(data_class: type) -> type:
+    data_fields = fields(data_class)
+    hints = get_type_hints(data_class)
+
+    def __init__(self, raw: Mapping):
+        self._raw = raw
+
+    def __eq__(self, other):
+        if isinstance(other, data_class):
+            return all(getattr(self, f.name) == getattr(other, f.name) for f in data_fields)
+        return NotImplemented
+
+    namespace = {
+        "__init__": __init__,
+        "__eq__": __eq__,
+        "__hash__": None,
+        "__doc__": f"Lazy view of {data_class.__name__} over the raw decoded JSON.",
+    }
+    for f in data_fields:
+        namespace[f.name] = _LazyField(f, hints[f.name])
+
+    view = type(f"{data_class.__name__}View", (data_class,), namespace)
+
+    def decode_view(data):
+        if isinstance(data, Mapping):
+            return view(data)
+        elif isinstance(data, data_class):
+            return data
+        raise WrongTypeError(field_type=data_class, value=data)
+
+    # So that RequestUtil can decode straight into a view, e.g. request(..., to_class=view_class(...)).
+    register_decoder(view, decode_view)
+    _views[data_class] = view
+    return view
+
+
+def lazy_view(data_class: Type[T], data: Mapping) -> T:
+    """
+    Wraps the raw decoded JSON in a lazy view of data_class without copying it.
+    """
+    return view_class(data_class)(data)
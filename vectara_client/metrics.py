@@ -0,0 +1,529 @@
+"""
+Client side performance metrics recorded by RequestUtil and AsyncRequestUtil for every HTTP request.
+
+Each operation has a latency histogram, request and response byte counts, counts per status code and an in-flight
+gauge. Recording takes no lock: every thread records into its own shard and a snapshot merges the shards, which the
+HDR-style histograms make exact. Snapshots are available from Client.metrics() and, optionally, in the Prometheus text
+format over HTTP, see PrometheusExporter.
+"""
+from vectara_client.config import MetricsConfig
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, List, Optional, Sequence
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the cumulative buckets exported to Prometheus.
+DEFAULT_PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_MICROS = 1_000_000
+
+
+class Histogram:
+    """
+    Log-linear histogram of latencies in the style of HdrHistogram. Values are kept in microseconds, exact below
+    2 * 10 ^ significant_figures and otherwise within a relative error of 10 ^ -significant_figures, in buckets which
+    are the same for every histogram with the same significant figures, so histograms merge without loss.
+
+    Not thread-safe, Metrics gives each thread its own.
+    """
+
+    def __init__(self, significant_figures: int = 2):
+        if not 1 <= significant_figures <= 5:
+            raise TypeError(f"significant_figures must be between 1 and 5, was [{significant_figures}]")
+        self.significant_figures = significant_figures
+        # Each power of two range is split into half_count linear buckets.
+        self._sub_bits = (2 * 10 ** significant_figures - 1).bit_length()
+        self._sub_count = 1 << self._sub_bits
+        self._half_count = self._sub_count >> 1
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self._total = 0
+        self._max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self._sub_bits
+        return self._sub_count + (shift - 1) * self._half_count + (value >> shift) - self._half_count
+
+    def _highest(self, index: int) -> int:
+        """
+        :return: the highest value, in microseconds, which lands in the bucket.
+        """
+        if index < self._sub_count:
+            return index
+        shift, offset = divmod(index - self._sub_count, self._half_count)
+        return ((offset + self._half_count + 1) << (shift + 1)) - 1
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * _MICROS))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self._total += value
+        if value > self._max:
+            self._max = value
+
+    @property
+    def sum(self) -> float:
+        """
+        :return: the total of every recorded latency in seconds.
+        """
+        return self._total / _MICROS
+
+    @property
+    def max(self) -> float:
+        return self._max / _MICROS
+
+    def mean(self) -> Optional[float]:
+        return self._total / self.count / _MICROS if self.count else None
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        :param percentile: between 0 and 100
+        :return: the latency in seconds at or below which percentile percent of values fall, None if empty.
+        """
+        if not self.count:
+            return None
+        target = max(1, math.ceil(percentile / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest(index), self._max) / _MICROS
+        return self.max
+
+    def cumulative_counts(self, bounds: Sequence[float]) -> List[int]:
+        """
+        :param bounds: ascending upper bounds in seconds
+        :return: how many values fell at or below each bound, as a Prometheus histogram reports them.
+        """
+        ordered = sorted(self.counts.items())
+        result = []
+        position = 0
+        seen = 0
+        for bound in bounds:
+            limit = bound * _MICROS
+            while position < len(ordered) and self._highest(ordered[position][0]) <= limit:
+                seen += ordered[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+    def merge(self, other: "Histogram"):
+        """
+        Adds other's values to this histogram.
+
+        :raises TypeError: if other has different significant figures, so different buckets.
+        """
+        if other.significant_figures != self.significant_figures:
+            raise TypeError(f"Cannot merge a histogram of [{other.significant_figures}] significant figures into "
+                            f"one of [{self.significant_figures}]")
+        for index, count in list(other.counts.items()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self._total += other._total
+        self._max = max(self._max, other._max)
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.significant_figures)
+        histogram.merge(self)
+        return histogram
+
+    def __repr__(self):
+        return (f"Histogram(count={self.count}, mean={self.mean()}, p50={self.percentile(50)}, "
+                f"p99={self.percentile(99)}, max={self.max})")
+
+
+@dataclass
+class OperationMetrics:
+    """
+    Metrics of one operation, counting each HTTP request including retries and hedges.
+    """
+    requests: int = 0
+    in_flight: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    # Keyed by the HTTP status code, or the exception's class name if no response was received.
+    statuses: Dict[str, int] = field(default_factory=dict)
+    latency: Histogram = field(default_factory=Histogram)
+
+    def merge(self, other: "OperationMetrics"):
+        """
+        Adds other's metrics, e.g. to combine those of several clients.
+        """
+        self.requests += other.requests
+        self.in_flight += other.in_flight
+        self.request_bytes += other.request_bytes
+        self.response_bytes += other.response_bytes
+        for status, count in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.latency.merge(other.latency)
+
+
+class _Record:
+    """
+    One thread's metrics for one operation, only ever written by that thread.
+    """
+    __slots__ = ("metrics", "started", "finished")
+
+    def __init__(self, significant_figures: int):
+        self.metrics = OperationMetrics(latency=Histogram(significant_figures))
+        self.started = 0
+        self.finished = 0
+
+    def snapshot(self) -> OperationMetrics:
+        metrics = self.metrics
+        return OperationMetrics(requests=metrics.requests, in_flight=self.started - self.finished,
+                                request_bytes=metrics.request_bytes, response_bytes=metrics.response_bytes,
+                                statuses=dict(metrics.statuses), latency=metrics.latency.copy())
+
+
+class _Tracking:
+    """
+    Context manager timing one request, see Metrics.track.
+    """
+    __slots__ = ("record", "request_bytes", "status", "response_bytes", "start", "latency")
+
+    def __init__(self, record: _Record, request_bytes: int):
+        self.record = record
+        self.request_bytes = request_bytes
+        self.status = None
+        self.response_bytes = 0
+        self.latency = None
+
+    def __enter__(self) -> "_Tracking":
+        self.record.started += 1
+        self.start = time.monotonic()
+        return self
+
+    def received(self, status_code: int, response_bytes: int):
+        self.status = str(status_code)
+        self.response_bytes = response_bytes
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.latency = time.monotonic() - self.start
+        record = self.record
+        record.finished += 1
+        metrics = record.metrics
+        metrics.requests += 1
+        metrics.request_bytes += self.request_bytes
+        metrics.response_bytes += self.response_bytes
+        status = self.status if self.status is not None else (exc_type.__name__ if exc_type else "unknown")
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        metrics.latency.record(self.latency)
+        return False
+
+
+class Metrics:
+    """
+    Thread-safe per operation metrics, shared by every thread or task using the request utility.
+    """
+
+    def __init__(self, config: MetricsConfig = None):
+        """
+        :param config: histogram precision and exporter settings, if None the defaults from MetricsConfig are used.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = MetricsConfig()
+        # Fail here rather than on the first request.
+        Histogram(config.significant_figures)
+        self.config = config
+        self._local = threading.local()
+        # Each live thread's records keyed by operation, and those of threads which have since finished.
+        self._shards = []
+        self._retired = {}
+        self._lock = Lock()
+
+    def _records(self) -> dict:
+        records = getattr(self._local, "records", None)
+        if records is None:
+            records = {}
+            self._local.records = records
+            with self._lock:
+                self._retire_finished()
+                self._shards.append((threading.current_thread(), records))
+        return records
+
+    def _retire_finished(self):
+        """
+        Folds the records of finished threads into _retired, so short lived threads don't accumulate. Call while
+        holding the lock.
+        """
+        live = []
+        for thread, records in self._shards:
+            if thread.is_alive():
+                live.append((thread, records))
+                continue
+            for operation, record in records.items():
+                retired = self._retired.get(operation)
+                if retired is None:
+                    self._retired[operation] = record
+                else:
+                    retired.metrics.merge(record.metrics)
+                    retired.started += record.started
+                    retired.finished += record.finished
+        self._shards = live
+
+    def track(self, operation: str, request_bytes: int = 0) -> _Tracking:
+        """
+        Times a request within a with block, call received() on the result once the response arrives. An exception
+        raised within the block is counted against the exception's class name.
+
+        :param request_bytes: the size of the request body as sent
+        """
+        records = self._records()
+        record = records.get(operation)
+        if record is None:
+            record = _Record(self.config.significant_figures)
+            records[operation] = record
+        return _Tracking(record, request_bytes)
+
+    def snapshot(self) -> Dict[str, OperationMetrics]:
+        """
+        :return: a copy of every operation's metrics merged across threads, keyed by operation.
+        """
+        result = {}
+        with self._lock:
+            self._retire_finished()
+            shards = [records for _, records in self._shards] + [self._retired]
+            for records in shards:
+                # Another thread may add an operation meanwhile, so iterate over a copy.
+                for operation, record in list(records.items()):
+                    metrics = result.get(operation)
+                    if metrics is None:
+                        result[operation] = record.snapshot()
+                    else:
+                        metrics.merge(record.snapshot())
+        return result
+
+    def render_prometheus(self) -> str:
+        return render_prometheus(self.snapshot())
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_prometheus(snapshot: Dict[str, OperationMetrics],
+                      buckets: Sequence[float] = DEFAULT_PROMETHEUS_BUCKETS) -> str:
+    """
+    :param snapshot: from Metrics.snapshot
+    :param buckets: ascending upper bounds of the exported latency buckets in seconds
+    :return: the metrics in version 0.0.4 of the Prometheus text exposition format.
+    """
+    lines = ["# HELP vectara_client_request_duration_seconds Latency of HTTP requests to Vectara.",
+             "# TYPE vectara_client_request_duration_seconds histogram"]
+    for operation, metrics in sorted(snapshot.items()):
+        labels = f'operation="{_label(operation)}"'
+        for bound, count in zip(buckets, metrics.latency.cumulative_counts(buckets)):
+            lines.append(f'vectara_client_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'vectara_client_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.latency.count}')
+        lines.append(f'vectara_client_request_duration_seconds_sum{{{labels}}} {metrics.latency.sum}')
+        lines.append(f'vectara_client_request_duration_seconds_count{{{labels}}} {metrics.latency.count}')
+
+    lines += ["# HELP vectara_client_requests_total HTTP requests to Vectara by response status.",
+              "# TYPE vectara_client_requests_total counter"]
+    for operation, metrics in sorted(snapshot.items()):
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f'vectara_client_requests_total{{operation="{_label(operation)}",status="{_label(status)}"}} '
+                         f'{count}')
+
+    for name, attribute, help_text in [
+            ("vectara_client_request_bytes_total", "request_bytes", "Request body bytes sent."),
+            ("vectara_client_response_bytes_total", "response_bytes", "Response body bytes received, decompressed.")]:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for operation, metrics in sorted(snapshot.items()):
+            lines.append(f'{name}{{operation="{_label(operation)}"}} {getattr(metrics, attribute)}')
+
+    lines += ["# HELP vectara_client_requests_in_flight HTTP requests to Vectara awaiting a response.",
+              "# TYPE vectara_client_requests_in_flight gauge"]
+    for operation, metrics in sorted(snapshot.items()):
+        lines.append(f'vectara_client_requests_in_flight{{operation="{_label(operation)}"}} {metrics.in_flight}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """
+    Serves one or more Metrics instances at /metrics in the Prometheus text format from a daemon thread, merged as
+    one. Metrics detached while serving leave their final counts behind, so the exported counters never go down.
+    """
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 0):
+        """
+        :param port: 0 picks a free port, see PrometheusExporter.port once started.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.metrics = metrics
+        self.host = host
+        self.requested_port = port
+        self._server = None
+        self._thread = None
+        self._sources: List[Metrics] = [metrics]
+        # The final snapshots of detached Metrics, merged.
+        self._detached: Dict[str, OperationMetrics] = {}
+        self._lock = Lock()
+
+    def attach(self, metrics: Metrics):
+        """
+        Adds metrics to those served.
+
+        :raises TypeError: if its histograms have different significant figures to those already served, as they
+            couldn't be merged.
+        """
+        with self._lock:
+            if metrics.config.significant_figures != self.metrics.config.significant_figures:
+                raise TypeError(f"The metrics served at [{self.host}:{self.requested_port}] have "
+                                f"[{self.metrics.config.significant_figures}] significant figures, every client "
+                                f"sharing a metrics port must have the same metrics.significant_figures")
+            self._sources.append(metrics)
+
+    def detach(self, metrics: Metrics) -> int:
+        """
+        Stops serving metrics, keeping its counts.
+
+        :return: how many Metrics are still attached.
+        """
+        with self._lock:
+            if metrics not in self._sources:
+                return len(self._sources)
+            self._sources.remove(metrics)
+            for operation, final in metrics.snapshot().items():
+                final.in_flight = 0
+                retained = self._detached.get(operation)
+                if retained is None:
+                    self._detached[operation] = final
+                else:
+                    retained.merge(final)
+            return len(self._sources)
+
+    def snapshot(self) -> Dict[str, OperationMetrics]:
+        """
+        :return: the served metrics merged, keyed by operation.
+        """
+        with self._lock:
+            result = {operation: OperationMetrics(statuses=dict(metrics.statuses), latency=metrics.latency.copy(),
+                                                  requests=metrics.requests, request_bytes=metrics.request_bytes,
+                                                  response_bytes=metrics.response_bytes)
+                      for operation, metrics in self._detached.items()}
+            sources = list(self._sources)
+        for metrics in sources:
+            for operation, current in metrics.snapshot().items():
+                merged = result.get(operation)
+                if merged is None:
+                    result[operation] = current
+                else:
+                    merged.merge(current)
+        return result
+
+    def start(self) -> "PrometheusExporter":
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(exporter.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((self.host, self.requested_port), Handler)
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, name="PrometheusExporter", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Serving metrics at {self.url}")
+        return self
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SharedExporter:
+    """
+    A client's use of the process-wide PrometheusExporter serving a fixed host and port, see share_exporter. Every
+    client configured with the same metrics port, e.g. a shared client and the one replacing it on a configuration
+    change, is served by the one exporter, which stops once the last of them is closed.
+    """
+
+    def __init__(self, exporter: PrometheusExporter, metrics: Metrics):
+        self.exporter = exporter
+        self.metrics = metrics
+        self._closed = False
+
+    @property
+    def port(self) -> int:
+        return self.exporter.port
+
+    @property
+    def url(self) -> str:
+        return self.exporter.url
+
+    def close(self):
+        with _shared_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self.exporter.detach(self.metrics) > 0:
+                return
+            del _shared_exporters[(self.exporter.host, self.exporter.requested_port)]
+        self.exporter.close()
+
+
+# The exporters serving a fixed port, by host and port.
+_shared_exporters: Dict[tuple, PrometheusExporter] = {}
+_shared_lock = Lock()
+
+
+def share_exporter(metrics: Metrics, host: str, port: int) -> SharedExporter:
+    """
+    Serves metrics at host and port, along with any other Metrics this process already serves there.
+
+    :param port: a fixed port, as port 0 picks a new one for each exporter there is nothing to share.
+    :raises OSError: if the port is in use by something other than this process's exporter.
+    """
+    key = (host, port)
+    with _shared_lock:
+        exporter = _shared_exporters.get(key)
+        if exporter is None:
+            exporter = PrometheusExporter(metrics, host, port)
+            try:
+                exporter.start()
+            except OSError as e:
+                raise OSError(e.errno, f"Could not serve metrics at [{host}:{port}], set by metrics.port, "
+                                       f"{e.strerror}") from e
+            _shared_exporters[key] = exporter
+        else:
+            exporter.attach(metrics)
+    return SharedExporter(exporter, metrics)
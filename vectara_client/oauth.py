@@ -0,0 +1,273 @@
+"""
+OAuth2 token management for OAuthUtil, shared by every thread and task using the client.
+
+getToken used to check and refresh the token inline, only 5 seconds before expiry and without any locking, so the
+threads of CorpusManager.batch_index reaching expiry together would each fetch their own token. The TokenManager
+instead:
+
+1. returns the current token without locking while it is fresh.
+2. once refresh_fraction of the token's lifetime has passed, starts one background refresh and carries on using the
+   current token, so requests normally never wait for the token endpoint.
+3. only when the token is within expiry_margin of expiring (or there is none yet) makes callers wait, and then all
+   concurrent callers share a single fetch and its outcome, as with single-flight requests.
+
+With TokenConfig.cache, tokens are also kept in a TokenCache on disk, so short lived processes (batch jobs, CLI
+invocations) re-use a token fetched by an earlier or concurrent process instead of each starting with a round trip to
+the token endpoint.
+"""
+from vectara_client.config import TokenConfig
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from threading import Lock, Thread
+from typing import Callable, Optional, Tuple
+import base64
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".vectara", "tokens")
+
+logger = logging.getLogger(__name__)
+
+
+def _expiry(response: dict, now: float, config: TokenConfig) -> Tuple[float, float]:
+    """
+    :return: when the token in an OAuth2 token response expires, and when it should be refreshed.
+    """
+    expires_in = response.get("expires_in")
+    expires_at = response.get("expires_at")
+    if expires_at is None:
+        expires_at = now + float(expires_in)
+    # Tokens from the TokenCache were issued before now.
+    issued_at = response.get("issued_at", now)
+    lifetime = float(expires_in) if expires_in is not None else expires_at - issued_at
+    return float(expires_at), issued_at + lifetime * config.refresh_fraction
+
+
+@dataclass(frozen=True)
+class Token:
+    access_token: str
+    # Seconds since the epoch.
+    expires_at: float
+    # When a background refresh should start, in seconds since the epoch.
+    refresh_at: float
+
+
+class TokenManager:
+    """
+    Thread-safe holder of the current token, which fetches new ones with fetch.
+    """
+
+    def __init__(self, fetch: Callable[[], dict], config: TokenConfig = None, clock: Callable[[], float] = time.time):
+        """
+        :param fetch: requests a new token, returning the OAuth2 token response with access_token and expires_in
+            and/or expires_at
+        :param config: the refresh settings, if None the defaults from TokenConfig are used.
+        :param clock: injectable for tests, seconds since the epoch
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config if config else TokenConfig()
+        if not 0.0 < self.config.refresh_fraction <= 1.0:
+            raise TypeError(f"refresh_fraction must be greater than 0 and at most 1, not {self.config.refresh_fraction}")
+        self.fetch = fetch
+        self.clock = clock
+        self.token: Optional[Token] = None
+        # Number of tokens fetched.
+        self.fetches = 0
+        self._lock = Lock()
+        self._in_flight: Optional[Future] = None
+        self._background = False
+
+    def _usable(self, token: Optional[Token], now: float) -> bool:
+        return token is not None and now < token.expires_at - self.config.expiry_margin
+
+    def get(self) -> Token:
+        """
+        :return: a token valid for at least expiry_margin seconds, waiting for a new one only if there is none.
+        """
+        token = self.token
+        now = self.clock()
+        if self._usable(token, now):
+            if now >= token.refresh_at and self.config.background_refresh:
+                self._refresh_in_background(token)
+            return token
+        return self.refresh(token)
+
+    def refresh(self, stale: Optional[Token] = None) -> Token:
+        """
+        Fetches a new token to replace stale, sharing the fetch of any concurrent caller.
+
+        :param stale: the token the caller wants replaced, if another caller has already replaced it with a usable
+            token that one is returned without fetching.
+        """
+        with self._lock:
+            current = self.token
+            if current is not stale and self._usable(current, self.clock()):
+                return current
+            future = self._in_flight
+            leader = future is None
+            if leader:
+                future = self._in_flight = Future()
+
+        if leader:
+            try:
+                future.set_result(self._fetch())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._in_flight = None
+        else:
+            self.logger.debug("Sharing the in-flight token request")
+        return future.result()
+
+    def _fetch(self) -> Token:
+        now = self.clock()
+        response = self.fetch()
+        token = Token(response["access_token"], *_expiry(response, now, self.config))
+        self.token = token
+        self.fetches += 1
+        return token
+
+    def _refresh_in_background(self, token: Token):
+        with self._lock:
+            if self._background or self._in_flight is not None:
+                return
+            self._background = True
+        Thread(target=self._background_refresh, args=(token,), name="vectara-token-refresh", daemon=True).start()
+
+    def _background_refresh(self, token: Token):
+        try:
+            self.refresh(token)
+        except Exception as e:
+            # Keep using the current token, trying again halfway to its expiry rather than on the very next call.
+            now = self.clock()
+            with self._lock:
+                if self.token is token:
+                    self.token = replace(token, refresh_at=now + (token.expires_at - now) / 2)
+            self.logger.warning(f"Background token refresh failed, the current token is still used: {e}")
+        finally:
+            with self._lock:
+                self._background = False
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """
+    Holds an exclusive lock on the file at path, shared between processes.
+    """
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            # Windows, where LK_LOCK retries for up to 10 seconds.
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TokenCache:
+    """
+    Tokens on disk shared between processes, one file per customer id, client id and auth URL.
+
+    Each file is encrypted with Fernet, keyed from the client secret, so it is only readable with the same credentials
+    which could fetch a token anyway. A lock file next to it lets one process fetch while the others wait and then
+    read its token.
+    """
+
+    def __init__(self, customer_id: str, client_id: str, auth_url: str, client_secret: str,
+                 config: TokenConfig = None, clock: Callable[[], float] = time.time):
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+        self.config = config if config else TokenConfig(cache=True)
+        self.clock = clock
+        self.directory = os.path.expanduser(self.config.cache_dir if self.config.cache_dir else DEFAULT_CACHE_DIR)
+        digest = hashlib.sha256(f"{customer_id}\n{client_id}\n{auth_url}".encode("utf-8")).hexdigest()[:32]
+        self.path = os.path.join(self.directory, f"{digest}.token")
+        self.lock_path = os.path.join(self.directory, f"{digest}.lock")
+        # The secret has plenty of entropy, so HKDF rather than a slow password based KDF.
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=digest.encode("ascii"),
+                   info=b"vectara-client token cache").derive(client_secret.encode("utf-8"))
+        self.fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    def get_or_fetch(self, fetch: Callable[[], dict], stale: Optional[str] = None) -> dict:
+        """
+        :param fetch: requests a new token if the cache has none which is usable and not yet due for refresh
+        :param stale: an access token which must not be returned, e.g. the one being replaced by authenticate()
+        :return: the OAuth2 token response, with issued_at added.
+        """
+        # Only the cache's own I/O falls back to fetching directly. Errors of fetch propagate as they are, as
+        # requests.RequestException is an OSError too.
+        with contextlib.ExitStack() as lock:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                lock.enter_context(_locked(self.lock_path))
+                cached = self._read()
+            except OSError as e:
+                logger.warning(f"Token cache [{self.path}] is unavailable, fetching a token directly: {e}")
+                return self._issue(fetch)
+            if cached is not None and cached["access_token"] != stale and self._fresh(cached):
+                logger.debug(f"Using cached token from [{self.path}]")
+                return cached
+            token = self._issue(fetch)
+            try:
+                self._write(token)
+            except OSError as e:
+                logger.warning(f"Could not write token cache [{self.path}]: {e}")
+            return token
+
+    def _issue(self, fetch: Callable[[], dict]) -> dict:
+        issued_at = self.clock()
+        return dict(fetch(), issued_at=issued_at)
+
+    def _fresh(self, token: dict) -> bool:
+        expires_at, refresh_at = _expiry(token, self.clock(), self.config)
+        return self.clock() < min(refresh_at, expires_at - self.config.expiry_margin)
+
+    def _read(self) -> Optional[dict]:
+        from cryptography.fernet import InvalidToken
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError):
+            # e.g. the client secret has changed.
+            logger.debug(f"Ignoring unreadable token cache [{self.path}]")
+            return None
+
+    def _write(self, token: dict):
+        cached = {key: token[key] for key in ("access_token", "expires_in", "expires_at", "issued_at")
+                  if key in token}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.fernet.encrypt(json.dumps(cached).encode("utf-8")))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def clear(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
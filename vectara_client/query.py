@@ -1,10 +1,13 @@
 import json
-from dataclasses import asdict
+from vectara_client.deadline import Deadline
+from vectara_client.tracing import traced
+from vectara_client.decoder import decode
 from vectara_client.domain import *
-from dacite import from_dict
+from vectara_client.encoder import encode
 from typing import List, TypeVar, Union
+from vectara_client.lazy import view_class
 from vectara_client.status import StatusCode
-from vectara_client.util import _custom_asdict_factory, RequestUtil
+from vectara_client.util import RequestUtil, AsyncRequestUtil
 import logging
 import re
 
@@ -25,13 +28,52 @@ class QueryService():
         self.request_util = request_util
         self.customer_id = customer_id
 
+    @traced
     def query(self, query_text: str, corpus_id: Union[int, List[int]], start: int = 0, page_size: int = 10,
               summary: bool = True, response_lang: str = 'en', context_config=None, semantics='DEFAULT',
               promptText=None, metadata: str = None, summarizer: str = "vectara-summary-ext-v1.2.0",
               summary_result_count=5, re_rank=False, re_ranker=272725718, custom_dimensions: List[dict] = None,
               _lambda=0.025,
               temperature=None, debug: bool = None, chat=False, conversation_id: str = None,
-              query_context: str = ""):
+              query_context: str = "", lazy: bool = False, deadline: Union[Deadline, float] = None) -> ResponseSet:
+        """
+        Runs the query against the given corpus (or corpora).
+
+        :param lazy: return a lazy view over the raw response which only decodes the fields you read. It behaves like
+            a ResponseSet (including with render_markdown) but is much cheaper for callers reading just the top
+            few results.
+        :param deadline: a Deadline or seconds from now, bounding the request and any retries.
+        """
+
+        final_query_dict = self._build_query(query_text, corpus_id, start=start, page_size=page_size,
+                                             summary=summary, response_lang=response_lang,
+                                             context_config=context_config, semantics=semantics,
+                                             promptText=promptText, metadata=metadata, summarizer=summarizer,
+                                             summary_result_count=summary_result_count, re_rank=re_rank,
+                                             re_ranker=re_ranker, custom_dimensions=custom_dimensions,
+                                             _lambda=_lambda, temperature=temperature, debug=debug, chat=chat,
+                                             conversation_id=conversation_id, query_context=query_context)
+
+        result = self.request_util.request("query", final_query_dict, self._response_class(lazy), deadline=deadline)
+
+        return self._handle_query_response(result, summary)
+
+    def _response_class(self, lazy: bool):
+        if lazy:
+            return view_class(BatchQueryResponse)
+        else:
+            return BatchQueryResponse
+
+    def _build_query(self, query_text: str, corpus_id: Union[int, List[int]], start: int = 0, page_size: int = 10,
+                     summary: bool = True, response_lang: str = 'en', context_config=None, semantics='DEFAULT',
+                     promptText=None, metadata: str = None, summarizer: str = "vectara-summary-ext-v1.2.0",
+                     summary_result_count=5, re_rank=False, re_ranker=272725718,
+                     custom_dimensions: List[dict] = None, _lambda=0.025,
+                     temperature=None, debug: bool = None, chat=False, conversation_id: str = None,
+                     query_context: str = "") -> dict:
+        """
+        Builds the validated query payload, shared by QueryService and AsyncQueryService.
+        """
 
         # Convert singular int to List of corpus ids.
         if type(corpus_id) is list:
@@ -61,6 +103,9 @@ class QueryService():
             if custom_dimensions:
                 corpus_key['dim'] = custom_dimensions
 
+            # Sent as "lambda", see vectara_client.encoder.wire_name
+            corpus_key['lexicalInterpolationConfig'] = {'_lambda': _lambda}
+
             corpus_keys.append(corpus_key)
 
         query_dict = {
@@ -120,20 +165,18 @@ class QueryService():
 
         batch_query_dict = {'query': [query_dict]}
 
-        self.logger.debug(f"Query is:\n{json.dumps(batch_query_dict, indent=4)}\n")
-
-        query = from_dict(BatchQueryRequest, batch_query_dict)
+        # Pretty printing the query costs more than building it, so only when it is written.
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Query is:\n{json.dumps(batch_query_dict, indent=4)}\n")
 
-        # Omit nulls using our own dict factory.
-        # Dataclasses feel like coding with the first XML serializers in Java in 2005 - very early.
-        final_query_dict = asdict(query, dict_factory=_custom_asdict_factory)
-
-        # Since we can't put in "lambda" to a dataclass field due to Python using it as a reserved word,
-        # we inject it now.
-        final_query_dict['query'][0]['corpusKey'][0]['lexicalInterpolationConfig'] = {"lambda": _lambda}
-
-        result = self.request_util.request("query", final_query_dict, BatchQueryResponse)
+        # Validate our dict against the domain, then encode it omitting nulls.
+        query = decode(BatchQueryRequest, batch_query_dict)
+        return encode(query)
 
+    def _handle_query_response(self, result: BatchQueryResponse, summary: bool) -> ResponseSet:
+        """
+        Checks the statuses on our response and unwraps the single ResponseSet we asked for.
+        """
         summary_status = None
         if summary:
             if (result.responseSet[0].summary[0].status and result.responseSet[0].summary[0].status
@@ -156,3 +199,26 @@ class QueryService():
             # raise SummaryError("We did not have sufficient results to generate results.")
         else:
             return result.responseSet[0]
+
+
+class AsyncQueryService(QueryService):
+    """
+    asyncio counterpart of QueryService, sharing its request building and response checks.
+    """
+
+    def __init__(self, request_util: AsyncRequestUtil, customer_id: int):
+        super().__init__(request_util, customer_id)
+
+    @traced
+    async def query(self, query_text: str, corpus_id: Union[int, List[int]], deadline: Union[Deadline, float] = None,
+                    **kwargs) -> ResponseSet:
+        """
+        Accepts the same keyword arguments as QueryService.query.
+        """
+        lazy = kwargs.pop('lazy', False)
+        final_query_dict = self._build_query(query_text, corpus_id, **kwargs)
+
+        result = await self.request_util.request("query", final_query_dict, self._response_class(lazy),
+                                                 deadline=deadline)
+
+        return self._handle_query_response(result, kwargs.get('summary', True))
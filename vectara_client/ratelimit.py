@@ -0,0 +1,229 @@
+"""
+Client side token bucket rate limiting for RequestUtil.
+
+Buckets are keyed by operation and optionally by corpus id. Each request reserves a token and is told how long
+to wait for it, so concurrent callers queue fairly behind one another and the account runs just under its quota
+instead of bouncing off the server with 429s. The memory store is shared between threads, the sqlite store
+between processes on the same host.
+
+No caller waits past its deadline, a wait which would take it past the deadline raises DeadlineExceededError
+without taking a token.
+"""
+from vectara_client.config import RateLimitConfig, RateLimitRule
+from vectara_client.error import DeadlineExceededError, RateLimitExceededError
+from abc import ABC
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Optional, Tuple
+import asyncio
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, capacity: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _reserve(tokens: float, rate: float, max_wait: Optional[float]) -> Tuple[Optional[float], float]:
+    """
+    Takes one token from the bucket, allowing the balance to go negative so later callers queue behind us.
+
+    :return: a tuple of the wait in seconds (None if over max_wait, in which case nothing is taken) and the new
+        balance.
+    """
+    remaining = tokens - 1.0
+    wait = 0.0 if remaining >= 0 else -remaining / rate
+    if max_wait is not None and wait > max_wait:
+        return None, tokens
+    return wait, remaining
+
+
+class BaseBucketStore(ABC):
+
+    # Whether reserve may block, e.g. on another process's lock, so asyncio callers run it on a worker thread.
+    blocking = False
+
+    def reserve(self, key: str, rate: float, capacity: float, now: float,
+                max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Atomically reserves a token from the named bucket.
+
+        :return: how long the caller must wait before using the token, or None if that exceeds max_wait.
+        """
+        raise NotImplementedError("You must implement this on a subclass")
+
+
+class MemoryBucketStore(BaseBucketStore):
+    """
+    Buckets shared by every thread in this process.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._buckets = {}
+
+    def reserve(self, key: str, rate: float, capacity: float, now: float,
+                max_wait: Optional[float] = None) -> Optional[float]:
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, rate, capacity)
+            wait, tokens = _reserve(tokens, rate, max_wait)
+            self._buckets[key] = (tokens, now)
+            return wait
+
+
+class SqliteBucketStore(BaseBucketStore):
+    """
+    Buckets in a local sqlite database so that worker processes on the same host share one budget. Wall clock time
+    is used as it is comparable between processes.
+    """
+
+    DEFAULT_PATH = str(Path.home() / ".vectara_rate_limit.db")
+
+    # Waits up to the connection timeout for other processes' write locks.
+    blocking = True
+
+    def __init__(self, path: str = None):
+        self.path = path if path else SqliteBucketStore.DEFAULT_PATH
+        self._lock = Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key text primary key, tokens real, updated real)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def reserve(self, key: str, rate: float, capacity: float, now: float,
+                max_wait: Optional[float] = None) -> Optional[float]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                # Take the write lock up front so the read-modify-write is atomic across processes.
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens = _refill(tokens, updated, now, rate, capacity)
+                wait, tokens = _reserve(tokens, rate, max_wait)
+                conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                             (key, tokens, now))
+                conn.execute("COMMIT")
+                return wait
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+
+def _find_corpus_id(payload) -> Optional[int]:
+    """
+    Finds the corpus id on the payloads built by our services, without each having to pass it explicitly.
+    """
+    if not isinstance(payload, dict):
+        return None
+    for key in ('corpus_id', 'corpusId', 'o'):
+        if key in payload:
+            return payload[key]
+    queries = payload.get('query')
+    if isinstance(queries, list) and queries and isinstance(queries[0], dict):
+        corpus_keys = queries[0].get('corpusKey')
+        if corpus_keys:
+            return corpus_keys[0].get('corpusId')
+    return None
+
+
+class RateLimiter:
+    """
+    Applies the RateLimitConfig rules, blocking (or asking asyncio callers to sleep) until a token is available.
+    """
+
+    def __init__(self, config: RateLimitConfig, store: BaseBucketStore = None,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.time,
+                 async_sleep=asyncio.sleep):
+        """
+        :param config: the rules per operation.
+        :param store: where buckets are kept, if None this is created from the config backend.
+        :param sleep: injectable for tests.
+        :param clock: injectable for tests, must be wall clock time for the sqlite store.
+        :param async_sleep: injectable for tests, used by acquire_async
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self.clock = clock
+
+        if store:
+            self.store = store
+        elif config.backend == "memory":
+            self.store = MemoryBucketStore()
+        elif config.backend == "sqlite":
+            self.store = SqliteBucketStore(config.path)
+        else:
+            raise TypeError(f"Unknown rate limit backend [{config.backend}], expected memory or sqlite")
+
+        for operation, rule in config.operations.items():
+            if rule.rate <= 0:
+                raise TypeError(f"Rate limit for operation [{operation}] must be positive")
+
+    def reserve(self, operation: str, payload=None, deadline=None) -> float:
+        """
+        Reserves a token for the operation.
+
+        :param operation: the REST operation.
+        :param payload: the request payload or upload params, used to find the corpus id for per corpus rules.
+        :param deadline: an optional vectara_client.deadline.Deadline, the wait may not go past it.
+        :return: how long the caller must wait before sending.
+        :raises RateLimitExceededError: if the wait would exceed the configured max_wait.
+        :raises DeadlineExceededError: if the wait would go past the deadline.
+        """
+        rule: RateLimitRule = self.config.operations.get(operation)
+        if not rule:
+            return 0.0
+
+        key = operation
+        if rule.per_corpus:
+            key = f"{operation}:{_find_corpus_id(payload)}"
+
+        max_wait = self.config.max_wait
+        remaining = deadline.remaining() if deadline is not None else None
+        limited_by_deadline = remaining is not None and (max_wait is None or remaining < max_wait)
+        if limited_by_deadline:
+            max_wait = max(0.0, remaining)
+
+        capacity = rule.burst if rule.burst else max(1.0, rule.rate)
+        wait = self.store.reserve(key, rule.rate, capacity, self.clock(), max_wait)
+        if wait is None and limited_by_deadline:
+            raise DeadlineExceededError(f"Rate limit for [{key}] would require waiting past the deadline of "
+                                        f"operation [{operation}], [{remaining:.3f}s] away", operation=operation)
+        if wait is None:
+            raise RateLimitExceededError(f"Rate limit for [{key}] would require waiting longer than "
+                                         f"[{self.config.max_wait}s]", key=key)
+        if wait > 0:
+            self.logger.debug(f"Rate limit for [{key}] reached, waiting [{wait:.3f}s]")
+        return wait
+
+    def acquire(self, operation: str, payload=None, deadline=None):
+        """
+        Blocks until the operation may be sent, see reserve.
+        """
+        wait = self.reserve(operation, payload, deadline)
+        if wait > 0:
+            self.sleep(wait)
+
+    async def acquire_async(self, operation: str, payload=None, deadline=None):
+        """
+        asyncio version of acquire. A store which may block is called on a worker thread, so the event loop isn't
+        stalled while e.g. the sqlite store waits for another process's lock.
+        """
+        if operation not in self.config.operations:
+            return
+        if self.store.blocking:
+            wait = await asyncio.to_thread(self.reserve, operation, payload, deadline)
+        else:
+            wait = self.reserve(operation, payload, deadline)
+        if wait > 0:
+            await self.async_sleep(wait)
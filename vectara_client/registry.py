@@ -0,0 +1,190 @@
+"""
+Process-wide registry of shared clients, for callers such as web request handlers which would otherwise build a new
+client, with its own connection pool and OAuth2 token, on every request.
+
+Factory.build_shared() returns the client registered for the factory's configuration source (a path, JSON or the
+home directory), profile and overrides (retry_config, interceptors...), building it on first use. Client is
+thread-safe, so one instance serves every thread. Each call re-checks the configuration through the ConfigCache, one
+stat for a file, and if it has changed a new client replaces the old one.
+
+Every build_shared() leases the client, and its close() returns the lease rather than closing it. A client which
+has been replaced, or invalidated, is closed once its last lease is returned, so threads still using it aren't left
+with a closed auth util, tracer or metrics exporter. Callers should therefore close the shared client when done with
+it, e.g. in a with block, as a replaced client with leases outstanding is never closed.
+"""
+from vectara_client.config import CONFIG_CACHE, ClientConfig, ConfigCache, config_key
+from threading import Lock
+from typing import Callable, Dict
+import copy
+import hashlib
+import logging
+
+
+class _Registration:
+    """
+    A shared client and the configuration it was built from.
+    """
+
+    __slots__ = ("client_config", "client", "leases", "retired")
+
+    def __init__(self, client_config: ClientConfig, client):
+        # The instance held by the ConfigCache, which is the same object for as long as the configuration is unchanged.
+        self.client_config = client_config
+        self.client = client
+        self.leases = 0
+        # Replaced or invalidated, so closed once leases reaches 0.
+        self.retired = False
+
+
+class ClientRegistry:
+    """
+    Thread-safe map of configuration source, profile and overrides to the client built from them.
+    """
+
+    def __init__(self, config_cache: ConfigCache = None):
+        """
+        :param config_cache: where the Factory caches parsed configuration, cleared along with invalidated clients.
+            Defaults to the process-wide CONFIG_CACHE.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config_cache = config_cache if config_cache else CONFIG_CACHE
+        self._clients: Dict[tuple, _Registration] = {}
+        # Every registration not yet closed, including retired ones, by id of its client.
+        self._open: Dict[int, _Registration] = {}
+        # One per key, so building the client of one configuration doesn't hold up callers of the others.
+        self._build_locks: Dict[tuple, Lock] = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get(self, key: tuple, overrides: tuple, load_config: Callable[[], ClientConfig],
+            build: Callable[[ClientConfig], object]):
+        """
+        :param key: the configuration's source and profile, see config_key
+        :param overrides: the building factory's overrides, clients are only shared between equal overrides
+        :param load_config: loads the configuration through the config cache, sharing the cached instance, so it
+            returns the very same ClientConfig while the configuration is unchanged
+        :param build: builds a client from the configuration
+        :return: the shared client for key and overrides, built now if there is none or its configuration has
+            changed. It is leased to the caller until its close().
+        """
+        registry_key = (key, overrides)
+        client = self._lease(registry_key, load_config())
+        if client is not None:
+            return client
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(registry_key, Lock())
+        with build_lock:
+            # Another caller may have built it while we waited.
+            client_config = load_config()
+            client = self._lease(registry_key, client_config)
+            if client is not None:
+                return client
+
+            # From a copy, so nothing the client holds is shared with the ConfigCache.
+            client = build(copy.deepcopy(client_config))
+            client.shared = True
+            client.registry = self
+            registration = _Registration(client_config, client)
+            registration.leases = 1
+            with self._lock:
+                replaced = self._clients.get(registry_key)
+                self._clients[registry_key] = registration
+                self._open[id(client)] = registration
+                closing = self._retire(replaced) if replaced else []
+
+        if replaced is not None:
+            self.logger.info(f"Configuration {_describe(key)} has changed, replaced its shared client")
+        self._close(closing)
+        return client
+
+    def _lease(self, registry_key: tuple, client_config: ClientConfig):
+        with self._lock:
+            registration = self._clients.get(registry_key)
+            if registration is not None and registration.client_config is client_config:
+                registration.leases += 1
+                return registration.client
+        return None
+
+    def release(self, client):
+        """
+        Returns a lease taken by get(), closing the client if it has been retired and this was the last one. Called
+        by Client.close().
+        """
+        with self._lock:
+            registration = self._open.get(id(client))
+            if registration is None or registration.client is not client:
+                return
+            registration.leases = max(0, registration.leases - 1)
+            closing = [registration] if registration.retired and registration.leases == 0 else []
+            if closing:
+                del self._open[id(client)]
+        self._close(closing)
+
+    def invalidate(self, config_path: str = None, config_json: str = None, profile: str = None) -> bool:
+        """
+        Retires the shared clients of a configuration source and profile, whatever their overrides. The next
+        Factory.build_shared() for them re-reads the configuration and builds a new client.
+
+        :return: whether there was a shared client.
+        """
+        key = config_key(config_path, config_json, profile)
+        with self._lock:
+            retired = [registry_key for registry_key in self._clients if registry_key[0] == key]
+            closing = []
+            for registry_key in retired:
+                closing += self._retire(self._clients.pop(registry_key))
+        self.config_cache.invalidate(key)
+        self._close(closing)
+        return len(retired) > 0
+
+    def invalidate_all(self) -> int:
+        """
+        Retires every shared client, e.g. on a signal to reload configuration.
+
+        :return: the number retired.
+        """
+        with self._lock:
+            retired = list(self._clients.values())
+            self._clients.clear()
+            closing = []
+            for registration in retired:
+                closing += self._retire(registration)
+        self.config_cache.clear()
+        self._close(closing)
+        return len(retired)
+
+    def _retire(self, registration: _Registration) -> list:
+        """
+        Called holding the lock.
+
+        :return: the registration, if it is to be closed now as it isn't leased.
+        """
+        registration.retired = True
+        registration.client.shared = False
+        if registration.leases > 0:
+            return []
+        del self._open[id(registration.client)]
+        return [registration]
+
+    def _close(self, registrations: list):
+        for registration in registrations:
+            # Requests already in flight on it complete, its connections are then discarded.
+            registration.client._close()
+
+
+def _describe(key: tuple) -> str:
+    """
+    :return: the configuration source and profile of a config_key for the log, a JSON source only by a digest as the
+        JSON holds the credentials.
+    """
+    kind, source, profile = key
+    if kind == "json":
+        source = "sha256:" + hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return f"[{kind}] [{source}] profile [{profile}]"
+
+
+# Used by Factory.build_shared.
+CLIENT_REGISTRY = ClientRegistry()
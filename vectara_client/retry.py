@@ -0,0 +1,313 @@
+"""
+Retry engine used by RequestUtil and AsyncRequestUtil.
+
+Failures are classified using vectara_client.status.StatusCode so the same names cover HTTP responses (e.g. 429
+TOO_MANY_REQUESTS) and Vectara statuses returned within a 200 body (e.g. UNAVAILABLE, RESOURCE_EXHAUSTED). Retries
+back off exponentially with jitter, honor Retry-After and draw from a per-client budget so that retries can't
+amplify an outage.
+
+Only idempotent operations are retried after any failure of the policy. An operation which changes state (e.g.
+create-corpus, create-api-key, index, delete-doc) might already have been acted upon when a read times out or a
+gateway gives up on it, and sending it again could then e.g. create a second corpus. Unless RetryConfig.operations
+has a policy of its own for one, which opts it in to every retry of that policy, such an operation is only retried
+when it wasn't sent (the connection failed) or the response says it wasn't acted upon (e.g. 429, 503).
+"""
+from vectara_client.config import RetryConfig, RetryPolicyConfig
+from vectara_client.status import Status, StatusCode
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, List, Optional, TypeVar
+import asyncio
+import logging
+import random
+import requests
+import sys
+import time
+import urllib3
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Sending these twice has no effect beyond the extra load.
+IDEMPOTENT_OPERATIONS = frozenset(["query", "list-corpora", "read-corpus", "compute-corpus-size", "list-documents",
+                                   "list-api-keys"])
+
+# Responses which say the request wasn't acted upon, so any operation may be sent again after them.
+NOT_ACTED_UPON_CODES = frozenset([StatusCode.TOO_MANY_REQUESTS, StatusCode.SERVICE_UNAVAILABLE,
+                                  StatusCode.UNAVAILABLE, StatusCode.RESOURCE_EXHAUSTED])
+
+
+class RetryBudget:
+    """
+    Thread-safe token budget shared by every operation on a client. Each successful request deposits a fraction of
+    a token, each retry withdraws a whole one, so once the initial allowance is spent the retry rate is capped at
+    the ratio of successful traffic.
+    """
+
+    def __init__(self, ratio: float = 0.1, initial: float = 10.0, maximum: float = 100.0):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = min(initial, maximum)
+        self._lock = Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            else:
+                return False
+
+
+class _RetryDecision:
+
+    def __init__(self, retryable: bool, code: Optional[StatusCode] = None, retry_after: Optional[float] = None):
+        self.retryable = retryable
+        self.code = code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header which is either delay-seconds or an HTTP-date.
+
+    :return: the delay in seconds or None if absent/unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_status_code(code) -> Optional[StatusCode]:
+    if isinstance(code, StatusCode):
+        return code
+    try:
+        return StatusCode(code)
+    except ValueError:
+        return None
+
+
+def _find_statuses(result) -> List[Status]:
+    """
+    Finds the top level statuses on a decoded response, which may be a single Status or a list of them.
+    """
+    if isinstance(result, dict):
+        return []
+    status = getattr(result, "status", None)
+    if isinstance(status, Status):
+        return [status]
+    elif isinstance(status, list):
+        return [s for s in status if isinstance(s, Status)]
+    else:
+        return []
+
+
+def _is_transport_error(e: Exception) -> bool:
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    # Only check httpx errors if the optional asyncio client has been loaded.
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(e, httpx.TransportError)
+
+
+def _is_connect_error(e: Exception) -> bool:
+    """
+    :return: whether a transport error happened before the request was sent, e.g. the connection was refused.
+    """
+    if isinstance(e, requests.ConnectTimeout):
+        return True
+    httpx = sys.modules.get("httpx")
+    unsent = (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError)
+    if httpx is not None:
+        unsent += (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+    if isinstance(e, requests.RequestException) and e.args:
+        # requests wraps urllib3's MaxRetryError, and the HTTP/2 transport httpx's error, as the first argument.
+        cause = e.args[0]
+        return isinstance(getattr(cause, "reason", cause), unsent)
+    return isinstance(e, unsent)
+
+
+class RetryHandler:
+    """
+    Runs a request, retrying it according to the policy for its operation.
+    """
+
+    def __init__(self, config: RetryConfig = None, sleep: Callable[[float], None] = time.sleep,
+                 async_sleep=asyncio.sleep, rand: Callable[[], float] = random.random):
+        """
+        :param config: the retry configuration, if None the defaults from RetryConfig are used.
+        :param sleep: injectable for tests, used between blocking retries
+        :param async_sleep: injectable for tests, used between asyncio retries
+        :param rand: injectable for tests, returns a float in [0, 1) used for jitter
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = RetryConfig()
+        self.config = config
+        self.budget = RetryBudget(config.budget_ratio, config.budget_initial, config.budget_max)
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self.rand = rand
+
+        self._retryable = {}
+        for operation, policy in [(None, config.default)] + list(config.operations.items()):
+            try:
+                self._retryable[operation] = frozenset(StatusCode[name] for name in policy.retryable_codes)
+            except KeyError as e:
+                raise TypeError(f"Unknown StatusCode {e} in retry policy for operation [{operation}]") from None
+
+    def policy_for(self, operation: str) -> RetryPolicyConfig:
+        return self.config.operations.get(operation, self.config.default)
+
+    def _retryable_codes(self, operation: str):
+        if operation in self.config.operations:
+            return self._retryable[operation]
+        else:
+            return self._retryable[None]
+
+    def _may_repeat(self, operation: str) -> bool:
+        """
+        :return: whether the operation may be retried after it could have been acted upon, see the module docs.
+        """
+        return operation in IDEMPOTENT_OPERATIONS or operation in self.config.operations
+
+    def _is_retryable_code(self, operation: str, code: Optional[StatusCode]) -> bool:
+        if code not in self._retryable_codes(operation):
+            return False
+        if code not in NOT_ACTED_UPON_CODES and not self._may_repeat(operation):
+            self.logger.info(f"Not retrying operation [{operation}] after [{code}] as it may have been acted upon, "
+                             f"give it a retry policy of its own to retry it")
+            return False
+        return True
+
+    def _classify_error(self, operation: str, policy: RetryPolicyConfig, e: Exception) -> _RetryDecision:
+        response = getattr(e, "response", None)
+        if response is not None and getattr(response, "status_code", None) is not None:
+            code = _to_status_code(response.status_code)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            return _RetryDecision(self._is_retryable_code(operation, code), code, retry_after)
+        elif _is_transport_error(e):
+            if policy.retry_connection_errors and not self._may_repeat(operation) and not _is_connect_error(e):
+                self.logger.info(f"Not retrying operation [{operation}] after [{type(e).__name__}] as it may have "
+                                 f"been acted upon, give it a retry policy of its own to retry it")
+                return _RetryDecision(False)
+            return _RetryDecision(policy.retry_connection_errors)
+        else:
+            return _RetryDecision(False)
+
+    def _classify_result(self, operation: str, result) -> _RetryDecision:
+        for status in _find_statuses(result):
+            code = _to_status_code(status.code)
+            if self._is_retryable_code(operation, code):
+                return _RetryDecision(True, code)
+        return _RetryDecision(False)
+
+    def _backoff(self, policy: RetryPolicyConfig, attempt: int, decision: _RetryDecision) -> Optional[float]:
+        """
+        :return: how long to wait before the next attempt, or None if we should give up.
+        """
+        delay = min(policy.max_backoff, policy.initial_backoff * (policy.multiplier ** (attempt - 1)))
+        if policy.jitter:
+            delay = delay * self.rand()
+
+        if policy.honor_retry_after and decision.retry_after is not None:
+            if decision.retry_after > policy.max_retry_after:
+                self.logger.warning(f"Server asked us to retry after [{decision.retry_after}s] which is longer than "
+                                    f"our max_retry_after [{policy.max_retry_after}s], giving up")
+                return None
+            delay = max(delay, decision.retry_after)
+
+        return delay
+
+    def _next_delay(self, operation: str, policy: RetryPolicyConfig, attempt: int,
+                    decision: _RetryDecision, deadline=None) -> Optional[float]:
+        if not decision.retryable or attempt >= policy.max_attempts:
+            return None
+
+        delay = self._backoff(policy, attempt, decision)
+        if delay is None:
+            return None
+
+        if deadline is not None and delay >= deadline.remaining():
+            self.logger.warning(f"Not retrying operation [{operation}] as its deadline would pass during the "
+                                f"[{delay:.3f}s] backoff")
+            return None
+
+        if not self.budget.try_withdraw():
+            self.logger.warning(f"Retry budget exhausted, not retrying operation [{operation}]")
+            return None
+
+        self.logger.info(f"Retrying operation [{operation}] after [{decision.code}], attempt [{attempt + 1}] of "
+                         f"[{policy.max_attempts}] in [{delay:.3f}s]")
+        return delay
+
+    def call(self, operation: str, send: Callable[[], T], deadline=None) -> T:
+        """
+        Invokes send until it succeeds, fails with a fatal error or we run out of attempts/budget/time.
+
+        :param operation: the REST operation, used to select the policy.
+        :param send: performs one attempt, returning the decoded response or raising.
+        :param deadline: an optional vectara_client.deadline.Deadline, we don't back off beyond it.
+        :return: the decoded response of the final attempt.
+        """
+        policy = self.policy_for(operation)
+        attempt = 1
+        while True:
+            try:
+                result = send()
+            except Exception as e:
+                delay = self._next_delay(operation, policy, attempt, self._classify_error(operation, policy, e),
+                                         deadline)
+                if delay is None:
+                    raise
+            else:
+                decision = self._classify_result(operation, result)
+                if not decision.retryable:
+                    self.budget.deposit()
+                    return result
+                delay = self._next_delay(operation, policy, attempt, decision, deadline)
+                if delay is None:
+                    return result
+
+            self.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, operation: str, send, deadline=None) -> T:
+        """
+        asyncio version of call, where send is a coroutine function.
+        """
+        policy = self.policy_for(operation)
+        attempt = 1
+        while True:
+            try:
+                result = await send()
+            except Exception as e:
+                delay = self._next_delay(operation, policy, attempt, self._classify_error(operation, policy, e),
+                                         deadline)
+                if delay is None:
+                    raise
+            else:
+                decision = self._classify_result(operation, result)
+                if not decision.retryable:
+                    self.budget.deposit()
+                    return result
+                delay = self._next_delay(operation, policy, attempt, decision, deadline)
+                if delay is None:
+                    return result
+
+            await self.async_sleep(delay)
+            attempt += 1
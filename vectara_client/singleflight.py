@@ -0,0 +1,151 @@
+"""
+Single-flight coalescing of identical in-flight requests for RequestUtil and AsyncRequestUtil.
+
+When several threads or tasks make the same read at the same moment (e.g. a popular query, or read_corpus for the
+same id) only the first, the leader, sends it. The others wait for the leader and share its decoded result, or its
+error. Nothing is cached, a call arriving after the leader finished sends a new request.
+
+Callers share the very same result object, so must treat it as read only.
+"""
+from vectara_client.config import SingleFlightConfig
+from vectara_client.error import DeadlineExceededError
+from vectara_client.retry import IDEMPOTENT_OPERATIONS
+from concurrent.futures import Future, TimeoutError
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Callable, Dict, Hashable, TypeVar
+import asyncio
+import json
+import logging
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SingleFlightStats:
+    """
+    Counters for one operation.
+    """
+    calls: int = 0
+    # Calls which shared another call's request rather than sending their own.
+    coalesced: int = 0
+
+
+class SingleFlight:
+    """
+    Thread-safe registry of in-flight requests keyed by operation and canonicalized payload, shared by every thread
+    or task using the request utility.
+    """
+
+    def __init__(self, config: SingleFlightConfig = None):
+        """
+        :param config: the operations to coalesce, if None the defaults from SingleFlightConfig are used.
+        :raises TypeError: if a configured operation is not idempotent
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = SingleFlightConfig()
+        for operation in config.operations:
+            if operation not in IDEMPOTENT_OPERATIONS:
+                raise TypeError(f"Operation [{operation}] is not idempotent so cannot be coalesced, expected one of "
+                                f"{sorted(IDEMPOTENT_OPERATIONS)}")
+        self.config = config
+        self._stats = {operation: SingleFlightStats() for operation in config.operations}
+        self._in_flight = {}
+        self._lock = Lock()
+
+    def coalesces(self, operation: str) -> bool:
+        return operation in self._stats
+
+    def stats(self) -> Dict[str, SingleFlightStats]:
+        """
+        :return: a copy of the counters keyed by operation.
+        """
+        with self._lock:
+            return {operation: replace(stats) for operation, stats in self._stats.items()}
+
+    @staticmethod
+    def key(operation: str, payload, *discriminators: Hashable) -> tuple:
+        """
+        Calls coalesce only if their keys are equal. The payload is canonicalized so dicts built in a different key
+        order still match.
+
+        :param discriminators: anything else which changes the result, e.g. the class it is decoded into
+        """
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return (operation, canonical) + discriminators
+
+    def _join(self, operation: str, key: tuple, create: Callable):
+        """
+        :return: a tuple of the in-flight future for key and whether we created it, i.e. are the leader.
+        """
+        with self._lock:
+            stats = self._stats[operation]
+            stats.calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                stats.coalesced += 1
+                return future, False
+            future = create()
+            self._in_flight[key] = future
+            return future, True
+
+    def _leave(self, key: tuple, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def _finished(self, key: tuple, task: asyncio.Task):
+        self._leave(key, task)
+        # Mark any error as retrieved, in case every caller was cancelled before it arrived.
+        if not task.cancelled():
+            task.exception()
+
+    def call(self, operation: str, key: tuple, send: Callable[[], T], timeout: float = None) -> T:
+        """
+        Performs send, unless an identical call is already in flight in which case its outcome is shared.
+
+        :param key: from SingleFlight.key
+        :param timeout: the most seconds a follower waits for the leader, e.g. the rest of its own deadline
+        :raises DeadlineExceededError: if a follower gives up waiting, the leader's request carries on.
+        """
+        future, leader = self._join(operation, key, Future)
+        if leader:
+            try:
+                future.set_result(send())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._leave(key, future)
+            return future.result()
+
+        self.logger.debug(f"Sharing the in-flight request for [{operation}]")
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            raise DeadlineExceededError(f"Deadline exceeded waiting for the shared request of operation "
+                                        f"[{operation}]", operation=operation) from None
+
+    async def call_async(self, operation: str, key: tuple, send, timeout: float = None) -> T:
+        """
+        asyncio version of call, where send is a coroutine function. The request runs in its own task so that
+        cancelling one caller, even the first, doesn't cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        # Tasks can only be awaited on their own loop.
+        key = key + (id(loop),)
+        task, leader = self._join(operation, key, lambda: loop.create_task(send()))
+        if leader:
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.logger.debug(f"Sharing the in-flight request for [{operation}]")
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            raise DeadlineExceededError(f"Deadline exceeded waiting for the shared request of operation "
+                                        f"[{operation}]", operation=operation) from None
@@ -35,7 +35,9 @@ class StatusCode(Enum):
     TOO_MANY_REQUESTS = 429
     INTERNAL_SERVER_ERROR = 500
     NOT_IMPLEMENTED = 501
+    BAD_GATEWAY = 502
     SERVICE_UNAVAILABLE = 503
+    GATEWAY_TIMEOUT = 504
     INSUFFICIENT_STORAGE = 507
 
     UNPARSEABLE_RESPONSE = 1000
@@ -0,0 +1,350 @@
+"""
+Tracing spans for each service method and each HTTP request made by RequestUtil and AsyncRequestUtil.
+
+A service method such as QueryService.query opens an INTERNAL span and each HTTP attempt beneath it, including
+retries and hedges, a CLIENT span. The server's PerformanceMetrics (query encoding, retrieval, user data retrieval
+and reranking) are attached to the HTTP span along with the time we spent decoding, so a trace splits client
+overhead, network time and each server phase.
+
+The current span is held in a contextvar, so spans nest across asyncio tasks as well as within a thread. Finished
+spans are handed to a pluggable exporter, InMemorySpanExporter for tests or OtlpJsonFileExporter which writes the
+OTLP JSON format read by the OpenTelemetry collector.
+"""
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from enum import Enum
+from vectara_client.config import TracingConfig
+from threading import Lock
+from typing import Dict, List, Optional
+import functools
+import inspect
+import json
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+_CURRENT_SPAN = ContextVar("vectara_current_span", default=None)
+
+# Attribute names for the fields of PerformanceMetrics.
+_SERVER_METRICS = {
+    "queryEncodeMs": "vectara.server.query_encode_ms",
+    "retrievalMs": "vectara.server.retrieval_ms",
+    "userdataRetrievalMs": "vectara.server.userdata_retrieval_ms",
+    "rerankMs": "vectara.server.rerank_ms"
+}
+
+
+class SpanKind(Enum):
+    """
+    The OTLP span kinds we use, valued as in the OTLP protocol.
+    """
+    INTERNAL = 1
+    CLIENT = 3
+
+
+class SpanStatus(Enum):
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+class Span:
+    """
+    One timed operation within a trace. Use as a context manager, which makes it the current span within the block.
+    """
+
+    def __init__(self, tracer: Optional["Tracer"], name: str, kind: SpanKind, trace_id: str, parent_span_id: str = None,
+                 attributes: dict = None, recording: bool = True):
+        """
+        :param recording: False if the trace was not sampled, the span is still current but never exported.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes) if attributes else {}
+        self.events = []
+        self.status = SpanStatus.UNSET
+        self.status_message = None
+        self.recording = recording
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = None
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        if self.recording:
+            self.attributes[key] = value
+
+    def set_status(self, status: SpanStatus, message: str = None):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exception: BaseException):
+        self.add_event("exception", {"exception.type": type(exception).__name__, "exception.message": str(exception)})
+        self.set_status(SpanStatus.ERROR, f"{type(exception).__name__}: {exception}")
+
+    def add_event(self, name: str, attributes: dict = None):
+        if self.recording:
+            self.events.append((name, time.time_ns(), attributes if attributes else {}))
+
+    def set_performance_metrics(self, metrics):
+        """
+        Attaches the server's PerformanceMetrics, if any, as vectara.server.* attributes in milliseconds.
+        """
+        if metrics is None or not self.recording:
+            return
+        total = 0
+        for field, attribute in _SERVER_METRICS.items():
+            value = getattr(metrics, field, None)
+            if value is not None:
+                self.attributes[attribute] = value
+                total += value
+        self.attributes["vectara.server.total_ms"] = total
+
+    @property
+    def duration(self) -> Optional[float]:
+        """
+        :return: seconds from start to end, None until ended.
+        """
+        return None if self.end_time_ns is None else (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def end(self):
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = time.time_ns()
+        if self.recording and self.tracer:
+            self.tracer._export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT_SPAN.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None:
+            self.record_exception(exc_val)
+        self.end()
+        _CURRENT_SPAN.reset(self._token)
+        return False
+
+    def __repr__(self):
+        return f"Span(name={self.name}, trace_id={self.trace_id}, span_id={self.span_id}, duration={self.duration})"
+
+
+class _NoopSpan:
+    """
+    Stands in for a span when tracing isn't configured, so callers needn't check.
+    """
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def set_performance_metrics(self, metrics):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT_SPAN.get()
+
+
+class BaseSpanExporter(ABC):
+    """
+    Receives spans as they finish. Must be thread-safe.
+    """
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        pass
+
+    def close(self):
+        pass
+
+
+class InMemorySpanExporter(BaseSpanExporter):
+    """
+    Keeps every finished span, for tests and interactive use.
+    """
+
+    def __init__(self):
+        self._spans = []
+        self._lock = Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    elif isinstance(value, int):
+        # int64 values are strings in OTLP JSON.
+        return {"intValue": str(value)}
+    elif isinstance(value, float):
+        return {"doubleValue": value}
+    else:
+        return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp_json(spans: List[Span], service_name: str = "vectara-client") -> dict:
+    """
+    :return: spans as an OTLP ExportTraceServiceRequest in its JSON encoding.
+    """
+    otlp_spans = []
+    for span in spans:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind.value,
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.end_time_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": span.status.value}
+        }
+        if span.parent_span_id:
+            otlp_span["parentSpanId"] = span.parent_span_id
+        if span.status_message:
+            otlp_span["status"]["message"] = span.status_message
+        if span.events:
+            otlp_span["events"] = [{"name": name, "timeUnixNano": str(time_ns),
+                                    "attributes": _otlp_attributes(attributes)}
+                                   for name, time_ns, attributes in span.events]
+        otlp_spans.append(otlp_span)
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+        "scopeSpans": [{"scope": {"name": "vectara_client"}, "spans": otlp_spans}]
+    }]}
+
+
+class OtlpJsonFileExporter(BaseSpanExporter):
+    """
+    Appends spans to a file as OTLP JSON, one ExportTraceServiceRequest per line, as written by the OpenTelemetry
+    collector's file exporter and read by its otlpjsonfile receiver.
+    """
+
+    def __init__(self, path: str, service_name: str = "vectara-client"):
+        self.path = path
+        self.service_name = service_name
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = Lock()
+
+    def export(self, spans: List[Span]):
+        line = json.dumps(to_otlp_json(spans, self.service_name), separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def create_exporter(config: TracingConfig) -> BaseSpanExporter:
+    """
+    :raises TypeError: for an unknown exporter, or the otlp-file exporter without a path.
+    """
+    if config.exporter == "memory":
+        return InMemorySpanExporter()
+    elif config.exporter == "otlp-file":
+        if not config.path:
+            raise TypeError("The otlp-file span exporter requires a path")
+        return OtlpJsonFileExporter(config.path, config.service_name)
+    else:
+        raise TypeError(f"Unknown span exporter [{config.exporter}], expected memory or otlp-file")
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to the exporter. Thread-safe, shared by every thread or task using the
+    request utility.
+    """
+
+    def __init__(self, config: TracingConfig = None, exporter: BaseSpanExporter = None):
+        """
+        :param config: the sampling rate and exporter, if None the defaults from TracingConfig are used.
+        :param exporter: overrides the exporter configured in config.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if not config:
+            config = TracingConfig()
+        self.config = config
+        self.exporter = exporter if exporter else create_exporter(config)
+
+    def start_span(self, name: str, kind: SpanKind = SpanKind.INTERNAL, attributes: Dict = None) -> Span:
+        """
+        :return: a span which is a child of the current span if there is one, otherwise the root of a new trace.
+        """
+        parent = _CURRENT_SPAN.get()
+        if parent is not None:
+            return Span(self, name, kind, parent.trace_id, parent.span_id, attributes, parent.recording)
+        recording = self.config.sample_rate >= 1.0 or random.random() < self.config.sample_rate
+        return Span(self, name, kind, f"{random.getrandbits(128):032x}", None, attributes, recording)
+
+    def _export(self, span: Span):
+        try:
+            self.exporter.export([span])
+        except Exception:
+            # Tracing must never fail the request being traced.
+            self.logger.exception(f"Unable to export span [{span.name}]")
+
+    def close(self):
+        self.exporter.close()
+
+
+def traced(method):
+    """
+    Decorates a service method, sync or async, to run within a span named after it, when the service's request
+    utility has a tracer.
+    """
+    name = method.__qualname__
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            tracer = getattr(self.request_util, "tracer", None)
+            if tracer is None:
+                return await method(self, *args, **kwargs)
+            with tracer.start_span(name):
+                return await method(self, *args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        tracer = getattr(self.request_util, "tracer", None)
+        if tracer is None:
+            return method(self, *args, **kwargs)
+        with tracer.start_span(name):
+            return method(self, *args, **kwargs)
+
+    return wrapper
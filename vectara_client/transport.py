@@ -0,0 +1,317 @@
+"""
+HTTP transports used by RequestUtil.
+
+A single pooled session is created per RequestUtil and shared by every service the Factory wires up, so
+consecutive calls re-use the same keep-alive connections instead of paying a fresh handshake each time.
+
+With TransportConfig.http2 the pool is replaced by a few HTTP/2 connections, each multiplexing up to
+http2_max_concurrent_streams in-flight requests, so a fan out of concurrent queries needs neither a connection per
+request nor queues behind one. The blocking client keeps its requests.Session (and so its responses and exceptions)
+with an adapter mounted which sends through httpx.
+"""
+from vectara_client.cassette import Cassette, CassetteRecordAdapter, CassetteReplayAdapter, AsyncCassetteClient
+from vectara_client.config import TransportConfig
+from dataclasses import replace
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from typing import List
+import asyncio
+import logging
+import requests
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Connection specific headers which are not allowed in HTTP/2, see RFC 9113 section 8.2.2.
+_HOP_BY_HOP_HEADERS = frozenset(["connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"])
+
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+# Stands in for no timeout on a shared HTTP/2 connection, see Http2Adapter._to_timeout.
+_NO_TIMEOUT = 24 * 60 * 60.0
+
+
+def create_session(config: TransportConfig = None) -> requests.Session:
+    """
+    Builds a pooled requests session from our transport configuration.
+
+    The underlying urllib3 pool is thread-safe, so the session may be shared across the worker threads used by
+    CorpusManager.batch_index.
+
+    :param config: the transport tuning, if None the defaults from TransportConfig are used.
+    :return: a session with our pooled adapter mounted for both http and https.
+    """
+    if not config:
+        config = TransportConfig()
+
+    session = requests.Session()
+    if config.cassette and config.cassette.mode == "replay":
+        logger.debug(f"Creating session replaying cassette [{config.cassette.path}]")
+        adapter = CassetteReplayAdapter(Cassette(config.cassette))
+    elif config.http2:
+        logger.debug(f"Creating HTTP/2 session with [{config.http2_connections}] connections of "
+                     f"[{config.http2_max_concurrent_streams}] streams")
+        adapter = Http2Adapter(config)
+    else:
+        logger.debug(f"Creating pooled session with pool_connections [{config.pool_connections}], "
+                     f"pool_maxsize [{config.pool_maxsize}], keep_alive [{config.keep_alive}]")
+        adapter = HTTPAdapter(pool_connections=config.pool_connections, pool_maxsize=config.pool_maxsize,
+                              pool_block=config.pool_block)
+    if config.cassette and config.cassette.mode == "record":
+        logger.debug(f"Recording to cassette [{config.cassette.path}]")
+        adapter = CassetteRecordAdapter(Cassette(config.cassette), adapter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if not config.keep_alive:
+        # Mirrors the old behaviour of module level requests.request(...), one connection per call.
+        session.headers['Connection'] = 'close'
+
+    return session
+
+
+def create_async_client(config: TransportConfig = None):
+    """
+    Builds a pooled httpx.AsyncClient from our transport configuration for the asyncio client.
+
+    httpx is an optional dependency, only needed if you use Factory.build_async.
+
+    :param config: the transport tuning, if None the defaults from TransportConfig are used.
+    :return: an httpx.AsyncClient sharing pool_maxsize connections between all tasks, or an AsyncHttp2Client.
+    """
+    httpx = _import_httpx()
+
+    if not config:
+        config = TransportConfig()
+
+    if config.cassette:
+        cassette = Cassette(config.cassette)
+        if config.cassette.mode == "replay":
+            logger.debug(f"Creating async client replaying cassette [{config.cassette.path}]")
+            return AsyncCassetteClient(cassette)
+        logger.debug(f"Recording to cassette [{config.cassette.path}]")
+        return AsyncCassetteClient(cassette, create_async_client(replace(config, cassette=None)))
+
+    if config.http2:
+        logger.debug(f"Creating HTTP/2 async client with [{config.http2_connections}] connections of "
+                     f"[{config.http2_max_concurrent_streams}] streams")
+        return AsyncHttp2Client(config)
+
+    logger.debug(f"Creating pooled async client with pool_maxsize [{config.pool_maxsize}], "
+                 f"keep_alive [{config.keep_alive}]")
+
+    keep_alive_connections = config.pool_maxsize if config.keep_alive else 0
+    limits = httpx.Limits(max_connections=config.pool_maxsize, max_keepalive_connections=keep_alive_connections)
+
+    # No default timeout, AsyncRequestUtil passes one per request from TimeoutConfig. This also disables the pool
+    # timeout so that a burst of tasks larger than the pool waits for a connection instead of failing.
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(None))
+
+
+def _import_httpx():
+    try:
+        import httpx
+        return httpx
+    except ImportError:
+        raise ImportError("The asyncio and HTTP/2 clients require httpx, install it with: pip install httpx[http2]") \
+            from None
+
+
+def _create_http2_clients(config: TransportConfig, client_class) -> list:
+    """
+    One httpx client per connection, as httpx otherwise multiplexes everything onto a single HTTP/2 connection.
+    """
+    httpx = _import_httpx()
+    if config.http2_connections < 1 or config.http2_max_concurrent_streams < 1:
+        raise TypeError("http2_connections and http2_max_concurrent_streams must be at least 1")
+
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1 if config.keep_alive else 0)
+    return [client_class(http1=not config.http2_prior_knowledge, http2=True, limits=limits,
+                         timeout=httpx.Timeout(None))
+            for _ in range(config.http2_connections)]
+
+
+def _h2_headers(headers) -> dict:
+    return {key: value for key, value in headers.items() if key.lower() not in _HOP_BY_HOP_HEADERS}
+
+
+class _StreamSlots:
+    """
+    Counts the in-flight requests on each connection, giving each new request to the least busy connection.
+    """
+
+    def __init__(self, connections: int, max_streams: int):
+        self.in_flight: List[int] = [0] * connections
+        self.max_streams = max_streams
+
+    def _pick(self):
+        slot = min(range(len(self.in_flight)), key=self.in_flight.__getitem__)
+        return slot if self.in_flight[slot] < self.max_streams else None
+
+
+class _ThreadStreamSlots(_StreamSlots):
+
+    def __init__(self, connections: int, max_streams: int):
+        super().__init__(connections, max_streams)
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        with self._condition:
+            slot = self._pick()
+            while slot is None:
+                self._condition.wait()
+                slot = self._pick()
+            self.in_flight[slot] += 1
+            return slot
+
+    def release(self, slot: int):
+        with self._condition:
+            self.in_flight[slot] -= 1
+            self._condition.notify()
+
+
+class _AsyncStreamSlots(_StreamSlots):
+
+    def __init__(self, connections: int, max_streams: int):
+        super().__init__(connections, max_streams)
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._pick() is not None)
+            slot = self._pick()
+            self.in_flight[slot] += 1
+            return slot
+
+    async def release(self, slot: int):
+        async with self._condition:
+            self.in_flight[slot] -= 1
+            self._condition.notify()
+
+
+class _Http2Raw:
+    """
+    Stands in for the urllib3 response on requests.Response.raw, so RequestUtil can count bytes on the wire.
+    """
+
+    def __init__(self, num_bytes_downloaded: int):
+        self.num_bytes_downloaded = num_bytes_downloaded
+
+    def tell(self) -> int:
+        return self.num_bytes_downloaded
+
+    def close(self):
+        pass
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    requests transport adapter which sends over HTTP/2 with httpx, returning ordinary requests.Response objects and
+    raising requests exceptions. Proxies and per-request verify/cert are taken from the environment by httpx rather
+    than from the session.
+    """
+
+    def __init__(self, config: TransportConfig = None):
+        super().__init__()
+        if not config:
+            config = TransportConfig(http2=True)
+        self.httpx = _import_httpx()
+        self.clients = _create_http2_clients(config, self.httpx.Client)
+        self.slots = _ThreadStreamSlots(config.http2_connections, config.http2_max_concurrent_streams)
+        # Held by a thread from picking its connection until it has sent its request headers, see send.
+        self._opening = [threading.Lock() for _ in self.clients]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body
+        if hasattr(body, "read"):
+            # e.g. the MultipartEncoderMonitor used for uploads.
+            body = iter(lambda stream=body: stream.read(_UPLOAD_CHUNK_SIZE), b"")
+
+        slot = self.slots.acquire()
+        # httpcore takes the next stream id and sends the stream's headers without holding a lock in between, so
+        # threads sharing a connection could send them out of order, which the server must treat as a protocol error
+        # closing the connection and every stream on it. We open one stream at a time on each connection, until
+        # httpcore's trace reports its headers sent.
+        opening = self._opening[slot]
+        opening.acquire()
+        held = [True]
+
+        def trace(event: str, info: dict):
+            if held[0] and event.startswith("http2.send_request_headers.") and not event.endswith(".started"):
+                held[0] = False
+                opening.release()
+
+        try:
+            response = self.clients[slot].request(request.method, request.url, headers=_h2_headers(request.headers),
+                                                  content=body, timeout=self._to_timeout(timeout),
+                                                  extensions={"trace": trace})
+        except self.httpx.TimeoutException as e:
+            raise requests.Timeout(e, request=request) from e
+        except self.httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request) from e
+        finally:
+            if held[0]:
+                held[0] = False
+                opening.release()
+            self.slots.release(slot)
+
+        return self._build_response(request, response)
+
+    def _to_timeout(self, timeout):
+        """
+        Every thread sharing a connection sets the socket's timeout before each of its reads and writes. Python makes
+        a socket without a timeout blocking and one with a timeout non-blocking, so were one thread to write without
+        a timeout while another reads with one, either could fail with EAGAIN, which drops the connection along with
+        every stream on it. Each phase therefore has a timeout, no timeout meaning a very long one.
+        """
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        connect = _NO_TIMEOUT if connect is None else connect
+        read = _NO_TIMEOUT if read is None else read
+        return self.httpx.Timeout(connect=connect, read=read, write=read, pool=None)
+
+    def _build_response(self, request, response) -> requests.Response:
+        result = requests.Response()
+        result.status_code = response.status_code
+        # httpx joins repeated headers with a comma, as requests does.
+        result.headers = CaseInsensitiveDict(response.headers.items())
+        result.encoding = response.encoding
+        result.reason = response.reason_phrase
+        result.url = request.url
+        result.request = request
+        result.connection = self
+        # The body is already read and decompressed.
+        result._content = response.content
+        result._content_consumed = True
+        result.raw = _Http2Raw(response.num_bytes_downloaded)
+        return result
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+
+class AsyncHttp2Client:
+    """
+    Drop in for the httpx.AsyncClient used by AsyncRequestUtil, sending over a few HTTP/2 connections with at most
+    http2_max_concurrent_streams in-flight requests on each.
+    """
+
+    def __init__(self, config: TransportConfig = None):
+        if not config:
+            config = TransportConfig(http2=True)
+        httpx = _import_httpx()
+        self.clients = _create_http2_clients(config, httpx.AsyncClient)
+        self.slots = _AsyncStreamSlots(config.http2_connections, config.http2_max_concurrent_streams)
+
+    async def request(self, method: str, url: str, headers=None, **kwargs):
+        slot = await self.slots.acquire()
+        try:
+            return await self.clients[slot].request(method, url, headers=_h2_headers(headers or {}), **kwargs)
+        finally:
+            await self.slots.release(slot)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        for client in self.clients:
+            await client.aclose()
@@ -1,21 +1,36 @@
 from abc import ABC
 from enum import Enum
 from vectara_client.authn import BaseAuthUtil
+from vectara_client.circuit import CircuitBreaker
+from vectara_client.codec import BaseJsonCodec, default_codec
+from vectara_client.compression import Compressor
+from vectara_client.config import LoggingConfig, TransportConfig
+from vectara_client.deadline import Deadline, Timeouts
+from vectara_client.decoder import decode
+from vectara_client.hedge import Hedger
+from vectara_client.interceptor import BaseInterceptor, InterceptorChain, RequestContext
+from vectara_client.eventlog import EventLogger, lazy
 from vectara_client.domain import UploadDocumentResponse, ResponseSet, Attribute
-from typing import Type, TypeVar, List
-from dacite import from_dict
+from vectara_client.journal import RequestJournal
+from vectara_client.metrics import Metrics
+from vectara_client.ratelimit import RateLimiter
+from vectara_client.retry import RetryHandler
+from vectara_client.singleflight import SingleFlight
+from vectara_client.tracing import NOOP_SPAN, SpanKind, Tracer
+from vectara_client.transport import create_session, create_async_client
+from typing import Optional, Type, TypeVar, List, Union
 from pathlib import Path
-from tqdm import tqdm
-from tqdm.contrib.logging import logging_redirect_tqdm
-from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
 import logging
 import threading
+import time
 import json
 import requests
 import warnings
 
 T = TypeVar("T")
 
+DEFAULT_BASE_URL = "https://api.vectara.io/v1"
+
 def convertAttrListToDict(input:List[Attribute]):
     result = {}
     for attr in input:
@@ -34,74 +49,313 @@ def _custom_asdict_factory(data):
     # lambda x: {k: v for (k, v) in x if v is not None}
 
 
-class RequestUtil:
+class BaseRequestUtil(ABC):
+    """
+    Request building and response decoding shared by our blocking and asyncio request utilities, so both send
+    byte-for-byte the same payloads and return the same domain classes.
+    """
 
-    def __init__(self, auth_util: BaseAuthUtil):
-        self.logger = logging.getLogger(__class__.__name__)
+    def __init__(self, auth_util: BaseAuthUtil, base_url: str = DEFAULT_BASE_URL,
+                 retry_handler: RetryHandler = None, rate_limiter: RateLimiter = None,
+                 journal: RequestJournal = None, codec: BaseJsonCodec = None, compressor: Compressor = None,
+                 hedger: Hedger = None, circuit_breaker: CircuitBreaker = None, timeouts: Timeouts = None,
+                 single_flight: SingleFlight = None, metrics: Metrics = None, tracer: Tracer = None,
+                 interceptors: List[BaseInterceptor] = None, logging_config: LoggingConfig = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
         self.auth_util = auth_util
-        self.requests = []
-
-    def request(self, operation: str, payload, to_class: Type[T] = None, method="POST") -> T:
+        self.base_url = base_url
+        # Bounded so long running ingestion doesn't hold on to every payload, see JournalConfig.
+        self.requests = journal if journal is not None else RequestJournal()
+        if retry_handler:
+            self.retry_handler = retry_handler
+        else:
+            self.retry_handler = RetryHandler()
+        self.rate_limiter = rate_limiter
+        self.codec = codec if codec else default_codec()
+        # Without a CompressionConfig requests are sent uncompressed, but bytes are still counted.
+        self.compressor = compressor if compressor else Compressor()
+        self.hedger = hedger
+        self.circuit_breaker = circuit_breaker
+        self.timeouts = timeouts if timeouts else Timeouts()
+        self.single_flight = single_flight
+        self.metrics = metrics if metrics else Metrics()
+        self.tracer = tracer
+        self.interceptors = InterceptorChain(interceptors)
+        self.events = EventLogger(self.logger, logging_config)
+
+    def _prepare_request(self, operation: str, payload):
         """
+        Builds the url, headers and serialized body for a JSON operation.
 
-        :param method:
-        :param to_class:
         :param operation: the REST operation to perform.
         :param payload: the payload which will be serialized.
-        :return:
+        :return: a tuple of url, headers without the auth headers and the encoded JSON body, compressed if configured
         """
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if not self.compressor.accept_compressed:
+            headers['Accept-Encoding'] = 'identity'
 
-        headers = self.auth_util.get_headers()
-        headers['Content-Type'] = 'application/json'
-        headers['Accept'] = 'application/json'
+        self.requests.append({'operation': operation, 'payload': payload})
 
-        self.logger.debug(f"Headers: {json.dumps(headers)}")
+        url = f"{self.base_url}/{operation}"
+        self.events.log("request.url", "URL for operation %s is: %s", operation, url, operation=operation)
+        self.events.log("request.payload", "Payload is: %s", lazy(self.codec.dumps_pretty, payload))
 
-        self.requests.append({'operation': operation, 'payload': payload})
+        payload_json, content_encoding = self.compressor.compress(operation, self.codec.dumps(payload))
+        if content_encoding:
+            headers['Content-Encoding'] = content_encoding
+        return url, headers, payload_json
 
-        url = f"https://api.vectara.io/v1/{operation}"
-        self.logger.info(f"URL for operation {operation} is: {url}")
-        if self.logger.isEnabledFor(logging.DEBUG):
+    def _with_auth(self, headers: Optional[dict]) -> dict:
+        """
+        Adds the auth headers for one attempt, so a retry or hedge may use another credential of a PooledAuthUtil.
 
-            self.logger.debug(f"Payload is: {json.dumps(payload, indent=4)}")
+        :param headers: the request's other headers, which are not changed
+        :return: a new dict of both
+        """
+        attempt_headers = dict(headers) if headers else {}
+        # Copied into ours, as get_headers may return the same dict each call.
+        attempt_headers.update(self.auth_util.get_headers())
+        self.events.log("request.headers", "Headers: %s", lazy(json.dumps, attempt_headers))
+        return attempt_headers
+
+    def _observe(self, headers: dict, response, result=None):
+        if self.auth_util.observes_responses:
+            if result is None and response.status_code != 200:
+                # e.g. a 401 or 403 whose status names a revoked API key.
+                result = self._error_body(response)
+            self.auth_util.observe(headers, response, result)
+
+    def _error_body(self, response):
+        """
+        :return: the decoded JSON body of an error response, None if it has none.
+        """
+        try:
+            return self.codec.loads(response.content) if response.content else None
+        except ValueError:
+            return None
 
-        payload_json = json.dumps(payload)
+    def _wire_bytes(self, response) -> Optional[int]:
+        """
+        :return: the size of the response body as received, before any decompression, None if unknown
+        """
+        return None
 
-        response = requests.request(method, url, headers=headers, data=payload_json)
+    def _http_span(self, operation: str, method: str, url: str, request_bytes: int):
+        """
+        :return: a CLIENT span for one HTTP request, or a no-op span if tracing isn't configured.
+        """
+        if self.tracer is None:
+            return NOOP_SPAN
+        return self.tracer.start_span(f"{method} {operation}", SpanKind.CLIENT, {
+            "http.request.method": method,
+            "url.full": url,
+            "vectara.operation": operation,
+            "http.request.body.size": request_bytes
+        })
+
+    def _handle_traced_response(self, span, response, to_class: Type[T] = None, operation: str = None,
+                                headers: dict = None) -> T:
+        """
+        _handle_response, adding the response, our decoding time and the server's PerformanceMetrics to span.
+        """
+        if span is NOOP_SPAN:
+            return self._handle_response(response, to_class, operation, headers)
+        span.set_attribute("http.response.status_code", response.status_code)
+        span.set_attribute("http.response.body.size", len(response.content))
+        start = time.perf_counter()
+        result = self._handle_response(response, to_class, operation, headers)
+        span.set_attribute("vectara.client.decode_ms", (time.perf_counter() - start) * 1000.0)
+        span.set_performance_metrics(getattr(result, "metrics", None))
+        return result
 
-        if response.status_code == 200:
-            if self.logger.isEnabledFor(logging.DEBUG):
-                self.logger.debug(f"Response was:\n{json.dumps(json.loads(response.text), indent=4)}")
+    def _handle_response(self, response, to_class: Type[T] = None, operation: str = None,
+                         headers: dict = None) -> T:
+        """
+        Decodes a response from either the requests or httpx library into our domain class.
 
-            if to_class:
-                return from_dict(to_class, json.loads(response.text))
-            elif response.text:
-                return json.loads(response.text)
-            else:
+        :param response: the HTTP response
+        :param to_class: the dataclass to decode into, if None the raw decoded JSON is returned
+        :param operation: the REST operation, for our compression counters
+        :param headers: the request's headers, for the auth util to observe the response
+        :return: the decoded response
+        """
+        if response.status_code == 200:
+            # Decode straight from the body bytes, response.text would first guess the charset and build a str.
+            body = response.content
+            if operation:
+                wire_bytes = self._wire_bytes(response) if response.headers.get('Content-Encoding') else None
+                self.compressor.record_response(operation, wire_bytes, len(body))
+            if not body:
                 return
+
+            decoded = self.codec.loads(body)
+            self.events.log("response.body", "Response was:\n%s", lazy(self.codec.dumps_pretty, decoded))
+
+            result = decode(to_class, decoded) if to_class else decoded
+            if headers is not None:
+                self._observe(headers, response, result)
+            return result
         else:
+            if headers is not None:
+                self._observe(headers, response)
             print(f"Received non 200 response: {response.text}")
             self.logger.error(f"Received non 200 response {response.status_code}, throwing exception")
             response.raise_for_status()
 
-    def multipart_post(self, operation: str, path_str: str = None, input_contents: bytes = None,
-                       filename_override: str = None,
-                       params=None, headers=None) -> UploadDocumentResponse:
 
-        # Create headers, taking in any from the particular method.
-        if not headers:
-            headers = {}
+class RequestUtil(BaseRequestUtil):
+
+    def __init__(self, auth_util: BaseAuthUtil, transport_config: TransportConfig = None,
+                 session: requests.Session = None, base_url: str = DEFAULT_BASE_URL,
+                 retry_handler: RetryHandler = None, rate_limiter: RateLimiter = None,
+                 journal: RequestJournal = None, codec: BaseJsonCodec = None, compressor: Compressor = None,
+                 hedger: Hedger = None, circuit_breaker: CircuitBreaker = None, timeouts: Timeouts = None,
+                 single_flight: SingleFlight = None, metrics: Metrics = None, tracer: Tracer = None,
+                 interceptors: List[BaseInterceptor] = None, logging_config: LoggingConfig = None):
+        """
+        Inject the dependencies for our common HTTP request handler.
+
+        :param auth_util: dependent authentication utility
+        :param transport_config: tuning for the pooled session, ignored if a session is supplied
+        :param session: an externally managed session to share, we will not close this one
+        :param base_url: the root of the Vectara REST API, override for local stand-in servers
+        :param retry_handler: retry policies and budget, defaults to RetryHandler with the default RetryConfig
+        :param rate_limiter: optional client side rate limits, applied to every attempt including retries
+        :param journal: records recent requests, defaults to RequestJournal with the default JournalConfig
+        :param codec: encodes request and decodes response bodies, defaults to orjson if installed
+        :param compressor: compresses request bodies and counts bytes saved, defaults to uncompressed requests
+        :param hedger: optionally hedges slow requests of idempotent operations, applied within each retry attempt
+        :param circuit_breaker: optionally fails fast while an operation keeps failing, applied to each retry attempt
+        :param timeouts: the connect and read timeouts of each attempt, defaults to Timeouts with the default
+            TimeoutConfig
+        :param single_flight: optionally shares one request between identical concurrent calls of idempotent
+            operations
+        :param metrics: latency, byte, status and in-flight metrics of every request, defaults to Metrics with the
+            default MetricsConfig
+        :param tracer: optionally traces each service method and HTTP request
+        :param interceptors: run around every request and multipart_post call, more may be added later with
+            interceptors.add
+        :param logging_config: the levels and sampling of the events logged for every request, defaults to the
+            "development" profile
+        """
+        super().__init__(auth_util, base_url=base_url, retry_handler=retry_handler, rate_limiter=rate_limiter,
+                         journal=journal, codec=codec, compressor=compressor, hedger=hedger,
+                         circuit_breaker=circuit_breaker, timeouts=timeouts, single_flight=single_flight,
+                         metrics=metrics, tracer=tracer, interceptors=interceptors,
+                         logging_config=logging_config)
+
+        if session:
+            self.session = session
+            self._owns_session = False
+        else:
+            self.session = create_session(transport_config)
+            self._owns_session = True
+
+    def _wire_bytes(self, response) -> Optional[int]:
+        # urllib3 counts the bytes read off the connection, before it decompresses them.
+        tell = getattr(response.raw, 'tell', None)
+        return tell() if tell else None
+
+    def close(self):
+        """
+        Release the pooled connections, only if we created the session ourselves.
+        """
+        self.requests.close()
+        if self.hedger:
+            self.hedger.close()
+        if self.tracer:
+            self.tracer.close()
+        if self._owns_session:
+            self.session.close()
+
+    def request(self, operation: str, payload, to_class: Type[T] = None, method="POST",
+                deadline: Union[Deadline, float] = None) -> T:
+        """
+
+        :param method:
+        :param to_class:
+        :param operation: the REST operation to perform.
+        :param payload: the payload which will be serialized.
+        :param deadline: a Deadline or seconds from now, bounding every attempt and the backoff between them.
+        :return:
+        :raises DeadlineExceededError: if the deadline passes before an attempt is sent.
+        """
+        deadline = Deadline.resolve(deadline)
+        if not self.interceptors.interceptors:
+            return self._call(operation, payload, to_class, method, deadline)
+        context = RequestContext(operation, payload, to_class, method, deadline)
+        return self.interceptors.call(context, lambda: self._call(
+            context.operation, context.payload, context.to_class, context.method, context.deadline))
+
+    def _call(self, operation: str, payload, to_class: Type[T], method: str, deadline: Optional[Deadline]) -> T:
+        if self.single_flight and self.single_flight.coalesces(operation):
+            # Identical calls already in flight share that request and its decoded result.
+            key = SingleFlight.key(operation, payload, method, to_class)
+            return self.single_flight.call(operation, key,
+                                           lambda: self._request(operation, payload, to_class, method, deadline),
+                                           timeout=deadline.remaining() if deadline else None)
+        return self._request(operation, payload, to_class, method, deadline)
+
+    def _request(self, operation: str, payload, to_class: Type[T], method: str, deadline: Optional[Deadline]) -> T:
+        url, headers, payload_json = self._prepare_request(operation, payload)
+
+        def send():
+            if self.rate_limiter:
+                self.rate_limiter.acquire(operation, payload, deadline)
+            timeout = self.timeouts.for_attempt(operation, deadline)
+            attempt_headers = self._with_auth(headers)
+            with self._http_span(operation, method, url, len(payload_json)) as span:
+                with self.metrics.track(operation, len(payload_json)) as tracking:
+                    response = self.session.request(method, url, headers=attempt_headers, data=payload_json,
+                                                    timeout=timeout)
+                    tracking.received(response.status_code, len(response.content))
+                if response.status_code == 200:
+                    # Quick 429 or 5xx responses while overloaded would otherwise shrink the adaptive timeouts.
+                    self.timeouts.record(operation, tracking.latency)
+                return self._handle_traced_response(span, response, to_class, operation, attempt_headers)
+
+        return self.retry_handler.call(operation, self._attempt(operation, send, deadline), deadline)
+
+    def _attempt(self, operation: str, send, deadline: Deadline = None):
+        """
+        Wraps one attempt of a request with the optional hedger and circuit breaker, and checks the deadline before
+        either sees it.
+        """
+        attempt = send
+        if self.hedger and self.hedger.hedges(operation):
+            attempt = lambda: self.hedger.call(operation, send)
+        if self.circuit_breaker:
+            hedged = attempt
+            attempt = lambda: self.circuit_breaker.call(operation, hedged)
+        if deadline:
+            unchecked = attempt
+            # check() returns None unless it raises.
+            attempt = lambda: deadline.check(operation) or unchecked()
+        return attempt
 
-        sec_headers = self.auth_util.get_headers()
-        for sec_header in sec_headers.keys():
-            headers[sec_header] = sec_headers[sec_header]
+    def multipart_post(self, operation: str, path_str: str = None, input_contents: bytes = None,
+                       filename_override: str = None,
+                       params=None, headers=None, deadline: Union[Deadline, float] = None) -> UploadDocumentResponse:
 
-        self.logger.debug(f"Headers: {json.dumps(headers)}")
+        deadline = Deadline.resolve(deadline)
+        if not self.interceptors.interceptors:
+            return self._multipart_post(operation, path_str, filename_override, params, headers, deadline)
+        context = RequestContext(operation, params, UploadDocumentResponse, "POST", deadline, path_str)
+        return self.interceptors.call(context, lambda: self._multipart_post(
+            context.operation, context.path, filename_override, context.payload, headers, context.deadline))
 
-        upload_url = f"https://api.vectara.io/v1/{operation}"
+    def _multipart_post(self, operation: str, path_str: Optional[str], filename_override: Optional[str], params,
+                        headers: Optional[dict], deadline: Optional[Deadline]) -> UploadDocumentResponse:
+        upload_url = f"{self.base_url}/{operation}"
 
         files = None
         if path_str:
+            # Imported on first upload, so clients which only query don't pay for them at start up.
+            from tqdm import tqdm
+            from tqdm.contrib.logging import logging_redirect_tqdm
+            from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+
             path = Path(path_str)
             tracker_total_size = path.stat().st_size
 
@@ -124,38 +378,248 @@ class RequestUtil:
                         unit_divisor=1024
                 ) as bar:
                     with logging_redirect_tqdm():
-                        with open(path, 'rb') as f:
 
-                            # TODO Get mimetype for extension.
+                        def send():
+                            # Each attempt re-opens the file as the previous stream has been consumed.
+                            bar.reset()
+                            if self.rate_limiter:
+                                self.rate_limiter.acquire(operation, params, deadline)
+                            with open(path, 'rb') as f:
 
-                            if params:
-                                params['file'] = (tracker_file_name, f, 'application/pdf')
-                            else:
-                                params = {'file': (tracker_file_name, f, 'application/pdf')}
+                                # TODO Get mimetype for extension.
 
-                            # This doesn't yet include the boundary
+                                if params:
+                                    fields = dict(params)
+                                    fields['file'] = (tracker_file_name, f, 'application/pdf')
+                                else:
+                                    fields = {'file': (tracker_file_name, f, 'application/pdf')}
 
-                            encoder = MultipartEncoder(fields=params)
+                                # This doesn't yet include the boundary
 
-                            headers['Content-Type'] = encoder.content_type
+                                encoder = MultipartEncoder(fields=fields)
 
-                            m = MultipartEncoderMonitor(
-                                encoder, lambda monitor: bar.update(monitor.bytes_read - bar.n)
-                            )
+                                attempt_headers = self._with_auth(headers)
+                                attempt_headers['Content-Type'] = encoder.content_type
 
-                            response = requests.post(upload_url, data=m, headers=headers, timeout=120)
+                                m = MultipartEncoderMonitor(
+                                    encoder, lambda monitor: bar.update(monitor.bytes_read - bar.n)
+                                )
 
-                            if response.status_code == 200:
-                                return from_dict(UploadDocumentResponse, json.loads(response.text))
-                            else:
-                                self.logger.error(f"Received non 200 response {response.status_code}: {response.text}")
-                                response.raise_for_status()
+                                timeout = self.timeouts.for_attempt(operation, deadline)
+                                with self._http_span(operation, "POST", upload_url, encoder.len) as span:
+                                    with self.metrics.track(operation, encoder.len) as tracking:
+                                        response = self.session.post(upload_url, data=m, headers=attempt_headers,
+                                                                     timeout=timeout)
+                                        tracking.received(response.status_code, len(response.content))
+                                    span.set_attribute("http.response.status_code", response.status_code)
+
+                                    if response.status_code == 200:
+                                        result = decode(UploadDocumentResponse, self.codec.loads(response.content))
+                                        self._observe(attempt_headers, response, result)
+                                        return result
+                                    else:
+                                        self._observe(attempt_headers, response)
+                                        self.logger.error(f"Received non 200 response {response.status_code}: {response.text}")
+                                        response.raise_for_status()
+
+                        return self.retry_handler.call(operation, self._attempt(operation, send, deadline),
+                                                       deadline)
 
         else:
             raise Exception("You must supply a filename")
             # files={'file': (input_file_name, input_contents), 'c': self.customer_id, 'o': corpus_id}
 
 
+class AsyncRequestUtil(BaseRequestUtil):
+    """
+    asyncio counterpart of RequestUtil backed by a pooled httpx.AsyncClient. A single instance may be shared by
+    thousands of concurrent tasks which queue for one of the pooled connections rather than each opening their own.
+    """
+
+    def __init__(self, auth_util: BaseAuthUtil, transport_config: TransportConfig = None, client=None,
+                 base_url: str = DEFAULT_BASE_URL, retry_handler: RetryHandler = None,
+                 rate_limiter: RateLimiter = None, journal: RequestJournal = None,
+                 codec: BaseJsonCodec = None, compressor: Compressor = None, hedger: Hedger = None,
+                 circuit_breaker: CircuitBreaker = None, timeouts: Timeouts = None,
+                 single_flight: SingleFlight = None, metrics: Metrics = None, tracer: Tracer = None,
+                 interceptors: List[BaseInterceptor] = None, logging_config: LoggingConfig = None):
+        """
+        Inject the dependencies for our common asyncio HTTP request handler.
+
+        :param auth_util: dependent authentication utility
+        :param transport_config: tuning for the pooled client, ignored if a client is supplied
+        :param client: an externally managed httpx.AsyncClient to share, we will not close this one
+        :param base_url: the root of the Vectara REST API, override for local stand-in servers
+        :param retry_handler: retry policies and budget, defaults to RetryHandler with the default RetryConfig
+        :param rate_limiter: optional client side rate limits, applied to every attempt including retries
+        :param journal: records recent requests, defaults to RequestJournal with the default JournalConfig
+        :param codec: encodes request and decodes response bodies, defaults to orjson if installed
+        :param compressor: compresses request bodies and counts bytes saved, defaults to uncompressed requests
+        :param hedger: optionally hedges slow requests of idempotent operations, applied within each retry attempt
+        :param circuit_breaker: optionally fails fast while an operation keeps failing, applied to each retry attempt
+        :param timeouts: the connect and read timeouts of each attempt, defaults to Timeouts with the default
+            TimeoutConfig
+        :param single_flight: optionally shares one request between identical concurrent calls of idempotent
+            operations
+        :param metrics: latency, byte, status and in-flight metrics of every request, defaults to Metrics with the
+            default MetricsConfig
+        :param tracer: optionally traces each service method and HTTP request
+        :param interceptors: run around every request and multipart_post call, more may be added later with
+            interceptors.add
+        :param logging_config: the levels and sampling of the events logged for every request, defaults to the
+            "development" profile
+        """
+        super().__init__(auth_util, base_url=base_url, retry_handler=retry_handler, rate_limiter=rate_limiter,
+                         journal=journal, codec=codec, compressor=compressor, hedger=hedger,
+                         circuit_breaker=circuit_breaker, timeouts=timeouts, single_flight=single_flight,
+                         metrics=metrics, tracer=tracer, interceptors=interceptors,
+                         logging_config=logging_config)
+
+        if client:
+            self.client = client
+            self._owns_client = False
+        else:
+            self.client = create_async_client(transport_config)
+            self._owns_client = True
+
+    def _wire_bytes(self, response) -> Optional[int]:
+        return response.num_bytes_downloaded
+
+    async def aclose(self):
+        """
+        Release the pooled connections, only if we created the client ourselves.
+        """
+        self.requests.close()
+        if self.hedger:
+            self.hedger.close()
+        if self.tracer:
+            self.tracer.close()
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def _throttle(self, operation: str, payload, deadline: Optional[Deadline]):
+        if self.rate_limiter:
+            await self.rate_limiter.acquire_async(operation, payload, deadline)
+
+    def _client_timeout(self, operation: str, deadline: Optional[Deadline]) -> tuple:
+        """
+        :return: the httpx connect, read, write and pool timeouts of an attempt.
+        """
+        connect, read = self.timeouts.for_attempt(operation, deadline)
+        # Without a deadline a burst of tasks larger than the pool waits for a connection however long it takes.
+        return connect, read, read, read if deadline else None
+
+    async def request(self, operation: str, payload, to_class: Type[T] = None, method="POST",
+                      deadline: Union[Deadline, float] = None) -> T:
+        """
+        See RequestUtil.request, the payload and returned domain classes are identical.
+        """
+        deadline = Deadline.resolve(deadline)
+        if not self.interceptors.interceptors:
+            return await self._call(operation, payload, to_class, method, deadline)
+        context = RequestContext(operation, payload, to_class, method, deadline)
+        return await self.interceptors.call_async(context, lambda: self._call(
+            context.operation, context.payload, context.to_class, context.method, context.deadline))
+
+    async def _call(self, operation: str, payload, to_class: Type[T], method: str,
+                    deadline: Optional[Deadline]) -> T:
+        if self.single_flight and self.single_flight.coalesces(operation):
+            key = SingleFlight.key(operation, payload, method, to_class)
+            return await self.single_flight.call_async(
+                operation, key, lambda: self._request(operation, payload, to_class, method, deadline),
+                timeout=deadline.remaining() if deadline else None)
+        return await self._request(operation, payload, to_class, method, deadline)
+
+    async def _request(self, operation: str, payload, to_class: Type[T], method: str,
+                       deadline: Optional[Deadline]) -> T:
+        url, headers, payload_json = self._prepare_request(operation, payload)
+
+        async def send():
+            await self._throttle(operation, payload, deadline)
+            timeout = self._client_timeout(operation, deadline)
+            attempt_headers = self._with_auth(headers)
+            with self._http_span(operation, method, url, len(payload_json)) as span:
+                with self.metrics.track(operation, len(payload_json)) as tracking:
+                    response = await self.client.request(method, url, headers=attempt_headers,
+                                                         content=payload_json, timeout=timeout)
+                    tracking.received(response.status_code, len(response.content))
+                if response.status_code == 200:
+                    # Quick 429 or 5xx responses while overloaded would otherwise shrink the adaptive timeouts.
+                    self.timeouts.record(operation, tracking.latency)
+                return self._handle_traced_response(span, response, to_class, operation, attempt_headers)
+
+        return await self.retry_handler.call_async(operation, self._attempt(operation, send, deadline), deadline)
+
+    def _attempt(self, operation: str, send, deadline: Deadline = None):
+        """
+        See RequestUtil._attempt, where send and the returned attempt are coroutine functions.
+        """
+        attempt = send
+        if self.hedger and self.hedger.hedges(operation):
+            attempt = lambda: self.hedger.call_async(operation, send)
+        if self.circuit_breaker:
+            hedged = attempt
+            attempt = lambda: self.circuit_breaker.call_async(operation, hedged)
+        if deadline:
+            unchecked = attempt
+            attempt = lambda: deadline.check(operation) or unchecked()
+        return attempt
+
+    async def multipart_post(self, operation: str, path_str: str = None, input_contents: bytes = None,
+                             filename_override: str = None,
+                             params=None, headers=None,
+                             deadline: Union[Deadline, float] = None) -> UploadDocumentResponse:
+        """
+        See RequestUtil.multipart_post, without the tqdm progress bar which doesn't make sense for concurrent uploads.
+        """
+        deadline = Deadline.resolve(deadline)
+        if not self.interceptors.interceptors:
+            return await self._multipart_post(operation, path_str, filename_override, params, headers, deadline)
+        context = RequestContext(operation, params, UploadDocumentResponse, "POST", deadline, path_str)
+        return await self.interceptors.call_async(context, lambda: self._multipart_post(
+            context.operation, context.path, filename_override, context.payload, headers, context.deadline))
+
+    async def _multipart_post(self, operation: str, path_str: Optional[str], filename_override: Optional[str],
+                              params, headers: Optional[dict], deadline: Optional[Deadline]) -> UploadDocumentResponse:
+        if not path_str:
+            raise Exception("You must supply a filename")
+
+        upload_url = f"{self.base_url}/{operation}"
+
+        path = Path(path_str)
+        if filename_override:
+            file_name = filename_override
+        else:
+            file_name = path.name
+        file_size = path.stat().st_size
+
+        async def send():
+            await self._throttle(operation, params, deadline)
+            with open(path, 'rb') as f:
+                # TODO Get mimetype for extension.
+                files = {'file': (file_name, f, 'application/pdf')}
+                timeout = self._client_timeout(operation, deadline)
+                attempt_headers = self._with_auth(headers)
+                # The file size, httpx doesn't expose the size of the encoded multipart body.
+                with self._http_span(operation, "POST", upload_url, file_size) as span:
+                    with self.metrics.track(operation, file_size) as tracking:
+                        response = await self.client.post(upload_url, data=params, files=files,
+                                                          headers=attempt_headers, timeout=timeout)
+                        tracking.received(response.status_code, len(response.content))
+                    span.set_attribute("http.response.status_code", response.status_code)
+
+                    if response.status_code == 200:
+                        result = decode(UploadDocumentResponse, self.codec.loads(response.content))
+                        self._observe(attempt_headers, response, result)
+                        return result
+                    else:
+                        self._observe(attempt_headers, response)
+                        self.logger.error(f"Received non 200 response {response.status_code}: {response.text}")
+                        response.raise_for_status()
+
+        return await self.retry_handler.call_async(operation, self._attempt(operation, send, deadline), deadline)
+
+
 class BaseFormatter(ABC):
 
     def __init__(self):
@@ -426,9 +890,11 @@ class ChatPromptFactory(BasePromptFactory):
     SYSTEM_PROMPT_TEMPLATE = 'You are a {chat_persona} talking with a customer, respond to small talk in a nice way. You must not say you are an AI model. Provide a short answer from the search results, though you can go into more detail if requested from the user. Do not iterate over each question, just provide a short answer based on prior assistant answers in this chat. You may allow additional information you know in the results if nothing relevant is found. Respond in the language denoted by ISO 639 code \\"$vectaraLangCode\\".'
     USER_PROMPT_TEMPLATE = 'Generate a chat response which is part of a back-and-forth, that is no more than {max_word_count} words, for the query \\"$esc.java(${{vectaraQuery}})\\" preferably based on the interactions in this chat. Please ask for more information to help clarify if needed. If the response answers the question, please finish with a closing phrase that uses \\"does that answer your question\\" to confirm resolution.'
 
-    def __init__(self, chat_persona="Customer Support", name="Gary", max_word_count=300, prompt_metadata={}):
+    def __init__(self, chat_persona="Customer Support", name="Gary", max_word_count=300, prompt_metadata={},
+                 logging_config: LoggingConfig = None):
         super().__init__()
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.events = EventLogger(self.logger, logging_config)
         self.chat_persona = chat_persona
         self.name = name
         self.messages = []
@@ -488,7 +954,7 @@ class ChatPromptFactory(BasePromptFactory):
         lines.append(f'{{"role": "user", "content": "{user_prompt}" }} ]')
 
         result = "".join(lines)
-        self.logger.info("Chat prompt is:\n" + result)
+        self.events.log("chat.prompt", "Chat prompt is:\n%s", result)
         return result
 
 
@@ -504,15 +970,14 @@ class CountDownLatch:
             self.lock.notify_all()
         self.lock.release()
 
-    def sweat_it_out(self):
+    def sweat_it_out(self, timeout: float = None) -> bool:
         """
         Because await is a keyword.
 
-        :return:
+        :param timeout: the most seconds to wait, None waits until the count reaches zero
+        :return: True if the count reached zero, False if we timed out first
         """
-        self.lock.acquire()
-        while self.count > 0:
-            self.lock.wait()
-        self.lock.release()
+        with self.lock:
+            return self.lock.wait_for(lambda: self.count <= 0, timeout)
 
 